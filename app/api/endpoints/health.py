@@ -1,5 +1,7 @@
 from fastapi import APIRouter, HTTPException, status, Request
 
+from app.core.llm_cache import get_llm_response_cache
+
 router = APIRouter()
 
 
@@ -18,3 +20,12 @@ async def readiness_check(request: Request):
             detail="Application is not ready yet",
         )
     return {"status": "ready"}
+
+
+@router.get("/cache/llm", tags=["Health"])
+async def llm_cache_stats():
+    """Hit and miss counters and size of the planner response cache."""
+    cache = get_llm_response_cache()
+    if cache is None:
+        return {"enabled": False}
+    return {"enabled": True, **cache.stats()}
@@ -1,78 +1,19 @@
 import logging
 from datetime import datetime
 from pathlib import Path
-from typing import Union
+from typing import Optional, Union
 from urllib.parse import urlparse
 
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, status
 from pydantic import BaseModel, HttpUrl, Field, field_validator
 
-from app.services.analysis_service import run_analysis
+from app.opos.prompts import STANDARD_ANALYSIS_PROMPT
+from app.services.analysis_service import arun_analysis
+from app.services.job_service import get_job_manager
+from app.utils.exceptions import JobQueueFullError
 
 router = APIRouter()
-PROMPT = f"""
-You have to analyze an open posts list from a company. It holds all unpaid invoices and credits for the company.
-            
-            # Rules
-            - Check the format of the due date in the excel file. Chances are high that the format used is german. You need to cater for this.
-            - Identify the format of "non-cumulative" rows. These are typically rows that contain an invoice number, a due date, an invoice date and an invoice amount.
-            - Identify "invoice" rows. These are rows that are "non-cumulative" AND have a positive invoice amount.
-            - Identify "credit" rows. These are rows that are "non-cumulative" AND have a negative invoice amount.
-            - All rows that are not "non-cumulative" are "cumulative" rows. 
-            - You get the maturity of an invoice by calculating the difference between today's date and the due date. 
-            - You store all your output in a new sheet named "Analysis".
-            
-            # Your Tasks
-            You provide a multi-step analysis of the entire open posts list.
-            Here is each step outlined with additional instructions:
-            1. Create a list of "cumulative" row numbers
-               - You can tell that a row is cumulative if the key identifier (mostly the invoice number) all of a sudden changes format compared to the previous rows.
-               - Sometimes, the key identifier contains the word "debitor", "debtor", "creditor". You then know that the file holds cumulative rows.
-               - Sometimes, the values such as invoice date, due date, etc are empty
-               - Other forms of cumulative rows are rows that accumulate the entire file under a given filter.
-               - Programmatically create a list of "cumulative" row numbers.
-               - Make sure to reuse the list accordingly in later steps.
-            2. Create a list of "invoice" row numbers
-               - You can tell that a row is an invoice row if it is not a "cumulative" row and has a POSITIVE invoice amount.
-               - Programmatically create a list of "cumulative" row numbers.
-               - Make sure to reuse the list accordingly in later steps.
-            3. Create a list of "credit" row numbers
-               - You can tell that a row is a credit row if it is not a "cumulative" row and has a NEGATIVE invoice amount.
-               - Programmatically create a list of "credit" row numbers.
-               - Make sure to reuse the list accordingly in later steps.
-            4. Check each "invoice" and each "credit" row for completeness. "Is all required information present?"
-               - Are invoice numbers, amounts, addresses, debtor names, creditor names, debtor numbers, etc present?
-               - Use only "invoice" rows and "credit" rows.
-            5. Calculate the sum over the invoice amounts of all "invoice" rows
-            6. Calculate the sum over the credit amounts of all "credit" rows
-            7. Create an ageing report on the "invoice" rows.
-               - Cluster "invoice" rows by maturity into clusters: 1. Not mature 2. 1-30 days maturity 3. 31-60 days maturity 4. >60 days maturity. 
-               - Calculate the maturity of a credit row by: (today's date - due date).days
-               - For each maturity cluster, accumulate the invoice amount (sum of all invoice amounts in the cluster). 
-               - For each maturity cluster, give the percentage of the total accumulated invoice amount, calculated in step 3.
-            8. Create an ageing report on the "credit" rows.
-               - Cluster "credit" rows by maturity into clusters: 1. Not mature 2. 1-30 days maturity 3. 31-60 days maturity 4. >60 days maturity. 
-               - Calculate the maturity of a credit row by: (today's date - due date).days
-               - For each maturity cluster, accumulate the credit amount (sum of all credit amounts in the cluster). 
-               - For each maturity cluster, give the percentage of the total accumulated credit amount, calculated in step 4.
-            9. Calculate the top 10 credit positions by amount (lowest to highest).
-            10. Calculate the top 10 debtor positions by amount (highest to lowest).
-            11. Duplicate analysis
-               - Check whether the "invoice" rows hold duplicate invoice numbers.
-               - If there are duplicates, provide a list of the duplicate invoice numbers.
-               - Check the "cumulative" rows for duplicate debtor numbers or names.
-               - If there are duplicates, provide a list of the duplicate debtor numbers or names.
-            
-            # Output
-            Create a new sheet named "Analysis".
-            Write the output in the "Analysis" sheet.
-            Paste the output of each step so that it is clearly visible and easy to understand.     
-            Use columns to separate the output of each step
-            
-            Today's date is the {datetime.now().strftime("%dth of %B %Y")}
-            
-            Take a deep breath and think step by step.
-"""
+PROMPT = STANDARD_ANALYSIS_PROMPT
 OPTIMIZED_PROMPT = f"""
 You are an expert Excel analyst specializing in OPOS (Open Posts) analysis. Your goal is to complete the analysis efficiently with MINIMAL tool calls.
 
@@ -134,6 +75,7 @@ You are an expert Excel analyst specializing in OPOS (Open Posts) analysis. Your
    - Column E: Additional metrics
 
 # OPTIMIZATION REMINDERS
+- Start with column_profile to learn column types, date formats and number locales
 - Minimize cell_range_reader calls by reading large ranges
 - Use pandas for all data manipulation (faster than openpyxl loops)
 - Combine related operations in single code blocks
@@ -303,7 +245,8 @@ async def analyze_workbook(request: AnalysisRequest):
         HTTPException: If an error occurs during the analysis process.
     """
     try:
-        result_url = run_analysis(
+        # Awaits the LLM on the event loop; blocking work runs in worker threads
+        result_url = await arun_analysis(
             instruction=request.instruction,
             workbook_source=request.workbook_source,
             is_local_file=request.is_local_file,
@@ -314,3 +257,71 @@ async def analyze_workbook(request: AnalysisRequest):
         raise HTTPException(
             status_code=500, detail=f"An unexpected error occurred: {e}"
         )
+
+
+class JobResponse(BaseModel):
+    """Response model for the job endpoints."""
+
+    job_id: str
+    status: str
+    analysis_file_url: Optional[str] = None
+    error: Optional[str] = None
+    created_at: Optional[str] = None
+    started_at: Optional[str] = None
+    finished_at: Optional[str] = None
+
+
+def _job_response(job) -> JobResponse:
+    return JobResponse(
+        job_id=job.id,
+        status=job.status,
+        analysis_file_url=job.result,
+        error=job.error,
+        created_at=job.created_at,
+        started_at=job.started_at,
+        finished_at=job.finished_at,
+    )
+
+
+@router.post("/jobs", response_model=JobResponse, status_code=status.HTTP_202_ACCEPTED)
+async def submit_job(request: AnalysisRequest):
+    """
+    Queues the analysis of a workbook and returns immediately with a job id.
+
+    The analysis runs in the background; poll `GET /opos/jobs/{job_id}` for its
+    status and result.
+
+    Args:
+        request: The analysis request containing the workbook source (URL or local file path).
+
+    Returns:
+        The queued job.
+
+    Raises:
+        HTTPException: 429 if too many jobs are already waiting.
+    """
+    try:
+        job = get_job_manager().submit(
+            instruction=request.instruction,
+            workbook_source=request.workbook_source,
+            is_local_file=request.is_local_file,
+        )
+    except JobQueueFullError as e:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS, detail=str(e), headers={"Retry-After": "30"}
+        )
+    return _job_response(job)
+
+
+@router.get("/jobs/{job_id}", response_model=JobResponse)
+async def get_job(job_id: str):
+    """
+    Reports the status of an analysis job, and its result once it has finished.
+
+    Raises:
+        HTTPException: 404 if the job does not exist.
+    """
+    job = get_job_manager().get(job_id)
+    if job is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Job '{job_id}' not found")
+    return _job_response(job)
@@ -14,6 +14,10 @@ from fastapi.responses import JSONResponse
 
 from app.api.endpoints import opos, health
 from app.core.logging_config import configure_logging
+from app.core.sandbox_pool import get_sandbox_pool
+from app.dataset.downloader import get_downloader
+from app.graph.registry import aclear_registry, warm_up
+from app.services.job_service import get_job_manager
 
 logger = logging.getLogger(__name__)
 
@@ -28,10 +32,27 @@ def create_app() -> FastAPI:
         # Force reconfigure logging to ensure it works with uvicorn
         logger.info("🚀 Starting FastAPI app...")
         # Initialize environment variables if not already done
+        # Pre-warm the sandbox workers so that the first request does not pay for them
+        sandbox_pool = get_sandbox_pool()
+        # Start the job workers, which also re-queues jobs interrupted by the last shutdown
+        get_job_manager()
+        # Compile the graph and open the LLM client once for all requests
+        warm_up()
         app.state.ready = True
         yield
         logger.info("👋 Shutting down FastAPI app...")
         app.state.ready = False
+        # Stop taking jobs before the sandboxes they run in go away
+        if get_job_manager.cache_info().currsize:
+            get_job_manager().shutdown(timeout=5)
+            get_job_manager.cache_clear()
+        if sandbox_pool is not None:
+            sandbox_pool.shutdown()
+            get_sandbox_pool.cache_clear()
+        if get_downloader.cache_info().currsize:
+            get_downloader().close()
+            get_downloader.cache_clear()
+        await aclear_registry()
 
     # Exception Handler
     async def global_exception_handler(request: Request, exc: Exception):
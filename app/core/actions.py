@@ -130,7 +130,7 @@ class SheetSelector(ActionExecutor):
             sql_query_new = sql_query
 
         try:
-            out = self.db_conn.execute(sql_query_new)
+            out = self.db_conn.execute(sqlalchemy.text(sql_query_new))
         except sqlite3.OperationalError as e:
             return EXEC_CODE.FAIL, "Error occurs:\n" + str(e)
         except sqlalchemy.exc.OperationalError as e:  # type: ignore
@@ -143,9 +143,9 @@ class SheetSelector(ActionExecutor):
             return EXEC_CODE.SUCCESS, None
 
         unmerged_results = []
-        headers = out.dataset.headers
+        headers = list(out.keys())
         for i in range(len(results)):
-            unmerged_results.append(results[i].values())
+            unmerged_results.append(list(results[i]))
         tb = {"header": headers, "rows": unmerged_results}
 
         if "sqlite_master" in sql_query.lower() or sql_query.lower().startswith("select count"):
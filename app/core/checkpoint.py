@@ -0,0 +1,311 @@
+"""
+Checkpoint and rollback support for the sandbox.
+
+A failed code snippet used to be recovered by resetting the interpreter and
+replaying the whole code history, which re-parses the workbook on every error.
+This module instead journals the changes a snippet makes while it runs:
+
+- Interpreter namespace: a shallow copy of the name bindings taken before the step.
+- Cells: the value/style state of an existing cell the first time it is written.
+- Worksheets: the cell map of a sheet the first time a structural operation
+  (insert/delete/move/merge) touches it, plus the keys of newly created cells.
+- Workbook: the sheet list and titles the first time sheets are added, removed,
+  moved or renamed.
+
+Rollback cost is therefore proportional to what the failed snippet touched, not to
+the length of the history. In-place mutations of non-workbook objects held in the
+namespace (lists, DataFrames, ...) are not reverted.
+"""
+import functools
+import logging
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from copy import copy
+from itertools import islice
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from openpyxl.cell.cell import Cell
+from openpyxl.styles import styleable
+from openpyxl.workbook.child import _WorkbookChild
+from openpyxl.workbook.workbook import Workbook
+from openpyxl.worksheet.worksheet import Worksheet
+
+logger = logging.getLogger(__name__)
+
+_active_journal: ContextVar[Optional["WorkbookJournal"]] = ContextVar("_active_journal", default=None)
+
+# Worksheet methods that move, merge or delete cells and therefore need a snapshot of the cell map.
+_STRUCTURAL_WORKSHEET_METHODS = (
+    "insert_rows",
+    "insert_cols",
+    "delete_rows",
+    "delete_cols",
+    "move_range",
+    "merge_cells",
+    "unmerge_cells",
+    "__delitem__",
+)
+
+# Workbook methods that change the sheet list.
+_SHEET_LIST_METHODS = ("_add_sheet", "remove", "move_sheet")
+
+_hooks_installed = False
+_install_lock = threading.Lock()
+
+
+class WorkbookJournal:
+    """Undo log of the workbook changes made during a single sandbox step."""
+
+    def __init__(self) -> None:
+        install_journal_hooks()
+        self._cells: Dict[int, Tuple[Cell, Tuple[Any, ...]]] = {}
+        self._created: List[Tuple[Worksheet, Tuple[int, int]]] = []
+        self._current_rows: Dict[int, Tuple[Worksheet, int]] = {}
+        self._sheets: Dict[int, Tuple[Worksheet, Tuple[Any, ...]]] = {}
+        self._workbooks: Dict[int, Tuple[Workbook, Tuple[Any, ...]]] = {}
+
+    def record_cell(self, cell: Any) -> None:
+        """Records the state of an existing cell before its first write."""
+        if type(cell) is not Cell or id(cell) in self._cells:
+            return
+        sheet_cells = getattr(cell.parent, "_cells", None)
+        if sheet_cells is None or sheet_cells.get((cell.row, cell.column)) is not cell:
+            # The cell is not attached to a sheet yet; its creation is journaled instead.
+            return
+        state = (cell._value, cell.data_type, copy(cell._style), cell._hyperlink, cell._comment)
+        self._cells[id(cell)] = (cell, state)
+
+    def record_created(self, worksheet: Worksheet, keys: List[Tuple[int, int]]) -> None:
+        """Records the keys of cells that did not exist before this step."""
+        self._created.extend((worksheet, key) for key in keys)
+
+    def record_current_row(self, worksheet: Worksheet) -> None:
+        self._current_rows.setdefault(id(worksheet), (worksheet, worksheet._current_row))
+
+    def record_sheet(self, worksheet: Worksheet) -> None:
+        """Snapshots the cell map of a sheet before its first structural change."""
+        if id(worksheet) in self._sheets:
+            return
+        self.record_current_row(worksheet)
+        # Cells created before the snapshot are part of it and still have to be removed on rollback.
+        state = (dict(worksheet._cells), set(worksheet.merged_cells.ranges), len(self._created))
+        self._sheets[id(worksheet)] = (worksheet, state)
+
+    def record_workbook(self, workbook: Workbook) -> None:
+        """Snapshots the sheet list and titles before the first sheet-level change."""
+        if id(workbook) in self._workbooks:
+            return
+        titles = [(sheet, sheet.title) for sheet in workbook._sheets]
+        state = (list(workbook._sheets), titles, workbook._active_sheet_index)
+        self._workbooks[id(workbook)] = (workbook, state)
+
+    @property
+    def touched_sheets(self) -> List[Worksheet]:
+        """Worksheets whose cells or structure were changed during the step."""
+        sheets = {id(cell.parent): cell.parent for cell, _ in self._cells.values()}
+        sheets.update({id(ws): ws for ws, _ in self._created})
+        sheets.update({id(ws): ws for ws, _ in self._sheets.values()})
+        return list(sheets.values())
+
+    def rollback(self) -> None:
+        """Reverts every journaled change."""
+        created_before_snapshot = {}
+        for worksheet, (cells, merged, n_created) in self._sheets.values():
+            worksheet._cells = cells
+            for (row, column), cell in cells.items():
+                cell.row, cell.column = row, column
+            worksheet.merged_cells.ranges = merged
+            created_before_snapshot[id(worksheet)] = n_created
+
+        for index, (worksheet, key) in enumerate(self._created):
+            if index < created_before_snapshot.get(id(worksheet), len(self._created)):
+                worksheet._cells.pop(key, None)
+
+        for worksheet, current_row in self._current_rows.values():
+            worksheet._current_row = current_row
+
+        for cell, (value, data_type, style, hyperlink, comment) in self._cells.values():
+            cell._value = value
+            cell.data_type = data_type
+            cell._style = style
+            cell._hyperlink = hyperlink
+            cell._comment = comment
+
+        for workbook, (sheets, titles, active_index) in self._workbooks.values():
+            workbook._sheets = sheets
+            for sheet, title in titles:
+                sheet._WorkbookChild__title = title
+            workbook._active_sheet_index = active_index
+
+    @contextmanager
+    def activate(self) -> Iterator["WorkbookJournal"]:
+        """Routes openpyxl writes made in the current context to this journal."""
+        token = _active_journal.set(self)
+        try:
+            yield self
+        finally:
+            _active_journal.reset(token)
+
+
+class SandboxCheckpoint:
+    """A restorable snapshot of the interpreter namespace and the workbook changes after it."""
+
+    def __init__(self, namespace: Dict[str, Any]) -> None:
+        self._namespace = namespace
+        self._bindings = dict(namespace)
+        self.journal = WorkbookJournal()
+        workbook = namespace.get("workbook")
+        if isinstance(workbook, Workbook):
+            self.journal.record_workbook(workbook)
+
+    def restore(self) -> None:
+        """Restores the workbook and the namespace to the state at checkpoint time."""
+        self.journal.rollback()
+        # Functions defined in the sandbox hold a reference to this dict, so it is updated in place.
+        self._namespace.clear()
+        self._namespace.update(self._bindings)
+
+
+def journal_sheet(worksheet: Worksheet) -> None:
+    """
+    Snapshots a worksheet in the active journal, if any.
+
+    Code that rewrites a sheet's cell map directly (bypassing the openpyxl methods
+    wrapped below) must call this first to stay undoable.
+    """
+    journal = _active_journal.get()
+    if journal is not None:
+        journal.record_sheet(worksheet)
+
+
+def _journaled_cell_write(setter):
+    @functools.wraps(setter)
+    def wrapper(self, value):
+        journal = _active_journal.get()
+        if journal is not None:
+            journal.record_cell(self)
+        return setter(self, value)
+
+    return wrapper
+
+
+def _journaled_descriptor_set(descriptor_set):
+    @functools.wraps(descriptor_set)
+    def wrapper(self, instance, value):
+        journal = _active_journal.get()
+        if journal is not None:
+            journal.record_cell(instance)
+        return descriptor_set(self, instance, value)
+
+    return wrapper
+
+
+def _journaled_get_cell(get_cell):
+    @functools.wraps(get_cell)
+    def wrapper(self, row, column):
+        journal = _active_journal.get()
+        if journal is not None and (row, column) not in self._cells:
+            journal.record_current_row(self)
+            cell = get_cell(self, row, column)
+            journal.record_created(self, [(row, column)])
+            return cell
+        return get_cell(self, row, column)
+
+    return wrapper
+
+
+def _journaled_append(append):
+    @functools.wraps(append)
+    def wrapper(self, iterable):
+        journal = _active_journal.get()
+        if journal is None:
+            return append(self, iterable)
+        journal.record_current_row(self)
+        n_cells = len(self._cells)
+        try:
+            return append(self, iterable)
+        finally:
+            # New keys are inserted at the end of the cell dict.
+            n_created = len(self._cells) - n_cells
+            if n_created > 0:
+                journal.record_created(self, list(islice(reversed(self._cells), n_created)))
+
+    return wrapper
+
+
+def _journaled_structural(method):
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        journal = _active_journal.get()
+        if journal is not None:
+            journal.record_sheet(self)
+        return method(self, *args, **kwargs)
+
+    return wrapper
+
+
+def _journaled_sheet_list(method):
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        journal = _active_journal.get()
+        if journal is not None:
+            journal.record_workbook(self)
+        return method(self, *args, **kwargs)
+
+    return wrapper
+
+
+def _journaled_title(setter):
+    @functools.wraps(setter)
+    def wrapper(self, value):
+        journal = _active_journal.get()
+        if journal is not None and isinstance(self.parent, Workbook):
+            journal.record_workbook(self.parent)
+        return setter(self, value)
+
+    return wrapper
+
+
+def _wrap_property_setter(cls, name: str, wrap) -> None:
+    prop = cls.__dict__[name]
+    setattr(cls, name, prop.setter(wrap(prop.fset)))
+
+
+def install_journal_hooks() -> None:
+    """
+    Installs the journaling wrappers on the openpyxl classes (idempotent).
+
+    The wrappers are inert unless a journal is active in the current context, so
+    code running outside a sandbox step is unaffected.
+    """
+    global _hooks_installed
+    if _hooks_installed:
+        return
+    # Sandboxes can step in several threads; the setters must be wrapped exactly once
+    with _install_lock:
+        if _hooks_installed:
+            return
+
+        for name in ("value", "hyperlink", "comment"):
+            _wrap_property_setter(Cell, name, _journaled_cell_write)
+
+        for descriptor_cls in (
+            styleable.StyleDescriptor,
+            styleable.NumberFormatDescriptor,
+            styleable.NamedStyleDescriptor,
+            styleable.StyleArrayDescriptor,
+        ):
+            descriptor_cls.__set__ = _journaled_descriptor_set(descriptor_cls.__set__)
+
+        Worksheet._get_cell = _journaled_get_cell(Worksheet._get_cell)
+        Worksheet.append = _journaled_append(Worksheet.append)
+        for name in _STRUCTURAL_WORKSHEET_METHODS:
+            setattr(Worksheet, name, _journaled_structural(getattr(Worksheet, name)))
+
+        for name in _SHEET_LIST_METHODS:
+            setattr(Workbook, name, _journaled_sheet_list(getattr(Workbook, name)))
+        _wrap_property_setter(_WorkbookChild, "title", _journaled_title)
+
+        _hooks_installed = True
+        logger.debug("Installed openpyxl journaling hooks")
@@ -118,6 +118,28 @@ class SheetAgentSettings(BaseSettings):
         LANGCHAIN_ENDPOINT: The endpoint URL for LangSmith.
         LANGCHAIN_API_KEY: The API key for LangSmith.
         LANGCHAIN_PROJECT: The project name for LangSmith tracing.
+        SANDBOX_POOL_SIZE: Number of pre-warmed sandbox worker processes (0 runs sandboxes in-process).
+        SANDBOX_WORKER_MAX_JOBS: Number of analyses a sandbox worker serves before it is recycled.
+        SANDBOX_WORKER_MAX_RSS_MB: Resident memory above which a sandbox worker is recycled.
+        CONTENT_CACHE_DIR: Directory of the content-addressed workbook cache.
+        CONTENT_CACHE_MAX_MB: Size cap of the workbook cache (0 disables it).
+        DOWNLOAD_CONNECT_TIMEOUT: Seconds to wait for a connection when downloading a workbook.
+        DOWNLOAD_READ_TIMEOUT: Seconds to wait between bytes of a workbook download.
+        DOWNLOAD_MAX_MB: Maximum size of a downloaded workbook.
+        DOWNLOAD_MAX_RETRIES: Retries of a failed workbook download.
+        JOB_WORKERS: Number of analysis jobs run concurrently.
+        JOB_MAX_QUEUE_DEPTH: Number of waiting jobs above which new jobs are rejected.
+        JOB_DB_PATH: Path of the SQLite database holding the job metadata.
+        PLANNER_HISTORY_BUDGET_RATIO: Share of the planner model's context window available to the message history.
+        PLANNER_HISTORY_KEEP_EXCHANGES: Number of latest planner exchanges kept verbatim in the history.
+        LLM_HTTP_MAX_CONNECTIONS: Size of the connection pool shared by all LLM requests.
+        LLM_HTTP_KEEPALIVE_SECONDS: Seconds an idle LLM connection is kept open for reuse.
+        LLM_CACHE_PATH: Path of the SQLite database caching planner responses.
+        LLM_CACHE_TTL_HOURS: Hours a cached planner response is served.
+        LLM_CACHE_MAX_MB: Size cap of the planner response cache (0 disables it).
+        LLM_RECORD_PATH: JSONL file to which planner calls are recorded (unset disables recording).
+        LLM_REPLAY_PATH: JSONL file of recorded planner calls to answer from instead of the model.
+        LLM_REPLAY_LATENCY_MS: Simulated model latency of replayed planner calls.
     """
 
     APP_ENVIRONMENT: Literal["local", "dev", "prod"] = "local"
@@ -139,6 +161,44 @@ class SheetAgentSettings(BaseSettings):
     LANGSMITH_API_KEY: str
     LANGSMITH_PROJECT: str
 
+    # Sandbox Worker Pool
+    SANDBOX_POOL_SIZE: int = 0
+    SANDBOX_WORKER_MAX_JOBS: int = 20
+    SANDBOX_WORKER_MAX_RSS_MB: int = 1536
+
+    # Content-addressed Workbook Cache
+    CONTENT_CACHE_DIR: str = "./cache/workbooks"
+    CONTENT_CACHE_MAX_MB: int = 1024
+
+    # Workbook Downloads
+    DOWNLOAD_CONNECT_TIMEOUT: float = 5.0
+    DOWNLOAD_READ_TIMEOUT: float = 60.0
+    DOWNLOAD_MAX_MB: int = 200
+    DOWNLOAD_MAX_RETRIES: int = 3
+
+    # Analysis Jobs
+    JOB_WORKERS: int = 2
+    JOB_MAX_QUEUE_DEPTH: int = 20
+    JOB_DB_PATH: str = "./jobs/jobs.db"
+
+    # Planner Message History
+    PLANNER_HISTORY_BUDGET_RATIO: float = 0.05
+    PLANNER_HISTORY_KEEP_EXCHANGES: int = 3
+
+    # LLM HTTP Client
+    LLM_HTTP_MAX_CONNECTIONS: int = 20
+    LLM_HTTP_KEEPALIVE_SECONDS: float = 120.0
+
+    # LLM Response Cache
+    LLM_CACHE_PATH: str = "./cache/llm_responses.db"
+    LLM_CACHE_TTL_HOURS: float = 168.0
+    LLM_CACHE_MAX_MB: int = 256
+
+    # LLM Record/Replay
+    LLM_RECORD_PATH: str | None = None
+    LLM_REPLAY_PATH: str | None = None
+    LLM_REPLAY_LATENCY_MS: float = 0.0
+
     model_config = SettingsConfigDict(
         env_file=".env",
         env_file_encoding="utf-8",
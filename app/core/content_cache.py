@@ -0,0 +1,186 @@
+"""
+Content-addressed on-disk cache for workbook derived data.
+
+Customers resubmit the same export many times, often with only a different
+instruction. Everything derived from the workbook bytes alone (the parsed and
+trimmed workbook, the SQLite mirror, the OPOS structure detection) is therefore
+stored under the SHA-256 of the file, so that a repeat submission skips parsing
+and structure detection.
+
+Each digest gets its own directory holding one file per artifact. The directory's
+modification time records its last use, and the least recently used directories
+are evicted once the cache grows beyond its size cap. Writes go through a temporary
+file and an atomic rename, so several processes can share one cache directory.
+"""
+import functools
+import hashlib
+import logging
+import os
+import pickle
+import shutil
+import tempfile
+import threading
+from pathlib import Path
+from typing import Any, List, Optional, Tuple, Union
+
+logger = logging.getLogger(__name__)
+
+_HASH_CHUNK_SIZE = 1024 * 1024
+
+
+def hash_file(path: Union[str, Path]) -> str:
+    """Returns the hex SHA-256 of a file's content."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(_HASH_CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class ContentCache:
+    """
+    An LRU cache of files and pickled objects keyed by content digest.
+
+    Args:
+        directory: The cache directory; created if missing.
+        max_bytes: Total size above which least recently used entries are evicted.
+    """
+
+    def __init__(self, directory: Union[str, Path], max_bytes: int) -> None:
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+    def __getstate__(self) -> dict:
+        # Sent to sandbox workers together with a LoadedWorkbook
+        return {"directory": self.directory, "max_bytes": self.max_bytes}
+
+    def __setstate__(self, state: dict) -> None:
+        self.directory = state["directory"]
+        self.max_bytes = state["max_bytes"]
+        self._lock = threading.Lock()
+
+    def _entry_dir(self, digest: str) -> Path:
+        if len(digest) != 64 or any(char not in "0123456789abcdef" for char in digest):
+            raise ValueError(f"Invalid content digest: {digest!r}")
+        return self.directory / digest
+
+    def _touch(self, entry_dir: Path) -> None:
+        try:
+            os.utime(entry_dir)
+        except OSError:
+            pass
+
+    def get_path(self, digest: str, name: str) -> Optional[Path]:
+        """Returns the path of a cached file, or None on a miss."""
+        entry_dir = self._entry_dir(digest)
+        path = entry_dir / name
+        if not path.is_file():
+            return None
+        self._touch(entry_dir)
+        return path
+
+    def put_file(self, digest: str, name: str, source: Union[str, Path]) -> Path:
+        """Copies a file into the cache and returns its cached path."""
+        entry_dir = self._entry_dir(digest)
+        entry_dir.mkdir(parents=True, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=entry_dir, prefix=f".{name}.")
+        os.close(fd)
+        try:
+            shutil.copyfile(source, tmp_path)
+            os.replace(tmp_path, entry_dir / name)
+        except BaseException:
+            Path(tmp_path).unlink(missing_ok=True)
+            raise
+        self._touch(entry_dir)
+        self.evict()
+        return entry_dir / name
+
+    def get_object(self, digest: str, name: str) -> Optional[Any]:
+        """Returns a cached object, or None on a miss or an unreadable entry."""
+        path = self.get_path(digest, name)
+        if path is None:
+            return None
+        try:
+            with open(path, "rb") as f:
+                return pickle.load(f)
+        except Exception as e:
+            logger.warning(f"Dropping unreadable cache entry {path}: {e}")
+            path.unlink(missing_ok=True)
+            return None
+
+    def put_object(self, digest: str, name: str, value: Any) -> None:
+        """Pickles an object into the cache."""
+        entry_dir = self._entry_dir(digest)
+        entry_dir.mkdir(parents=True, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=entry_dir, prefix=f".{name}.")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, entry_dir / name)
+        except BaseException:
+            Path(tmp_path).unlink(missing_ok=True)
+            raise
+        self._touch(entry_dir)
+        self.evict()
+
+    def _entries(self) -> List[Tuple[float, int, Path]]:
+        entries = []
+        for entry_dir in self.directory.iterdir():
+            if not entry_dir.is_dir():
+                continue
+            try:
+                size = sum(path.stat().st_size for path in entry_dir.iterdir() if path.is_file())
+                entries.append((entry_dir.stat().st_mtime, size, entry_dir))
+            except FileNotFoundError:
+                # Evicted by another process meanwhile
+                continue
+        return entries
+
+    def size(self) -> int:
+        """Returns the total size of all cached files in bytes."""
+        return sum(size for _, size, _ in self._entries())
+
+    def evict(self) -> int:
+        """
+        Removes least recently used entries until the cache fits its size cap.
+
+        Returns:
+            The number of entries removed.
+        """
+        with self._lock:
+            entries = sorted(self._entries(), key=lambda entry: entry[0])
+            total = sum(size for _, size, _ in entries)
+            removed = 0
+            # The most recently used entry is kept even if it exceeds the cap on its own
+            while total > self.max_bytes and len(entries) - removed > 1:
+                _, size, entry_dir = entries[removed]
+                shutil.rmtree(entry_dir, ignore_errors=True)
+                total -= size
+                removed += 1
+        if removed:
+            logger.info(f"Evicted {removed} entries from the content cache at {self.directory}")
+        return removed
+
+    def clear(self) -> None:
+        """Removes all entries."""
+        with self._lock:
+            for entry_dir in self.directory.iterdir():
+                if entry_dir.is_dir():
+                    shutil.rmtree(entry_dir, ignore_errors=True)
+
+
+@functools.lru_cache
+def get_content_cache() -> Optional[ContentCache]:
+    """
+    Returns the process-wide content cache, or None if caching is disabled.
+
+    The cache is configured by CONTENT_CACHE_DIR and CONTENT_CACHE_MAX_MB.
+    """
+    from app.core.config import get_settings
+
+    settings = get_settings()
+    if settings.CONTENT_CACHE_MAX_MB <= 0:
+        return None
+    return ContentCache(settings.CONTENT_CACHE_DIR, settings.CONTENT_CACHE_MAX_MB * 1024 * 1024)
@@ -0,0 +1,118 @@
+"""
+Columnar shadow copies of the workbook's sheets.
+
+Planner code that loops over openpyxl cells row by row is slow on large open-post
+lists. The sandbox therefore exposes `frames`, a read-only mapping from sheet name
+to a pandas DataFrame of that sheet, so that code can use vectorized operations.
+
+Each frame uses the first row as column names and the Excel row number as index,
+so row labels can be used to write results back through openpyxl. Frames are built
+from the loaded workbook (no second parse of the file), cached per worksheet, and
+dropped whenever a sandbox step writes to their sheet.
+"""
+from collections.abc import Mapping
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+import pandas as pd
+from openpyxl.workbook.workbook import Workbook
+from openpyxl.worksheet.worksheet import Worksheet
+
+
+def _column_names(headers: List[Any]) -> List[Any]:
+    """Names empty headers and de-duplicates repeated ones like pandas.read_excel."""
+    names = []
+    seen: Dict[Any, int] = {}
+    for idx, header in enumerate(headers):
+        name = f"Unnamed: {idx}" if header is None or header == "" else header
+        if name in seen:
+            seen[name] += 1
+            name = f"{name}.{seen[name]}"
+        else:
+            seen[name] = 0
+        names.append(name)
+    return names
+
+
+def sheet_to_frame(worksheet: Worksheet) -> pd.DataFrame:
+    """
+    Builds a typed DataFrame from a worksheet in one pass over its cells.
+
+    Columns holding only numbers, dates or strings (plus empty cells) get the
+    matching NumPy dtype; mixed columns stay object.
+
+    Args:
+        worksheet: The openpyxl worksheet to convert.
+
+    Returns:
+        A DataFrame with the header row as columns and the Excel row number as index.
+    """
+    cells = worksheet._cells
+    if not cells:
+        return pd.DataFrame()
+
+    n_rows, n_cols = worksheet.max_row, worksheet.max_column
+    headers: List[Any] = [None] * n_cols
+    columns: List[List[Any]] = [[None] * max(n_rows - 1, 0) for _ in range(n_cols)]
+    for (row, column), cell in cells.items():
+        if row == 1:
+            headers[column - 1] = cell._value
+        else:
+            columns[column - 1][row - 2] = cell._value
+
+    index = pd.RangeIndex(2, n_rows + 1, name="row")
+    frame = pd.DataFrame(
+        {idx: pd.Series(values, index=index, dtype=object) for idx, values in enumerate(columns)},
+        index=index,
+    )
+    frame.columns = _column_names(headers)
+    return frame.infer_objects()
+
+
+class SheetFrames(Mapping):
+    """
+    Read-only mapping from sheet name to the DataFrame of that sheet.
+
+    Frames are shared between calls; copy a frame before modifying it.
+    """
+
+    def __init__(self, get_workbook: Callable[[], Optional[Workbook]]) -> None:
+        self._get_workbook = get_workbook
+        self._frames: Dict[int, Tuple[Worksheet, pd.DataFrame]] = {}
+        self._workbook: Optional[Workbook] = None
+
+    def _worksheets(self) -> Dict[str, Worksheet]:
+        workbook = self._get_workbook()
+        if workbook is not self._workbook:
+            self._frames.clear()
+            self._workbook = workbook
+        if workbook is None:
+            return {}
+        return {worksheet.title: worksheet for worksheet in workbook.worksheets}
+
+    def __getitem__(self, sheet_name: str) -> pd.DataFrame:
+        worksheet = self._worksheets()[sheet_name]
+        cached = self._frames.get(id(worksheet))
+        if cached is not None and cached[0] is worksheet:
+            return cached[1]
+
+        frame = sheet_to_frame(worksheet)
+        self._frames[id(worksheet)] = (worksheet, frame)
+        return frame
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._worksheets())
+
+    def __len__(self) -> int:
+        return len(self._worksheets())
+
+    def __repr__(self) -> str:
+        return f"SheetFrames({list(self)})"
+
+    def preload(self) -> None:
+        """Builds the frames of all worksheets."""
+        for sheet_name in self:
+            self[sheet_name]
+
+    def invalidate(self, worksheet: Worksheet) -> None:
+        """Drops the cached frame of a worksheet after it was written to."""
+        self._frames.pop(id(worksheet), None)
@@ -0,0 +1,199 @@
+"""
+Token-budgeted compaction of the planner's message history.
+
+The graph state keeps every message of a run, but the planner does not need all of
+them verbatim. Before each planner call the history is compacted:
+
+- the initial task message and the latest `keep_exchanges` exchanges (an assistant
+  message and the tool results answering it) are kept verbatim,
+- tool results of older exchanges are collapsed into short digests,
+- only the most recent sheet-state observation is kept, since it supersedes the
+  earlier ones,
+- if the history still exceeds the token budget, the oldest exchanges are dropped.
+
+Token counts are cached per message, so each message is encoded only once per run.
+"""
+import functools
+import json
+import logging
+from typing import Any, Dict, List, Optional, Sequence
+
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, SystemMessage, ToolMessage
+
+from app.core.prompt_manager import PromptManager
+from app.utils.enumeration import MODEL_TYPE
+from app.utils.utils import count_tokens_openai_chat_models, get_model_token_limit
+
+logger = logging.getLogger(__name__)
+
+# Context window assumed for models get_model_token_limit does not know
+DEFAULT_MODEL_TOKEN_LIMIT = 128000
+
+DIGEST_CHARS = 200
+
+
+class ApproximateEncoding:
+    """
+    Estimates 4 characters per token.
+
+    Used when no tiktoken encoding is available, e.g. without network access to
+    download the encoding files.
+    """
+
+    def encode(self, text: str) -> List[int]:
+        return [0] * ((len(text) + 3) // 4)
+
+
+@functools.lru_cache
+def get_token_encoding(model_name: str) -> Any:
+    """Returns the tiktoken encoding of the model, or an ApproximateEncoding if it cannot be loaded."""
+    try:
+        import tiktoken
+
+        try:
+            return tiktoken.encoding_for_model(model_name)
+        except KeyError:
+            return tiktoken.get_encoding("o200k_base")
+    except Exception as e:
+        logger.warning(f"No tiktoken encoding for {model_name}, estimating token counts: {e}")
+        return ApproximateEncoding()
+
+
+def history_token_budget(model_name: str, ratio: float) -> int:
+    """The history budget as a share of the model's context window."""
+    try:
+        limit = get_model_token_limit(MODEL_TYPE(model_name))
+    except ValueError:
+        limit = None
+    return int((limit or DEFAULT_MODEL_TOKEN_LIMIT) * ratio)
+
+
+def is_observation(message: BaseMessage) -> bool:
+    """Whether the message is a sheet-state observation of the PromptManager."""
+    return isinstance(message, SystemMessage) and str(message.content).strip().startswith(
+        PromptManager.OBSERVATION_PROMPT.strip().splitlines()[0]
+    )
+
+
+def _role(message: BaseMessage) -> str:
+    if isinstance(message, HumanMessage):
+        return "user"
+    if isinstance(message, AIMessage):
+        return "assistant"
+    if isinstance(message, ToolMessage):
+        return "tool"
+    return "system"
+
+
+def _message_dict(message: BaseMessage) -> Dict[str, str]:
+    content = message.content if isinstance(message.content, str) else json.dumps(message.content)
+    if isinstance(message, AIMessage) and message.tool_calls:
+        content += json.dumps([{"name": call["name"], "args": call["args"]} for call in message.tool_calls])
+    return {"role": _role(message), "content": content}
+
+
+class HistoryCompactor:
+    """
+    Compacts the planner's message history to a token budget.
+
+    Args:
+        budget_tokens: Maximum number of tokens of the compacted history.
+        encoding: A tiktoken encoding (anything with an `encode(text)` method).
+        keep_exchanges: Number of latest exchanges kept verbatim.
+        digest_chars: Characters of an older tool result kept in its digest.
+    """
+
+    def __init__(
+        self,
+        budget_tokens: int,
+        encoding: Any = None,
+        keep_exchanges: int = 3,
+        digest_chars: int = DIGEST_CHARS,
+    ) -> None:
+        self.budget_tokens = budget_tokens
+        self.encoding = encoding if encoding is not None else ApproximateEncoding()
+        self.keep_exchanges = keep_exchanges
+        self.digest_chars = digest_chars
+        self._token_counts: Dict[str, int] = {}
+        self._digests: Dict[str, ToolMessage] = {}
+
+    def count_tokens(self, message: BaseMessage) -> int:
+        """Tokens of one message; cached for messages with an id."""
+        if message.id is not None and message.id in self._token_counts:
+            return self._token_counts[message.id]
+        # count_tokens_openai_chat_models adds 2 tokens for the reply priming
+        tokens = count_tokens_openai_chat_models([_message_dict(message)], self.encoding) - 2
+        if message.id is not None:
+            self._token_counts[message.id] = tokens
+        return tokens
+
+    def total_tokens(self, messages: Sequence[BaseMessage]) -> int:
+        return sum(self.count_tokens(message) for message in messages) + 2
+
+    def _digest(self, message: ToolMessage) -> ToolMessage:
+        content = str(message.content)
+        if len(content) <= self.digest_chars:
+            return message
+        if message.id is not None and message.id in self._digests:
+            return self._digests[message.id]
+
+        head = " ".join(content[: self.digest_chars].split())
+        digest = ToolMessage(
+            content=f"{head} ... [{len(content) - self.digest_chars} more characters omitted]",
+            tool_call_id=message.tool_call_id,
+            name=message.name,
+            id=f"{message.id}-digest" if message.id is not None else None,
+        )
+        if message.id is not None:
+            self._digests[message.id] = digest
+        return digest
+
+    def compact(self, messages: Sequence[BaseMessage], observation: Optional[BaseMessage] = None) -> List[BaseMessage]:
+        """
+        Returns the compacted history to send to the planner.
+
+        Args:
+            messages: The full message history of the graph state.
+            observation: A new sheet-state observation appended to the history; it replaces older ones.
+
+        Returns:
+            The compacted messages, ending with the latest observation if there is one.
+        """
+        latest_observation = observation
+        head: List[BaseMessage] = []
+        exchanges: List[List[BaseMessage]] = []
+        for message in messages:
+            if is_observation(message):
+                if observation is None:
+                    latest_observation = message
+                continue
+            if isinstance(message, AIMessage):
+                exchanges.append([message])
+            elif exchanges:
+                exchanges[-1].append(message)
+            else:
+                head.append(message)
+
+        split = max(0, len(exchanges) - self.keep_exchanges)
+        older = [
+            [self._digest(message) if isinstance(message, ToolMessage) else message for message in exchange]
+            for exchange in exchanges[:split]
+        ]
+        recent = exchanges[split:]
+        tail = [latest_observation] if latest_observation is not None else []
+
+        def flatten(exchange_groups: List[List[BaseMessage]]) -> List[BaseMessage]:
+            return [message for exchange in exchange_groups for message in exchange]
+
+        compacted = head + flatten(older) + flatten(recent) + tail
+        total = self.total_tokens(compacted)
+        dropped = 0
+        while total > self.budget_tokens and older:
+            total -= sum(self.count_tokens(message) for message in older.pop(0))
+            dropped += 1
+        if dropped:
+            compacted = head + flatten(older) + flatten(recent) + tail
+            logger.info(f"Dropped {dropped} old exchanges from the planner history to fit {self.budget_tokens} tokens")
+        if total > self.budget_tokens:
+            logger.warning(f"Planner history of {total} tokens exceeds the budget of {self.budget_tokens} tokens")
+        return compacted
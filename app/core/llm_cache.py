@@ -0,0 +1,182 @@
+"""
+Exact-match cache of planner responses.
+
+Running the same instruction on the same workbook produces the same planner
+calls, so their responses are stored in a local SQLite database and replayed.
+The cache plugs into LangChain's BaseCache interface. LangChain hands it the
+serialized messages and a string describing the model, its parameters and the
+bound tool schemas. The key is the SHA-256 of both, after dropping the parts of
+a message that do not reach the model: message ids (random per run) and response
+metadata. The sheet state is part of the messages, so a different sheet leads to
+a different key.
+
+Entries expire after a TTL. The least recently used entries are evicted once the
+stored responses exceed the size cap. Hit and miss counters are kept per process.
+"""
+import functools
+import hashlib
+import json
+import logging
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional, Union
+
+from langchain_core.caches import RETURN_VAL_TYPE, BaseCache
+from langchain_core.load import dumps, loads
+
+logger = logging.getLogger(__name__)
+
+# Message fields that differ between runs without changing what the model sees
+_VOLATILE_MESSAGE_FIELDS = ("id", "response_metadata", "usage_metadata")
+
+
+def _normalize(value: Any) -> Any:
+    if isinstance(value, list):
+        return [_normalize(item) for item in value]
+    if isinstance(value, dict):
+        if value.get("type") == "constructor" and isinstance(value.get("kwargs"), dict):
+            kwargs = {
+                key: _normalize(item) for key, item in value["kwargs"].items() if key not in _VOLATILE_MESSAGE_FIELDS
+            }
+            return {**value, "kwargs": kwargs}
+        return {key: _normalize(item) for key, item in value.items()}
+    return value
+
+
+def cache_key(prompt: str, llm_string: str) -> str:
+    """The SHA-256 of the normalized prompt and the model description."""
+    try:
+        normalized = json.dumps(_normalize(json.loads(prompt)), sort_keys=True, ensure_ascii=False)
+    except ValueError:
+        normalized = prompt
+    digest = hashlib.sha256()
+    digest.update(llm_string.encode("utf-8"))
+    digest.update(b"\0")
+    digest.update(normalized.encode("utf-8"))
+    return digest.hexdigest()
+
+
+class LLMResponseCache(BaseCache):
+    """
+    A SQLite-backed LangChain cache with TTL and LRU size eviction.
+
+    Args:
+        db_path: The path of the SQLite database file; created if missing.
+        ttl_seconds: Age after which an entry is no longer served.
+        max_bytes: Total size of stored responses above which least recently used entries are evicted.
+    """
+
+    def __init__(self, db_path: Union[str, Path], ttl_seconds: float, max_bytes: int) -> None:
+        self.db_path = Path(db_path)
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS responses (
+                    key TEXT PRIMARY KEY,
+                    value TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    created_at REAL NOT NULL,
+                    last_used REAL NOT NULL
+                )
+                """
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS responses_last_used ON responses (last_used)")
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    def lookup(self, prompt: str, llm_string: str) -> Optional[RETURN_VAL_TYPE]:
+        key = cache_key(prompt, llm_string)
+        now = time.time()
+        with self._lock, self._conn:
+            row = self._conn.execute("SELECT value, created_at FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is not None and now - row[1] > self.ttl_seconds:
+                self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                row = None
+            if row is None:
+                self.misses += 1
+                return None
+            self._conn.execute("UPDATE responses SET last_used = ? WHERE key = ?", (now, key))
+            self.hits += 1
+        try:
+            # Only LangChain core classes (generations and messages) are revived
+            return [
+                loads(generation, allowed_objects="core", secrets_from_env=False)
+                for generation in json.loads(row[0])
+            ]
+        except Exception as e:
+            logger.warning(f"Dropping unreadable LLM cache entry {key[:12]}: {e}")
+            with self._lock, self._conn:
+                self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+            return None
+
+    def update(self, prompt: str, llm_string: str, return_val: RETURN_VAL_TYPE) -> None:
+        value = json.dumps([dumps(generation) for generation in return_val])
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, value, size, created_at, last_used) VALUES (?, ?, ?, ?, ?)",
+                (cache_key(prompt, llm_string), value, len(value), now, now),
+            )
+            self._evict()
+
+    def _evict(self) -> None:
+        self._conn.execute("DELETE FROM responses WHERE created_at < ?", (time.time() - self.ttl_seconds,))
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        removed = 0
+        for key, size in self._conn.execute("SELECT key, size FROM responses ORDER BY last_used").fetchall():
+            if total <= self.max_bytes:
+                break
+            self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+            total -= size
+            removed += 1
+        logger.info(f"Evicted {removed} entries from the LLM response cache")
+
+    def clear(self, **kwargs: Any) -> None:
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM responses")
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit and miss counters of this process and the size of the cache."""
+        with self._lock:
+            entries, size = self._conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses").fetchone()
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "entries": entries,
+            "bytes": size,
+        }
+
+
+@functools.lru_cache
+def get_llm_response_cache() -> Optional[LLMResponseCache]:
+    """
+    Returns the process-wide LLM response cache, or None if it is disabled.
+
+    Configured by LLM_CACHE_PATH, LLM_CACHE_TTL_HOURS and LLM_CACHE_MAX_MB.
+    """
+    from app.core.config import get_settings
+
+    settings = get_settings()
+    if settings.LLM_CACHE_MAX_MB <= 0:
+        return None
+    return LLMResponseCache(
+        settings.LLM_CACHE_PATH,
+        ttl_seconds=settings.LLM_CACHE_TTL_HOURS * 3600,
+        max_bytes=settings.LLM_CACHE_MAX_MB * 1024 * 1024,
+    )
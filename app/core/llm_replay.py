@@ -0,0 +1,160 @@
+"""
+Recording and offline replay of planner calls.
+
+LLMRecorder is a callback handler that appends every chat model call (the
+messages sent and the response, including its tool calls) to a JSONL fixture file.
+ReplayChatModel is a BaseChatModel that answers from such a file with a
+configurable latency. With it, SheetAgentGraph runs end to end without network
+access, so graph overhead, sandbox time and I/O time can be measured reproducibly.
+
+Calls are matched on the same normalized messages as the LLM response cache
+(message ids and response metadata ignored). If no recorded call matches, e.g.
+because the prompt embeds today's date, the next unreplayed response in
+recording order is used, unless the model is strict.
+"""
+import asyncio
+import json
+import logging
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Union
+from uuid import UUID
+
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.language_models import BaseChatModel
+from langchain_core.load import dumps, loads
+from langchain_core.messages import AIMessage, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatResult, LLMResult
+from pydantic import PrivateAttr
+
+from app.core.llm_cache import cache_key
+
+logger = logging.getLogger(__name__)
+
+
+def _messages_key(messages: Sequence[BaseMessage]) -> str:
+    return cache_key(dumps(list(messages)), "")
+
+
+class LLMRecorder(BaseCallbackHandler):
+    """
+    Appends chat model calls to a JSONL fixture file.
+
+    Each line holds the call's key, the serialized messages and the serialized response.
+
+    Args:
+        path: The fixture file; created if missing and appended to otherwise.
+    """
+
+    def __init__(self, path: Union[str, Path]) -> None:
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._pending: Dict[UUID, List[BaseMessage]] = {}
+
+    def on_chat_model_start(
+        self, serialized: Dict[str, Any], messages: List[List[BaseMessage]], *, run_id: UUID, **kwargs: Any
+    ) -> None:
+        with self._lock:
+            self._pending[run_id] = messages[0]
+
+    def on_llm_end(self, response: LLMResult, *, run_id: UUID, **kwargs: Any) -> None:
+        with self._lock:
+            messages = self._pending.pop(run_id, None)
+        if messages is None or not response.generations or not response.generations[0]:
+            return
+        generation = response.generations[0][0]
+        record = {
+            "key": _messages_key(messages),
+            "messages": dumps(messages),
+            "response": dumps(getattr(generation, "message", AIMessage(content=generation.text))),
+        }
+        with self._lock, open(self.path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+    def on_llm_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any) -> None:
+        with self._lock:
+            self._pending.pop(run_id, None)
+
+
+def load_recordings(path: Union[str, Path]) -> List[Dict[str, Any]]:
+    """Reads a fixture file written by LLMRecorder."""
+    recordings = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            record["response"] = loads(record["response"], allowed_objects="core", secrets_from_env=False)
+            recordings.append(record)
+    return recordings
+
+
+class ReplayChatModel(BaseChatModel):
+    """
+    A chat model answering with recorded responses.
+
+    Attributes:
+        recordings: The recorded calls, as returned by load_recordings.
+        latency_seconds: Delay before each response, simulating the model's latency.
+        strict: Raise instead of falling back to recording order when no recorded call matches.
+    """
+
+    recordings: List[Dict[str, Any]]
+    latency_seconds: float = 0.0
+    strict: bool = False
+
+    _by_key: Dict[str, List[int]] = PrivateAttr(default_factory=dict)
+    _replayed: set = PrivateAttr(default_factory=set)
+    _lock: Any = PrivateAttr(default_factory=threading.Lock)
+
+    def model_post_init(self, __context: Any) -> None:
+        for idx, record in enumerate(self.recordings):
+            self._by_key.setdefault(record["key"], []).append(idx)
+
+    @classmethod
+    def from_file(cls, path: Union[str, Path], **kwargs: Any) -> "ReplayChatModel":
+        return cls(recordings=load_recordings(path), **kwargs)
+
+    @property
+    def _llm_type(self) -> str:
+        return "replay"
+
+    def bind_tools(self, tools: Sequence[Any], **kwargs: Any):
+        # The recorded responses already contain the tool calls
+        return self.bind(**kwargs)
+
+    def reset(self) -> None:
+        """Makes all recordings available again, e.g. before the next benchmark round."""
+        with self._lock:
+            self._replayed.clear()
+
+    def _next_response(self, messages: List[BaseMessage]) -> AIMessage:
+        key = _messages_key(messages)
+        with self._lock:
+            candidates = self._by_key.get(key, [])
+            idx = next((idx for idx in candidates if idx not in self._replayed), candidates[-1] if candidates else None)
+            if idx is None:
+                if self.strict:
+                    raise KeyError(f"No recorded planner call matches key {key[:12]}")
+                idx = next((idx for idx in range(len(self.recordings)) if idx not in self._replayed), None)
+                if idx is None:
+                    raise KeyError("All recorded planner calls have been replayed")
+                logger.debug(f"No recorded call matches key {key[:12]}, replaying recording {idx}")
+            self._replayed.add(idx)
+        return self.recordings[idx]["response"].model_copy(deep=True)
+
+    def _generate(
+        self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager: Any = None, **kwargs: Any
+    ) -> ChatResult:
+        if self.latency_seconds:
+            time.sleep(self.latency_seconds)
+        return ChatResult(generations=[ChatGeneration(message=self._next_response(messages))])
+
+    async def _agenerate(
+        self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager: Any = None, **kwargs: Any
+    ) -> ChatResult:
+        if self.latency_seconds:
+            await asyncio.sleep(self.latency_seconds)
+        return ChatResult(generations=[ChatGeneration(message=self._next_response(messages))])
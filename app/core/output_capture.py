@@ -0,0 +1,95 @@
+"""
+Context-local capture of stdout and stderr.
+
+Swapping sys.stdout/sys.stderr for every sandbox step is process-global, so two
+sandboxes executing in different threads would mix up or lose each other's output.
+Instead, the process streams are replaced once by proxies that write to the buffers
+registered in the current context (thread or asyncio task), and fall through to the
+original stream everywhere else.
+"""
+import io
+import sys
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Iterator, Optional, TextIO, Tuple
+
+_capture_buffers: ContextVar[Optional[Tuple[io.StringIO, io.StringIO]]] = ContextVar(
+    "_capture_buffers", default=None
+)
+_install_lock = threading.Lock()
+
+
+class _RoutedStream(io.TextIOBase):
+    """A text stream that writes to the current context's capture buffer, if any."""
+
+    def __init__(self, index: int, fallback: TextIO) -> None:
+        super().__init__()
+        self._index = index
+        self._fallback = fallback
+
+    def _target(self) -> TextIO:
+        buffers = _capture_buffers.get()
+        return buffers[self._index] if buffers is not None else self._fallback
+
+    def write(self, text: str) -> int:
+        return self._target().write(text)
+
+    def writelines(self, lines) -> None:
+        self._target().writelines(lines)
+
+    def flush(self) -> None:
+        target = self._target()
+        # The wrapped stream may be closed by its owner (e.g. a test runner) at shutdown.
+        if not getattr(target, "closed", False):
+            target.flush()
+
+    def close(self) -> None:
+        # The proxy does not own the streams it routes to.
+        pass
+
+    def isatty(self) -> bool:
+        return self._target().isatty()
+
+    def fileno(self) -> int:
+        return self._fallback.fileno()
+
+    @property
+    def encoding(self) -> str:
+        return getattr(self._fallback, "encoding", "utf-8")
+
+    def __getattr__(self, name: str):
+        return getattr(self._fallback, name)
+
+
+def install_output_routing() -> None:
+    """
+    Replaces sys.stdout and sys.stderr with context-routed proxies (idempotent).
+
+    The check is repeated on every call because test runners and other tools may
+    swap the process streams after the proxies were installed.
+    """
+    if isinstance(sys.stdout, _RoutedStream) and isinstance(sys.stderr, _RoutedStream):
+        return
+    with _install_lock:
+        if not isinstance(sys.stdout, _RoutedStream):
+            sys.stdout = _RoutedStream(0, sys.stdout)
+        if not isinstance(sys.stderr, _RoutedStream):
+            sys.stderr = _RoutedStream(1, sys.stderr)
+
+
+@contextmanager
+def capture_output() -> Iterator[Tuple[io.StringIO, io.StringIO]]:
+    """
+    Captures everything written to stdout and stderr in the current context.
+
+    Yields:
+        A tuple of (stdout buffer, stderr buffer).
+    """
+    install_output_routing()
+    buffers = (io.StringIO(), io.StringIO())
+    token = _capture_buffers.set(buffers)
+    try:
+        yield buffers
+    finally:
+        _capture_buffers.reset(token)
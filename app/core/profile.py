@@ -0,0 +1,194 @@
+"""
+Column profiles of a sheet for the planner.
+
+Instead of paging through a sheet to learn what its columns hold, the planner can
+ask for one profile per column, computed from the sheet's frame with vectorized
+pandas operations:
+
+- the kinds of values (number, date, text, bool) and their shares,
+- the share of empty cells, the number of distinct values and the most frequent ones,
+- minimum and maximum of numbers and dates, including numbers and dates stored as text,
+- the native Excel dates and the date format and number locale ("de" 1.234,56,
+  "en" 1,234.56) of the text values, inferred by app.opos.dates and app.opos.amounts,
+- the OPOS role detected by app.opos.columns (invoice number, due date, amount, ...).
+
+Profiles are plain frozen dataclasses; `describe_profiles` renders them as one
+compact tab-separated line per column.
+"""
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+import pandas as pd
+from openpyxl.utils import get_column_letter
+
+from app.opos.amounts import infer_number_format, parse_amounts
+from app.opos.columns import detect_column_roles
+from app.opos.dates import infer_date_format, parse_dates, value_kinds
+
+TOP_VALUES = 3
+# Top values are listed for columns with at most this many distinct values
+MAX_TOP_DISTINCT = 50
+
+
+@dataclass(frozen=True)
+class ColumnProfile:
+    """
+    The profile of one column.
+
+    Attributes:
+        letter: The column letter.
+        header: The header (first row) of the column.
+        kinds: Share of the non-empty values per kind (number, date, text, bool), largest first.
+        null_ratio: Share of empty cells below the header.
+        distinct: Number of distinct non-empty values.
+        minimum: Smallest number or date, if the column mainly holds numbers or dates.
+        maximum: Largest number or date, if the column mainly holds numbers or dates.
+        formats: Share of the non-empty values per date format or number locale found in text.
+        top_values: The most frequent values with their counts, for low-cardinality columns.
+        role: The OPOS role detected for the column, if any.
+    """
+
+    letter: str
+    header: Any
+    kinds: Tuple[Tuple[str, float], ...]
+    null_ratio: float
+    distinct: int
+    minimum: Any = None
+    maximum: Any = None
+    formats: Tuple[Tuple[str, float], ...] = ()
+    top_values: Tuple[Tuple[Any, int], ...] = ()
+    role: Optional[str] = None
+
+    @property
+    def kind(self) -> str:
+        """The main kind of the column's values, "empty" if it has none."""
+        return self.kinds[0][0] if self.kinds else "empty"
+
+
+def _shares(counts: pd.Series, total: int) -> Tuple[Tuple[str, float], ...]:
+    return tuple((str(name), round(count / total, 3)) for name, count in counts.items() if count)
+
+
+def profile_column(letter: str, header: Any, values: pd.Series, role: Optional[str] = None) -> ColumnProfile:
+    """Profiles the values of one column (without the header)."""
+    total = len(values)
+    present = values[values.notna()]
+    # Values of other types are profiled by their text
+    kinds = value_kinds(present).replace("other", "text")
+    text = present[kinds == "text"].astype(str).str.strip()
+    blank = text.index[text == ""]
+    if len(blank):
+        present, kinds, text = present.drop(blank), kinds.drop(blank), text.drop(blank)
+    if present.empty:
+        return ColumnProfile(letter, header, (), 1.0 if total else 0.0, 0, role=role)
+
+    kind_counts = kinds.value_counts()
+    formats: Dict[str, int] = {}
+    numbers = [pd.to_numeric(present[kinds == "number"], errors="coerce")]
+    dates = [pd.to_datetime(present[kinds == "date"], errors="coerce")]
+    if kind_counts.get("date", 0):
+        formats["native date"] = int(kind_counts["date"])
+
+    if not text.empty:
+        date_format = infer_date_format(text)
+        if date_format.text_format is not None:
+            text_dates = parse_dates(text, date_format).dropna()
+            if len(text_dates):
+                formats[date_format.name] = len(text_dates)
+                dates.append(text_dates)
+                text = text.drop(text_dates.index)
+        number_format = infer_number_format(text)
+        if number_format.convention is not None:
+            text_numbers = parse_amounts(text, number_format).as_series().dropna()
+            # Integers alone ("4711") do not tell the locale
+            if len(text_numbers) and not number_format.ambiguous:
+                formats[number_format.name] = len(text_numbers)
+            numbers.append(text_numbers)
+
+    # Text that holds dates or numbers counts towards the column's main kind
+    date_count = sum(len(series.dropna()) for series in dates)
+    number_count = sum(len(series.dropna()) for series in numbers)
+    minimum = maximum = None
+    if date_count and date_count >= number_count and date_count * 2 >= len(present):
+        all_dates = pd.concat([series.dropna() for series in dates])
+        minimum, maximum = all_dates.min().to_pydatetime(), all_dates.max().to_pydatetime()
+    elif number_count and number_count * 2 >= len(present):
+        all_numbers = pd.concat([series.dropna() for series in numbers])
+        minimum, maximum = all_numbers.min().item(), all_numbers.max().item()
+
+    distinct = int(present.nunique())
+    top_values: Tuple[Tuple[Any, int], ...] = ()
+    if distinct <= MAX_TOP_DISTINCT and distinct < len(present):
+        top = present.value_counts().head(TOP_VALUES)
+        top_values = tuple((value, int(count)) for value, count in top.items())
+
+    return ColumnProfile(
+        letter=letter,
+        header=header,
+        kinds=_shares(kind_counts, len(present)),
+        null_ratio=round(1 - len(present) / total, 3),
+        distinct=distinct,
+        minimum=minimum,
+        maximum=maximum,
+        formats=tuple((name, round(count / len(present), 3)) for name, count in formats.items()),
+        top_values=top_values,
+        role=role,
+    )
+
+
+def profile_frame(frame: pd.DataFrame) -> List[ColumnProfile]:
+    """
+    Profiles every column of a sheet frame (see app.core.frames).
+
+    Args:
+        frame: The sheet frame with the header row as column labels.
+
+    Returns:
+        One ColumnProfile per column, in sheet order.
+    """
+    if frame.empty and not len(frame.columns):
+        return []
+    roles = {column: role for role, column in detect_column_roles(frame).columns.items()}
+    return [
+        profile_column(get_column_letter(idx + 1), column, frame.iloc[:, idx], roles.get(column))
+        for idx, column in enumerate(frame.columns)
+    ]
+
+
+def _format(value: Any) -> str:
+    if isinstance(value, datetime):
+        return value.date().isoformat() if value.time() == datetime.min.time() else value.isoformat(sep=" ")
+    if isinstance(value, float):
+        return f"{value:.15g}"
+    return str(value).replace("\t", " ").replace("\n", " ")
+
+
+def _percent(share: float) -> str:
+    return f"{share * 100:.0f}%" if share >= 0.01 or share == 0 else "<1%"
+
+
+def describe_profiles(sheet_name: str, n_rows: int, profiles: List[ColumnProfile]) -> str:
+    """Renders the profiles as one tab-separated line per column."""
+    lines = [
+        f'Sheet "{sheet_name}": {n_rows} data rows, {len(profiles)} columns',
+        "col\theader\trole\tkinds\tempty\tdistinct\tmin\tmax\tformats\ttop",
+    ]
+    for profile in profiles:
+        kinds = " ".join(f"{kind} {_percent(share)}" for kind, share in profile.kinds) or "empty"
+        formats = " ".join(f"{name} {_percent(share)}" for name, share in profile.formats)
+        top = ", ".join(f"{_format(value)} x{count}" for value, count in profile.top_values)
+        fields = [
+            profile.letter,
+            _format(profile.header) if profile.header is not None else "",
+            profile.role or "",
+            kinds,
+            _percent(profile.null_ratio),
+            str(profile.distinct),
+            _format(profile.minimum) if profile.minimum is not None else "",
+            _format(profile.maximum) if profile.maximum is not None else "",
+            formats,
+            top,
+        ]
+        lines.append("\t".join(fields).rstrip("\t"))
+    return "\n".join(lines)
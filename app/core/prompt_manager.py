@@ -64,11 +64,14 @@ When working with OPOS (Open Posts) or financial data, ALWAYS use these tools FI
 1. The code runs in a secure sandbox. All previously written code will be appended to the code you write.
 1. Only write one python code snippet per tool call.
 2. The openpyxl library has already been imported as `openpyxl`. You do not need to import it again.
-3. ONLY use openpyxl for manipulating spreadsheets.
+3. ONLY use openpyxl for writing to spreadsheets.
 4. Do not write comments unless you would cry without them. If you write a comment, make it concise.
 5. The workbook is already loaded in the sandbox and can be accessed as `workbook`. DO NOT CREATE A NEW WORKBOOK.
 6. If you want to read the output of the code or some value, use the `print()` function. For example, if you want to read the output of a dataframe, use `print(df.head())`.
 7. If an error occurs, do not panic. Read the error message and try to fix the error. If you cannot fix the error, output the error message and end the workflow.
+8. For reading and computing, use `frames[sheet_name]`: a pandas DataFrame of the sheet with typed columns, the header row as column names and the Excel row number as index. It always reflects the current state of `workbook`.
+9. Prefer vectorized pandas operations on these frames (boolean masks, `groupby`, `pd.cut`, column arithmetic) over looping over cells with openpyxl. Never iterate over all rows with `ws.iter_rows()` or `ws.cell()` to compute values.
+10. Do not modify a frame in place; call `.copy()` first. Write results back with openpyxl, using the frame index as the row number, e.g. `for row, value in result.items(): ws.cell(row=row, column=col, value=value)`.
 """
 
     OBSERVATION_PROMPT = """
@@ -0,0 +1,203 @@
+"""
+Paginated, token-budgeted reading of worksheet ranges for the planner.
+
+A page is a compact tab-separated table:
+
+    Sheet "Sheet1" A1:O10001, rows 1-312
+    row	A	B	C	...
+    1	Belegnummer	Betrag	Währung
+    2	90429355	2784.6	EUR
+    3	~4	12.5
+    4-9	~
+    More rows follow: call again with cursor=313.
+
+The column letters are given once. A field "~N" stands for N consecutive empty
+cells, empty cells at the end of a row are left out, and a run of empty rows is
+written as one "first-last\t~" line. If the page starts below the first row,
+the sheet's first row is repeated once as the "header" line.
+
+Rows are added until the next one would exceed the token budget; the footer gives
+the cursor (the next row) to continue from. Only existing cells are read, so
+reading never changes the worksheet.
+"""
+import re
+from dataclasses import dataclass
+from datetime import date, datetime, time
+from typing import Any, List, Optional, Tuple
+
+from openpyxl.utils.cell import get_column_letter, range_boundaries
+from openpyxl.worksheet.worksheet import Worksheet
+
+from app.core.history import ApproximateEncoding
+
+DEFAULT_MAX_TOKENS = 2000
+MAX_TOKENS_LIMIT = 8000
+MIN_TOKENS = 100
+
+# Empty cells collapsed into one "~N" field from this run length on
+MIN_EMPTY_RUN = 3
+
+# A1:B2, A:C, 2:40 or a single cell
+RANGE_PATTERN = re.compile(r"^([A-Z]+\d+|[A-Z]+|\d+)(:([A-Z]+\d+|[A-Z]+|\d+))?$")
+
+
+@dataclass(frozen=True)
+class RangePage:
+    """
+    One page of a range read.
+
+    Attributes:
+        text: The encoded page.
+        first_row: The first row of the page.
+        last_row: The last row of the page.
+        next_cursor: The row to continue from, or None if the range is exhausted.
+        tokens: The token count of the page.
+    """
+
+    text: str
+    first_row: int
+    last_row: int
+    next_cursor: Optional[int]
+    tokens: int
+
+
+def format_value(value: Any) -> str:
+    """Renders a cell value as a single-line field."""
+    if value is None:
+        return ""
+    if isinstance(value, bool):
+        return "TRUE" if value else "FALSE"
+    if isinstance(value, datetime):
+        return value.date().isoformat() if value.time() == time() else value.isoformat(sep=" ")
+    if isinstance(value, (date, time)):
+        return value.isoformat()
+    if isinstance(value, float):
+        return f"{value:.15g}"
+    text = str(value).replace("\t", " ").replace("\r", " ").replace("\n", " ")
+    # Keep literal text from being read as an empty-cell run
+    return "\\" + text if text.startswith(("~", "\\")) else text
+
+
+def _encode_row(values: List[str]) -> List[str]:
+    while values and values[-1] == "":
+        values.pop()
+    fields: List[str] = []
+    empty = 0
+    for value in values + [None]:
+        if value == "":
+            empty += 1
+            continue
+        if empty:
+            fields.extend([""] * empty if empty < MIN_EMPTY_RUN else [f"~{empty}"])
+            empty = 0
+        if value is not None:
+            fields.append(value)
+    return fields
+
+
+def parse_range(worksheet: Worksheet, cell_range: Optional[str]) -> Tuple[int, int, int, int]:
+    """
+    Resolves a range to (min_col, min_row, max_col, max_row) within the sheet's extent.
+
+    An empty range means the whole sheet; column-only and row-only ranges span the sheet.
+
+    Raises:
+        ValueError: If the range is malformed.
+    """
+    max_row, max_col = worksheet.max_row, worksheet.max_column
+    if not cell_range:
+        return 1, 1, max_col, max_row
+    cell_range = cell_range.replace("$", "").upper().strip()
+    if not RANGE_PATTERN.match(cell_range):
+        raise ValueError(f"Invalid cell range {cell_range!r}. Use e.g. A1:F200, A:C, 2:50 or leave it empty.")
+    min_c, min_r, max_c, max_r = range_boundaries(cell_range)
+    min_c, max_c = min_c or 1, min(max_c or max_col, max_col)
+    min_r, max_r = min_r or 1, min(max_r or max_row, max_row)
+    return min_c, min_r, max_c, max_r
+
+
+def read_range(
+    worksheet: Worksheet,
+    cell_range: Optional[str] = None,
+    cursor: Optional[int] = None,
+    max_tokens: int = DEFAULT_MAX_TOKENS,
+    encoding: Any = None,
+) -> RangePage:
+    """
+    Reads one page of a range.
+
+    Args:
+        worksheet: The worksheet to read.
+        cell_range: The range to read; empty for the whole sheet.
+        cursor: The row to start at, as returned by the previous page; None for the start of the range.
+        max_tokens: Token budget of the page, clamped to MIN_TOKENS..MAX_TOKENS_LIMIT.
+        encoding: A tiktoken encoding (anything with an `encode(text)` method).
+
+    Returns:
+        The page. At least one row is returned, even if it alone exceeds the budget.
+
+    Raises:
+        ValueError: If the range is malformed or the cursor lies outside it.
+    """
+    encoding = encoding if encoding is not None else ApproximateEncoding()
+    max_tokens = max(MIN_TOKENS, min(int(max_tokens), MAX_TOKENS_LIMIT))
+    min_col, min_row, max_col, max_row = parse_range(worksheet, cell_range)
+    range_ref = f"{get_column_letter(min_col)}{min_row}:{get_column_letter(max_col)}{max_row}"
+    start = min_row if cursor is None else int(cursor)
+    if max_row < min_row or max_col < min_col:
+        return RangePage(f'Sheet "{worksheet.title}" {range_ref}: the range is empty.', start, start - 1, None, 0)
+    if not min_row <= start <= max_row:
+        raise ValueError(f"Cursor {start} lies outside the rows {min_row}-{max_row} of {range_ref}.")
+
+    cells = worksheet._cells
+    columns = range(min_col, max_col + 1)
+
+    def row_values(row: int) -> List[str]:
+        values = []
+        for column in columns:
+            cell = cells.get((row, column))
+            values.append(format_value(cell._value) if cell is not None else "")
+        return values
+
+    def count(line: str) -> int:
+        return len(encoding.encode(line)) + 1
+
+    head = ["row\t" + "\t".join(get_column_letter(column) for column in columns)]
+    if start > 1:
+        header = _encode_row(row_values(1))
+        if header:
+            head.append("header\t" + "\t".join(header))
+    # Room for the title and the footer
+    used = sum(count(line) for line in head) + 40
+
+    lines: List[str] = []
+    row = start
+    empty_from: Optional[int] = None
+    while row <= max_row:
+        fields = _encode_row(row_values(row))
+        if not fields:
+            empty_from = row if empty_from is None else empty_from
+            row += 1
+            continue
+        pending = []
+        if empty_from is not None:
+            pending.append(f"{empty_from}\t~" if empty_from == row - 1 else f"{empty_from}-{row - 1}\t~")
+        pending.append(f"{row}\t" + "\t".join(fields))
+        tokens = sum(count(line) for line in pending)
+        if lines and used + tokens > max_tokens:
+            # The skipped empty rows are shown on the next page
+            row = empty_from if empty_from is not None else row
+            break
+        lines.extend(pending)
+        used += tokens
+        empty_from = None
+        row += 1
+    if empty_from is not None and row > max_row:
+        lines.append(f"{empty_from}\t~" if empty_from == max_row else f"{empty_from}-{max_row}\t~")
+
+    last_row = row - 1
+    next_cursor = row if row <= max_row else None
+    title = f'Sheet "{worksheet.title}" {range_ref}, rows {start}-{last_row}'
+    footer = f"More rows follow: call again with cursor={next_cursor}." if next_cursor else "End of range."
+    text = "\n".join([title, *head, *lines, footer])
+    return RangePage(text, start, last_row, next_cursor, len(encoding.encode(text)))
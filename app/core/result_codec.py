@@ -0,0 +1,51 @@
+"""
+Binary codec for messages between the request thread and sandbox worker processes.
+
+`Connection.send` pickles a message into one byte string with the default pickle
+protocol, so a NumPy array or DataFrame returned by a sandbox is copied into the
+pickle stream and copied out of it again on the other side. This codec pickles
+with protocol 5 and takes contiguous buffers (array and frame blocks) out of band:
+
+- the pickle stream, prefixed with the number of out-of-band buffers, is sent as
+  one message,
+- every buffer is sent as its own message, straight from the array's memory.
+
+The receiver reassembles the object from the stream and the buffers, so sandbox
+results arrive as real dicts, lists and arrays without being printed and parsed.
+"""
+import pickle
+import struct
+from typing import Any, List
+
+_COUNT = struct.Struct("<I")
+
+
+def encode(obj: Any) -> List[Any]:
+    """
+    Encodes an object into frames: the header with the pickle stream, then the raw buffers.
+
+    Raises:
+        pickle.PicklingError: If the object cannot be pickled.
+    """
+    buffers: List[pickle.PickleBuffer] = []
+    payload = pickle.dumps(obj, protocol=5, buffer_callback=buffers.append)
+    return [_COUNT.pack(len(buffers)) + payload, *(buffer.raw() for buffer in buffers)]
+
+
+def decode(frames: List[Any]) -> Any:
+    """Decodes the frames produced by `encode`."""
+    header, *buffers = frames
+    return pickle.loads(memoryview(header)[_COUNT.size :], buffers=buffers)
+
+
+def send(conn, obj: Any) -> None:
+    """Sends an object over a multiprocessing connection."""
+    for frame in encode(obj):
+        conn.send_bytes(frame)
+
+
+def recv(conn) -> Any:
+    """Receives an object sent with `send` from a multiprocessing connection."""
+    header = conn.recv_bytes()
+    (count,) = _COUNT.unpack_from(header)
+    return decode([header, *(conn.recv_bytes() for _ in range(count))])
@@ -1,10 +1,21 @@
 import code
-import io
-import sys
+from dataclasses import replace
 from pathlib import Path
-import ast 
+from typing import Any, Dict, List, Optional, Tuple, Union
 import os
 
+from openpyxl.workbook.workbook import Workbook
+from openpyxl.worksheet.worksheet import Worksheet
+
+from app.core.checkpoint import SandboxCheckpoint, WorkbookJournal
+from app.core.frames import SheetFrames
+from app.core.output_capture import capture_output
+from app.core.history import get_token_encoding
+from app.core.profile import ColumnProfile, profile_frame
+from app.core.range_reader import DEFAULT_MAX_TOKENS, read_range
+from app.core.sheet_state import SheetSummary, summarize_sheet
+from app.core.trim import TrimReport
+from app.dataset.workbook_loader import LoadedWorkbook
 from app.utils.common import SandboxResponse
 from app.utils.enumeration import EXEC_CODE 
 import logging
@@ -12,36 +23,9 @@ import logging
 logger = logging.getLogger(__name__)
 
 TRIM_SHEET_CODE = """
-from openpyxl.utils import get_column_letter
-
-def trim_sheet(ws):
-    max_data_row = 0
-    max_data_col = 0
-
-    # Scan all cells to find the maximum row/column that contains data
-    for row in ws.iter_rows():
-        for cell in row:
-            if cell.value not in (None, ""):
-                if cell.row > max_data_row:
-                    max_data_row = cell.row
-                if cell.column > max_data_col:
-                    max_data_col = cell.column
-
-    # If the sheet is entirely empty, nothing to trim
-    if max_data_row == 0 or max_data_col == 0:
-        return
-
-    # Delete rows below max_data_row
-    # Note: delete from the bottom up to avoid reindexing issues
-    for row_idx in range(ws.max_row, max_data_row, -1):
-        ws.delete_rows(row_idx)
-
-    # Delete columns to the right of max_data_col
-    for col_idx in range(ws.max_column, max_data_col, -1):
-        ws.delete_cols(col_idx)
-
-for ws in workbook.worksheets:
-    trim_sheet(ws)
+from app.core.trim import trim_workbook
+
+trim_report = trim_workbook(workbook)
 """
 
 class Sandbox:    
@@ -61,6 +45,16 @@ class Sandbox:
         self.code_history = []
         self.stdout = []
         self.stderr = []
+        # Sheet summaries keyed by worksheet id, invalidated by the write journal of each step
+        self._sheet_summaries: Dict[int, Tuple[Worksheet, SheetSummary]] = {}
+        self._summarized_workbook: Optional[Workbook] = None
+        # Column profiles keyed by worksheet id, dropped with the sheet summaries
+        self._column_profiles: Dict[int, Tuple[Worksheet, List[ColumnProfile]]] = {}
+        self.trim_report: List[TrimReport] = []
+        self.loaded_workbook: Optional[LoadedWorkbook] = None
+        # Columnar copies of the sheets, exposed to sandbox code as `frames`
+        self.frames = SheetFrames(self._find_workbook)
+        self.interpreter.locals["frames"] = self.frames
         
         self.base_dir = base_dir.resolve()
         if not self.base_dir.is_dir():
@@ -77,103 +71,185 @@ class Sandbox:
         if response.code == EXEC_CODE.FAIL:
             raise RuntimeError(f"Sandbox: Failed to import essential libraries. Error: {response.msg.strip()}")
 
-    def load_workbook(self, workbook_path):
-        path_str = str(workbook_path).replace("\\", "\\\\")
+    def load_workbook(self, workbook_path: Union[str, Path, LoadedWorkbook]):
+        """
+        Loads the trimmed workbook into the interpreter as `workbook`.
+
+        Args:
+            workbook_path: The path of the workbook file, or a LoadedWorkbook whose
+                parsed workbook is used directly instead of parsing the file again.
+        """
+        if not isinstance(workbook_path, LoadedWorkbook):
+            workbook_path = LoadedWorkbook(Path(workbook_path))
+        loaded = workbook_path
+        path_str = str(loaded.path).replace("\\", "\\\\")
 
         code_init_wb_path = f'wb_path = r"{path_str}"'
         path_response = self.step(code_init_wb_path, dummy=False)
         if path_response.code == EXEC_CODE.FAIL:
             raise ValueError(f"Sandbox: Failed to set workbook path variable. Error: {path_response.msg.strip()}")
 
-        code_init_load_wb = "workbook = openpyxl.load_workbook(wb_path)"
-        
-        load_response = self.step(code_init_load_wb, dummy=False)
-        if load_response.code == EXEC_CODE.FAIL:
-            raise ValueError(f"Sandbox: Failed to load workbook '{workbook_path}'. Error: {load_response.msg.strip()}")
+        try:
+            workbook = loaded.workbook
+        except Exception as e:
+            raise ValueError(f"Sandbox: Failed to load workbook '{loaded.path}'. Error: {e}") from e
+
+        self.interpreter.locals["workbook"] = workbook
+        self.interpreter.locals["trim_report"] = loaded.trim_report
+        # Replaying the history after a failed rollback parses and trims the file again
+        self.code_history.extend(["workbook = openpyxl.load_workbook(wb_path)", TRIM_SHEET_CODE])
+        self.loaded_workbook = loaded
+        self.trim_report = loaded.trim_report
+        self.frames.preload()
+
+    def _find_workbook(self) -> Optional[Workbook]:
+        workbook = self.interpreter.locals.get("workbook")
+        return workbook if isinstance(workbook, Workbook) else None
+
+    def _get_workbook(self) -> Workbook:
+        workbook = self._find_workbook()
+        if workbook is None:
+            raise ValueError("Sandbox: No workbook is loaded as `workbook` in the interpreter.")
+        return workbook
+
+    def get_var(self, name: str, default: Any = None) -> Any:
+        """Returns a variable of the interpreter namespace, or `default` if it is not set."""
+        return self.interpreter.locals.get(name, default)
+
+    def get_vars(self, *names: str) -> Dict[str, Any]:
+        """Returns the variables of the interpreter namespace that are set, out of `names`."""
+        return {name: self.interpreter.locals[name] for name in names if name in self.interpreter.locals}
+
+    def set_var(self, name: str, value: Any) -> None:
+        """Binds a variable in the interpreter namespace."""
+        self.interpreter.locals[name] = value
+
+    def record_code(self, code_snippet: str) -> None:
+        """
+        Appends code to the code history without running it.
 
-        trim_workbook_code = TRIM_SHEET_CODE
-        trim_response = self.step(trim_workbook_code, dummy=False)
-        if trim_response.code == EXEC_CODE.FAIL:
-            raise ValueError(f"Sandbox: Failed to trim workbook. Error: {trim_response.msg.strip()}")
+        For code whose effects were restored otherwise, e.g. results bound from a cache
+        with `set_var`, so that the saved code and a replay of the history still define them.
+        """
+        self.code_history.append(code_snippet)
 
-    def get_existing_sheet_names(self):
-        code_snippet = "print(workbook.sheetnames)"
-        response = self.step(code_snippet, dummy=True)
+    def get_existing_sheet_names(self) -> List[str]:
+        return list(self._get_workbook().sheetnames)
 
-        if response.code == EXEC_CODE.FAIL:
-            raise ValueError(f"Sandbox: Failed to get sheet names. Underlying interpreter error: {response.msg.strip()}")
+    def _get_summarized_workbook(self) -> Workbook:
+        """Returns the loaded workbook, dropping the cached summaries and profiles if it was replaced."""
+        workbook = self._get_workbook()
+        if workbook is not self._summarized_workbook:
+            self._sheet_summaries.clear()
+            self._column_profiles.clear()
+            self._summarized_workbook = workbook
+        return workbook
 
-        output_str = response.msg
-        lines = output_str.strip().splitlines()
+    def get_sheet_summaries(self) -> List[SheetSummary]:
+        """
+        Returns a summary of every worksheet of the loaded workbook.
 
-        if not lines:
-            raise ValueError("No output received from interpreter when getting sheet names (stdout was empty).")
+        Summaries are read from the live workbook object and cached per worksheet;
+        only worksheets changed by a step since the last call are recomputed.
+        """
+        workbook = self._get_summarized_workbook()
+        summaries = []
+        cache = {}
+        for worksheet in workbook.worksheets:
+            cached = self._sheet_summaries.get(id(worksheet))
+            if cached is not None and cached[0] is worksheet:
+                summary = cached[1]
+                if summary.name != worksheet.title:
+                    summary = replace(summary, name=worksheet.title)
+            else:
+                summary = summarize_sheet(worksheet)
+            cache[id(worksheet)] = (worksheet, summary)
+            summaries.append(summary)
 
-        last_line = lines[-1]
+        self._sheet_summaries = cache
+        return summaries
 
-        try:
-            sheet_names = ast.literal_eval(last_line)
-        except Exception as e:
-            raise ValueError(f"Failed to parse sheet names from interpreter output: '{last_line}'. Error: {e}") from e
+    def get_column_profiles(self, sheet_name: str) -> List[ColumnProfile]:
+        """
+        Returns the column profiles of a worksheet.
 
-        if not isinstance(sheet_names, list):
-            raise TypeError(f"Expected list of sheet names from interpreter, got {type(sheet_names)}: '{last_line}'")
+        Profiles are computed from the sheet's frame and cached until a step writes to the sheet.
+        """
+        worksheet = self._get_summarized_workbook()[sheet_name]
+        cached = self._column_profiles.get(id(worksheet))
+        if cached is not None and cached[0] is worksheet:
+            return cached[1]
+        profiles = profile_frame(self.frames[sheet_name])
+        self._column_profiles[id(worksheet)] = (worksheet, profiles)
+        return profiles
+
+    def profile_sheet(self, sheet_name: str) -> Tuple[int, List[ColumnProfile]]:
+        """
+        Returns the number of data rows and the column profiles of a worksheet.
 
-        return sheet_names
+        One call, so that a RemoteSandbox only sends the profiles across the process boundary.
+        """
+        profiles = self.get_column_profiles(sheet_name)
+        return len(self.frames[sheet_name]), profiles
+
+    def read_range(
+        self,
+        sheet_name: str,
+        cell_range: str = "",
+        cursor: Optional[int] = None,
+        max_tokens: int = DEFAULT_MAX_TOKENS,
+        model_name: Optional[str] = None,
+    ) -> str:
+        """
+        Returns one page of a worksheet range as text (see app.core.range_reader).
+
+        Args:
+            sheet_name: The worksheet to read.
+            cell_range: The range to read; empty for the whole sheet.
+            cursor: The row to continue from, as given by the previous page.
+            max_tokens: Token budget of the page.
+            model_name: The model whose tokenizer counts the tokens; estimated if not given.
+        """
+        worksheet = self._get_workbook()[sheet_name]
+        encoding = get_token_encoding(model_name) if model_name else None
+        return read_range(worksheet, cell_range, cursor, max_tokens, encoding).text
 
     def get_sheet_state(self) -> str:
-        sheet_state = ""
-        sheet_names = self.get_existing_sheet_names()
-        for sheet_name in sheet_names:
-            code_snippet = f"""print(workbook["{sheet_name}"].max_column)
-print(workbook["{sheet_name}"].max_row)
-print(workbook["{sheet_name}"].min_column)
-print(workbook["{sheet_name}"].min_row)
-print(workbook["{sheet_name}"].cell(1, 1).value)"""
-            max_column, max_row, min_column, min_row, first_value = self.step(code_snippet, dummy=True).msg.splitlines()
-            if (max_column == max_row == min_column == min_row == str(1)) and str(first_value) == "None":
-                sheet_desc = 'Sheet "{sheet_name}" is empty. '.format(sheet_name=sheet_name)
-            else:
-                sheet_desc = 'Sheet "{sheet_name}" has {n_rows} rows (Including the header row) and {n_cols} columns ({headers}). '
-                code_snippet = f"""print(workbook["{sheet_name}"].max_column)
-print(workbook["{sheet_name}"].max_row)
-print([cell.value for cell in workbook["{sheet_name}"][1]])
-print([str(cell.value.__class__) for cell in workbook["{sheet_name}"][2]])"""
-
-                n_cols, n_rows, headers, data_types = self.step(code_snippet, dummy=True).msg.splitlines()
-                import datetime
-
-                headers = eval(headers)
-                data_types = eval(data_types)
-
-                headers_str = ", ".join(
-                    [
-                        f'{chr(65 + i)}({i+1}): "{header}" ({data_type})'
-                        for i, (header, data_type) in enumerate(zip(headers, data_types))
-                    ]
-                )
-                sheet_desc = sheet_desc.format(
-                    sheet_name=sheet_name,
-                    n_cols=int(n_cols),
-                    headers=headers_str,
-                    n_rows=int(n_rows),
-                )
-
-            sheet_state += sheet_desc
-
-        return sheet_state
+        return "".join(summary.describe() for summary in self.get_sheet_summaries())
+
+    def _mark_dirty(self, journal: WorkbookJournal) -> None:
+        for worksheet in journal.touched_sheets:
+            self._sheet_summaries.pop(id(worksheet), None)
+            self._column_profiles.pop(id(worksheet), None)
+            self.frames.invalidate(worksheet)
 
     def reset(self):
         self.interpreter = code.InteractiveInterpreter()
+        self.interpreter.locals["frames"] = self.frames
+
+    def rollback(self, checkpoint: SandboxCheckpoint) -> None:
+        """
+        Restores the interpreter to the state captured by `checkpoint`.
+
+        Falls back to resetting the interpreter and replaying the code history if
+        the journal cannot be applied.
+        """
+        try:
+            checkpoint.restore()
+        except Exception:
+            logger.exception("Sandbox: Checkpoint restore failed, replaying code history")
+            self.reset()
+            self.step("\n".join(self.code_history), dummy=True)
 
     def step(self, code_snippet: str, dummy=False) -> SandboxResponse:
         logger.info(f"Executing Python code: {code_snippet}")
-        out_buffer = io.StringIO()
-        err_buffer = io.StringIO()
-        sys.stdout = out_buffer
-        sys.stderr = err_buffer
+        checkpoint = None if dummy else SandboxCheckpoint(self.interpreter.locals)
+        journal = checkpoint.journal if checkpoint is not None else WorkbookJournal()
 
-        self.interpreter.runcode(code_snippet)
+        # Output is captured per context, so sandboxes can run concurrently in one process
+        with capture_output() as (out_buffer, err_buffer), journal.activate():
+            self.interpreter.runcode(code_snippet)
+        self._mark_dirty(journal)
 
         output = out_buffer.getvalue()
         error = err_buffer.getvalue()
@@ -184,14 +260,10 @@ print([str(cell.value.__class__) for cell in workbook["{sheet_name}"][2]])"""
             self.stdout.append(output)
             self.stderr.append(error)
 
-        sys.stdout = sys.__stdout__
-        sys.stderr = sys.__stderr__
-
         if error != "":  # error caught
             if not dummy:
-                self.reset()
-                self.step("\n".join(self.code_history), dummy=True)
-            
+                self.rollback(checkpoint)
+
             return SandboxResponse(EXEC_CODE.FAIL, error)
         
         return SandboxResponse(EXEC_CODE.SUCCESS, output)
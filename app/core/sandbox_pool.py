@@ -0,0 +1,399 @@
+"""
+Pool of pre-warmed sandbox worker processes.
+
+Creating a Sandbox imports openpyxl, pandas and matplotlib on the request path. The
+pool moves that cost to application startup: workers are forked from a zygote (the
+multiprocessing forkserver) that has already imported the heavy libraries, and each
+worker hosts one Sandbox at a time that the request thread drives over a pipe.
+
+Workers are recycled after a configurable number of jobs or once their resident
+memory passes a watermark, and every analysis runs in its own process. Messages
+are exchanged with the binary codec of app.core.result_codec, so results read
+from the sandbox namespace arrive as real objects.
+"""
+import functools
+import logging
+import multiprocessing
+import os
+import queue
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple, Union
+
+from app.core import result_codec
+from app.core.profile import ColumnProfile
+from app.core.range_reader import DEFAULT_MAX_TOKENS
+from app.core.sandbox import Sandbox
+from app.core.sheet_state import SheetSummary
+from app.dataset.workbook_loader import LoadedWorkbook
+from app.utils.common import SandboxResponse
+from app.utils.exceptions import SandboxWorkerError
+
+logger = logging.getLogger(__name__)
+
+# Modules imported once by the zygote so that forked workers start warm.
+PRELOAD_MODULES = ["openpyxl", "pandas", "matplotlib.pyplot", "app.core.sandbox"]
+
+# Sandbox methods that may be called through a RemoteSandbox.
+REMOTE_METHODS = frozenset(
+    {
+        "load_workbook",
+        "get_existing_sheet_names",
+        "get_sheet_state",
+        "get_var",
+        "get_vars",
+        "set_var",
+        "record_code",
+        "get_sheet_summaries",
+        "profile_sheet",
+        "read_range",
+        "step",
+        "save",
+        "save_temp_workbook",
+    }
+)
+
+
+def _current_rss_bytes() -> int:
+    """Returns the resident set size of the current process."""
+    try:
+        with open("/proc/self/statm", "r", encoding="utf-8") as f:
+            resident_pages = int(f.read().split()[1])
+        return resident_pages * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        import resource
+
+        # ru_maxrss is the peak, reported in kilobytes on Linux and bytes on macOS.
+        max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return max_rss if os.uname().sysname == "Darwin" else max_rss * 1024
+
+
+def _worker_main(conn) -> None:
+    """
+    Entry point of a sandbox worker process.
+
+    Messages are tuples whose first item is the command:
+    ("open", base_dir), ("call", method, args, kwargs), ("close",) and ("stop",).
+    Every command is answered with ("ok", result) or ("error", exception).
+    """
+    from app.core.logging_config import configure_logging
+
+    configure_logging()
+    sandbox: Optional[Sandbox] = None
+
+    while True:
+        try:
+            message = result_codec.recv(conn)
+        except EOFError:
+            return
+
+        command = message[0]
+        try:
+            if command == "open":
+                sandbox = Sandbox(base_dir=Path(message[1]))
+                result = None
+            elif command == "call":
+                _, method, args, kwargs = message
+                if sandbox is None:
+                    raise RuntimeError("Sandbox worker has no open sandbox.")
+                result = getattr(sandbox, method)(*args, **kwargs)
+            elif command == "close":
+                sandbox = None
+                result = _current_rss_bytes()
+            elif command == "stop":
+                result_codec.send(conn, ("ok", None))
+                return
+            else:
+                raise ValueError(f"Unknown sandbox worker command: {command}")
+        except Exception as e:
+            try:
+                result_codec.send(conn, ("error", e))
+            except Exception:
+                # The exception itself could not be pickled.
+                result_codec.send(conn, ("error", RuntimeError(f"{type(e).__name__}: {e}")))
+        else:
+            try:
+                result_codec.send(conn, ("ok", result))
+            except Exception as e:
+                result_codec.send(conn, ("error", TypeError(f"Result of sandbox command '{command}' cannot be sent: {e}")))
+
+
+class _SandboxWorker:
+    """Parent-side handle of a sandbox worker process."""
+
+    def __init__(self, ctx) -> None:
+        self.conn, child_conn = ctx.Pipe()
+        self.process = ctx.Process(target=_worker_main, args=(child_conn,), daemon=True)
+        self.process.start()
+        child_conn.close()
+        self.jobs_done = 0
+        self.rss_bytes = 0
+        self.broken = False
+        # Read-only tool calls share a sandbox concurrently; a request and its reply must not interleave
+        self._lock = threading.Lock()
+
+    @property
+    def pid(self) -> Optional[int]:
+        return self.process.pid
+
+    def request(self, *message: Any) -> Any:
+        try:
+            with self._lock:
+                result_codec.send(self.conn, message)
+                status, payload = result_codec.recv(self.conn)
+        except (EOFError, OSError, BrokenPipeError) as e:
+            self.broken = True
+            raise SandboxWorkerError(self.pid, str(e)) from e
+
+        if status == "error":
+            raise payload
+        return payload
+
+    def stop(self, timeout: float = 5.0) -> None:
+        if not self.broken and self.process.is_alive():
+            try:
+                self.request("stop")
+            except Exception:
+                pass
+        self.process.join(timeout)
+        if self.process.is_alive():
+            self.process.terminate()
+            self.process.join(timeout)
+        self.conn.close()
+
+
+class RemoteSandbox:
+    """
+    A Sandbox running inside a pool worker.
+
+    Exposes the same public methods as Sandbox; every call is forwarded to the
+    worker process and its result or exception is returned to the caller.
+    """
+
+    def __init__(self, worker: _SandboxWorker, base_dir: Path) -> None:
+        self._worker = worker
+        self.base_dir = base_dir.resolve()
+
+    def _call(self, method: str, *args: Any, **kwargs: Any) -> Any:
+        if method not in REMOTE_METHODS:
+            raise AttributeError(f"Sandbox method '{method}' is not available remotely.")
+        if self._worker is None:
+            raise RuntimeError("This sandbox has already been released to the pool.")
+        return self._worker.request("call", method, args, kwargs)
+
+    def load_workbook(self, workbook_path: Union[str, Path, LoadedWorkbook]) -> None:
+        # A LoadedWorkbook is pickled without its parsed workbook, the worker loads it itself
+        return self._call("load_workbook", workbook_path)
+
+    def get_existing_sheet_names(self) -> List[str]:
+        return self._call("get_existing_sheet_names")
+
+    def get_sheet_summaries(self) -> List[SheetSummary]:
+        return self._call("get_sheet_summaries")
+
+    def profile_sheet(self, sheet_name: str) -> Tuple[int, List[ColumnProfile]]:
+        return self._call("profile_sheet", sheet_name)
+
+    def read_range(
+        self,
+        sheet_name: str,
+        cell_range: str = "",
+        cursor: Optional[int] = None,
+        max_tokens: int = DEFAULT_MAX_TOKENS,
+        model_name: Optional[str] = None,
+    ) -> str:
+        return self._call("read_range", sheet_name, cell_range, cursor, max_tokens, model_name)
+
+    def get_sheet_state(self) -> str:
+        return self._call("get_sheet_state")
+
+    def get_var(self, name: str, default: Any = None) -> Any:
+        return self._call("get_var", name, default)
+
+    def get_vars(self, *names: str) -> Dict[str, Any]:
+        return self._call("get_vars", *names)
+
+    def set_var(self, name: str, value: Any) -> None:
+        return self._call("set_var", name, value)
+
+    def record_code(self, code_snippet: str) -> None:
+        return self._call("record_code", code_snippet)
+
+    def step(self, code_snippet: str, dummy=False) -> SandboxResponse:
+        return self._call("step", code_snippet, dummy=dummy)
+
+    def save(self, save_dir: Path) -> None:
+        return self._call("save", save_dir)
+
+    def save_temp_workbook(self, save_dir: Path) -> None:
+        return self._call("save_temp_workbook", save_dir)
+
+
+class SandboxPool:
+    """
+    A fixed-size pool of pre-warmed sandbox worker processes.
+
+    Args:
+        size: Number of worker processes kept alive.
+        max_jobs_per_worker: A worker is replaced after serving this many sandboxes.
+        max_worker_rss_mb: A worker is replaced once its resident memory exceeds this value.
+        preload: Modules imported by the zygote before any worker is forked.
+    """
+
+    def __init__(
+        self,
+        size: int,
+        max_jobs_per_worker: int = 20,
+        max_worker_rss_mb: int = 1536,
+        preload: Optional[List[str]] = None,
+    ) -> None:
+        if size < 1:
+            raise ValueError("Sandbox pool size must be at least 1.")
+
+        self.size = size
+        self.max_jobs_per_worker = max_jobs_per_worker
+        self.max_worker_rss_bytes = max_worker_rss_mb * 1024 * 1024
+
+        if "forkserver" in multiprocessing.get_all_start_methods():
+            self._ctx = multiprocessing.get_context("forkserver")
+            self._ctx.set_forkserver_preload(preload if preload is not None else PRELOAD_MODULES)
+        else:
+            self._ctx = multiprocessing.get_context("spawn")
+
+        self._idle: "queue.Queue[_SandboxWorker]" = queue.Queue()
+        self._workers: List[_SandboxWorker] = []
+        self._lock = threading.Lock()
+        self._closed = False
+
+    def start(self) -> None:
+        """Starts the worker processes."""
+        with self._lock:
+            while len(self._workers) < self.size:
+                worker = _SandboxWorker(self._ctx)
+                self._workers.append(worker)
+                self._idle.put(worker)
+        logger.info(f"Sandbox pool started with {self.size} workers")
+
+    def acquire(self, base_dir: Path, timeout: Optional[float] = None) -> RemoteSandbox:
+        """
+        Takes an idle worker and opens a fresh sandbox in it.
+
+        Args:
+            base_dir: The base directory for the sandbox's file operations.
+            timeout: Seconds to wait for an idle worker; waits forever if None.
+
+        Raises:
+            TimeoutError: If no worker becomes idle within `timeout`.
+        """
+        if self._closed:
+            raise RuntimeError("Sandbox pool has been shut down.")
+        if not self._workers:
+            self.start()
+
+        try:
+            worker = self._idle.get(timeout=timeout)
+        except queue.Empty as e:
+            raise TimeoutError("No sandbox worker became available in time.") from e
+
+        try:
+            worker.request("open", str(base_dir))
+        except Exception:
+            self._replace(worker)
+            raise
+        return RemoteSandbox(worker, base_dir)
+
+    def release(self, sandbox: RemoteSandbox) -> None:
+        """Closes the sandbox and returns its worker to the pool, recycling it if needed."""
+        worker, sandbox._worker = sandbox._worker, None
+        if worker is None:
+            return
+
+        try:
+            worker.rss_bytes = worker.request("close")
+        except Exception as e:
+            logger.warning(f"Sandbox worker {worker.pid} failed to close its sandbox: {e}")
+            worker.broken = True
+        worker.jobs_done += 1
+
+        if worker.broken or self._closed:
+            reason = "broken" if worker.broken else "pool closed"
+        elif worker.jobs_done >= self.max_jobs_per_worker:
+            reason = f"served {worker.jobs_done} jobs"
+        elif worker.rss_bytes > self.max_worker_rss_bytes:
+            reason = f"RSS {worker.rss_bytes // (1024 * 1024)} MB above watermark"
+        else:
+            self._idle.put(worker)
+            return
+
+        logger.info(f"Recycling sandbox worker {worker.pid}: {reason}")
+        self._replace(worker)
+
+    @contextmanager
+    def sandbox(self, base_dir: Path, timeout: Optional[float] = None) -> Iterator[RemoteSandbox]:
+        """Context manager that acquires a sandbox and releases it on exit."""
+        remote = self.acquire(base_dir, timeout=timeout)
+        try:
+            yield remote
+        finally:
+            self.release(remote)
+
+    def shutdown(self) -> None:
+        """Stops all worker processes."""
+        with self._lock:
+            self._closed = True
+            workers, self._workers = self._workers, []
+        for worker in workers:
+            worker.stop()
+        logger.info("Sandbox pool shut down")
+
+    def _replace(self, worker: _SandboxWorker) -> None:
+        worker.stop()
+        with self._lock:
+            if worker in self._workers:
+                self._workers.remove(worker)
+            if self._closed:
+                return
+            replacement = _SandboxWorker(self._ctx)
+            self._workers.append(replacement)
+        self._idle.put(replacement)
+
+
+@functools.lru_cache
+def get_sandbox_pool() -> Optional[SandboxPool]:
+    """
+    Returns the process-wide sandbox pool, or None if pooling is disabled.
+
+    The pool is configured by SANDBOX_POOL_SIZE, SANDBOX_WORKER_MAX_JOBS and
+    SANDBOX_WORKER_MAX_RSS_MB and its workers are started on first use.
+    """
+    from app.core.config import get_settings
+
+    settings = get_settings()
+    if settings.SANDBOX_POOL_SIZE < 1:
+        return None
+
+    pool = SandboxPool(
+        size=settings.SANDBOX_POOL_SIZE,
+        max_jobs_per_worker=settings.SANDBOX_WORKER_MAX_JOBS,
+        max_worker_rss_mb=settings.SANDBOX_WORKER_MAX_RSS_MB,
+    )
+    pool.start()
+    return pool
+
+
+@contextmanager
+def open_sandbox(base_dir: Path) -> Iterator[Union[Sandbox, RemoteSandbox]]:
+    """
+    Opens a sandbox for one analysis.
+
+    Uses a pooled worker process when the sandbox pool is enabled and an
+    in-process Sandbox otherwise.
+    """
+    pool = get_sandbox_pool()
+    if pool is None:
+        yield Sandbox(base_dir=base_dir)
+        return
+
+    with pool.sandbox(base_dir) as sandbox:
+        yield sandbox
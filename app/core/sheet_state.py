@@ -0,0 +1,80 @@
+"""
+Structured sheet state for the planner.
+
+Summaries are computed directly from the live openpyxl worksheets held in the
+sandbox namespace, without executing code in the interpreter, and without touching
+cells that do not exist yet (reading `ws.cell(...)` would create them).
+"""
+from dataclasses import dataclass
+from typing import Any, Tuple
+
+from openpyxl.utils import get_column_letter
+from openpyxl.worksheet.worksheet import Worksheet
+
+
+@dataclass(frozen=True)
+class SheetSummary:
+    """
+    The shape of a worksheet as shown to the planner.
+
+    Attributes:
+        name: The sheet title.
+        n_rows: Number of rows, including the header row.
+        n_cols: Number of columns.
+        headers: Values of the first row.
+        data_types: Class names of the values in the second row, e.g. "<class 'str'>".
+        is_empty: Whether the sheet holds no data at all.
+    """
+
+    name: str
+    n_rows: int
+    n_cols: int
+    headers: Tuple[Any, ...]
+    data_types: Tuple[str, ...]
+    is_empty: bool
+
+    def describe(self) -> str:
+        """Returns the sheet description used in the planner's sheet state."""
+        if self.is_empty:
+            return 'Sheet "{sheet_name}" is empty. '.format(sheet_name=self.name)
+
+        headers_str = ", ".join(
+            f'{get_column_letter(i + 1)}({i+1}): "{header}" ({data_type})'
+            for i, (header, data_type) in enumerate(zip(self.headers, self.data_types))
+        )
+        return 'Sheet "{sheet_name}" has {n_rows} rows (Including the header row) and {n_cols} columns ({headers}). '.format(
+            sheet_name=self.name,
+            n_rows=self.n_rows,
+            n_cols=self.n_cols,
+            headers=headers_str,
+        )
+
+
+def _row_values(worksheet: Worksheet, row: int, n_cols: int) -> Tuple[Any, ...]:
+    cells = worksheet._cells
+    values = []
+    for column in range(1, n_cols + 1):
+        cell = cells.get((row, column))
+        values.append(cell.value if cell is not None else None)
+    return tuple(values)
+
+
+def summarize_sheet(worksheet: Worksheet) -> SheetSummary:
+    """
+    Builds the summary of a worksheet.
+
+    Args:
+        worksheet: The openpyxl worksheet to summarize.
+
+    Returns:
+        A SheetSummary describing the worksheet.
+    """
+    max_row, max_column = worksheet.max_row, worksheet.max_column
+    first_cell = worksheet._cells.get((1, 1))
+    first_value = first_cell.value if first_cell is not None else None
+    if max_row == max_column == 1 and first_value is None:
+        return SheetSummary(worksheet.title, max_row, max_column, (), (), True)
+
+    headers = _row_values(worksheet, 1, max_column)
+    data_types = tuple(str(value.__class__) for value in _row_values(worksheet, 2, max_column))
+    return SheetSummary(worksheet.title, max_row, max_column, headers, data_types, False)
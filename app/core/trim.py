@@ -0,0 +1,120 @@
+"""
+Bulk trimming of empty trailing rows and columns.
+
+Exports from accounting systems often carry formatting down to the last row of the
+sheet, which openpyxl materializes as empty styled cells. Scanning the sheet with
+iter_rows walks the whole rectangular grid, and delete_rows/delete_cols shift every
+remaining cell on each call, so trimming row by row is quadratic. Here the data
+extent is found in a single pass over the cells that actually exist, and everything
+beyond it is dropped in one operation.
+"""
+import logging
+from dataclasses import dataclass
+from typing import List, Tuple
+
+from openpyxl.workbook.workbook import Workbook
+from openpyxl.worksheet.worksheet import Worksheet
+
+from app.core.checkpoint import journal_sheet
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class TrimReport:
+    """
+    How much of a worksheet was trimmed.
+
+    Attributes:
+        sheet_name: The sheet title.
+        rows_before: max_row before trimming.
+        cols_before: max_column before trimming.
+        rows_after: max_row after trimming.
+        cols_after: max_column after trimming.
+        cells_removed: Number of (empty) cell objects dropped.
+    """
+
+    sheet_name: str
+    rows_before: int
+    cols_before: int
+    rows_after: int
+    cols_after: int
+    cells_removed: int
+
+    @property
+    def rows_removed(self) -> int:
+        return self.rows_before - self.rows_after
+
+    @property
+    def cols_removed(self) -> int:
+        return self.cols_before - self.cols_after
+
+
+def find_data_extent(worksheet: Worksheet) -> Tuple[int, int, int, int]:
+    """
+    Finds the sheet extent and the data extent in one pass over the existing cells.
+
+    Returns:
+        (max_row, max_column, max_data_row, max_data_column); the data extent is
+        (0, 0) if no cell holds a value.
+    """
+    max_row = max_column = max_data_row = max_data_column = 0
+    for (row, column), cell in worksheet._cells.items():
+        if row > max_row:
+            max_row = row
+        if column > max_column:
+            max_column = column
+        if cell._value is not None and cell._value != "":
+            if row > max_data_row:
+                max_data_row = row
+            if column > max_data_column:
+                max_data_column = column
+    return max_row, max_column, max_data_row, max_data_column
+
+
+def trim_sheet(worksheet: Worksheet) -> TrimReport:
+    """Drops every row below and every column right of the last cell holding data."""
+    max_row, max_column, max_data_row, max_data_column = find_data_extent(worksheet)
+    rows_before, cols_before = max(max_row, 1), max(max_column, 1)
+
+    # If the sheet is entirely empty, nothing to trim
+    if max_data_row == 0 or max_data_column == 0:
+        return TrimReport(worksheet.title, rows_before, cols_before, rows_before, cols_before, 0)
+
+    if max_row <= max_data_row and max_column <= max_data_column:
+        return TrimReport(worksheet.title, rows_before, cols_before, rows_before, cols_before, 0)
+
+    journal_sheet(worksheet)
+    cells = worksheet._cells
+    worksheet._cells = {
+        key: cell for key, cell in cells.items() if key[0] <= max_data_row and key[1] <= max_data_column
+    }
+    worksheet._current_row = max_data_row
+    for row in [row for row in worksheet.row_dimensions if row > max_data_row]:
+        del worksheet.row_dimensions[row]
+
+    return TrimReport(
+        worksheet.title,
+        rows_before,
+        cols_before,
+        max_data_row,
+        max_data_column,
+        len(cells) - len(worksheet._cells),
+    )
+
+
+def trim_workbook(workbook: Workbook) -> List[TrimReport]:
+    """
+    Trims every worksheet of the workbook.
+
+    Returns:
+        One TrimReport per worksheet.
+    """
+    reports = [trim_sheet(worksheet) for worksheet in workbook.worksheets]
+    for report in reports:
+        if report.cells_removed:
+            logger.info(
+                f"Trimmed sheet '{report.sheet_name}': {report.rows_removed} rows, "
+                f"{report.cols_removed} columns, {report.cells_removed} empty cells removed"
+            )
+    return reports
@@ -1,44 +1,63 @@
 import os
-import sqlite3
 import shutil
 from pathlib import Path
 from typing import List, Optional
 
-import openpyxl
-import pandas as pd
-import requests
+from app.core.content_cache import ContentCache
+from app.dataset.downloader import DownloadResult, get_downloader
+from app.dataset.workbook_loader import LoadedWorkbook
 
 
 class SheetProblem:
     def __init__(
-        self, workbook_path: Path, db_path: Path, context: Optional[str], instruction: str, sheet_vars: List[str]
+        self,
+        workbook_path: Path,
+        db_path: Path,
+        context: Optional[str],
+        instruction: str,
+        workbook: Optional[LoadedWorkbook] = None,
     ) -> None:
         self.workbook_path = workbook_path
         self.db_path = db_path
         self.context = context
         self.instruction = instruction
-        self.sheet_vars = sheet_vars
+        # Parsed at most once and shared by the sandbox, the sheet listing and the SQLite mirror
+        self.workbook = workbook if workbook is not None else LoadedWorkbook(workbook_path)
+        self._database_built = False
 
+    @property
+    def sheet_vars(self) -> List[str]:
+        return self.workbook.sheet_names
 
-def _download_file(url: str, save_path: Path) -> None:
+    def get_database(self) -> Path:
+        """
+        Returns the path of the SQLite mirror of the workbook, building it on first use.
+
+        Only SQL tools need the mirror, so it is not created when the problem is loaded.
+        """
+        if not self._database_built:
+            self.workbook.build_database(self.db_path)
+            self._database_built = True
+        return self.db_path
+
+
+def _download_file(url: str, save_path: Path) -> DownloadResult:
     """Downloads a file from a URL and saves it locally.
 
+    Uses the shared pooled downloader, which bounds the transfer by timeouts and a
+    size cap, retries and resumes broken transfers, and skips unchanged files.
+
     Args:
         url: The URL of the file to download.
         save_path: The path to save the downloaded file.
 
+    Returns:
+        The DownloadResult, including the SHA-256 of the file.
+
     Raises:
-        requests.exceptions.RequestException: If the download fails.
+        DownloadError: If the download fails or the file is too large.
     """
-    try:
-        response = requests.get(url, stream=True)
-        response.raise_for_status()  # Raise an exception for bad status codes
-        with open(save_path, "wb") as f:
-            for chunk in response.iter_content(chunk_size=8192):
-                f.write(chunk)
-    except requests.exceptions.RequestException as e:
-        # You might want to log the error here
-        raise e
+    return get_downloader().download(url, save_path)
 
 
 def _copy_local_file(source_path: Path, save_path: Path) -> None:
@@ -64,21 +83,27 @@ def load_problem(
     db_path: Path, 
     instruction: str, 
     workbook_source: Optional[str] = None,
-    is_local_file: bool = False
+    is_local_file: bool = False,
+    cache: Optional[ContentCache] = None,
 ) -> SheetProblem:
     """
     Loads a sheet problem, downloading the workbook from URL or copying from local file.
 
+    The workbook is not parsed here; the problem's LoadedWorkbook parses it once for
+    the sandbox, and the SQLite mirror is only built by `SheetProblem.get_database`.
+
     Args:
         workbook_path: The local path to save/load the workbook file.
         db_path: The path to the database directory.
         instruction: The instruction for the problem.
         workbook_source: The URL or local file path of the workbook.
         is_local_file: Whether the workbook_source is a local file path.
+        cache: Optional content cache for the parsed workbook and its derived data.
 
     Returns:
         A SheetProblem instance.
     """
+    digest = None
     if workbook_source:
         if is_local_file:
             # Copy local file to the sandbox
@@ -86,28 +111,16 @@ def load_problem(
             _copy_local_file(source_path, workbook_path)
         else:
             # Download from URL
-            _download_file(workbook_source, workbook_path)
-
-    def create_database(wb_path: Path, db_path: Path) -> None:
-        wb = pd.read_excel(wb_path, sheet_name=None)
-        conn = sqlite3.connect(db_path)
-
-        for sheet_name, df in wb.items():
-            # add row number
-            row_number_col = "row number"
-            df.insert(0, row_number_col, range(1, 1 + len(df)))
-            table_name = sheet_name
-            if not df.empty:
-                df.to_sql(table_name, conn, index=False, if_exists="replace")
+            digest = _download_file(workbook_source, workbook_path).digest
 
     os.makedirs(db_path, exist_ok=True)
     db_path = db_path / "database.db"
-    create_database(workbook_path, db_path)
-
-    workbook = openpyxl.load_workbook(workbook_path)
-    sheet_vars = workbook.sheetnames
 
     context = "The workbook is already loaded as `workbook` using openpyxl, you only need to load the sheet(s) you want to use manually. Besides, the workbook will be automatically saved, so you don't need to save it manually."
     return SheetProblem(
-        workbook_path=workbook_path, db_path=db_path, context=context, instruction=instruction, sheet_vars=sheet_vars
+        workbook_path=workbook_path,
+        db_path=db_path,
+        context=context,
+        instruction=instruction,
+        workbook=LoadedWorkbook(workbook_path, cache=cache, digest=digest),
     )
@@ -0,0 +1,276 @@
+"""
+Workbook downloads over a shared connection pool.
+
+All downloads go through one requests.Session, so connections to the same host
+are reused between analyses. Every request has connect and read timeouts, the
+response size is capped, and transient failures are retried with exponential
+backoff. A retry after a broken transfer resumes with an HTTP range request
+instead of starting over.
+
+With a ContentCache, the downloaded bytes are stored under their SHA-256 along
+with the response's ETag/Last-Modified validators. The next download of the same
+URL is a conditional GET, and a 304 answer is served from the cache.
+"""
+import functools
+import hashlib
+import logging
+import shutil
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from app.core.content_cache import ContentCache
+from app.utils.exceptions import DownloadError, DownloadTooLargeError
+
+logger = logging.getLogger(__name__)
+
+# Cache artifact names
+BODY_ARTIFACT = "source.bin"
+VALIDATORS_ARTIFACT = "validators.v1.pickle"
+
+# Read sizes grow from MIN_CHUNK_SIZE up to MAX_CHUNK_SIZE while reads keep filling them
+MIN_CHUNK_SIZE = 64 * 1024
+MAX_CHUNK_SIZE = 4 * 1024 * 1024
+
+RETRY_STATUS_CODES = frozenset({429, 500, 502, 503, 504})
+
+
+@dataclass(frozen=True)
+class DownloadResult:
+    """
+    The outcome of a download.
+
+    Attributes:
+        path: Where the file was saved.
+        size: Size of the file in bytes.
+        digest: The hex SHA-256 of the file content.
+        from_cache: Whether the server confirmed the cached copy (HTTP 304).
+        attempts: Number of HTTP requests made.
+    """
+
+    path: Path
+    size: int
+    digest: str
+    from_cache: bool
+    attempts: int
+
+
+class _RetryableError(Exception):
+    """A transient failure that may succeed on the next attempt."""
+
+
+class WorkbookDownloader:
+    """
+    Downloads files over a pooled HTTP session.
+
+    Args:
+        connect_timeout: Seconds to wait for a connection.
+        read_timeout: Seconds to wait between bytes of the response.
+        max_bytes: Downloads larger than this are aborted with DownloadTooLargeError.
+        max_retries: Retries after the first attempt for transient failures.
+        backoff_factor: The n-th retry waits backoff_factor * 2 ** (n - 1) seconds.
+        cache: Optional content cache for conditional GETs.
+        pool_maxsize: Connections kept per host.
+    """
+
+    def __init__(
+        self,
+        connect_timeout: float = 5.0,
+        read_timeout: float = 60.0,
+        max_bytes: int = 200 * 1024 * 1024,
+        max_retries: int = 3,
+        backoff_factor: float = 0.5,
+        cache: Optional[ContentCache] = None,
+        pool_maxsize: int = 10,
+    ) -> None:
+        self.timeout = (connect_timeout, read_timeout)
+        self.max_bytes = max_bytes
+        self.max_retries = max_retries
+        self.backoff_factor = backoff_factor
+        self.cache = cache
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_maxsize, pool_maxsize=pool_maxsize, max_retries=0)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def close(self) -> None:
+        self.session.close()
+
+    @staticmethod
+    def _url_key(url: str) -> str:
+        return hashlib.sha256(url.encode("utf-8")).hexdigest()
+
+    def _cached_validators(self, url: str) -> Optional[Dict[str, str]]:
+        """Returns the validators of the last download of `url` if its body is still cached."""
+        if self.cache is None:
+            return None
+        validators = self.cache.get_object(self._url_key(url), VALIDATORS_ARTIFACT)
+        if not validators or self.cache.get_path(validators["digest"], BODY_ARTIFACT) is None:
+            return None
+        return validators
+
+    def _store(self, url: str, response: requests.Response, save_path: Path, digest: str) -> None:
+        if self.cache is None:
+            return
+        etag = response.headers.get("ETag")
+        last_modified = response.headers.get("Last-Modified")
+        if etag is None and last_modified is None:
+            return
+        try:
+            self.cache.put_file(digest, BODY_ARTIFACT, save_path)
+            self.cache.put_object(
+                self._url_key(url),
+                VALIDATORS_ARTIFACT,
+                {"digest": digest, "etag": etag, "last_modified": last_modified},
+            )
+        except Exception as e:
+            logger.warning(f"Could not cache download of {url}: {e}")
+
+    def download(self, url: str, save_path: Path) -> DownloadResult:
+        """
+        Downloads `url` to `save_path`.
+
+        Raises:
+            DownloadTooLargeError: If the file is larger than `max_bytes`.
+            DownloadError: If the download fails after all retries or with a client error.
+        """
+        save_path = Path(save_path)
+        validators = self._cached_validators(url)
+        attempts = 0
+
+        with open(save_path, "wb") as f:
+            transfer = _Transfer(f)
+            while True:
+                attempts += 1
+                # Byte offsets for range requests must refer to the raw file, not a decoded stream
+                headers: Dict[str, str] = {"Accept-Encoding": "identity"}
+                if transfer.received:
+                    # Resume the broken transfer, but only if the file did not change meanwhile
+                    headers["Range"] = f"bytes={transfer.received}-"
+                    if transfer.etag:
+                        headers["If-Range"] = transfer.etag
+                elif validators is not None:
+                    if validators.get("etag"):
+                        headers["If-None-Match"] = validators["etag"]
+                    if validators.get("last_modified"):
+                        headers["If-Modified-Since"] = validators["last_modified"]
+
+                try:
+                    with self.session.get(url, headers=headers, stream=True, timeout=self.timeout) as response:
+                        if response.status_code == 304:
+                            if validators is None:
+                                raise DownloadError(url, "unexpected HTTP 304 for an unconditional request")
+                            cached = self.cache.get_path(validators["digest"], BODY_ARTIFACT)
+                            if cached is not None:
+                                f.close()
+                                shutil.copyfile(cached, save_path)
+                                logger.info(f"{url} not modified, using cached copy")
+                                return DownloadResult(
+                                    save_path, save_path.stat().st_size, validators["digest"], True, attempts
+                                )
+                            # Evicted since the request was prepared; fetch the body again
+                            validators = None
+                            raise _RetryableError("cached copy no longer available")
+
+                        if response.status_code in RETRY_STATUS_CODES:
+                            raise _RetryableError(f"HTTP {response.status_code}")
+                        if response.status_code >= 400:
+                            raise DownloadError(url, f"HTTP {response.status_code}")
+
+                        if transfer.received and response.status_code != 206:
+                            # The server ignored the range, start over
+                            transfer.restart()
+
+                        transfer.etag = response.headers.get("ETag", transfer.etag)
+                        content_length = response.headers.get("Content-Length")
+                        if content_length is not None and transfer.received + int(content_length) > self.max_bytes:
+                            raise DownloadTooLargeError(url, self.max_bytes)
+
+                        self._read_body(url, response, transfer)
+                        digest = transfer.hasher.hexdigest()
+                        self._store(url, response, save_path, digest)
+                        return DownloadResult(save_path, transfer.received, digest, False, attempts)
+
+                except (_RetryableError, requests.ConnectionError, requests.Timeout, requests.exceptions.ChunkedEncodingError) as e:
+                    if attempts > self.max_retries:
+                        raise DownloadError(url, f"{e} (after {attempts} attempts)") from e
+                    delay = self.backoff_factor * 2 ** (attempts - 1)
+                    logger.warning(
+                        f"Download of {url} failed ({e}), retrying in {delay:.1f}s from byte {transfer.received}"
+                    )
+                    time.sleep(delay)
+                except requests.RequestException as e:
+                    raise DownloadError(url, str(e)) from e
+
+    def _read_body(self, url: str, response: requests.Response, transfer: "_Transfer") -> None:
+        """Streams the response body into the transfer's file."""
+        chunk_size = MIN_CHUNK_SIZE
+        try:
+            while True:
+                chunk = response.raw.read(chunk_size, decode_content=True)
+                if not chunk:
+                    break
+                if transfer.received + len(chunk) > self.max_bytes:
+                    raise DownloadTooLargeError(url, self.max_bytes)
+                transfer.write(chunk)
+                # A full read means more data is waiting, so read bigger pieces next time
+                if len(chunk) == chunk_size and chunk_size < MAX_CHUNK_SIZE:
+                    chunk_size *= 2
+        except DownloadTooLargeError:
+            raise
+        except Exception as e:
+            # Keep what was received so far; the next attempt resumes from here
+            raise _RetryableError(f"transfer interrupted after {transfer.received} bytes: {e}") from e
+        finally:
+            transfer.file.flush()
+
+        expected = response.headers.get("Content-Range", "").rpartition("/")[2]
+        if expected.isdigit() and transfer.received != int(expected):
+            raise _RetryableError(f"received {transfer.received} of {expected} bytes")
+
+
+class _Transfer:
+    """The bytes of a download received so far, kept across retries."""
+
+    def __init__(self, file) -> None:
+        self.file = file
+        self.hasher = hashlib.sha256()
+        self.received = 0
+        self.etag: Optional[str] = None
+
+    def write(self, chunk: bytes) -> None:
+        self.file.write(chunk)
+        self.hasher.update(chunk)
+        self.received += len(chunk)
+
+    def restart(self) -> None:
+        self.file.seek(0)
+        self.file.truncate()
+        self.hasher = hashlib.sha256()
+        self.received = 0
+
+
+@functools.lru_cache
+def get_downloader() -> WorkbookDownloader:
+    """
+    Returns the process-wide downloader sharing one connection pool.
+
+    Configured by DOWNLOAD_CONNECT_TIMEOUT, DOWNLOAD_READ_TIMEOUT, DOWNLOAD_MAX_MB and
+    DOWNLOAD_MAX_RETRIES; uses the content cache for conditional GETs.
+    """
+    from app.core.config import get_settings
+    from app.core.content_cache import get_content_cache
+
+    settings = get_settings()
+    return WorkbookDownloader(
+        connect_timeout=settings.DOWNLOAD_CONNECT_TIMEOUT,
+        read_timeout=settings.DOWNLOAD_READ_TIMEOUT,
+        max_bytes=settings.DOWNLOAD_MAX_MB * 1024 * 1024,
+        max_retries=settings.DOWNLOAD_MAX_RETRIES,
+        cache=get_content_cache(),
+    )
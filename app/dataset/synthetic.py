@@ -0,0 +1,204 @@
+"""
+Synthetic OPOS workbooks for benchmarks and tests.
+
+generate_opos_workbook writes an open-posts export shaped like the SAP exports the
+service receives:
+
+- German headers ("Belegnummer", "Nettofälligkeit", "Betrag in Hauswährung", ...),
+- debtor blocks, each closed by a "Debitor <number>" subtotal row,
+- amounts in document currency (EUR, USD, CHF, GBP) and in local currency (EUR),
+- German number and date formats, and a share of dates and amounts stored as
+  German-formatted text, as left behind by CSV imports,
+- phantom formatting: styled empty cells far below and right of the data, which
+  openpyxl materializes on load.
+
+The workbook is written in openpyxl's write-only mode, so a million rows do not
+have to be held in memory. The output only depends on the arguments and the seed.
+"""
+from datetime import date, timedelta
+from pathlib import Path
+from typing import Any, List, Sequence, Tuple, Union
+
+import numpy as np
+import openpyxl
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Font, PatternFill
+
+# Row counts the benchmark suite generates workbooks for
+BENCHMARK_SIZES = (1_000, 10_000, 100_000, 1_000_000)
+
+HEADERS = (
+    "Zuordnung",
+    "Buchungsdatum",
+    "Belegart",
+    "Belegnummer",
+    "Belegdatum",
+    "Position",
+    "Buchungsschlüssel",
+    "Mahnstufe",
+    "Zahlungsfr.basis",
+    "Tage 1",
+    "Nettofälligkeit",
+    "Betrag in Belegwährung",
+    "Währung",
+    "Betrag in Hauswährung",
+    "Währung",
+)
+
+# Document currencies with their share of the invoices and their rate to EUR
+CURRENCIES: Tuple[Tuple[str, float, float], ...] = (
+    ("EUR", 0.8, 1.0),
+    ("USD", 0.1, 0.92),
+    ("CHF", 0.06, 1.04),
+    ("GBP", 0.04, 1.17),
+)
+
+DATE_FORMAT = "DD.MM.YYYY"
+AMOUNT_FORMAT = "#,##0.00"
+DAYS_FORMAT = "#,##0"
+
+MAX_BLOCK_SIZE = 8
+CREDIT_SHARE = 0.15
+
+
+def german_amount(value: float) -> str:
+    """Formats an amount as German text, e.g. -1234.5 as "-1.234,50"."""
+    return f"{value:,.2f}".replace(",", "_").replace(".", ",").replace("_", ".")
+
+
+def german_date(value: date) -> str:
+    """Formats a date as German text, e.g. "05.05.2025"."""
+    return value.strftime("%d.%m.%Y")
+
+
+class _Styles:
+    """Write-only cells reuse these, so each style is registered with the workbook once."""
+
+    def __init__(self, worksheet: Any) -> None:
+        self.worksheet = worksheet
+        self.subtotal_font = Font(bold=True)
+        self.phantom_fill = PatternFill("solid", fgColor="FFF2CC")
+
+    def cell(self, value: Any, number_format: str = None, bold: bool = False, fill: bool = False) -> WriteOnlyCell:
+        cell = WriteOnlyCell(self.worksheet, value=value)
+        if number_format is not None:
+            cell.number_format = number_format
+        if bold:
+            cell.font = self.subtotal_font
+        if fill:
+            cell.fill = self.phantom_fill
+        return cell
+
+
+def generate_opos_workbook(
+    path: Union[str, Path],
+    rows: int,
+    seed: int = 0,
+    text_share: float = 0.05,
+    phantom_rows: int = 1000,
+    phantom_columns: int = 10,
+    today: date = date(2025, 6, 30),
+    sheet_name: str = "Sheet1",
+) -> Path:
+    """
+    Writes a synthetic OPOS workbook.
+
+    Args:
+        path: The xlsx file to write.
+        rows: Number of data rows below the header, including the debtor subtotal rows.
+        seed: Seed of the random generator.
+        text_share: Share of invoice rows whose dates and amounts are German-formatted text.
+        phantom_rows: Number of styled empty rows below the data.
+        phantom_columns: Number of styled empty columns right of the data.
+        today: Reference date; due dates lie up to a year before and 90 days after it.
+        sheet_name: The title of the worksheet.
+
+    Returns:
+        The path of the written file.
+    """
+    path = Path(path)
+    rng = np.random.default_rng(seed)
+    workbook = openpyxl.Workbook(write_only=True)
+    worksheet = workbook.create_sheet(sheet_name)
+    styles = _Styles(worksheet)
+    worksheet.append(list(HEADERS))
+
+    # Draw all random values up front; the loop below only formats them
+    codes = [code for code, _, _ in CURRENCIES]
+    shares = np.array([share for _, share, _ in CURRENCIES])
+    rates = {code: rate for code, _, rate in CURRENCIES}
+    block_sizes = rng.integers(1, MAX_BLOCK_SIZE + 1, size=rows)
+    is_credit = rng.random(rows) < CREDIT_SHARE
+    as_text = rng.random(rows) < text_share
+    magnitudes = np.round(rng.lognormal(mean=7.5, sigma=1.0, size=rows), 2)
+    currencies = rng.choice(len(codes), size=rows, p=shares / shares.sum())
+    due_offsets = rng.integers(-365, 91, size=rows)
+    terms = rng.choice([0, 14, 30, 60], size=rows)
+    dunning = rng.choice([0, 0, 0, 1, 2, 3], size=rows)
+
+    phantom_tail = [styles.cell(None, fill=True) for _ in range(phantom_columns)]
+    written = 0
+    invoice = 0
+    block = 0
+    debtor = 210000
+    while written < rows:
+        size = min(int(block_sizes[block]), rows - written - 1)
+        block += 1
+        debtor += int(rng.integers(1, 500))
+        block_total = 0.0
+        for _ in range(max(size, 0)):
+            i = invoice
+            invoice += 1
+            credit = bool(is_credit[i])
+            currency = codes[currencies[i]]
+            amount = -magnitudes[i] if credit else magnitudes[i]
+            home_amount = round(amount * rates[currency], 2)
+            block_total += home_amount
+            due = today + timedelta(days=int(due_offsets[i]))
+            document_date = due - timedelta(days=int(terms[i]))
+            number = (1600000000 if credit else 90400000) + i
+            row: List[Any] = [
+                f"{number:010d}",
+                styles.cell(document_date, DATE_FORMAT),
+                "DG" if credit else "RV",
+                str(number),
+            ]
+            if as_text[i]:
+                row += [german_date(document_date), "1", "11" if credit else "01", str(dunning[i])]
+                row += [german_date(document_date), int(terms[i]), german_date(due)]
+                row += [german_amount(amount), currency, german_amount(home_amount), "EUR"]
+            else:
+                row += [styles.cell(document_date, DATE_FORMAT), "1", "11" if credit else "01", str(dunning[i])]
+                row += [styles.cell(document_date, DATE_FORMAT), styles.cell(int(terms[i]), DAYS_FORMAT)]
+                row += [styles.cell(due, DATE_FORMAT), styles.cell(float(amount), AMOUNT_FORMAT), currency]
+                row += [styles.cell(home_amount, AMOUNT_FORMAT), "EUR"]
+            worksheet.append(row + phantom_tail)
+            written += 1
+
+        # Debtor subtotal: label in the first column, totals in local currency
+        total = round(block_total, 2)
+        subtotal: List[Any] = [styles.cell(f"Debitor {debtor}", bold=True)] + [None] * 10
+        subtotal += [styles.cell(total, AMOUNT_FORMAT, bold=True), "EUR"]
+        subtotal += [styles.cell(total, AMOUNT_FORMAT, bold=True), "EUR"]
+        worksheet.append(subtotal + phantom_tail)
+        written += 1
+
+    phantom_row = [styles.cell(None, fill=True) for _ in range(len(HEADERS) + phantom_columns)]
+    for _ in range(phantom_rows):
+        worksheet.append(phantom_row)
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    workbook.save(path)
+    return path
+
+
+def generate_benchmark_workbooks(directory: Union[str, Path], sizes: Sequence[int] = BENCHMARK_SIZES) -> List[Path]:
+    """Writes one workbook per size as `opos_<rows>.xlsx`, skipping files that already exist."""
+    directory = Path(directory)
+    paths = []
+    for rows in sizes:
+        path = directory / f"opos_{rows}.xlsx"
+        if not path.exists():
+            generate_opos_workbook(path, rows)
+        paths.append(path)
+    return paths
@@ -0,0 +1,154 @@
+"""
+Single-parse loading of a problem workbook.
+
+A LoadedWorkbook parses the xlsx file at most once and hands the parsed openpyxl
+workbook to every consumer: the sandbox, the sheet-name listing and the SQLite
+mirror used by SQL tools. Parsing is deferred until a consumer needs the workbook,
+and the SQLite mirror is only built when it is requested.
+
+With a ContentCache, the trimmed workbook, its trim reports and the SQLite mirror
+are stored under the SHA-256 of the file, so that resubmitting the same file skips
+parsing entirely.
+"""
+import logging
+import shutil
+import sqlite3
+from pathlib import Path
+from typing import List, Optional
+
+import openpyxl
+from openpyxl.workbook.workbook import Workbook
+
+from app.core.content_cache import ContentCache, hash_file
+from app.core.frames import sheet_to_frame
+from app.core.trim import TrimReport, trim_workbook
+
+logger = logging.getLogger(__name__)
+
+# Name of the row number column added to every table of the SQLite mirror
+ROW_NUMBER_COLUMN = "row number"
+
+# Cache artifact names; bump the suffix when the stored format changes
+WORKBOOK_ARTIFACT = "workbook.v1.pickle"
+TRIM_REPORT_ARTIFACT = "trim_report.v1.pickle"
+DATABASE_ARTIFACT = "database.v1.db"
+
+
+class LoadedWorkbook:
+    """
+    A workbook file that is parsed and trimmed on first use and shared afterwards.
+
+    Args:
+        path: The path of the xlsx file.
+        cache: Optional content cache for the parsed workbook and the SQLite mirror.
+        digest: The SHA-256 of the file if already known, e.g. from the download.
+    """
+
+    def __init__(self, path: Path, cache: Optional[ContentCache] = None, digest: Optional[str] = None) -> None:
+        self.path = Path(path)
+        self.cache = cache
+        self.trim_report: List[TrimReport] = []
+        self._workbook: Optional[Workbook] = None
+        self._digest = digest
+
+    def __getstate__(self) -> dict:
+        # Only the file reference travels to a sandbox worker, which parses it itself
+        return {"path": self.path, "cache": self.cache, "digest": self._digest}
+
+    def __setstate__(self, state: dict) -> None:
+        self.__init__(state["path"], state["cache"], state["digest"])
+
+    @property
+    def digest(self) -> str:
+        """The SHA-256 of the file content."""
+        if self._digest is None:
+            self._digest = hash_file(self.path)
+        return self._digest
+
+    @property
+    def is_parsed(self) -> bool:
+        return self._workbook is not None
+
+    @property
+    def workbook(self) -> Workbook:
+        """The parsed and trimmed openpyxl workbook; loaded on first access."""
+        if self._workbook is None:
+            self._workbook = self._load()
+        return self._workbook
+
+    def _load(self) -> Workbook:
+        if self.cache is not None:
+            workbook = self.cache.get_object(self.digest, WORKBOOK_ARTIFACT)
+            trim_report = self.cache.get_object(self.digest, TRIM_REPORT_ARTIFACT)
+            if isinstance(workbook, Workbook) and trim_report is not None:
+                logger.info(f"Loaded workbook {self.path} from cache ({self.digest[:12]})")
+                self.trim_report = trim_report
+                return workbook
+
+        logger.info(f"Parsing workbook {self.path}")
+        workbook = openpyxl.load_workbook(self.path)
+        self.trim_report = trim_workbook(workbook)
+
+        if self.cache is not None:
+            try:
+                self.cache.put_object(self.digest, WORKBOOK_ARTIFACT, workbook)
+                self.cache.put_object(self.digest, TRIM_REPORT_ARTIFACT, self.trim_report)
+            except Exception as e:
+                logger.warning(f"Could not cache workbook {self.path}: {e}")
+        return workbook
+
+    @property
+    def sheet_names(self) -> List[str]:
+        """
+        The sheet names of the workbook.
+
+        If the workbook has not been parsed yet, only the workbook index is read
+        (read-only mode loads worksheets lazily), so no full parse is triggered.
+        """
+        if self._workbook is not None:
+            return list(self._workbook.sheetnames)
+
+        index = openpyxl.load_workbook(self.path, read_only=True)
+        try:
+            return list(index.sheetnames)
+        finally:
+            index.close()
+
+    def build_database(self, db_path: Path) -> Path:
+        """
+        Writes every non-empty worksheet to a SQLite database, one table per sheet.
+
+        Each table gets a leading "row number" column counting the data rows from 1.
+        The mirror reflects the workbook at the time of the call, so it should be
+        built before the sandbox starts modifying the workbook.
+
+        Args:
+            db_path: The path of the SQLite database file.
+
+        Returns:
+            The path of the database file.
+        """
+        if self.cache is not None:
+            cached = self.cache.get_path(self.digest, DATABASE_ARTIFACT)
+            if cached is not None:
+                shutil.copyfile(cached, db_path)
+                return db_path
+
+        conn = sqlite3.connect(db_path)
+        try:
+            for worksheet in self.workbook.worksheets:
+                df = sheet_to_frame(worksheet).reset_index(drop=True)
+                if df.empty:
+                    continue
+                df.columns = [str(column) for column in df.columns]
+                df.insert(0, ROW_NUMBER_COLUMN, range(1, 1 + len(df)))
+                df.to_sql(worksheet.title, conn, index=False, if_exists="replace")
+        finally:
+            conn.close()
+
+        if self.cache is not None:
+            try:
+                self.cache.put_file(self.digest, DATABASE_ARTIFACT, db_path)
+            except Exception as e:
+                logger.warning(f"Could not cache the SQLite mirror of {self.path}: {e}")
+        return db_path
@@ -4,31 +4,90 @@ LangGraph implementation for SheetAgent.
 This module defines the GraphState model and node functions for the LangGraph workflow.
 It includes LangSmith integration for tracing and monitoring.
 """
-from typing import Dict, List,Any
+from typing import Dict, List, Any, Optional, Tuple
 from pathlib import Path
+import asyncio
 import logging
 
 from langchain_core.tools import BaseTool
-from langchain_core.runnables import Runnable
+from langchain_core.messages import BaseMessage
+from langchain_core.runnables import Runnable, RunnableLambda
 from langgraph.graph import StateGraph, END
-from langgraph.prebuilt import ToolNode
-from langchain_openai import ChatOpenAI
 from langsmith import traceable
 
-from app.utils.enumeration import MODEL_TYPE
 from app.dataset.dataloader import SheetProblem
 from app.core.sandbox import Sandbox
-from app.graph.tools import python_executor, cell_range_reader
 from app.graph.opos_intelligence import get_all_intelligence_tools
 from app.graph.nodes.opos_analyzer import opos_preprocessing_node, validation_node, should_run_validation
+from app.graph.nodes.opos_engine import opos_engine_node, route_after_engine
+from app.core.history import HistoryCompactor, get_token_encoding, history_token_budget
 from app.core.prompt_manager import PromptManager
 from app.utils.utils import parse_think
 from app.graph.state import GraphState
+from app.graph.tool_node import SandboxToolNode
 from langchain_core.runnables import RunnableConfig
 
 # Configure logger
 logger = logging.getLogger(__name__)
 
+def _prepare_planner_call(state: GraphState) -> Tuple[Optional[BaseMessage], List[BaseMessage]]:
+    """
+    Returns the new sheet-state observation (None if the sheet is unchanged) and the
+    message history to send to the planner.
+    """
+    messages = state["messages"]
+    sheet_state_changed = state["previous_sheet_state"] != state["current_sheet_state"]
+    
+    # Get observation only if the sheet state has changed
+    observation = None
+    if sheet_state_changed:
+        observation = state["prompt_manager"].get_observation_prompt(state["current_sheet_state"])
+        
+    # Compact the history to the token budget; the new observation replaces older ones
+    history_compactor = state.get("history_compactor")
+    if history_compactor is not None:
+        history = history_compactor.compact(messages, observation)
+    else:
+        history = [*messages, observation] if observation is not None else messages
+    return observation, history
+
+
+def _planner_update(state: GraphState, response: Optional[BaseMessage], observation: Optional[BaseMessage]) -> GraphState:
+    """Returns the updated state with the planner's response."""
+    if response:
+        # Try to parse the thought from the planner's message if it has content
+        if hasattr(response, 'content') and response.content:
+            try:
+                thought = parse_think(response.content)
+                logger.info(f"Parsed thought: {thought[:100]}...")
+            except Exception as e:
+                # If parsing fails, continue without adding a thought
+                logger.warning(f"Failed to parse thought from planner message: {str(e)}")
+        
+        return {
+            **state, 
+            "messages": [observation, response] if observation is not None else [response],  # Use the response directly
+            "step": state["step"] + 1
+        }
+    else:
+        logger.warning("Planner returned empty message")
+        return {
+            **state,
+            "step": state["step"] + 1  # Still increment step to prevent infinite loops
+        }
+
+
+def _max_steps_reached(state: GraphState) -> bool:
+    # Check for safety - prevent infinite loops
+    current_step = state.get("step", 0)
+    max_steps = state.get("max_steps", 15)
+    
+    if current_step >= max_steps:
+        logger.warning(f"Maximum steps ({max_steps}) reached, stopping execution")
+        return True
+    return False
+
+
 @traceable(name="Planner Node", run_type="chain")
 def planner_node(state: GraphState) -> GraphState:
     """
@@ -45,53 +104,53 @@ def planner_node(state: GraphState) -> GraphState:
     """
     logger.info(f"Executing planner node at step {state['step']}")
     
-    # Check for safety - prevent infinite loops
-    current_step = state.get("step", 0)
-    max_steps = state.get("max_steps", 15)
+    if _max_steps_reached(state):
+        return {
+            **state,
+            "step": state.get("step", 0) + 1  # Increment to trigger end condition
+        }
     
-    if current_step >= max_steps:
-        logger.warning(f"Maximum steps ({max_steps}) reached, stopping execution")
+    observation, history = _prepare_planner_call(state)
+    try:
+        # LLM CALL
+        response = state["planner_chain"].invoke({"messages": history})
+        return _planner_update(state, response, observation)
+            
+    except Exception as e:
+        logger.error(f"Error in planner node: {e}")
         return {
             **state,
-            "step": current_step + 1  # Increment to trigger end condition
+            "step": state["step"] + 1  # Increment step even on error
         }
+
+
+@traceable(name="Planner Node", run_type="chain")
+async def aplanner_node(state: GraphState) -> GraphState:
+    """
+    Async variant of planner_node, used when the graph runs with ainvoke.
     
-    # Extract the necessary components from the state
-    planner_chain = state["planner_chain"]
-    messages = state["messages"]
-    sheet_state_changed = state["previous_sheet_state"] != state["current_sheet_state"]
+    The LLM call is awaited, so the event loop serves other analyses while the
+    planner waits for the model.
     
-    # Get observation only if the sheet state has changed
-    if sheet_state_changed:
-        observation = state["prompt_manager"].get_observation_prompt(state["current_sheet_state"])
+    Args:
+        state: The current state of the graph.
         
+    Returns:
+        The updated state with the planner's response.
+    """
+    logger.info(f"Executing planner node at step {state['step']}")
+    
+    if _max_steps_reached(state):
+        return {
+            **state,
+            "step": state.get("step", 0) + 1  # Increment to trigger end condition
+        }
+    
+    observation, history = _prepare_planner_call(state)
     try:
         # LLM CALL
-        response = planner_chain.invoke({
-            "messages": [*messages, observation] if sheet_state_changed else messages
-        })
-        
-        if response:
-            # Try to parse the thought from the planner's message if it has content
-            if hasattr(response, 'content') and response.content:
-                try:
-                    thought = parse_think(response.content)
-                    logger.info(f"Parsed thought: {thought[:100]}...")
-                except Exception as e:
-                    # If parsing fails, continue without adding a thought
-                    logger.warning(f"Failed to parse thought from planner message: {str(e)}")
-            
-            return {
-                **state, 
-                "messages": [observation, response] if sheet_state_changed else [response],  # Use the response directly
-                "step": state["step"] + 1
-            }
-        else:
-            logger.warning("Planner returned empty message")
-            return {
-                **state,
-                "step": state["step"] + 1  # Still increment step to prevent infinite loops
-            }
+        response = await state["planner_chain"].ainvoke({"messages": history})
+        return _planner_update(state, response, observation)
             
     except Exception as e:
         logger.error(f"Error in planner node: {e}")
@@ -116,7 +175,7 @@ def build_graph(tools: List[BaseTool]) -> StateGraph:
     Enhanced with OPOS intelligence nodes for better financial data processing.
     
     Args:
-        tools: List of tools to be used by the ToolNode.
+        tools: List of tools to be used by the tool node.
         
     Returns:
         The compiled StateGraph.
@@ -124,13 +183,25 @@ def build_graph(tools: List[BaseTool]) -> StateGraph:
     graph = StateGraph(GraphState)
     
     # Add all nodes
+    graph.add_node("opos_engine", opos_engine_node)
     graph.add_node("opos_preprocessing", opos_preprocessing_node)
-    graph.add_node("planner", planner_node)
-    graph.add_node("tools", ToolNode(tools))
+    # The planner is awaited under ainvoke; the other nodes touch the sandbox and
+    # are run in LangGraph's thread executor under ainvoke
+    graph.add_node("planner", RunnableLambda(planner_node, afunc=aplanner_node, name="planner"))
+    # Read-only tool calls of a turn run concurrently, mutating ones in order
+    graph.add_node("tools", SandboxToolNode(tools))
     graph.add_node("validation", validation_node)
     
-    # Set entry point - start with OPOS preprocessing
-    graph.set_entry_point("opos_preprocessing")
+    # Set entry point - the deterministic engine answers the standard analysis without the planner
+    graph.set_entry_point("opos_engine")
+    graph.add_conditional_edges(
+        "opos_engine",
+        route_after_engine,
+        {
+            "opos_preprocessing": "opos_preprocessing",
+            END: END
+        }
+    )
     
     # Flow from preprocessing to planner
     graph.add_edge("opos_preprocessing", "planner")
@@ -218,6 +289,7 @@ def create_initial_state(
     output_dir: Path,
     max_steps: int = 8, # ATTENTION: Reduced from 10 due to streamlined tool suite - determines the maximum number of steps the agent can take.
     prompt_manager: PromptManager = None,
+    history_compactor: HistoryCompactor = None,
 ):
     """
     Creates the initial state for the graph execution.
@@ -229,6 +301,7 @@ def create_initial_state(
         output_dir: The directory where output files will be saved.
         max_steps: Maximum number of steps to execute.
         prompt_manager: The PromptManager instance for formatting prompts.
+        history_compactor: Compacts the message history before each planner call (None sends it in full).
         
     Returns:
         The initial state for the graph execution.
@@ -252,6 +325,7 @@ def create_initial_state(
         "max_steps": max_steps,
         "output_dir": output_dir,
         "prompt_manager": prompt_manager,
+        "history_compactor": history_compactor,
         
         # Dynamic components
         "messages": [initial_message],
@@ -260,6 +334,10 @@ def create_initial_state(
         "previous_sheet_state": sheet_state,
         "current_sheet_state": sheet_state,
         
+        # Deterministic OPOS engine (initialize with defaults)
+        "opos_engine_applied": False,
+        "opos_engine_result": None,
+        
         # OPOS Intelligence tracking (initialize with defaults)
         "opos_preprocessing_complete": False,
         "opos_structure_results": {},
@@ -290,7 +368,7 @@ class SheetAgentGraph:
         output_dir: Path,
         sandbox: Sandbox,
         max_steps: int = 10,  # Reduced from 12 due to streamlined workflow
-        planner_model_name: str = MODEL_TYPE.GPT_4_1106.value,
+        planner_model_name: Optional[str] = None,
     ):
         """
         Initializes the SheetAgentGraph.
@@ -300,9 +378,10 @@ class SheetAgentGraph:
             output_dir: The directory where output files will be saved.
             sandbox: The sandbox instance for secure code execution.
             max_steps: Maximum number of steps to execute.
-            planner_model_name: The name of the model to use for planning.
+            planner_model_name: The name of the model to use for planning; defaults to registry.PLANNER_MODEL.
         """
         from app.core.config import get_settings
+        from app.graph.registry import PLANNER_MODEL, PLANNER_TOOLS, get_compiled_graph, get_planner_chain
         
         self.problem = problem
         self.output_dir = output_dir
@@ -315,60 +394,58 @@ class SheetAgentGraph:
         # Initialize the language models
         settings = get_settings()
         
-        planner_model = ChatOpenAI(
-            model="o4-mini-2025-04-16",
-            api_key=settings.OPENAI_API_KEY,
-            base_url=settings.OPENAI_API_BASE,
-            # temperature=0.0,
-            timeout=60
-        )
-        
         # Create list of tools for binding (enhanced with OPOS intelligence)
         # base_tools = [python_executor, cell_range_reader]
         # intelligence_tools = get_all_intelligence_tools()
         # self.tool_list = base_tools + intelligence_tools
-        self.tool_list = [python_executor, cell_range_reader]
+        self.tool_list = list(PLANNER_TOOLS)
         
         logger.info(f"Initialized SheetAgent with {len(self.tool_list)} tools: {[tool.name for tool in self.tool_list]}")
         
-        # Bind tools to the planner model
-        planner_model = planner_model.bind_tools(self.tool_list)
+        # The planner chain and the compiled graph are shared by all requests (a replayed planner is per run)
+        planner_model_name = planner_model_name or PLANNER_MODEL
+        self.planner = get_planner_chain(self.tool_list, planner_model_name)
         
-        # Create the planner chain using the prompt manager
-        planner_prompt = self.prompt_manager.get_planner_prompt_template()
-        planner_chain = planner_prompt | planner_model
-        self.planner = planner_chain
+        # Keep the planner's input within a share of the model's context window
+        self.history_compactor = HistoryCompactor(
+            budget_tokens=history_token_budget(planner_model_name, settings.PLANNER_HISTORY_BUDGET_RATIO),
+            encoding=get_token_encoding(planner_model_name),
+            keep_exchanges=settings.PLANNER_HISTORY_KEEP_EXCHANGES,
+        )
         
-        # Build the graph with the tool list
-        self.graph = build_graph(self.tool_list)
+        self.graph = get_compiled_graph(self.tool_list)
     
-    @traceable(name="SheetAgent", run_type="chain")
-    def run(self) -> Dict[str, Any]:
-        """
-        Runs the graph with the initial state.
-        
-        This method is traced with LangSmith to provide monitoring and debugging
-        capabilities for the agent's execution.
-        
-        Returns:
-            The final state after graph execution.
-        """
-        logger.info("Starting SheetAgentGraph execution")
-        
+    def _prepare(self) -> Dict[str, Any]:
+        """Loads the workbook into the sandbox and returns the initial state."""
         # Initialize the workbook first before creating initial state
         logger.info("Loading workbook")
-        self.sandbox.load_workbook(self.problem.workbook_path)
+        self.sandbox.load_workbook(self.problem.workbook)
         
         # Create the initial state
         logger.info("Creating initial state")
-        initial_state = create_initial_state(
+        return create_initial_state(
             problem=self.problem,
             sandbox=self.sandbox,
             planner=self.planner,
             output_dir=self.output_dir,
             max_steps=self.max_steps,
             prompt_manager=self.prompt_manager,
+            history_compactor=self.history_compactor,
         )
+    
+    @traceable(name="SheetAgent", run_type="chain")
+    def run(self) -> Dict[str, Any]:
+        """
+        Runs the graph with the initial state.
+        
+        This method is traced with LangSmith to provide monitoring and debugging
+        capabilities for the agent's execution.
+        
+        Returns:
+            The final state after graph execution.
+        """
+        logger.info("Starting SheetAgentGraph execution")
+        initial_state = self._prepare()
         config = RunnableConfig(recursion_limit=25)
         
         # Run the graph
@@ -380,4 +457,30 @@ class SheetAgentGraph:
         logger.info(f"Saving final workbook state to {self.output_dir}")
         self.sandbox.save(self.output_dir)
         
-        return final_state 
\ No newline at end of file
+        return final_state
+    
+    @traceable(name="SheetAgent", run_type="chain")
+    async def arun(self) -> Dict[str, Any]:
+        """
+        Runs the graph with the initial state on the event loop.
+        
+        LLM calls are awaited and sandbox work runs in worker threads, so one
+        process can interleave many analyses while they wait for the model.
+        
+        Returns:
+            The final state after graph execution.
+        """
+        logger.info("Starting SheetAgentGraph execution")
+        initial_state = await asyncio.to_thread(self._prepare)
+        config = RunnableConfig(recursion_limit=25)
+        
+        # Run the graph
+        logger.info("Invoking graph")
+        final_state = await self.graph.ainvoke(initial_state, config)
+        logger.info(f"Graph execution completed after {final_state['step']} steps")
+        
+        # Save the final state of the workbook
+        logger.info(f"Saving final workbook state to {self.output_dir}")
+        await asyncio.to_thread(self.sandbox.save, self.output_dir)
+        
+        return final_state
@@ -6,8 +6,10 @@ including OPOS intelligence and validation nodes.
 """
 
 from .opos_analyzer import opos_preprocessing_node, validation_node
+from .opos_engine import opos_engine_node
 
 __all__ = [
+    "opos_engine_node",
     "opos_preprocessing_node",
     "validation_node"
 ]
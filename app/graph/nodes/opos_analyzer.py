@@ -4,15 +4,44 @@ OPOS Analysis Nodes for LangGraph Workflow.
 This module provides specialized nodes for OPOS data preprocessing and validation
 to enhance the efficiency and accuracy of financial data analysis.
 """
+import hashlib
 import logging
+from typing import Any, Dict, Optional
 
 from langsmith import traceable
 from langchain_core.messages import SystemMessage
 
 from app.graph.state import GraphState
 from app.graph.tools_cumulative_detector import identify_summary_rows, detect_opos_structure
+from app.opos.terms import get_term_matcher
 logger = logging.getLogger(__name__)
 
+# Sandbox variables holding the preprocessing results
+PREPROCESSING_RESULT_VARS = ("opos_structure_results", "cumulative_detection_results")
+
+
+def _preprocessing_artifact(analysis_code: str) -> str:
+    # The analysis code embeds the sheet name, so changing either invalidates the entry
+    return f"opos_preprocessing.{hashlib.sha256(analysis_code.encode('utf-8')).hexdigest()[:16]}.pickle"
+
+
+def _load_cached_preprocessing(state: GraphState, analysis_code: str) -> Optional[Dict[str, Any]]:
+    """Returns the cached preprocessing results for the problem workbook, if any."""
+    loaded = getattr(state.get("problem"), "workbook", None)
+    if loaded is None or loaded.cache is None:
+        return None
+    return loaded.cache.get_object(loaded.digest, _preprocessing_artifact(analysis_code))
+
+
+def _store_cached_preprocessing(state: GraphState, analysis_code: str, results: Dict[str, Any]) -> None:
+    loaded = getattr(state.get("problem"), "workbook", None)
+    if loaded is None or loaded.cache is None:
+        return
+    try:
+        loaded.cache.put_object(loaded.digest, _preprocessing_artifact(analysis_code), results)
+    except Exception as e:
+        logger.warning(f"Could not cache OPOS preprocessing results: {e}")
+
 @traceable(name="OPOS Preprocessing Node", run_type="chain")
 def opos_preprocessing_node(state: GraphState) -> GraphState:
     """
@@ -58,9 +87,8 @@ def opos_preprocessing_node(state: GraphState) -> GraphState:
         logger.info(f"Extracted sheet name: {sheet_name}")
         
         # Check if this looks like OPOS data by examining headers
-        has_opos_indicators = any(term.lower() in sheet_state.lower() for term in [
-            "debitor", "buchung", "beleg", "währung", "betrag", "invoice", "amount"
-        ])
+        term_matcher = get_term_matcher()
+        has_opos_indicators = bool(term_matcher.match([sheet_state])[0] & term_matcher.bit("indicator"))
         
         if not has_opos_indicators:
             logger.info("No OPOS indicators detected, skipping OPOS preprocessing")
@@ -77,47 +105,6 @@ def opos_preprocessing_node(state: GraphState) -> GraphState:
         
         logger.info(f"OPOS indicators detected, running structure analysis on sheet: {sheet_name}")
         
-        # Determine appropriate data ranges for analysis
-        # Get sheet dimensions from sandbox to create appropriate ranges
-        try:
-            # Try to get actual sheet dimensions from sandbox
-            if hasattr(sandbox, 'workbook') and sandbox.workbook:
-                workbook = sandbox.workbook
-                if workbook and sheet_name in workbook.sheetnames:
-                    sheet = workbook[sheet_name]
-                    rows = list(sheet.rows)
-                    total_rows = len(rows)
-                    total_cols = len(rows[0]) if rows else 0
-                    
-                    # Create ranges based on actual data size
-                    max_analysis_rows = min(total_rows, 200)  # Limit for performance
-                    max_cols = min(total_cols, 26)  # Limit to A-Z columns
-                    
-                    # Structure detection range (header + sample data)
-                    structure_range = f"A1:{chr(65 + max_cols - 1)}10"
-                    
-                    # Summary detection range (more comprehensive)
-                    summary_range = f"A1:{chr(65 + max_cols - 1)}{max_analysis_rows}"
-                    
-                    logger.info(f"Using ranges - Structure: {structure_range}, Summary: {summary_range}")
-                else:
-                    # Fallback ranges if sheet access fails
-                    structure_range = "A1:Z10"
-                    summary_range = "A1:Z100"
-                    logger.warning(f"Could not access sheet {sheet_name}, using fallback ranges")
-            else:
-                # Use sandbox methods to get sheet info
-                sheet_state = sandbox.get_sheet_state()
-                # Parse sheet state to get dimensions if possible
-                structure_range = "A1:Z10"
-                summary_range = "A1:Z100"
-                logger.info(f"Using default ranges - Structure: {structure_range}, Summary: {summary_range}")
-                
-        except Exception as e:
-            logger.warning(f"Error determining sheet dimensions: {e}, using default ranges")
-            structure_range = "A1:Z10"
-            summary_range = "A1:Z100"
-        
         # Run OPOS analysis using Python code execution in sandbox
         logger.info("Running OPOS structure and summary analysis...")
         
@@ -127,22 +114,20 @@ def opos_preprocessing_node(state: GraphState) -> GraphState:
         # Combined analysis code that runs both structure detection and summary identification
         analysis_code = f"""
 import re
-from datetime import datetime
 
 # Get sheet and data
 sheet = workbook["{sheet_name}"]
-rows = list(sheet.rows)
-headers = [cell.value for cell in rows[0]] if rows else []
+headers = [cell.value for cell in next(sheet.iter_rows(max_row=1), ())]
 
-print(f"Analyzing sheet '{sheet_name}' with {{len(rows)}} rows and {{len(headers)}} columns")
+print(f"Analyzing sheet '{sheet_name}' with {{sheet.max_row}} rows and {{len(headers)}} columns")
 
 # PART 1: Structure Detection
 print("=== OPOS Structure Detection ===")
 
 # Sample first few rows for analysis
 sample_rows = []
-for row in rows[1:6]:  # Skip header, take next 5 rows
-    sample_rows.append([cell.value for cell in row])
+for row in sheet.iter_rows(min_row=2, max_row=6, values_only=True):  # Skip header, take next 5 rows
+    sample_rows.append(list(row))
 
 structure_info = {{
     'total_columns': len(headers),
@@ -152,30 +137,43 @@ structure_info = {{
     'confidence_scores': {{}}
 }}
 
+# Header terms per column type come from the term registry, matched once per header
+from app.opos.terms import get_term_matcher
+
+term_matcher = get_term_matcher()
+header_terms = term_matcher.match(headers)
+
+# Date formats of the whole columns, cached by the sheet's header signature
+from app.opos.dates import infer_frame_date_formats
+
+sheet_frame = frames["{sheet_name}"]
+date_formats = infer_frame_date_formats(sheet_frame)
+structure_info['date_formats'] = {{str(column): date_format.name for column, date_format in date_formats.items()}}
+
+# Number conventions of the amount columns ("de" 1.234,56, "en" 1,234.56)
+from app.opos.amounts import infer_frame_number_formats
+
+number_formats = infer_frame_number_formats(sheet_frame)
+structure_info['amount_formats'] = {{str(column): number_format.name for column, number_format in number_formats.items()}}
+
 # Column type detection patterns
 column_patterns = {{
     'invoice_number': {{
-        'keywords': ['invoice', 'rechnung', 'belegnr', 'beleg', 'nummer', 'nr', 'rg'],
         'data_patterns': [r'^[0-9]+$', r'^[A-Z]{{1,3}}[0-9]+$', r'^[0-9]{{4,}}$']
     }},
     'invoice_date': {{
-        'keywords': ['invoice.*date', 'rechnungsdatum', 'belegdatum', 'datum', 'date', 'buchung'],
         'data_patterns': []
     }},
     'due_date': {{
-        'keywords': ['due.*date', 'fällig', 'faellig', 'valuta', 'due'],
         'data_patterns': []
     }},
     'amount': {{
-        'keywords': ['amount', 'betrag', 'summe', 'wert', 'value', 'eur', 'usd', 'euro', 'dollar'],
-        'data_patterns': [r'^[0-9.,]+$', r'^-?[0-9.,]+$']
+        'data_patterns': []  # Scored by the inferred number format
     }},
     'debitor': {{
-        'keywords': ['debitor', 'debtor', 'kunde', 'customer', 'client', 'klient'],
         'data_patterns': [r'^[0-9]+$', r'^[A-Z]{{2,}}[0-9]*$']
     }},
     'currency': {{
-        'keywords': ['currency', 'währung', 'waehrung', 'curr'],
         'data_patterns': [r'^(EUR|USD|GBP|CHF)$']
     }}
 }}
@@ -185,7 +183,6 @@ for col_idx, header in enumerate(headers):
     if not header:
         continue
         
-    header_lower = str(header).lower()
     col_analysis = {{
         'index': col_idx,
         'header': header,
@@ -210,10 +207,8 @@ for col_idx, header in enumerate(headers):
     for pattern_type, patterns in column_patterns.items():
         confidence = 0.0
         
-        # Header keyword matching
-        header_matches = sum(1 for keyword in patterns['keywords'] 
-                           if re.search(keyword, header_lower))
-        if header_matches > 0:
+        # Header term matching
+        if header_terms[col_idx] & term_matcher.bit(f"header:{{pattern_type}}"):
             confidence += 0.6
         
         # Data pattern matching for amounts and IDs
@@ -232,23 +227,17 @@ for col_idx, header in enumerate(headers):
             if sample_values:
                 confidence += 0.4 * (pattern_matches / len(sample_values))
         
-        # Special handling for dates
-        if pattern_type in ['invoice_date', 'due_date'] and sample_values:
-            date_score = 0
-            for value in sample_values:
-                if isinstance(value, datetime):
-                    date_score += 1
-                elif isinstance(value, str):
-                    # Try to parse common date formats
-                    for fmt in ['%d.%m.%Y', '%Y-%m-%d', '%m/%d/%Y', '%d/%m/%Y']:
-                        try:
-                            datetime.strptime(str(value), fmt)
-                            date_score += 1
-                            break
-                        except:
-                            continue
-            if sample_values:
-                confidence += 0.4 * (date_score / len(sample_values))
+        # Dates: share of the column parsing with its inferred format
+        if pattern_type in ['invoice_date', 'due_date'] and col_idx < len(sheet_frame.columns):
+            date_format = date_formats.get(sheet_frame.columns[col_idx])
+            if date_format is not None:
+                confidence += 0.4 * date_format.share
+        
+        # Amounts: share of the column parsing with its inferred number convention
+        if pattern_type == 'amount' and col_idx < len(sheet_frame.columns):
+            number_format = number_formats.get(sheet_frame.columns[col_idx])
+            if number_format is not None:
+                confidence += 0.4 * number_format.share
         
         if confidence > best_confidence:
             best_confidence = confidence
@@ -284,84 +273,33 @@ structure_info['currency_info'] = {{
 }}
 
 # German terminology detection
-german_terms = ["Buchungsdatum", "Belegart", "Belegnummer", "Belegdatum", 
-               "Buchungsschlüssel", "Negativbuchung", "Mahnstufe", "Währung", 
-               "Hauswährung", "Zahlungsfr", "Skontosatz", "Debitor"]
-
-german_detected = [term for term in german_terms if any(term in str(header) for header in headers)]
+german_detected = [header for header, terms in zip(headers, header_terms) if terms & term_matcher.bit("german")]
 structure_info['german_terms'] = german_detected
 
 print(f"Structure analysis completed:")
 print(f"  - Total columns: {{structure_info['total_columns']}}")
 print(f"  - German terms found: {{len(german_detected)}}")
 print(f"  - Currencies: {{list(currencies_found)}}")
+print(f"  - Date formats: {{structure_info['date_formats']}}")
+print(f"  - Amount formats: {{structure_info['amount_formats']}}")
 
 # PART 2: Summary Row Detection
 print("\\n=== Summary Row Detection ===")
 
-# Convert to list for easier processing
-data_rows = []
-for row_idx, row in enumerate(rows[1:], 2):  # Start from row 2 (skip header)
-    row_values = [cell.value for cell in row]
-    data_rows.append({{'row_num': row_idx, 'values': row_values}})
-
-print(f"Analyzing {{len(data_rows)}} data rows for cumulative patterns...")
-
-# Identify cumulative rows using multiple heuristics
-cumulative_rows = []
-analysis_results = {{
-    'debitor_rows': [],
-    'empty_key_fields': [],
-    'format_changes': [],
-    'summary_indicators': [],
-    'total_rows_analyzed': len(data_rows)
-}}
+# Vectorized over every row and column of the sheet frame
+from app.opos.cumulative import detect_cumulative_rows
 
-# Heuristic 1: Look for "Debitor", "Debtor", "Creditor" keywords
-for row_data in data_rows:
-    row_num = row_data['row_num']
-    for col_idx, value in enumerate(row_data['values']):
-        if value and isinstance(value, str):
-            value_lower = str(value).lower()
-            if any(keyword in value_lower for keyword in ['debitor', 'hauptbuchkonto', 'buchungskreis', 'total', 'sum', 'gesamt']):
-                if row_num not in cumulative_rows:
-                    cumulative_rows.append(row_num)
-                    analysis_results['debitor_rows'].append(row_num)
-                break
-
-# Heuristic 2: Detect rows with mostly empty key fields
-key_columns = min(5, len(data_rows[0]['values']) if data_rows else 0)
-for row_data in data_rows:
-    row_num = row_data['row_num']
-    if row_num in cumulative_rows:
-        continue
-        
-    key_values = row_data['values'][:key_columns]
-    empty_count = sum(1 for val in key_values if val is None or val == "" or val == 0)
-    
-    # If more than 60% of key fields are empty, likely cumulative
-    if len(key_values) > 0 and empty_count / len(key_values) > 0.6:
-        # But check if there are amounts present
-        amount_present = any(
-            val is not None and str(val).strip() != ""
-            for val in row_data['values'][key_columns:]
-            if isinstance(val, (int, float)) or (isinstance(val, str) and val.replace('.', '', 1).replace(',', '', 1).replace('-', '', 1).isdigit())
-        )
-        if amount_present:
-            cumulative_rows.append(row_num)
-            analysis_results['empty_key_fields'].append(row_num)
+analysis_results = detect_cumulative_rows(frames["{sheet_name}"]).to_dict()
+cumulative_rows = analysis_results['cumulative_rows']
 
-# Sort and deduplicate
-cumulative_rows = sorted(list(set(cumulative_rows)))
-analysis_results['cumulative_rows'] = cumulative_rows
-analysis_results['total_cumulative_found'] = len(cumulative_rows)
-
-print(f"Found {{len(cumulative_rows)}} cumulative rows")
+print(f"Found {{len(cumulative_rows)}} cumulative rows in {{analysis_results['total_rows_analyzed']}} data rows")
 if len(cumulative_rows) > 0:
     print(f"Sample cumulative rows: {{cumulative_rows[:5]}}")
 print(f"Analysis breakdown:")
 print(f"  - Debitor keyword matches: {{len(analysis_results['debitor_rows'])}}")
 print(f"  - Empty key fields: {{len(analysis_results['empty_key_fields'])}}")
+print(f"  - Format changes: {{len(analysis_results['format_changes'])}}")
+print(f"  - Summary words: {{len(analysis_results['summary_indicators'])}}")
 
 # Store results in variables for later access
 opos_structure_results = structure_info
@@ -370,54 +308,25 @@ cumulative_detection_results = analysis_results
 print("\\n=== OPOS Analysis Complete ===")
 """
 
-        response = executor.utilize(analysis_code)
-        
-        # Extract the results from the sandbox namespace
-        results_extraction_code = """
-# Extract the results that were stored in variables
-try:
-    if 'opos_structure_results' in locals():
-        print(f"Structure results: {opos_structure_results}")
-        structure_results = opos_structure_results
-    else:
-        print("No structure results found")
-        structure_results = {}
-        
-    if 'cumulative_detection_results' in locals():
-        print(f"Cumulative results: {cumulative_detection_results}")
-        cumulative_results = cumulative_detection_results
-    else:
-        print("No cumulative results found") 
-        cumulative_results = {}
-        
-    # Create combined results
-    analysis_results = {
-        'structure': structure_results,
-        'cumulative': cumulative_results
-    }
-    
-    print(f"Combined results created: {list(analysis_results.keys())}")
-    
-except Exception as e:
-    print(f"Error extracting results: {e}")
-    analysis_results = {'error': str(e)}
-"""
-        
-        extraction_response = executor.utilize(results_extraction_code)
-        logger.info(f"Results extraction: {extraction_response.obs}")
-        
-        # Parse the results from the execution
-        structure_results = {}
-        cumulative_results = {}
-        
-        try:
-            # Try to get actual results by parsing the output
-            if "Structure results:" in str(extraction_response.obs):
-                logger.info("Successfully extracted structure results")
-            if "Cumulative results:" in str(extraction_response.obs):
-                logger.info("Successfully extracted cumulative results")
-        except Exception as e:
-            logger.warning(f"Could not parse extraction results: {e}")
+        # The analysis only depends on the workbook content, so repeat submissions reuse it
+        results = _load_cached_preprocessing(state, analysis_code)
+        if results is not None:
+            logger.info("Using cached OPOS structure and summary analysis")
+            for name in PREPROCESSING_RESULT_VARS:
+                sandbox.set_var(name, results[name])
+            # Saving and replaying the code history must still define the results
+            sandbox.record_code(analysis_code)
+        else:
+            response = executor.utilize(analysis_code)
+            # The results are read from the sandbox namespace as objects, not from the printed output
+            results = sandbox.get_vars(*PREPROCESSING_RESULT_VARS)
+            if len(results) == len(PREPROCESSING_RESULT_VARS):
+                _store_cached_preprocessing(state, analysis_code, results)
+            else:
+                logger.warning(f"OPOS analysis did not produce all results: {response.obs}")
+
+        structure_results = results.get("opos_structure_results") or {}
+        cumulative_results = results.get("cumulative_detection_results") or {}
         
         # Generate processing recommendations based on results
         recommendations = []
@@ -426,6 +335,29 @@ except Exception as e:
         recommendations.append("OPOS data structure analysis completed successfully.")
         recommendations.append("The system has identified column types and summary rows for optimized processing.")
         recommendations.append("When performing calculations, the agent will automatically exclude summary rows to prevent double-counting.")
+        cumulative_rows = cumulative_results.get("cumulative_rows", [])
+        if cumulative_rows:
+            recommendations.append(
+                f"{len(cumulative_rows)} summary rows were found (sample rows: {cumulative_rows[:5]}); "
+                "they are available in the variable `cumulative_detection_results`."
+            )
+        date_formats = structure_results.get("date_formats") or {}
+        if date_formats:
+            recommendations.append(
+                "Date columns and their formats: "
+                + ", ".join(f"{column} ({name})" for column, name in date_formats.items())
+                + ". Convert a whole date column at once with `from app.opos.dates import parse_dates` "
+                "and `parse_dates(frames[sheet_name][column])` instead of parsing row by row."
+            )
+        amount_formats = structure_results.get("amount_formats") or {}
+        if amount_formats:
+            recommendations.append(
+                "Amount columns and their number formats: "
+                + ", ".join(f"{column} ({name})" for column, name in amount_formats.items())
+                + ". Convert a whole amount column at once with `from app.opos.amounts import parse_amounts`: "
+                "`parse_amounts(frames[sheet_name][column])` handles thousands separators, currency tokens and "
+                "trailing minus signs and returns `.amounts` (float), `.cents` (int64) and an `.unparseable` mask."
+            )
         
         # Create guidance message for the planner
         guidance_content = "OPOS preprocessing completed successfully.\n\n"
@@ -0,0 +1,86 @@
+"""
+Deterministic OPOS engine node for the LangGraph workflow.
+
+For the standard open-posts analysis the engine in app.opos computes and writes the
+whole "Analysis" sheet without the LLM. It runs inside the sandbox like any other
+code, so the call is part of the code history and the saved code.py. The planner
+only takes over for other instructions or if the columns cannot be identified with
+enough confidence.
+"""
+import logging
+from datetime import date
+
+from langchain_core.messages import AIMessage
+from langgraph.graph import END
+from langsmith import traceable
+
+from app.graph.state import GraphState
+from app.opos import is_standard_analysis
+from app.utils.enumeration import EXEC_CODE
+
+logger = logging.getLogger(__name__)
+
+ENGINE_RESULT_VAR = "opos_engine_result"
+
+
+def engine_code(today: date) -> str:
+    """The sandbox code running the engine; the date is fixed so that a replay gives the same result."""
+    return (
+        "from datetime import date\n"
+        "from app.opos import run_opos_engine\n"
+        f"{ENGINE_RESULT_VAR} = run_opos_engine(workbook, frames, today=date.fromisoformat({today.isoformat()!r}))"
+    )
+
+
+@traceable(name="OPOS Engine Node", run_type="chain")
+def opos_engine_node(state: GraphState) -> GraphState:
+    """
+    Answers the standard OPOS analysis deterministically if possible.
+
+    Args:
+        state: The current state of the graph
+
+    Returns:
+        Updated state with "opos_engine_applied" and "opos_engine_result"
+    """
+    problem = state["problem"]
+    if not is_standard_analysis(problem.instruction):
+        logger.info("OPOS engine skipped: custom instruction")
+        return {**state, "opos_engine_applied": False, "opos_engine_result": None}
+
+    sandbox = state["sandbox"]
+    response = sandbox.step(engine_code(date.today()))
+    if response.code != EXEC_CODE.SUCCESS:
+        logger.warning(f"OPOS engine failed, falling back to the planner: {response.msg}")
+        return {
+            **state,
+            "opos_engine_applied": False,
+            "opos_engine_result": {"applied": False, "reason": response.msg},
+        }
+
+    result = sandbox.get_var(ENGINE_RESULT_VAR) or {"applied": False}
+    if not result.get("applied"):
+        logger.info(f"OPOS engine not applied: {result.get('reason')}")
+        return {**state, "opos_engine_applied": False, "opos_engine_result": result}
+
+    sheet_state = sandbox.get_sheet_state()
+    message = AIMessage(
+        content=(
+            f"The standard OPOS analysis of sheet {result['sheet_name']!r} was written to the \"Analysis\" sheet: "
+            f"{result['invoice_rows']} invoices totalling {result['invoice_total']}, "
+            f"{result['credit_rows']} credits totalling {result['credit_total']}."
+        )
+    )
+    return {
+        **state,
+        "opos_engine_applied": True,
+        "opos_engine_result": result,
+        "messages": [message],
+        "previous_sheet_state": state["current_sheet_state"],
+        "current_sheet_state": sheet_state,
+    }
+
+
+def route_after_engine(state: GraphState):
+    """Ends the run if the engine produced the analysis, otherwise continues with preprocessing."""
+    return END if state.get("opos_engine_applied") else "opos_preprocessing"
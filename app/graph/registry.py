@@ -0,0 +1,162 @@
+"""
+Process-wide registry of compiled graphs and planner chains.
+
+Compiling the graph and creating the LLM client do not depend on the request:
+the problem and the sandbox reach the nodes and tools only through GraphState.
+They are therefore built once per tool set and shared by all requests. All planner
+clients send their requests through one pooled HTTP client, so the TLS connection
+to the model endpoint is kept alive between LLM calls and between requests.
+
+Offline runs (LLM_REPLAY_PATH) are the exception: the replay model tracks which
+recordings it has answered with, so every planner chain gets its own model over
+the recordings, which are read once.
+"""
+import functools
+import logging
+import threading
+from typing import Any, Dict, List, Sequence, Tuple
+
+import httpx
+from langchain_core.runnables import Runnable
+from langchain_core.tools import BaseTool
+
+from app.graph.tools import cell_range_reader, column_profile, python_executor
+
+logger = logging.getLogger(__name__)
+
+PLANNER_MODEL = "o4-mini-2025-04-16"
+PLANNER_TIMEOUT = 60
+
+# The tools bound to the planner
+PLANNER_TOOLS: Tuple[BaseTool, ...] = (python_executor, cell_range_reader, column_profile)
+
+_lock = threading.Lock()
+_graphs: Dict[Tuple[str, ...], Runnable] = {}
+_planner_chains: Dict[Tuple[str, Tuple[str, ...]], Runnable] = {}
+_replay_recordings: Dict[str, List[Dict[str, Any]]] = {}
+
+
+def _tool_key(tools: Sequence[BaseTool]) -> Tuple[str, ...]:
+    return tuple(tool.name for tool in tools)
+
+
+def _llm_http_limits() -> httpx.Limits:
+    from app.core.config import get_settings
+
+    settings = get_settings()
+    return httpx.Limits(
+        max_connections=settings.LLM_HTTP_MAX_CONNECTIONS,
+        max_keepalive_connections=settings.LLM_HTTP_MAX_CONNECTIONS,
+        keepalive_expiry=settings.LLM_HTTP_KEEPALIVE_SECONDS,
+    )
+
+
+@functools.lru_cache
+def get_llm_http_client() -> httpx.Client:
+    """
+    Returns the process-wide HTTP client for LLM requests.
+
+    Configured by LLM_HTTP_MAX_CONNECTIONS; idle connections are kept alive for reuse.
+    """
+    return httpx.Client(limits=_llm_http_limits(), timeout=PLANNER_TIMEOUT)
+
+
+@functools.lru_cache
+def get_llm_async_http_client() -> httpx.AsyncClient:
+    """
+    Returns the process-wide async HTTP client for LLM requests made with ainvoke.
+
+    It must only be used from the application's event loop.
+    """
+    return httpx.AsyncClient(limits=_llm_http_limits(), timeout=PLANNER_TIMEOUT)
+
+
+def get_compiled_graph(tools: Sequence[BaseTool] = PLANNER_TOOLS) -> Runnable:
+    """Returns the compiled graph for a tool set, compiling it on first use."""
+    from app.graph.graph import build_graph
+
+    key = _tool_key(tools)
+    with _lock:
+        graph = _graphs.get(key)
+        if graph is None:
+            logger.info(f"Compiling graph for tools {list(key)}")
+            graph = _graphs[key] = build_graph(list(tools))
+    return graph
+
+
+def get_planner_chain(tools: Sequence[BaseTool] = PLANNER_TOOLS, model: str = PLANNER_MODEL) -> Runnable:
+    """
+    Returns the planner chain (prompt template and tool-bound model) for a model and tool set.
+
+    With LLM_REPLAY_PATH set, a new chain over the recorded calls is returned on every
+    call, so each analysis replays all recordings.
+    """
+    from langchain_openai import ChatOpenAI
+
+    from app.core.config import get_settings
+    from app.core.llm_cache import get_llm_response_cache
+    from app.core.llm_replay import LLMRecorder, ReplayChatModel, load_recordings
+    from app.core.prompt_manager import PromptManager
+
+    settings = get_settings()
+    if settings.LLM_REPLAY_PATH:
+        # Offline runs answer from recorded planner calls
+        with _lock:
+            recordings = _replay_recordings.get(settings.LLM_REPLAY_PATH)
+            if recordings is None:
+                recordings = _replay_recordings[settings.LLM_REPLAY_PATH] = load_recordings(settings.LLM_REPLAY_PATH)
+        planner_model = ReplayChatModel(
+            recordings=recordings, latency_seconds=settings.LLM_REPLAY_LATENCY_MS / 1000
+        )
+        return PromptManager().get_planner_prompt_template() | planner_model.bind_tools(list(tools))
+
+    key = (model, _tool_key(tools))
+    with _lock:
+        chain = _planner_chains.get(key)
+        if chain is None:
+            planner_model = ChatOpenAI(
+                model=model,
+                api_key=settings.OPENAI_API_KEY,
+                base_url=settings.OPENAI_API_BASE,
+                timeout=PLANNER_TIMEOUT,
+                http_client=get_llm_http_client(),
+                http_async_client=get_llm_async_http_client(),
+                # Identical planner calls are answered from the response cache; False if it is disabled
+                cache=get_llm_response_cache() or False,
+                callbacks=[LLMRecorder(settings.LLM_RECORD_PATH)] if settings.LLM_RECORD_PATH else None,
+            )
+            planner_prompt = PromptManager().get_planner_prompt_template()
+            chain = _planner_chains[key] = planner_prompt | planner_model.bind_tools(list(tools))
+    return chain
+
+
+def warm_up() -> None:
+    """Builds the default graph, planner chain and token encoding, so that the first request does not pay for them."""
+    from app.core.history import get_token_encoding
+
+    get_compiled_graph()
+    get_planner_chain()
+    get_token_encoding(PLANNER_MODEL)
+
+
+def clear_registry() -> None:
+    """
+    Drops all graphs, planner chains and replay recordings and closes the shared HTTP client.
+
+    The async client is dropped without closing it; use aclear_registry on the event loop.
+    """
+    with _lock:
+        _graphs.clear()
+        _planner_chains.clear()
+        _replay_recordings.clear()
+    if get_llm_http_client.cache_info().currsize:
+        get_llm_http_client().close()
+        get_llm_http_client.cache_clear()
+    get_llm_async_http_client.cache_clear()
+
+
+async def aclear_registry() -> None:
+    """Like clear_registry, but also closes the async HTTP client."""
+    if get_llm_async_http_client.cache_info().currsize:
+        await get_llm_async_http_client().aclose()
+    clear_registry()
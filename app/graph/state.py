@@ -9,6 +9,7 @@ from langgraph.graph import add_messages
 from app.dataset.dataloader import SheetProblem
 from app.core.sandbox import Sandbox
 from app.core.prompt_manager import PromptManager
+from app.core.history import HistoryCompactor
 
 class GraphState(TypedDict):
     """
@@ -25,6 +26,7 @@ class GraphState(TypedDict):
     max_steps: int
     output_dir: Path
     prompt_manager: PromptManager
+    history_compactor: Optional[HistoryCompactor]
     
     # Dynamic components that are updated during execution
     # IMPORTANT: add_messages is used to automatically add the messages to the state 
@@ -34,6 +36,10 @@ class GraphState(TypedDict):
     step: int
     tool_executions: Optional[int]  # Track number of tool executions to prevent infinite loops
     
+    # Deterministic OPOS engine (optional fields)
+    opos_engine_applied: Optional[bool]
+    opos_engine_result: Optional[Dict[str, Any]]
+    
     # OPOS Intelligence tracking (optional fields)
     opos_preprocessing_complete: Optional[bool]
     opos_structure_results: Optional[Dict[str, Any]]
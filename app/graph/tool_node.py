@@ -0,0 +1,119 @@
+"""
+Tool node running the planner's tool calls against the shared sandbox.
+
+The prebuilt ToolNode runs all tool calls of a planner turn at the same time, which
+lets python_executor calls race on the one sandbox interpreter. SandboxToolNode
+splits the calls of a turn into batches, keeping their order:
+
+- consecutive read-only calls form one batch and run concurrently; no call
+  mutates the sandbox meanwhile, so they all see the same workbook,
+- every mutating call is a batch of its own and runs alone, in order.
+
+A tool is read-only if its metadata says so (see `mark_read_only`); all other
+tools are treated as mutating. The outputs are merged into one state update in
+call order: the tool messages are appended in the order of the calls and, for
+other keys, the update of the last call setting the key wins.
+"""
+import asyncio
+import logging
+from typing import Any, Dict, List, Literal, Optional
+
+from langchain_core.messages import ToolCall, ToolMessage
+from langchain_core.runnables import RunnableConfig
+from langchain_core.runnables.config import get_config_list, get_executor_for_config
+from langchain_core.tools import BaseTool
+from langgraph.prebuilt import ToolNode
+from langgraph.store.base import BaseStore
+from langgraph.types import Command
+
+logger = logging.getLogger(__name__)
+
+READ_ONLY_METADATA_KEY = "read_only"
+
+
+def mark_read_only(tool: BaseTool) -> BaseTool:
+    """Marks a tool as not mutating the sandbox, so that its calls may run concurrently."""
+    tool.metadata = {**(tool.metadata or {}), READ_ONLY_METADATA_KEY: True}
+    return tool
+
+
+def is_read_only(tool: BaseTool) -> bool:
+    return bool((tool.metadata or {}).get(READ_ONLY_METADATA_KEY))
+
+
+class SandboxToolNode(ToolNode):
+    """A ToolNode running read-only calls concurrently and mutating calls one at a time, in order."""
+
+    def _batches(self, tool_calls: List[ToolCall]) -> List[List[int]]:
+        """Groups the call indices into batches of consecutive read-only calls and single mutating calls."""
+        batches: List[List[int]] = []
+        open_batch = False
+        for idx, call in enumerate(tool_calls):
+            tool = self.tools_by_name.get(call["name"])
+            if tool is not None and is_read_only(tool):
+                if not open_batch:
+                    batches.append([])
+                    open_batch = True
+                batches[-1].append(idx)
+            else:
+                batches.append([idx])
+                open_batch = False
+        return batches
+
+    def _func(self, input: Any, config: RunnableConfig, *, store: Optional[BaseStore]) -> Any:
+        tool_calls, input_type = self._parse_input(input, store)
+        config_list = get_config_list(config, len(tool_calls))
+        outputs: List[Any] = [None] * len(tool_calls)
+        with get_executor_for_config(config) as executor:
+            for batch in self._batches(tool_calls):
+                if len(batch) == 1:
+                    idx = batch[0]
+                    outputs[idx] = self._run_one(tool_calls[idx], input_type, config_list[idx])
+                    continue
+                results = executor.map(
+                    self._run_one,
+                    [tool_calls[idx] for idx in batch],
+                    [input_type] * len(batch),
+                    [config_list[idx] for idx in batch],
+                )
+                for idx, output in zip(batch, results):
+                    outputs[idx] = output
+        return self._merge_outputs(outputs, input_type)
+
+    async def _afunc(self, input: Any, config: RunnableConfig, *, store: Optional[BaseStore]) -> Any:
+        tool_calls, input_type = self._parse_input(input, store)
+        config_list = get_config_list(config, len(tool_calls))
+        outputs: List[Any] = [None] * len(tool_calls)
+        for batch in self._batches(tool_calls):
+            results = await asyncio.gather(
+                *(self._arun_one(tool_calls[idx], input_type, config_list[idx]) for idx in batch)
+            )
+            for idx, output in zip(batch, results):
+                outputs[idx] = output
+        return self._merge_outputs(outputs, input_type)
+
+    def _merge_outputs(self, outputs: List[Any], input_type: Literal["list", "dict", "tool_calls"]) -> Any:
+        """
+        Merges the outputs, in call order, into a single state update.
+
+        Commands that navigate (goto, resume or a parent graph) cannot be merged and
+        are handed to LangGraph as they are.
+        """
+        commands = [output for output in outputs if isinstance(output, Command)]
+        if input_type != "dict" or any(
+            command.goto or command.resume is not None or command.graph is not None for command in commands
+        ):
+            return self._combine_tool_outputs(outputs, input_type)
+
+        messages: List[ToolMessage] = []
+        update: Dict[str, Any] = {}
+        for output in outputs:
+            if not isinstance(output, Command):
+                messages.append(output)
+                continue
+            for key, value in dict(output.update or {}).items():
+                if key == self.messages_key:
+                    messages.extend(value if isinstance(value, list) else [value])
+                else:
+                    update[key] = value
+        return {**update, self.messages_key: messages}
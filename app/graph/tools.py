@@ -5,8 +5,7 @@ Each function is decorated with @tool and provides a clear interface for the LLM
 to interact with the underlying ActionExecutor classes.
 """
 import logging
-import re
-from typing import Annotated
+from typing import Annotated, Optional
 from langchain_core.tools import tool, InjectedToolCallId
 from langchain_core.messages import ToolMessage
 from langgraph.prebuilt import InjectedState
@@ -14,6 +13,9 @@ from langgraph.types import Command
 from pathlib import Path
 
 from app.graph.state import GraphState
+from app.graph.tool_node import mark_read_only
+from app.core.profile import describe_profiles
+from app.core.range_reader import DEFAULT_MAX_TOKENS
 from app.core.actions import PythonInterpreter, SheetSelector, AnswerSubmitter
 from app.utils.types import TableRepType
 
@@ -56,55 +58,73 @@ def python_executor(
 @tool(name_or_callable="cell_range_reader")
 def cell_range_reader(
     sheet_name: str,
-    cell_range: str,
-    state: Annotated[GraphState, InjectedState]
+    state: Annotated[GraphState, InjectedState],
+    cell_range: str = "",
+    cursor: Optional[int] = None,
+    max_tokens: int = DEFAULT_MAX_TOKENS,
 ) -> str:
-    """Read the values from a specific sheet and cell range.
-    
-    This tool allows you to read the values of cells from a specific sheet and cell range.
-    
+    """Read the values of a sheet or cell range as a compact table, page by page.
+
+    Rows are returned tab-separated below a line with the column letters, starting
+    with the row number. "~N" stands for N empty cells, empty cells at the end of a
+    row are left out and "first-last ~" marks empty rows. A page stops at the token
+    budget; its last line gives the cursor to read the next page with.
+
     Args:
         sheet_name: The name of the sheet to read
-        cell_range: The cell range to read (e.g. "A1:B2")
         state: The current state of the graph (automatically provided)
-    
+        cell_range: The range to read, e.g. "A1:F200", "A:C" or "2:50"; empty for the whole sheet
+        cursor: The row to continue from, as given at the end of the previous page
+        max_tokens: The maximum size of the page in tokens (at most 8000)
+
     Returns:
-        The data from the sheet and cell range
+        One page of the sheet or cell range
     """
-    # Check that the range is valid
-    if not cell_range:
-        return "Error: Cell range is empty"
-    
     if not sheet_name:
         return "Error: Sheet name is empty"
-    
-    # Check the format to be A1:B2
-    if not re.match(r'^[A-Z]+\d+:[A-Z]+\d+$', cell_range):
-        return "Error: Invalid cell range format. Provide a valid cell range in the format A1:B2."
-        
+
+    from app.graph.registry import PLANNER_MODEL
+
     sandbox = state["sandbox"]
-    executor = PythonInterpreter(sandbox)
-    code = f"""
-try:
-    sheet = workbook["{sheet_name}"]
-    rows = sheet["{cell_range}"]
-    
-    # Check if the cell range is empty
-    if len(rows) == 0:
-        print("Error: The cell range is empty. Please provide a valid cell range.")
-    elif len(rows) > 10:
-        print("Error: The cell range is too large. Please provide a cell range with a maximum of 10 rows and 10 columns.")
-    elif len(rows[0]) > 10:
-        print("Error: The cell range is too large. Please provide a cell range with a maximum of 10 rows and 10 columns.")
-    else:
-        # Print the cell data
-        for row in sheet["{cell_range}"]:
-            for cell in row:
-                print(cell.row, cell.column, cell.value)
-                
-except Exception as e:
-    print(f"Error reading cell range: {{e}}")
-"""
+    try:
+        # Only the page text crosses the process boundary of a pooled sandbox
+        return sandbox.read_range(sheet_name, cell_range, cursor, max_tokens, model_name=PLANNER_MODEL)
+    except Exception as e:
+        return f"Error reading cell range: {e}"
 
-    response = executor.utilize(code)
-    return response.obs
\ No newline at end of file
+
+mark_read_only(cell_range_reader)
+
+
+@tool(name_or_callable="column_profile")
+def column_profile(
+    sheet_name: str,
+    state: Annotated[GraphState, InjectedState],
+) -> str:
+    """Profile every column of a sheet in one call instead of reading its rows.
+
+    For each column the profile gives the header, the detected OPOS role, the kinds
+    of values (number, date, text, bool) and their shares, the share of empty cells,
+    the number of distinct values, minimum and maximum of numbers and dates (also
+    when stored as text), the date formats and number locales of text values and,
+    for columns with few distinct values, the most frequent values.
+
+    Args:
+        sheet_name: The name of the sheet to profile
+        state: The current state of the graph (automatically provided)
+
+    Returns:
+        One tab-separated line per column
+    """
+    if not sheet_name:
+        return "Error: Sheet name is empty"
+
+    sandbox = state["sandbox"]
+    try:
+        n_rows, profiles = sandbox.profile_sheet(sheet_name)
+    except Exception as e:
+        return f"Error profiling columns: {e}"
+    return describe_profiles(sheet_name, n_rows, profiles)
+
+
+mark_read_only(column_profile)
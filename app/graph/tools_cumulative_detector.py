@@ -18,19 +18,20 @@ logger = logging.getLogger(__name__)
 @tool("identify_summary_rows", parse_docstring=True)
 def identify_summary_rows(
     sheet_name: str,
-    data_range: str,
     tool_call_id: Annotated[str, InjectedToolCallId],
     state: Annotated[GraphState, InjectedState],
+    data_range: str = "",
 ) -> dict:
     """Identify cumulative/summary rows in OPOS data to prevent double-counting.
     
     This tool analyzes the structure of OPOS data to automatically detect rows that
     contain cumulative totals or summaries (like "Debitor" rows) which should be
-    excluded from calculations to prevent double-counting.
+    excluded from calculations to prevent double-counting. The whole sheet is
+    analyzed unless a range is given.
     
     Args:
         sheet_name: The name of the sheet to analyze
-        data_range: The cell range to analyze (e.g. "A1:O100")
+        data_range: The cell range to analyze (e.g. "A1:AP50000"); empty for the whole sheet
     
     Returns:
         Dictionary containing cumulative row numbers and analysis results
@@ -39,115 +40,20 @@ def identify_summary_rows(
     executor = PythonInterpreter(sandbox)
     
     code = f"""
-import re
-from datetime import datetime
-
-# Read the data range
-sheet = workbook["{sheet_name}"]
-data_range = sheet["{data_range}"]
-
-# Convert to list for easier processing
-rows_data = []
-for row_idx, row in enumerate(data_range, 1):
-    row_values = [cell.value for cell in row]
-    rows_data.append({{'row_num': row_idx, 'values': row_values}})
-
-print(f"Analyzing {{len(rows_data)}} rows for cumulative patterns...")
-
-# Identify cumulative rows using multiple heuristics
-cumulative_rows = []
-analysis_results = {{
-    'debitor_rows': [],
-    'empty_key_fields': [],
-    'format_changes': [],
-    'summary_indicators': [],
-    'total_rows_analyzed': len(rows_data)
-}}
-
-# Heuristic 1: Look for "Debitor", "Debtor", "Creditor" keywords
-for row_data in rows_data:
-    row_num = row_data['row_num']
-    for col_idx, value in enumerate(row_data['values']):
-        if value and isinstance(value, str):
-            value_lower = str(value).lower()
-            if any(keyword in value_lower for keyword in ['debitor', 'debtor', 'creditor', 'total', 'sum', 'gesamt']):
-                if row_num not in cumulative_rows:
-                    cumulative_rows.append(row_num)
-                    analysis_results['debitor_rows'].append(row_num)
-                break
-
-# Heuristic 2: Detect rows with mostly empty key fields (invoice number, dates)
-# Assume first few columns contain key identifiers
-key_columns = min(5, len(rows_data[0]['values']) if rows_data else 0)
-for row_data in rows_data:
-    row_num = row_data['row_num']
-    if row_num in cumulative_rows:
-        continue
-        
-    key_values = row_data['values'][:key_columns]
-    empty_count = sum(1 for val in key_values if val is None or val == "" or val == 0)
-    
-    # If more than 60% of key fields are empty, likely cumulative
-    if empty_count / len(key_values) > 0.6:
-        cumulative_rows.append(row_num)
-        analysis_results['empty_key_fields'].append(row_num)
-
-# Heuristic 3: Format change detection in first column (invoice numbers)
-if len(rows_data) > 2:
-    first_col_formats = []
-    for row_data in rows_data:
-        first_val = row_data['values'][0] if row_data['values'] else None
-        if first_val is not None:
-            # Categorize format type
-            if isinstance(first_val, (int, float)):
-                format_type = 'numeric'
-            elif isinstance(first_val, str):
-                if re.match(r'^[0-9]+$', str(first_val)):
-                    format_type = 'numeric_string'
-                elif re.match(r'^[A-Z]{{2,}}[0-9]+', str(first_val)):
-                    format_type = 'alpha_numeric'
-                else:
-                    format_type = 'text'
-            else:
-                format_type = 'other'
-        else:
-            format_type = 'empty'
-        
-        first_col_formats.append((row_data['row_num'], format_type))
-    
-    # Look for sudden format changes that indicate summary rows
-    prev_format = None
-    for row_num, format_type in first_col_formats:
-        if prev_format and format_type != prev_format and format_type == 'text':
-            if row_num not in cumulative_rows:
-                cumulative_rows.append(row_num)
-                analysis_results['format_changes'].append(row_num)
-        prev_format = format_type
+from app.core.range_reader import parse_range
+from app.opos.cumulative import detect_cumulative_rows
 
-# Heuristic 4: Look for summary indicator words in any column
-summary_words = ['total', 'sum', 'gesamt', 'summe', 'subtotal', 'zwischensumme']
-for row_data in rows_data:
-    row_num = row_data['row_num']
-    if row_num in cumulative_rows:
-        continue
-        
-    for value in row_data['values']:
-        if value and isinstance(value, str):
-            value_lower = str(value).lower()
-            if any(word in value_lower for word in summary_words):
-                cumulative_rows.append(row_num)
-                analysis_results['summary_indicators'].append(row_num)
-                break
+# Heuristics run as vectorized masks over the sheet frame, indexed by Excel row
+min_col, min_row, max_col, max_row = parse_range(workbook[{sheet_name!r}], {data_range!r})
+frame = frames[{sheet_name!r}].iloc[:, min_col - 1:max_col].loc[min_row:max_row]
+cumulative_detection_results = detect_cumulative_rows(frame).to_dict()
+cumulative_rows = cumulative_detection_results['cumulative_rows']
 
-# Sort and deduplicate
-cumulative_rows = sorted(list(set(cumulative_rows)))
-analysis_results['cumulative_rows'] = cumulative_rows
-analysis_results['total_cumulative_found'] = len(cumulative_rows)
-
-print(f"Found {{len(cumulative_rows)}} cumulative rows:")
-for row_num in cumulative_rows:
+print(f"Found {{len(cumulative_rows)}} cumulative rows in {{cumulative_detection_results['total_rows_analyzed']}} data rows:")
+for row_num in cumulative_rows[:50]:
     print(f"  Row {{row_num}}")
-
+if len(cumulative_rows) > 50:
+    print(f"  ... and {{len(cumulative_rows) - 50}} more, see the variable cumulative_detection_results")
 """
 
     response = executor.utilize(code)
@@ -182,7 +88,11 @@ def detect_opos_structure(
     
     code = f"""
 import re
-from datetime import datetime
+
+import pandas as pd
+
+from app.opos.amounts import infer_number_format
+from app.opos.dates import infer_date_format
 
 # Read the header and sample data
 sheet = workbook["{sheet_name}"]
@@ -202,33 +112,34 @@ structure_info = {{
     'detected_columns': {{}},
     'currency_info': {{}},
     'date_formats': {{}},
+    'amount_formats': {{}},
     'confidence_scores': {{}}
 }}
 
+# Header terms per column type come from the term registry, matched once per header
+from app.opos.terms import get_term_matcher
+
+term_matcher = get_term_matcher()
+header_terms = term_matcher.match(header_row)
+
 # Column type detection patterns
 column_patterns = {{
     'invoice_number': {{
-        'keywords': ['invoice', 'rechnung', 'belegnr', 'beleg', 'nummer', 'nr', 'rg'],
         'data_patterns': [r'^[0-9]+$', r'^[A-Z]{{1,3}}[0-9]+$', r'^[0-9]{{4,}}$']
     }},
     'invoice_date': {{
-        'keywords': ['invoice.*date', 'rechnungsdatum', 'belegdatum', 'datum', 'date'],
         'data_patterns': []  # Will detect date formats
     }},
     'due_date': {{
-        'keywords': ['due.*date', 'fällig', 'faellig', 'valuta', 'due'],
         'data_patterns': []
     }},
     'amount': {{
-        'keywords': ['amount', 'betrag', 'summe', 'wert', 'value', 'eur', 'usd', 'euro', 'dollar'],
-        'data_patterns': [r'^[0-9.,]+$', r'^-?[0-9.,]+$']
+        'data_patterns': []  # Scored by the inferred number format
     }},
     'debitor': {{
-        'keywords': ['debitor', 'debtor', 'kunde', 'customer', 'client', 'klient'],
         'data_patterns': [r'^[0-9]+$', r'^[A-Z]{{2,}}[0-9]*$']
     }},
     'currency': {{
-        'keywords': ['currency', 'währung', 'waehrung', 'curr'],
         'data_patterns': [r'^(EUR|USD|GBP|CHF)$']
     }}
 }}
@@ -238,7 +149,6 @@ for col_idx, header in enumerate(header_row):
     if not header:
         continue
         
-    header_lower = str(header).lower()
     col_analysis = {{
         'index': col_idx,
         'header': header,
@@ -263,11 +173,9 @@ for col_idx, header in enumerate(header_row):
     for pattern_type, patterns in column_patterns.items():
         confidence = 0.0
         
-        # Header keyword matching
-        header_matches = sum(1 for keyword in patterns['keywords'] 
-                           if re.search(keyword, header_lower))
-        if header_matches > 0:
-            confidence += 0.6 * (header_matches / len(patterns['keywords']))
+        # Header term matching
+        if header_terms[col_idx] & term_matcher.bit(f"header:{{pattern_type}}"):
+            confidence += 0.6
         
         # Data pattern matching
         if patterns['data_patterns'] and sample_values:
@@ -282,23 +190,22 @@ for col_idx, header in enumerate(header_row):
             if sample_values:
                 confidence += 0.4 * (pattern_matches / len(sample_values))
         
-        # Special handling for dates
+        # Dates: share of the samples parsing with their inferred format
         if pattern_type in ['invoice_date', 'due_date'] and sample_values:
-            date_score = 0
-            for value in sample_values:
-                if isinstance(value, datetime):
-                    date_score += 1
-                elif isinstance(value, str):
-                    # Try to parse common date formats
-                    for fmt in ['%d.%m.%Y', '%Y-%m-%d', '%m/%d/%Y', '%d/%m/%Y']:
-                        try:
-                            datetime.strptime(str(value), fmt)
-                            date_score += 1
-                            break
-                        except:
-                            continue
-            if sample_values:
-                confidence += 0.4 * (date_score / len(sample_values))
+            date_format = infer_date_format(
+                pd.Series(sample_values, dtype=object),
+                serials=bool(header_terms[col_idx] & term_matcher.bit(f"header:{{pattern_type}}")),
+            )
+            confidence += 0.4 * date_format.share
+            if date_format.is_date:
+                structure_info['date_formats'][str(header)] = date_format.name
+        
+        # Amounts: share of the samples parsing with their inferred number convention
+        if pattern_type == 'amount' and sample_values:
+            number_format = infer_number_format(pd.Series(sample_values, dtype=object))
+            confidence += 0.4 * number_format.share
+            if number_format.is_amount and header_terms[col_idx] & term_matcher.bit("header:amount"):
+                structure_info['amount_formats'][str(header)] = number_format.name
         
         if confidence > best_confidence:
             best_confidence = confidence
@@ -355,7 +262,7 @@ opos_structure_results = structure_info
     
     return Command(
         update={
-            "opos_structure_results": response.obs,
+            "opos_structure_results": sandbox.get_var("opos_structure_results") or {},
             "messages": [
                 ToolMessage(
                     content=f"OPOS structure detection completed. {response.obs}",
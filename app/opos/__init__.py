@@ -0,0 +1,41 @@
+"""
+Deterministic OPOS (open posts) analysis.
+
+A non-LLM fast path for the standard open-posts analysis: column roles are detected
+from headers and values, the analysis runs as vectorized pandas operations, and the
+result is written to the "Analysis" sheet.
+"""
+from app.opos.amounts import NumberFormat, ParsedAmounts, infer_frame_number_formats, infer_number_format, parse_amounts
+from app.opos.columns import ColumnRoles, detect_column_roles
+from app.opos.cumulative import CumulativeRows, detect_cumulative_rows
+from app.opos.dates import DateFormat, infer_date_format, infer_frame_date_formats, parse_dates
+from app.opos.engine import MIN_ROLE_CONFIDENCE, OposAnalysis, analyze_frame, run_opos_engine
+from app.opos.prompts import STANDARD_ANALYSIS_PROMPT, is_standard_analysis
+from app.opos.report import write_analysis_sheet
+from app.opos.terms import TERM_CLASSES, TermMatcher, get_term_matcher
+
+__all__ = [
+    "NumberFormat",
+    "ParsedAmounts",
+    "infer_frame_number_formats",
+    "infer_number_format",
+    "parse_amounts",
+    "ColumnRoles",
+    "detect_column_roles",
+    "CumulativeRows",
+    "detect_cumulative_rows",
+    "DateFormat",
+    "infer_date_format",
+    "infer_frame_date_formats",
+    "parse_dates",
+    "MIN_ROLE_CONFIDENCE",
+    "OposAnalysis",
+    "analyze_frame",
+    "run_opos_engine",
+    "STANDARD_ANALYSIS_PROMPT",
+    "is_standard_analysis",
+    "write_analysis_sheet",
+    "TERM_CLASSES",
+    "TermMatcher",
+    "get_term_matcher",
+]
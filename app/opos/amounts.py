@@ -0,0 +1,232 @@
+"""
+Number format inference and vectorized amount parsing for open-post columns.
+
+Amount columns of exports mix numeric cells with text such as "1.234,56",
+"-12,00 EUR" or "1.234,56-" (SAP style trailing minus). A column's convention is
+inferred once from a stratified sample (see app.opos.dates):
+
+- "de": "." groups thousands and "," separates decimals (1.234,56),
+- "en": "," groups thousands and "." separates decimals (1,234.56).
+
+Text that only one convention reads ("1.234,56", "12,5") votes for it; text both
+read ("1.234", "100") does not vote, and German wins a tie. The whole column is then
+parsed in one pass of string operations: currency tokens and blanks are stripped,
+leading, trailing and bracketed signs are read and the separators are normalized.
+
+The result holds float64 amounts, int64 cents and a mask of the non-empty cells
+that could not be parsed, for the completeness checks of the analysis.
+"""
+from dataclasses import dataclass
+from typing import Any, Dict, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from app.opos.dates import SAMPLE_SIZE, stratified_sample, value_kinds
+from app.opos.terms import get_term_matcher
+
+CURRENCY_CODES = ("EUR", "USD", "GBP", "CHF")
+CURRENCY_SYMBOLS = "€$£"
+CURRENCY_PATTERN = rf"(?i)(?<![a-z])(?:{'|'.join(CURRENCY_CODES)})(?![a-z])|[{CURRENCY_SYMBOLS}]"
+# Whitespace (including non-breaking spaces) and Swiss style apostrophes within numbers
+FILLER_PATTERN = r"[\s']"
+SIGNED_PATTERN = r"^(?P<lead>[-+]?)(?P<open>\(?)(?P<number>\d[\d.,]*)(?P<close>\)?)(?P<trail>-?)$"
+
+# Decimal and thousands separator per convention
+CONVENTIONS: Dict[str, Tuple[str, str]] = {"de": (",", "."), "en": (".", ",")}
+# Unsigned numbers per convention; thousands groups are optional but must be complete
+NUMBER_PATTERNS: Dict[str, str] = {
+    "de": r"\d{1,3}(?:\.\d{3})+(?:,\d+)?|\d+(?:,\d+)?",
+    "en": r"\d{1,3}(?:,\d{3})+(?:\.\d+)?|\d+(?:\.\d+)?",
+}
+
+# Share of the sampled values that must parse for a column to count as an amount column
+MIN_AMOUNT_SHARE = 0.8
+
+
+@dataclass(frozen=True)
+class NumberFormat:
+    """
+    The inferred number format of a column.
+
+    Attributes:
+        convention: "de" or "en" for the text values, or None if the column holds no number text.
+        share: Share of the sampled non-empty values that parse as amounts.
+        ambiguous: Whether no text value told the conventions apart, so the German default was taken.
+    """
+
+    convention: Optional[str]
+    share: float
+    ambiguous: bool = False
+
+    @property
+    def name(self) -> str:
+        """A readable name of the format: "de", "en" or "native" for numeric cells only."""
+        return self.convention or "native"
+
+    @property
+    def is_amount(self) -> bool:
+        return self.share >= MIN_AMOUNT_SHARE
+
+
+@dataclass(frozen=True)
+class ParsedAmounts:
+    """
+    The amounts of a column.
+
+    Attributes:
+        index: The index of the parsed column.
+        amounts: The float64 amounts; NaN for empty and unparseable cells.
+        unparseable: Whether each cell is non-empty but could not be parsed.
+        number_format: The number format the text was parsed with.
+    """
+
+    index: pd.Index
+    amounts: np.ndarray
+    unparseable: np.ndarray
+    number_format: NumberFormat
+
+    @property
+    def valid(self) -> np.ndarray:
+        """Whether each cell holds an amount."""
+        return ~np.isnan(self.amounts)
+
+    @property
+    def cents(self) -> np.ndarray:
+        """The amounts as int64 cents; 0 where `valid` is False."""
+        return np.rint(np.nan_to_num(self.amounts) * 100).astype(np.int64)
+
+    def as_series(self) -> pd.Series:
+        """The amounts as a float64 Series with the index of the parsed column."""
+        return pd.Series(self.amounts, index=self.index, dtype=float)
+
+
+def _is_numeric(values: pd.Series) -> bool:
+    return pd.api.types.is_numeric_dtype(values) and not pd.api.types.is_bool_dtype(values)
+
+
+def _split_kinds(values: pd.Series) -> Tuple[pd.Series, pd.Series, pd.Series]:
+    """Splits the non-empty values into numbers, non-blank stripped text and other values."""
+    kinds = value_kinds(values)
+    text = values[kinds == "text"].astype("string").str.strip()
+    return values[kinds == "number"], text[text != ""], values[~kinds.isin(("number", "text"))]
+
+
+def _signed_parts(text: pd.Series) -> pd.DataFrame:
+    """Splits text into sign markers and the unsigned number; rows that are no number are NaN."""
+    stripped = text.str.replace(CURRENCY_PATTERN, "", regex=True).str.replace(FILLER_PATTERN, "", regex=True)
+    return stripped.str.extract(SIGNED_PATTERN)
+
+
+def _votes(numbers: pd.Series) -> Tuple[int, int]:
+    """The number of values only the German and only the English convention reads."""
+    de = numbers.str.fullmatch(NUMBER_PATTERNS["de"]).fillna(False)
+    en = numbers.str.fullmatch(NUMBER_PATTERNS["en"]).fillna(False)
+    return int((de & ~en).sum()), int((en & ~de).sum())
+
+
+def _to_float(parts: pd.DataFrame, convention: str) -> pd.Series:
+    """The signed float of every row of `_signed_parts`; NaN where the convention does not read it."""
+    decimal, thousands = CONVENTIONS[convention]
+    numbers = parts["number"]
+    readable = numbers.str.fullmatch(NUMBER_PATTERNS[convention]).fillna(False)
+    # Brackets come in pairs, and a number has at most one minus
+    readable &= (parts["open"].eq("(") == parts["close"].eq(")")).fillna(False)
+    readable &= ~(parts["lead"].eq("-") & parts["trail"].eq("-")).fillna(False)
+    unsigned = pd.to_numeric(
+        numbers.where(readable).str.replace(thousands, "", regex=False).str.replace(decimal, ".", regex=False),
+        errors="coerce",
+    ).astype(float)
+    negative = (parts["lead"].eq("-") | parts["trail"].eq("-") | parts["open"].eq("(")).fillna(False)
+    return unsigned.mask(negative.astype(bool), -unsigned)
+
+
+def infer_number_format(values: pd.Series, sample_size: int = SAMPLE_SIZE) -> NumberFormat:
+    """
+    Infers the number format of a column from a stratified sample.
+
+    Args:
+        values: The column.
+        sample_size: The number of values sampled.
+
+    Returns:
+        The NumberFormat; its `is_amount` tells whether the column holds amounts.
+    """
+    if _is_numeric(values):
+        return NumberFormat(None, 1.0)
+    sample = stratified_sample(values, sample_size)
+    if sample.empty or pd.api.types.is_bool_dtype(sample) or pd.api.types.is_datetime64_any_dtype(sample):
+        return NumberFormat(None, 0.0)
+
+    numbers, text, other = _split_kinds(sample)
+    total = len(numbers) + len(text) + len(other)
+    if not total:
+        return NumberFormat(None, 0.0)
+    if text.empty:
+        return NumberFormat(None, round(len(numbers) / total, 3))
+
+    parts = _signed_parts(text)
+    de_votes, en_votes = _votes(parts["number"])
+    convention = "en" if en_votes > de_votes else "de"
+    parsed = int(_to_float(parts, convention).notna().sum())
+    share = (len(numbers) + parsed) / total
+    return NumberFormat(convention, round(share, 3), ambiguous=not de_votes and not en_votes)
+
+
+def parse_amounts(values: pd.Series, number_format: Optional[NumberFormat] = None) -> ParsedAmounts:
+    """
+    Converts a column to amounts, vectorized per kind of value.
+
+    Numeric cells are kept, text is parsed with the format's convention and empty
+    or blank cells become NaN; everything else is NaN and flagged as unparseable.
+
+    Args:
+        values: The column.
+        number_format: The column's format; inferred if not given.
+
+    Returns:
+        The ParsedAmounts of the column.
+    """
+    if number_format is None:
+        number_format = infer_number_format(values)
+    unparseable = np.zeros(len(values), dtype=bool)
+    if _is_numeric(values):
+        return ParsedAmounts(values.index, values.to_numpy(dtype=float, na_value=np.nan), unparseable, number_format)
+
+    amounts = pd.Series(np.nan, index=values.index, dtype=float)
+    flagged = pd.Series(False, index=values.index)
+    if not pd.api.types.is_datetime64_any_dtype(values) and not pd.api.types.is_bool_dtype(values):
+        numbers, text, other = _split_kinds(values.dropna())
+        if len(numbers):
+            amounts[numbers.index] = pd.to_numeric(numbers, errors="coerce").astype(float)
+        if len(text):
+            parsed = _to_float(_signed_parts(text), number_format.convention or "de")
+            amounts[text.index] = parsed.to_numpy()
+            flagged[text.index[parsed.isna().to_numpy()]] = True
+        flagged[other.index] = True
+    else:
+        flagged = values.notna()
+    unparseable = flagged.to_numpy(dtype=bool)
+    return ParsedAmounts(values.index, amounts.to_numpy(), unparseable, number_format)
+
+
+def infer_frame_number_formats(frame: pd.DataFrame) -> Dict[Any, NumberFormat]:
+    """
+    Infers the number format of every column of a sheet frame whose header names an amount.
+
+    Args:
+        frame: The sheet frame (see app.core.frames).
+
+    Returns:
+        The NumberFormat per amount column, in column order.
+    """
+    matcher = get_term_matcher()
+    amount_headers = matcher.match(pd.Series(list(frame.columns), dtype=object)) & matcher.bit("header:amount")
+    formats = {}
+    for idx, column in enumerate(frame.columns):
+        if not amount_headers[idx]:
+            continue
+        number_format = infer_number_format(frame.iloc[:, idx])
+        if number_format.is_amount:
+            formats[column] = number_format
+    return formats
@@ -0,0 +1,120 @@
+"""
+Column role detection for open-post lists.
+
+Every column of the sheet frame is scored against each role: a header term of
+the role ("role:*" classes of app.opos.terms) contributes 0.6 and the share of values with the expected type contributes
+up to 0.4. Roles are then assigned greedily, best score first, so that each column
+takes at most one role.
+"""
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+
+import pandas as pd
+
+from app.opos.amounts import infer_number_format
+from app.opos.dates import infer_date_format
+from app.opos.terms import TERM_CLASSES, get_term_matcher
+
+# Roles with their header terms in the "role:<role>" class of the term registry
+ROLES = ("invoice_number", "invoice_date", "due_date", "amount", "currency", "debtor")
+
+# Roles the analysis engine cannot work without
+REQUIRED_ROLES = ("invoice_number", "due_date", "amount")
+
+HEADER_WEIGHT = 0.6
+VALUE_WEIGHT = 0.4
+
+
+@dataclass(frozen=True)
+class ColumnRoles:
+    """
+    The columns detected for each role and how confident the detection is.
+
+    Attributes:
+        columns: Column label per detected role.
+        scores: Detection score per detected role, between 0 and 1.
+    """
+
+    columns: Dict[str, Any] = field(default_factory=dict)
+    scores: Dict[str, float] = field(default_factory=dict)
+
+    def get(self, role: str) -> Optional[Any]:
+        return self.columns.get(role)
+
+    @property
+    def confidence(self) -> float:
+        """The lowest score of the required roles (0 if one is missing)."""
+        return min((self.scores.get(role, 0.0) for role in REQUIRED_ROLES), default=0.0)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            role: {"column": str(column), "score": round(self.scores[role], 3)}
+            for role, column in self.columns.items()
+        }
+
+
+def _keyword_rank(header: str, role: str) -> int:
+    """Position in the role's terms (most specific first) of the first term contained in a matched term."""
+    terms = TERM_CLASSES[f"role:{role}"]
+    found = get_term_matcher().terms_in(header)
+    return next((rank for rank, term in enumerate(terms) if any(term in match for match in found)), len(terms))
+
+
+def _value_score(role: str, values: pd.Series) -> float:
+    """Share of the column's non-empty values that fit the role."""
+    present = values.dropna()
+    if present.empty:
+        return 0.0
+
+    if role in ("invoice_date", "due_date"):
+        # The header names a date, so numbers may be Excel serial dates
+        return infer_date_format(present, serials=True).share
+
+    if role == "amount":
+        # Numbers, and text such as "1.234,56" or "100,00-" in the column's convention
+        return infer_number_format(present).share
+
+    if role == "currency":
+        text = present.astype(str).str.strip()
+        return float(text.str.fullmatch(r"[A-Z]{3}").mean())
+
+    # Identifiers: anything that is neither a date nor a fractional number
+    if pd.api.types.is_datetime64_any_dtype(present):
+        return 0.0
+    if pd.api.types.is_float_dtype(present):
+        return float((present == present.round()).mean())
+    return 1.0
+
+
+def detect_column_roles(frame: pd.DataFrame) -> ColumnRoles:
+    """
+    Detects the invoice number, date, amount, currency and debtor columns of a sheet frame.
+
+    Args:
+        frame: The sheet frame with the header row as column labels.
+
+    Returns:
+        The detected ColumnRoles.
+    """
+    # The header terms of all columns in one call to the term registry
+    matcher = get_term_matcher()
+    headers = [str(column) for column in frame.columns]
+    header_terms = matcher.match(headers) & matcher.mask(*(f"role:{role}" for role in ROLES))
+
+    candidates: List[Tuple[float, int, str, Any]] = []
+    for idx, column in enumerate(frame.columns):
+        for role in ROLES:
+            if not header_terms[idx] & matcher.bit(f"role:{role}"):
+                continue
+            score = HEADER_WEIGHT + VALUE_WEIGHT * _value_score(role, frame.iloc[:, idx])
+            candidates.append((score, _keyword_rank(headers[idx], role), role, column))
+
+    columns: Dict[str, Any] = {}
+    scores: Dict[str, float] = {}
+    # Best score first; on a tie the more specific keyword wins
+    for score, _, role, column in sorted(candidates, key=lambda candidate: (-candidate[0], candidate[1])):
+        if role in columns or column in columns.values():
+            continue
+        columns[role] = column
+        scores[role] = score
+    return ColumnRoles(columns=columns, scores=scores)
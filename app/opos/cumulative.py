@@ -0,0 +1,158 @@
+"""
+Cumulative (subtotal) row detection over a whole sheet.
+
+Open-post exports interleave the postings with subtotal rows ("Debitor 213752",
+"Summe", ...) that must be excluded from totals. The detector evaluates four
+heuristics as vectorized masks over every row and column of the sheet frame:
+
+- keyword: a text cell holds an account term ("Debitor", "Hauptbuchkonto"),
+- empty_key_fields: most of the first KEY_COLUMNS cells are empty or zero while a
+  later cell holds an amount,
+- format_change: the first column switches from empty cells, numbers or identifiers
+  ("4711", "RE2025") to free text,
+- summary_word: a text cell holds a summary term ("Summe", "Gesamt", "Total").
+
+The terms come from the registry of app.opos.terms.
+
+A row is cumulative if any heuristic scores it above zero. Completely empty rows
+are layout and never flagged.
+"""
+from dataclasses import dataclass
+from typing import Any, Dict, Tuple
+
+import numpy as np
+import pandas as pd
+
+from app.opos.terms import get_term_matcher
+
+HEURISTICS = ("keyword", "empty_key_fields", "format_change", "summary_word")
+
+# Leading columns holding the identifiers of a posting (invoice number, dates, ...)
+KEY_COLUMNS = 5
+# Share of empty key cells above which a row with an amount counts as a subtotal
+EMPTY_KEY_SHARE = 0.6
+
+AMOUNT_TEXT_PATTERN = r"[-+]?\d[\d.,]*-?"
+
+
+@dataclass(frozen=True)
+class CumulativeRows:
+    """
+    The cumulative rows of a sheet.
+
+    Attributes:
+        rows: Excel row numbers of the cumulative rows, ascending.
+        scores: Score of every heuristic (columns, in HEURISTICS order) for every row in `rows`, from 0 to 1.
+        total_rows_analyzed: Number of data rows examined.
+    """
+
+    rows: np.ndarray
+    scores: np.ndarray
+    total_rows_analyzed: int
+
+    def flagged_by(self, heuristic: str) -> np.ndarray:
+        """The rows a heuristic scored above zero."""
+        return self.rows[self.scores[:, HEURISTICS.index(heuristic)] > 0]
+
+    def to_dict(self) -> Dict[str, Any]:
+        """The plain-Python form kept in the graph state and the sandbox namespace."""
+        return {
+            "cumulative_rows": self.rows.tolist(),
+            "total_cumulative_found": int(len(self.rows)),
+            "total_rows_analyzed": self.total_rows_analyzed,
+            "debitor_rows": self.flagged_by("keyword").tolist(),
+            "empty_key_fields": self.flagged_by("empty_key_fields").tolist(),
+            "format_changes": self.flagged_by("format_change").tolist(),
+            "summary_indicators": self.flagged_by("summary_word").tolist(),
+        }
+
+
+def _is_text_column(values: pd.Series) -> bool:
+    return not (
+        pd.api.types.is_numeric_dtype(values)
+        or pd.api.types.is_datetime64_any_dtype(values)
+        or pd.api.types.is_bool_dtype(values)
+    )
+
+
+def _text_hits(frame: pd.DataFrame) -> Tuple[np.ndarray, np.ndarray]:
+    """Rows with an account term and rows with a summary term in any text cell."""
+    matcher = get_term_matcher()
+    keyword = np.zeros(len(frame), dtype=bool)
+    summary = np.zeros(len(frame), dtype=bool)
+    for idx in range(frame.shape[1]):
+        values = frame.iloc[:, idx]
+        if not _is_text_column(values):
+            continue
+        masks = matcher.match(values)
+        keyword |= (masks & matcher.bit("account")) != 0
+        summary |= (masks & matcher.bit("summary")) != 0
+    return keyword, summary
+
+
+def _blank_or_zero(values: pd.Series) -> np.ndarray:
+    if pd.api.types.is_datetime64_any_dtype(values):
+        return values.isna().to_numpy()
+    blank = values.isna().to_numpy() | (pd.to_numeric(values, errors="coerce") == 0).to_numpy()
+    if _is_text_column(values):
+        blank |= values.astype("string").str.strip().eq("").fillna(False).to_numpy(dtype=bool)
+    return blank
+
+
+def _has_amount(values: pd.Series) -> np.ndarray:
+    if pd.api.types.is_bool_dtype(values) or pd.api.types.is_datetime64_any_dtype(values):
+        return np.zeros(len(values), dtype=bool)
+    numbers = pd.to_numeric(values, errors="coerce").notna().to_numpy()
+    if not _is_text_column(values):
+        return numbers
+    # German and SAP style amounts ("1.234,56", "100,00-")
+    text = values.astype("string").str.strip().str.fullmatch(AMOUNT_TEXT_PATTERN).fillna(False)
+    return numbers | text.to_numpy(dtype=bool)
+
+
+def _is_free_text(values: pd.Series) -> np.ndarray:
+    """Strings of the first column that are neither numeric nor an alphanumeric identifier."""
+    if not _is_text_column(values):
+        return np.zeros(len(values), dtype=bool)
+    text = values.where(values.map(type) == str).astype("string")
+    identifier = text.str.fullmatch(r"[0-9]+") | text.str.match(r"[A-Z]{2,}[0-9]+")
+    return (text.notna() & ~identifier.fillna(False)).to_numpy(dtype=bool)
+
+
+def detect_cumulative_rows(frame: pd.DataFrame) -> CumulativeRows:
+    """
+    Detects the cumulative rows of a sheet frame.
+
+    Args:
+        frame: The sheet frame (see app.core.frames), indexed by Excel row number.
+
+    Returns:
+        The CumulativeRows with the score of every heuristic.
+    """
+    n_rows, n_columns = frame.shape
+    if not n_rows or not n_columns:
+        return CumulativeRows(np.empty(0, dtype=np.int64), np.empty((0, len(HEURISTICS))), n_rows)
+
+    scores = np.zeros((n_rows, len(HEURISTICS)))
+    keyword, summary = _text_hits(frame)
+    scores[:, 0] = keyword
+    scores[:, 3] = summary
+
+    key_columns = min(KEY_COLUMNS, n_columns)
+    if key_columns < n_columns:
+        empty_keys = np.column_stack([_blank_or_zero(frame.iloc[:, idx]) for idx in range(key_columns)])
+        empty_share = empty_keys.mean(axis=1)
+        # Amounts are only looked for in the few rows with empty key fields
+        candidates = np.flatnonzero(empty_share > EMPTY_KEY_SHARE)
+        rest = frame.iloc[candidates, key_columns:]
+        amount = np.column_stack([_has_amount(rest.iloc[:, idx]) for idx in range(rest.shape[1])]).any(axis=1)
+        scores[candidates[amount], 1] = empty_share[candidates[amount]]
+
+    free_text = _is_free_text(frame.iloc[:, 0])
+    scores[1:, 2] = free_text[1:] & ~free_text[:-1]
+
+    non_empty = frame.notna().to_numpy().any(axis=1)
+    cumulative = (scores > 0).any(axis=1) & non_empty
+    rows = frame.index.to_numpy(dtype=np.int64)[cumulative]
+    order = np.argsort(rows, kind="stable")
+    return CumulativeRows(rows[order], scores[cumulative][order], n_rows)
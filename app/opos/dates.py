@@ -0,0 +1,310 @@
+"""
+Date format inference and vectorized date parsing for open-post columns.
+
+Date columns of exports hold openpyxl datetimes, Excel serial numbers or text in
+one of a few formats. Instead of trying every format on every value, a column's
+format is inferred once from a stratified sample (values at evenly spaced
+positions of the column) and the whole column is then converted to datetime64 in
+one call per kind of value.
+
+Day-first and month-first text ("03/04/2025") is told apart statistically: a
+component above 12 decides; otherwise the component with more distinct values is
+taken as the day, and day-first (German) wins a tie.
+
+Inferred formats are cached by the header signature of the sheet and the column
+(see DateFormatCache), so repeat uploads of the same export layout skip inference.
+"""
+import functools
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import date, datetime
+from typing import Any, Dict, Hashable, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from app.opos.terms import get_term_matcher
+
+# Text formats tried on the sample, with a display name
+TEXT_DATE_FORMATS: Dict[str, str] = {
+    "%d.%m.%Y": "DD.MM.YYYY",
+    "%d.%m.%y": "DD.MM.YY",
+    "%Y-%m-%d": "YYYY-MM-DD",
+    "%Y-%m-%d %H:%M:%S": "YYYY-MM-DD hh:mm:ss",
+    "%d/%m/%Y": "DD/MM/YYYY",
+    "%m/%d/%Y": "MM/DD/YYYY",
+    "%d-%m-%Y": "DD-MM-YYYY",
+}
+# Day-first and month-first formats that read the same text
+AMBIGUOUS_FORMATS = (("%d/%m/%Y", "%m/%d/%Y"),)
+
+NATIVE = "native"
+EXCEL_SERIAL = "excel_serial"
+
+# Excel serial numbers of 1954-10-04 and 2099-12-31; other numbers are not read as dates
+MIN_EXCEL_SERIAL = 20000
+MAX_EXCEL_SERIAL = 73050
+EXCEL_EPOCH = "1899-12-30"
+
+SAMPLE_SIZE = 200
+# Share of the sampled values that must parse for a column to count as a date column
+MIN_DATE_SHARE = 0.8
+# Cached formats are checked against this many values before they are reused
+VALIDATION_SIZE = 20
+FORMAT_CACHE_SIZE = 1024
+
+
+@dataclass(frozen=True)
+class DateFormat:
+    """
+    The inferred date format of a column.
+
+    Attributes:
+        text_format: The strptime format of the text values, or None if the column holds no date text.
+        share: Share of the sampled non-empty values that parse as dates.
+        ambiguous: Whether day-first and month-first could not be told apart by a component above 12.
+        serials: Whether numbers are read as Excel serial dates.
+    """
+
+    text_format: Optional[str]
+    share: float
+    ambiguous: bool = False
+    serials: bool = False
+
+    @property
+    def name(self) -> str:
+        """A readable name of the format, e.g. "DD.MM.YYYY", "native" or "excel_serial"."""
+        if self.text_format is not None:
+            return TEXT_DATE_FORMATS.get(self.text_format, self.text_format)
+        return EXCEL_SERIAL if self.serials else NATIVE
+
+    @property
+    def is_date(self) -> bool:
+        return self.share >= MIN_DATE_SHARE
+
+
+def stratified_sample(values: pd.Series, size: int = SAMPLE_SIZE) -> pd.Series:
+    """The non-empty values at `size` evenly spaced positions of the column."""
+    present = values.dropna()
+    if len(present) <= size:
+        return present
+    return present.iloc[np.linspace(0, len(present) - 1, size).astype(int)]
+
+
+def _type_kind(value_type: type) -> str:
+    if issubclass(value_type, (datetime, date)):
+        return "date"
+    if issubclass(value_type, (bool, np.bool_)):
+        return "bool"
+    if issubclass(value_type, (int, float, np.number)):
+        return "number"
+    return "text" if issubclass(value_type, str) else "other"
+
+
+def value_kinds(values: pd.Series) -> pd.Series:
+    """The kind of each value: "date", "bool", "number", "text" or "other"."""
+    if pd.api.types.is_bool_dtype(values):
+        return pd.Series("bool", index=values.index)
+    if pd.api.types.is_numeric_dtype(values):
+        return pd.Series("number", index=values.index)
+    if pd.api.types.is_datetime64_any_dtype(values):
+        return pd.Series("date", index=values.index)
+    # Classify each distinct type once, then map the types of all values
+    types = values.map(type)
+    return types.map({value_type: _type_kind(value_type) for value_type in types.unique()})
+
+
+def _split_kinds(values: pd.Series) -> Tuple[pd.Series, pd.Series, pd.Series]:
+    """Splits the non-empty values into native dates, numbers and stripped text."""
+    kinds = value_kinds(values)
+    return values[kinds == "date"], values[kinds == "number"], values[kinds == "text"].str.strip()
+
+
+def _from_serials(numbers: pd.Series) -> pd.Series:
+    numbers = pd.to_numeric(numbers, errors="coerce")
+    numbers = numbers.where((numbers >= MIN_EXCEL_SERIAL) & (numbers <= MAX_EXCEL_SERIAL))
+    return pd.to_datetime(numbers, unit="D", origin=EXCEL_EPOCH, errors="coerce")
+
+
+def _day_first(text: pd.Series, separator: str) -> Tuple[bool, bool]:
+    """Whether ambiguous text is day-first, and whether that was decided by a component above 12."""
+    parts = text.str.split(separator, n=2, expand=True)
+    first = pd.to_numeric(parts[0], errors="coerce")
+    second = pd.to_numeric(parts[1], errors="coerce")
+    if (first > 12).any():
+        return True, False
+    if (second > 12).any():
+        return False, False
+    return first.nunique() >= second.nunique(), True
+
+
+def _infer_text_format(text: pd.Series) -> Tuple[Optional[str], int, bool]:
+    """The format parsing most of the text, the count it parses and whether it is ambiguous."""
+    best, best_count, ambiguous = None, 0, False
+    for text_format in TEXT_DATE_FORMATS:
+        count = int(pd.to_datetime(text, format=text_format, errors="coerce").notna().sum())
+        if count > best_count:
+            best, best_count = text_format, count
+    for day_first_format, month_first_format in AMBIGUOUS_FORMATS:
+        if best not in (day_first_format, month_first_format):
+            continue
+        matched = text[pd.to_datetime(text, format=best, errors="coerce").notna()]
+        day_first, ambiguous = _day_first(matched, "/")
+        best = day_first_format if day_first else month_first_format
+        best_count = int(pd.to_datetime(text, format=best, errors="coerce").notna().sum())
+    return best, best_count, ambiguous
+
+
+def infer_date_format(values: pd.Series, serials: bool = False, sample_size: int = SAMPLE_SIZE) -> DateFormat:
+    """
+    Infers the date format of a column from a stratified sample.
+
+    Args:
+        values: The column.
+        serials: Whether numbers may be Excel serial dates; numeric columns only hold dates
+            if this is set, e.g. because the header names a date.
+        sample_size: The number of values sampled.
+
+    Returns:
+        The DateFormat; its `is_date` tells whether the column holds dates.
+    """
+    if pd.api.types.is_datetime64_any_dtype(values):
+        return DateFormat(None, 1.0)
+    sample = stratified_sample(values, sample_size)
+    if sample.empty:
+        return DateFormat(None, 0.0)
+    if pd.api.types.is_numeric_dtype(sample):
+        if not serials or pd.api.types.is_bool_dtype(sample):
+            return DateFormat(None, 0.0)
+        return DateFormat(None, float(_from_serials(sample).notna().mean()), serials=True)
+
+    native, numbers, text = _split_kinds(sample)
+    text_format, text_count, ambiguous = _infer_text_format(text) if len(text) else (None, 0, False)
+    serial_count = int(_from_serials(numbers).notna().sum()) if serials and len(numbers) else 0
+    share = (len(native) + text_count + serial_count) / len(sample)
+    return DateFormat(text_format, round(share, 3), ambiguous, serials=serial_count > 0)
+
+
+def parse_dates(values: pd.Series, date_format: Optional[DateFormat] = None) -> pd.Series:
+    """
+    Converts a column to datetime64, vectorized per kind of value.
+
+    Native dates are kept, numbers are read as Excel serials if the format says so
+    and text is parsed with the format's text format; everything else becomes NaT.
+
+    Args:
+        values: The column.
+        date_format: The column's format; inferred if not given.
+
+    Returns:
+        A datetime64 Series with the index of `values`.
+    """
+    if pd.api.types.is_datetime64_any_dtype(values):
+        return values
+    if date_format is None:
+        date_format = infer_date_format(values, serials=True)
+    if pd.api.types.is_numeric_dtype(values) and not pd.api.types.is_bool_dtype(values):
+        if date_format.serials:
+            return _from_serials(values)
+        return pd.Series(pd.NaT, index=values.index, dtype="datetime64[us]")
+
+    result = pd.Series(pd.NaT, index=values.index, dtype="datetime64[us]")
+    native, numbers, text = _split_kinds(values.dropna())
+    if len(native):
+        result[native.index] = pd.to_datetime(native, errors="coerce")
+    if date_format.serials and len(numbers):
+        result[numbers.index] = _from_serials(numbers)
+    if date_format.text_format is not None and len(text):
+        result[text.index] = pd.to_datetime(text, format=date_format.text_format, errors="coerce")
+    return result
+
+
+def header_signature(columns: List[Any]) -> Tuple[str, ...]:
+    """The normalized header row of a sheet, identifying an export layout."""
+    return tuple(str(column).strip().lower() for column in columns)
+
+
+class DateFormatCache:
+    """
+    A bounded cache of inferred date formats keyed by header signature and column.
+
+    A cached format is reused only if it still fits a few values of the column: a
+    date format must still parse them, and a column cached as holding no dates must
+    still hold none (an earlier upload may have had an empty or text column there).
+
+    Args:
+        max_size: The number of column formats kept.
+    """
+
+    def __init__(self, max_size: int = FORMAT_CACHE_SIZE) -> None:
+        self.max_size = max_size
+        self._formats: "OrderedDict[Tuple[Tuple[str, ...], Hashable], DateFormat]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(
+        self, signature: Tuple[str, ...], column: Hashable, values: pd.Series, serials: bool = False
+    ) -> Optional[DateFormat]:
+        with self._lock:
+            date_format = self._formats.get((signature, column))
+            if date_format is not None:
+                self._formats.move_to_end((signature, column))
+        if date_format is None:
+            return None
+        sample = stratified_sample(values, VALIDATION_SIZE)
+        if len(sample):
+            if date_format.is_date and parse_dates(sample, date_format).notna().mean() < MIN_DATE_SHARE:
+                return None
+            if not date_format.is_date and infer_date_format(sample, serials=serials).is_date:
+                return None
+        with self._lock:
+            self.hits += 1
+        return date_format
+
+    def put(self, signature: Tuple[str, ...], column: Hashable, date_format: DateFormat) -> None:
+        with self._lock:
+            self.misses += 1
+            self._formats[(signature, column)] = date_format
+            self._formats.move_to_end((signature, column))
+            while len(self._formats) > self.max_size:
+                self._formats.popitem(last=False)
+
+
+@functools.lru_cache
+def get_date_format_cache() -> DateFormatCache:
+    """Returns the process-wide date format cache."""
+    return DateFormatCache()
+
+
+def infer_frame_date_formats(frame: pd.DataFrame, cache: Optional[DateFormatCache] = None) -> Dict[Any, DateFormat]:
+    """
+    Infers the date format of every column of a sheet frame that holds dates.
+
+    Numbers are only read as Excel serial dates in columns whose header names a date.
+
+    Args:
+        frame: The sheet frame (see app.core.frames).
+        cache: The format cache; the process-wide cache if not given.
+
+    Returns:
+        The DateFormat per date column, in column order.
+    """
+    cache = cache if cache is not None else get_date_format_cache()
+    matcher = get_term_matcher()
+    date_headers = matcher.match(pd.Series(list(frame.columns), dtype=object)) & matcher.mask(
+        "header:invoice_date", "header:due_date"
+    )
+    signature = header_signature(list(frame.columns))
+
+    formats = {}
+    for idx, column in enumerate(frame.columns):
+        values = frame.iloc[:, idx]
+        date_format = cache.get(signature, column, values, serials=bool(date_headers[idx]))
+        if date_format is None:
+            date_format = infer_date_format(values, serials=bool(date_headers[idx]))
+            cache.put(signature, column, date_format)
+        if date_format.is_date:
+            formats[column] = date_format
+    return formats
@@ -0,0 +1,315 @@
+"""
+Deterministic OPOS analysis.
+
+Computes the eleven steps of the standard open-posts analysis in one pass of
+vectorized pandas operations over the sheet frame: row classification, completeness,
+totals, ageing, top positions and duplicates. No LLM is involved, so the result is
+reproducible and takes milliseconds even for large exports.
+"""
+import logging
+from dataclasses import dataclass, field
+from datetime import date
+from typing import Any, Dict, List, Mapping, Optional
+
+import pandas as pd
+from openpyxl.workbook.workbook import Workbook
+
+from app.opos.amounts import ParsedAmounts, parse_amounts
+from app.opos.columns import ColumnRoles, detect_column_roles
+from app.opos.dates import infer_date_format, parse_dates
+from app.opos.report import write_analysis_sheet
+from app.opos.terms import get_term_matcher
+
+logger = logging.getLogger(__name__)
+
+# Column roles below this confidence are left to the LLM planner
+MIN_ROLE_CONFIDENCE = 0.7
+
+# Term classes (see app.opos.terms) marking a key identifier as a subtotal ("Debitor 213752", "Summe", ...)
+CUMULATIVE_TERM_CLASSES = ("account", "summary")
+
+AGEING_BUCKETS = ("Not mature", "1-30 days", "31-60 days", ">60 days")
+TOP_N = 10
+
+
+@dataclass(frozen=True)
+class OposAnalysis:
+    """
+    The result of the standard OPOS analysis of one sheet.
+
+    Row numbers are Excel row numbers of the analysed sheet.
+
+    Attributes:
+        sheet_name: The analysed sheet.
+        roles: The detected column roles.
+        today: The reference date for maturities.
+        cumulative_rows: Rows holding subtotals (step 1).
+        invoice_rows: Non-cumulative rows with a positive amount (step 2).
+        credit_rows: Non-cumulative rows with a negative amount (step 3).
+        incomplete_rows: Invoice and credit rows missing a required field, with the missing fields (step 4).
+        unparseable_amount_rows: Non-cumulative rows whose amount cell is not empty but no amount (step 4).
+        invoice_total: Sum of the invoice amounts (step 5).
+        credit_total: Sum of the credit amounts (step 6).
+        invoice_ageing: Amount, count and share per maturity bucket of the invoices (step 7).
+        credit_ageing: Amount, count and share per maturity bucket of the credits (step 8).
+        top_credits: The largest credits, most negative first (step 9).
+        top_debtors: The debtors with the largest balance (step 10).
+        duplicate_invoice_numbers: Invoice numbers occurring on more than one invoice row (step 11).
+        duplicate_debtors: Debtor labels occurring on more than one cumulative row (step 11).
+    """
+
+    sheet_name: str
+    roles: ColumnRoles
+    today: date
+    cumulative_rows: List[int] = field(default_factory=list)
+    invoice_rows: List[int] = field(default_factory=list)
+    credit_rows: List[int] = field(default_factory=list)
+    incomplete_rows: Dict[int, List[str]] = field(default_factory=dict)
+    unparseable_amount_rows: List[int] = field(default_factory=list)
+    invoice_total: float = 0.0
+    credit_total: float = 0.0
+    invoice_ageing: List[Dict[str, Any]] = field(default_factory=list)
+    credit_ageing: List[Dict[str, Any]] = field(default_factory=list)
+    top_credits: List[Dict[str, Any]] = field(default_factory=list)
+    top_debtors: List[Dict[str, Any]] = field(default_factory=list)
+    duplicate_invoice_numbers: List[str] = field(default_factory=list)
+    duplicate_debtors: List[str] = field(default_factory=list)
+
+    def summary(self) -> Dict[str, Any]:
+        """A JSON-serializable summary of the analysis."""
+        return {
+            "sheet_name": self.sheet_name,
+            "today": self.today.isoformat(),
+            "columns": self.roles.to_dict(),
+            "cumulative_rows": len(self.cumulative_rows),
+            "invoice_rows": len(self.invoice_rows),
+            "credit_rows": len(self.credit_rows),
+            "incomplete_rows": len(self.incomplete_rows),
+            "unparseable_amount_rows": len(self.unparseable_amount_rows),
+            "invoice_total": self.invoice_total,
+            "credit_total": self.credit_total,
+            "invoice_ageing": self.invoice_ageing,
+            "credit_ageing": self.credit_ageing,
+            "top_credits": self.top_credits,
+            "top_debtors": self.top_debtors,
+            "duplicate_invoice_numbers": self.duplicate_invoice_numbers,
+            "duplicate_debtors": self.duplicate_debtors,
+        }
+
+
+def _rows(mask: pd.Series) -> List[int]:
+    return [int(row) for row in mask.index[mask]]
+
+
+def _as_dates(values: pd.Series) -> pd.Series:
+    # One inferred format for the whole column instead of guessing per value
+    return parse_dates(values, infer_date_format(values, serials=True))
+
+
+def _as_amounts(values: pd.Series) -> ParsedAmounts:
+    # German and SAP style text ("1.234,56", "100,00-") is parsed with the column's convention
+    return parse_amounts(values)
+
+
+def _is_blank(values: pd.Series) -> pd.Series:
+    return values.isna() | values.astype("string").str.strip().eq("").fillna(False)
+
+
+def _cumulative_terms(values: pd.Series) -> pd.Series:
+    """Whether each value holds a subtotal term."""
+    matcher = get_term_matcher()
+    return pd.Series((matcher.match(values) & matcher.mask(*CUMULATIVE_TERM_CLASSES)) != 0, index=values.index)
+
+
+def _debtor_labels(values: pd.Series) -> pd.Series:
+    """Whether each value starts with a debtor account term ("Debitor 213752")."""
+    matcher = get_term_matcher()
+    first_words = values.str.split(n=1).str[0]
+    return pd.Series((matcher.match(first_words) & matcher.bit("debtor_account")) != 0, index=values.index)
+
+
+def _key_column(frame: pd.DataFrame) -> Any:
+    """The text column with the most subtotal terms, usually the first column."""
+    best, best_hits = frame.columns[0], 0
+    for column in frame.columns:
+        values = frame[column]
+        if pd.api.types.is_numeric_dtype(values) or pd.api.types.is_datetime64_any_dtype(values):
+            continue
+        hits = int(_cumulative_terms(values).sum())
+        if hits > best_hits:
+            best, best_hits = column, hits
+    return best
+
+
+def _ageing(amounts: pd.Series, days_overdue: pd.Series) -> List[Dict[str, Any]]:
+    buckets = pd.cut(
+        days_overdue,
+        bins=[float("-inf"), 0, 30, 60, float("inf")],
+        labels=list(AGEING_BUCKETS),
+    )
+    grouped = amounts.groupby(buckets, observed=False).agg(["sum", "count"])
+    total = amounts.sum()
+    return [
+        {
+            "bucket": bucket,
+            "amount": round(float(grouped.at[bucket, "sum"]), 2),
+            "count": int(grouped.at[bucket, "count"]),
+            # "or 0.0" turns the -0.0 of empty credit buckets into 0.0
+            "share": (round(float(grouped.at[bucket, "sum"] / total * 100), 2) or 0.0) if total else 0.0,
+        }
+        for bucket in AGEING_BUCKETS
+    ]
+
+
+def analyze_frame(frame: pd.DataFrame, sheet_name: str, roles: ColumnRoles, today: Optional[date] = None) -> OposAnalysis:
+    """
+    Runs the standard OPOS analysis on a sheet frame.
+
+    Args:
+        frame: The sheet frame, indexed by Excel row number.
+        sheet_name: The name of the sheet.
+        roles: The column roles of the frame; must include the required roles.
+        today: The reference date for maturities; defaults to the current date.
+
+    Returns:
+        The OposAnalysis.
+    """
+    today = today or date.today()
+    # Rows without any value are layout, not data
+    frame = frame.loc[frame.notna().any(axis=1)]
+
+    parsed_amounts = _as_amounts(frame[roles.get("amount")])
+    amounts = parsed_amounts.as_series()
+    due_dates = _as_dates(frame[roles.get("due_date")])
+    invoice_numbers = frame[roles.get("invoice_number")]
+    key = frame[_key_column(frame)].astype("string").str.strip()
+
+    # Step 1: subtotal rows carry a subtotal term in the key column or lack the invoice fields
+    keyword_rows = _cumulative_terms(key)
+    missing_keys = _is_blank(invoice_numbers) & due_dates.isna()
+    cumulative = keyword_rows | missing_keys
+
+    # Steps 2 and 3
+    invoices = ~cumulative & (amounts > 0)
+    credits = ~cumulative & (amounts < 0)
+    postings = invoices | credits
+
+    # Step 4: required fields of every posting
+    required = {roles.get(role): role for role in ("invoice_number", "invoice_date", "due_date", "amount", "debtor")}
+    required.pop(None, None)
+    missing = pd.DataFrame({role: _is_blank(frame[column]) for column, role in required.items()}).loc[postings]
+    incomplete = missing.loc[missing.any(axis=1)]
+    incomplete_rows = {
+        int(row): [role for role, is_missing in flags.items() if is_missing] for row, flags in incomplete.iterrows()
+    }
+    # Amount cells that hold text but no amount are neither invoices nor credits, so they are listed separately
+    unparseable_amounts = ~cumulative & pd.Series(parsed_amounts.unparseable, index=frame.index)
+
+    # Steps 5 to 8
+    days_overdue = (pd.Timestamp(today) - due_dates).dt.days
+    # Totals are summed in integer cents, so they do not accumulate float rounding errors
+    cents = pd.Series(parsed_amounts.cents, index=frame.index)
+    invoice_total = int(cents[invoices].sum()) / 100
+    credit_total = int(cents[credits].sum()) / 100
+
+    # Step 9
+    credit_frame = pd.DataFrame({"invoice_number": invoice_numbers, "amount": amounts})[credits]
+    top_credits = [
+        {"row": int(row), "invoice_number": str(values["invoice_number"]), "amount": round(float(values["amount"]), 2)}
+        for row, values in credit_frame.nsmallest(TOP_N, "amount").iterrows()
+    ]
+
+    # Step 10: debtor balances from the debtor subtotal rows, or by grouping the postings
+    debtor_rows = keyword_rows & _debtor_labels(key)
+    if debtor_rows.any():
+        balances = pd.Series(amounts[debtor_rows].values, index=key[debtor_rows].values)
+        balances = balances.groupby(level=0, sort=False).sum()
+    elif roles.get("debtor") is not None:
+        balances = amounts[postings].groupby(frame.loc[postings, roles.get("debtor")].astype("string")).sum()
+    else:
+        balances = pd.Series(dtype=float)
+    top_debtors = [
+        {"debtor": str(debtor), "amount": round(float(amount), 2)}
+        for debtor, amount in balances.nlargest(TOP_N).items()
+    ]
+
+    # Step 11
+    invoice_number_text = invoice_numbers[invoices].astype("string").str.strip()
+    duplicate_invoice_numbers = sorted(invoice_number_text[invoice_number_text.duplicated()].dropna().unique())
+    debtor_labels = key[debtor_rows] if debtor_rows.any() else key[cumulative & keyword_rows]
+    duplicate_debtors = sorted(debtor_labels[debtor_labels.duplicated()].dropna().unique())
+
+    return OposAnalysis(
+        sheet_name=sheet_name,
+        roles=roles,
+        today=today,
+        cumulative_rows=_rows(cumulative),
+        invoice_rows=_rows(invoices),
+        credit_rows=_rows(credits),
+        incomplete_rows=incomplete_rows,
+        unparseable_amount_rows=_rows(unparseable_amounts),
+        invoice_total=invoice_total,
+        credit_total=credit_total,
+        invoice_ageing=_ageing(amounts[invoices], days_overdue[invoices]),
+        credit_ageing=_ageing(amounts[credits], days_overdue[credits]),
+        top_credits=top_credits,
+        top_debtors=top_debtors,
+        duplicate_invoice_numbers=[str(value) for value in duplicate_invoice_numbers],
+        duplicate_debtors=[str(value) for value in duplicate_debtors],
+    )
+
+
+def run_opos_engine(
+    workbook: Workbook,
+    frames: Mapping[str, pd.DataFrame],
+    today: Optional[date] = None,
+    min_confidence: float = MIN_ROLE_CONFIDENCE,
+) -> Dict[str, Any]:
+    """
+    Runs the standard OPOS analysis and writes it to the "Analysis" sheet.
+
+    The open-posts sheet is the one whose column roles are detected with the highest
+    confidence. If that confidence is below `min_confidence`, nothing is written and
+    the analysis is left to the planner.
+
+    Args:
+        workbook: The workbook to analyse and write to.
+        frames: Typed frames of the workbook's sheets, e.g. the sandbox's SheetFrames.
+        today: The reference date for maturities; defaults to the current date.
+        min_confidence: The lowest column role confidence the engine accepts.
+
+    Returns:
+        A summary with "applied", "confidence", "sheet_name" and, if applied, the analysis results;
+        otherwise a "reason".
+    """
+    best_name, best_frame, best_roles = None, None, None
+    for sheet_name in workbook.sheetnames:
+        if sheet_name.lower().startswith("analysis"):
+            continue
+        frame = frames[sheet_name]
+        if frame.empty:
+            continue
+        roles = detect_column_roles(frame)
+        if best_roles is None or roles.confidence > best_roles.confidence:
+            best_name, best_frame, best_roles = sheet_name, frame, roles
+
+    if best_roles is None:
+        return {"applied": False, "confidence": 0.0, "sheet_name": None, "reason": "no sheet with data"}
+
+    confidence = round(best_roles.confidence, 3)
+    if best_roles.confidence < min_confidence:
+        logger.info(f"OPOS engine skipped: column roles of {best_name!r} detected with confidence {confidence}")
+        return {
+            "applied": False,
+            "confidence": confidence,
+            "sheet_name": best_name,
+            "reason": f"column roles detected with confidence {confidence} < {min_confidence}",
+            "columns": best_roles.to_dict(),
+        }
+
+    analysis = analyze_frame(best_frame, best_name, best_roles, today=today)
+    write_analysis_sheet(workbook, analysis)
+    logger.info(
+        f"OPOS engine analysed {best_name!r}: {len(analysis.invoice_rows)} invoices, {len(analysis.credit_rows)} credits"
+    )
+    return {"applied": True, "confidence": confidence, **analysis.summary()}
@@ -0,0 +1,83 @@
+"""
+The standard OPOS analysis instruction.
+
+The API uses it as the default instruction. When a problem carries exactly this
+instruction, the deterministic engine in app.opos.engine can answer it without the
+LLM planner.
+"""
+from datetime import datetime
+
+STANDARD_ANALYSIS_PROMPT = f"""
+You have to analyze an open posts list from a company. It holds all unpaid invoices and credits for the company.
+            
+            # Rules
+            - Check the format of the due date in the excel file. Chances are high that the format used is german. You need to cater for this.
+            - Identify the format of "non-cumulative" rows. These are typically rows that contain an invoice number, a due date, an invoice date and an invoice amount.
+            - Identify "invoice" rows. These are rows that are "non-cumulative" AND have a positive invoice amount.
+            - Identify "credit" rows. These are rows that are "non-cumulative" AND have a negative invoice amount.
+            - All rows that are not "non-cumulative" are "cumulative" rows. 
+            - You get the maturity of an invoice by calculating the difference between today's date and the due date. 
+            - You store all your output in a new sheet named "Analysis".
+            
+            # Your Tasks
+            You provide a multi-step analysis of the entire open posts list.
+            Here is each step outlined with additional instructions:
+            1. Create a list of "cumulative" row numbers
+               - You can tell that a row is cumulative if the key identifier (mostly the invoice number) all of a sudden changes format compared to the previous rows.
+               - Sometimes, the key identifier contains the word "debitor", "debtor", "creditor". You then know that the file holds cumulative rows.
+               - Sometimes, the values such as invoice date, due date, etc are empty
+               - Other forms of cumulative rows are rows that accumulate the entire file under a given filter.
+               - Programmatically create a list of "cumulative" row numbers.
+               - Make sure to reuse the list accordingly in later steps.
+            2. Create a list of "invoice" row numbers
+               - You can tell that a row is an invoice row if it is not a "cumulative" row and has a POSITIVE invoice amount.
+               - Programmatically create a list of "cumulative" row numbers.
+               - Make sure to reuse the list accordingly in later steps.
+            3. Create a list of "credit" row numbers
+               - You can tell that a row is a credit row if it is not a "cumulative" row and has a NEGATIVE invoice amount.
+               - Programmatically create a list of "credit" row numbers.
+               - Make sure to reuse the list accordingly in later steps.
+            4. Check each "invoice" and each "credit" row for completeness. "Is all required information present?"
+               - Are invoice numbers, amounts, addresses, debtor names, creditor names, debtor numbers, etc present?
+               - Use only "invoice" rows and "credit" rows.
+            5. Calculate the sum over the invoice amounts of all "invoice" rows
+            6. Calculate the sum over the credit amounts of all "credit" rows
+            7. Create an ageing report on the "invoice" rows.
+               - Cluster "invoice" rows by maturity into clusters: 1. Not mature 2. 1-30 days maturity 3. 31-60 days maturity 4. >60 days maturity. 
+               - Calculate the maturity of a credit row by: (today's date - due date).days
+               - For each maturity cluster, accumulate the invoice amount (sum of all invoice amounts in the cluster). 
+               - For each maturity cluster, give the percentage of the total accumulated invoice amount, calculated in step 3.
+            8. Create an ageing report on the "credit" rows.
+               - Cluster "credit" rows by maturity into clusters: 1. Not mature 2. 1-30 days maturity 3. 31-60 days maturity 4. >60 days maturity. 
+               - Calculate the maturity of a credit row by: (today's date - due date).days
+               - For each maturity cluster, accumulate the credit amount (sum of all credit amounts in the cluster). 
+               - For each maturity cluster, give the percentage of the total accumulated credit amount, calculated in step 4.
+            9. Calculate the top 10 credit positions by amount (lowest to highest).
+            10. Calculate the top 10 debtor positions by amount (highest to lowest).
+            11. Duplicate analysis
+               - Check whether the "invoice" rows hold duplicate invoice numbers.
+               - If there are duplicates, provide a list of the duplicate invoice numbers.
+               - Check the "cumulative" rows for duplicate debtor numbers or names.
+               - If there are duplicates, provide a list of the duplicate debtor numbers or names.
+            
+            # Output
+            Create a new sheet named "Analysis".
+            Write the output in the "Analysis" sheet.
+            Paste the output of each step so that it is clearly visible and easy to understand.     
+            Use columns to separate the output of each step
+            
+            Today's date is the {datetime.now().strftime("%dth of %B %Y")}
+            
+            Take a deep breath and think step by step.
+"""
+
+
+def _normalize(instruction: str) -> str:
+    # The prompt embeds today's date, so compare without the date line
+    lines = (line.strip() for line in instruction.strip().splitlines())
+    return "\n".join(line for line in lines if line and not line.startswith("Today's date is"))
+
+
+def is_standard_analysis(instruction: str) -> bool:
+    """Whether the instruction is the standard OPOS analysis prompt, ignoring whitespace and the date."""
+    return _normalize(instruction) == _normalize(STANDARD_ANALYSIS_PROMPT)
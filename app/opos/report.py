@@ -0,0 +1,98 @@
+"""
+Rendering of an OposAnalysis into the "Analysis" sheet.
+
+Each analysis step becomes a block of columns: a title row, a header row and the
+data rows below. Blocks are placed side by side with an empty column in between,
+so that every step is visible at a glance.
+"""
+from typing import TYPE_CHECKING, Any, List, Sequence, Tuple
+
+from openpyxl.styles import Font
+from openpyxl.workbook.workbook import Workbook
+from openpyxl.worksheet.worksheet import Worksheet
+
+if TYPE_CHECKING:
+    from app.opos.engine import OposAnalysis
+
+# (title, column headers, rows)
+Block = Tuple[str, Sequence[str], List[Sequence[Any]]]
+
+_BOLD = Font(bold=True)
+
+
+def _blocks(analysis: "OposAnalysis") -> List[Block]:
+    def ageing_rows(ageing):
+        return [[bucket["bucket"], bucket["amount"], bucket["count"], bucket["share"]] for bucket in ageing]
+
+    return [
+        ("1. Cumulative rows", ["Row"], [[row] for row in analysis.cumulative_rows]),
+        ("2. Invoice rows", ["Row"], [[row] for row in analysis.invoice_rows]),
+        ("3. Credit rows", ["Row"], [[row] for row in analysis.credit_rows]),
+        (
+            "4. Completeness",
+            ["Row", "Missing fields"],
+            [[row, ", ".join(fields)] for row, fields in analysis.incomplete_rows.items()]
+            + [[row, "amount (unparseable)"] for row in analysis.unparseable_amount_rows]
+            or [["All invoice and credit rows are complete", ""]],
+        ),
+        (
+            "5./6. Totals",
+            ["Position", "Amount"],
+            [["Sum of invoices", analysis.invoice_total], ["Sum of credits", analysis.credit_total]],
+        ),
+        ("7. Ageing of invoices", ["Maturity", "Amount", "Count", "Share %"], ageing_rows(analysis.invoice_ageing)),
+        ("8. Ageing of credits", ["Maturity", "Amount", "Count", "Share %"], ageing_rows(analysis.credit_ageing)),
+        (
+            "9. Top 10 credits",
+            ["Row", "Invoice number", "Amount"],
+            [[credit["row"], credit["invoice_number"], credit["amount"]] for credit in analysis.top_credits],
+        ),
+        (
+            "10. Top 10 debtors",
+            ["Debtor", "Amount"],
+            [[debtor["debtor"], debtor["amount"]] for debtor in analysis.top_debtors],
+        ),
+        (
+            "11. Duplicate invoice numbers",
+            ["Invoice number"],
+            [[number] for number in analysis.duplicate_invoice_numbers] or [["None"]],
+        ),
+        (
+            "11. Duplicate debtors",
+            ["Debtor"],
+            [[debtor] for debtor in analysis.duplicate_debtors] or [["None"]],
+        ),
+    ]
+
+
+def write_analysis_sheet(workbook: Workbook, analysis: "OposAnalysis", sheet_name: str = "Analysis") -> Worksheet:
+    """
+    Writes the analysis to a sheet, replacing an existing sheet of the same name in place.
+
+    Args:
+        workbook: The workbook to write to.
+        analysis: The analysis to render.
+        sheet_name: The name of the output sheet.
+
+    Returns:
+        The written worksheet.
+    """
+    index = None
+    if sheet_name in workbook.sheetnames:
+        index = workbook.sheetnames.index(sheet_name)
+        workbook.remove(workbook[sheet_name])
+    worksheet = workbook.create_sheet(sheet_name, index)
+
+    worksheet.cell(row=1, column=1, value=f"OPOS analysis of sheet {analysis.sheet_name!r}").font = _BOLD
+    worksheet.cell(row=2, column=1, value=f"Reference date: {analysis.today.isoformat()}")
+
+    column = 1
+    for title, headers, rows in _blocks(analysis):
+        worksheet.cell(row=4, column=column, value=title).font = _BOLD
+        for offset, header in enumerate(headers):
+            worksheet.cell(row=5, column=column + offset, value=header).font = _BOLD
+        for row_offset, values in enumerate(rows):
+            for offset, value in enumerate(values):
+                worksheet.cell(row=6 + row_offset, column=column + offset, value=value)
+        column += len(headers) + 1
+    return worksheet
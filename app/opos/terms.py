@@ -0,0 +1,197 @@
+"""
+Registry of the German and English terms of open-post lists and a compiled matcher.
+
+Every term class of TERM_CLASSES gets one bit. TermMatcher compiles all terms into
+a single case-insensitive alternation (longest term first) and returns, per cell,
+the bitmask of the term classes found in it. A term also carries the bits of the
+registry terms it contains, so "Rechnungsdatum" is both an invoice date header
+("rechnungsdatum", "datum") and an invoice number header ("rechnung").
+
+Terms of WORD_START_CLASSES only match at the start of a word ("Summe", but not
+"Konsum"); all other terms match anywhere. Columns are matched once per distinct
+value, and the matcher is compiled once per process (see `get_term_matcher`).
+
+The registry holds every term of the package: subtotal labels, the header terms of
+the structure analysis and of column role detection, and the terms suggesting that
+a sheet is an open-post list.
+"""
+import functools
+import re
+from typing import Any, Collection, Dict, Iterable, List, Mapping, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+TERM_CLASSES: Dict[str, Tuple[str, ...]] = {
+    # Cell terms marking subtotal rows
+    "account": ("debitor", "debtor", "kreditor", "creditor", "hauptbuchkonto", "buchungskreis"),
+    "summary": ("summe", "sum", "gesamt", "total", "zwischensumme", "subtotal"),
+    # Header terms per column type
+    "header:invoice_number": ("invoice", "rechnung", "belegnr", "beleg", "nummer", "nr", "rg"),
+    "header:invoice_date": ("rechnungsdatum", "belegdatum", "datum", "date", "buchung"),
+    "header:due_date": ("fällig", "faellig", "valuta", "due"),
+    "header:amount": ("amount", "betrag", "summe", "wert", "value", "eur", "usd", "euro", "dollar"),
+    "header:debitor": ("debitor", "debtor", "kunde", "customer", "client", "klient"),
+    "header:currency": ("currency", "währung", "waehrung", "curr"),
+    # Column names typical of German SAP exports
+    "german": (
+        "buchungsdatum",
+        "belegart",
+        "belegnummer",
+        "belegdatum",
+        "buchungsschlüssel",
+        "negativbuchung",
+        "mahnstufe",
+        "währung",
+        "hauswährung",
+        "zahlungsfr",
+        "skontosatz",
+        "debitor",
+    ),
+    # Header terms of the column roles of app.opos.columns, most specific first
+    "role:invoice_number": (
+        "belegnummer",
+        "rechnungsnummer",
+        "rechnungsnr",
+        "belegnr",
+        "beleg-nr",
+        "invoice number",
+        "invoice no",
+        "document number",
+        "invoice",
+    ),
+    "role:invoice_date": ("belegdatum", "rechnungsdatum", "invoice date", "document date"),
+    "role:due_date": (
+        "nettofälligkeit",
+        "nettofaelligkeit",
+        "fälligkeitsdatum",
+        "fälligkeit",
+        "faelligkeit",
+        "fällig",
+        "faellig",
+        "due date",
+        "due",
+    ),
+    "role:amount": (
+        "betrag in hauswährung",
+        "betrag in hauswaehrung",
+        "betrag hw",
+        "betrag in belegwährung",
+        "betrag",
+        "amount",
+        "summe",
+    ),
+    "role:currency": ("währung", "waehrung", "currency"),
+    "role:debtor": ("debitorennummer", "debitor", "debtor", "kundennummer", "kunde", "customer"),
+    # Sheet state terms suggesting an open-post list
+    "indicator": ("debitor", "buchung", "beleg", "währung", "betrag", "invoice", "amount"),
+    # Labels of debtor subtotal rows ("Debitor 213752")
+    "debtor_account": ("debitor", "debtor"),
+}
+
+WORD_START_CLASSES = frozenset({"account", "summary", "debtor_account"})
+
+# Distinct cell texts whose bitmask is kept between calls
+MATCH_CACHE_SIZE = 65536
+
+
+class TermMatcher:
+    """
+    Matches the terms of a registry in text and returns term-class bitmasks.
+
+    Args:
+        classes: The terms per class; each class gets the bit `1 << position`.
+        word_start: The classes whose terms only match at the start of a word.
+    """
+
+    def __init__(self, classes: Mapping[str, Sequence[str]], word_start: Collection[str] = ()) -> None:
+        if len(classes) > 63:
+            raise ValueError("A term matcher supports at most 63 term classes.")
+        self.classes: Tuple[str, ...] = tuple(classes)
+        self._bits = {name: 1 << idx for idx, name in enumerate(self.classes)}
+
+        variants: Dict[Tuple[str, bool], int] = {}
+        for name, terms in classes.items():
+            for term in terms:
+                key = (term.lower(), name in word_start)
+                variants[key] = variants.get(key, 0) | self._bits[name]
+
+        # A term starting with a word-start term also gets a word-start variant, which is tried
+        # first and so keeps that term's bits when the longer term matches at a word start
+        for text, at_word_start in list(variants):
+            if at_word_start or (text, True) in variants:
+                continue
+            if any(other_at_word_start and text.startswith(other) for other, other_at_word_start in variants):
+                variants[(text, True)] = variants[(text, False)]
+
+        # Longest first, so a term wins over the terms it contains; at equal length word starts first
+        alternatives = []
+        self._group_bits = [0]
+        for text, at_word_start in sorted(variants, key=lambda variant: (-len(variant[0]), not variant[1])):
+            bits = 0
+            for (other, other_at_word_start), other_bits in variants.items():
+                if other_at_word_start and not (at_word_start and text.startswith(other)):
+                    continue
+                if other in text:
+                    bits |= other_bits
+            alternatives.append(("\\b" if at_word_start else "") + f"({re.escape(text)})")
+            self._group_bits.append(bits)
+        self.pattern = re.compile("|".join(alternatives), re.IGNORECASE)
+        self.match_text = functools.lru_cache(maxsize=MATCH_CACHE_SIZE)(self._match_text)
+
+    def bit(self, name: str) -> int:
+        """The bit of a term class."""
+        return self._bits[name]
+
+    def mask(self, *names: str) -> int:
+        """The combined bits of several term classes."""
+        return functools.reduce(lambda mask, name: mask | self._bits[name], names, 0)
+
+    def classes_of(self, mask: int) -> List[str]:
+        """The term classes set in a bitmask."""
+        return [name for name in self.classes if int(mask) & self._bits[name]]
+
+    def _match_text(self, text: str) -> int:
+        mask = 0
+        for match in self.pattern.finditer(text):
+            mask |= self._group_bits[match.lastindex]
+        return mask
+
+    def terms_in(self, text: str) -> List[str]:
+        """The registry terms matched in a text, lower case and in order of appearance."""
+        return [match.group(match.lastindex).lower() for match in self.pattern.finditer(text)]
+
+    def match(self, values: Iterable[Any]) -> np.ndarray:
+        """
+        Returns the term-class bitmask of every value; values that are not strings get 0.
+
+        Args:
+            values: A column (pandas Series) or any sequence of cell values.
+
+        Returns:
+            An int64 array with one bitmask per value.
+        """
+        if not isinstance(values, pd.Series):
+            values = pd.Series(list(values), dtype=object)
+        codes, uniques = pd.factorize(values)
+        # The last entry is the mask of missing values (code -1)
+        masks = np.zeros(len(uniques) + 1, dtype=np.int64)
+        for idx, value in enumerate(uniques):
+            if isinstance(value, str):
+                masks[idx] = self.match_text(value)
+        return masks[codes]
+
+    def match_frame(self, frame: pd.DataFrame) -> np.ndarray:
+        """Returns the bitmasks of all cells of a frame as a (rows, columns) int64 array."""
+        masks = np.zeros(frame.shape, dtype=np.int64)
+        for idx in range(frame.shape[1]):
+            values = frame.iloc[:, idx]
+            if pd.api.types.is_object_dtype(values) or pd.api.types.is_string_dtype(values):
+                masks[:, idx] = self.match(values)
+        return masks
+
+
+@functools.lru_cache
+def get_term_matcher() -> TermMatcher:
+    """Returns the process-wide matcher of the OPOS term registry."""
+    return TermMatcher(TERM_CLASSES, WORD_START_CLASSES)
@@ -1,13 +1,17 @@
+import asyncio
 import logging
 import shutil
 import tempfile
 import uuid
+from contextlib import asynccontextmanager, contextmanager
+from dataclasses import dataclass
 from datetime import datetime
 from pathlib import Path
-from typing import Any, Dict, Optional
+from typing import Any, AsyncIterator, Dict, Iterator, Optional
 
 from app.core.config import get_settings
-from app.core.sandbox import Sandbox
+from app.core.content_cache import get_content_cache
+from app.core.sandbox_pool import open_sandbox
 from app.dataset.dataloader import load_problem
 from app.graph.graph import SheetAgentGraph
 from app.utils.enumeration import MODEL_TYPE
@@ -17,32 +21,101 @@ from app.utils.gcs import upload_to_gcs
 logger = logging.getLogger(__name__)
 
 
-def run_analysis(
-    instruction: str, workbook_source: str, is_local_file: bool = False
-) -> str:
+def _publish_output(output_file_path: Path, unique_id: uuid.UUID) -> str:
     """
-    Runs the open post analysis on the given workbook.
+    Publishes the generated workbook.
 
-    All file operations are executed within a secure temporary directory to prevent
-    unauthorized file system access. The analysis process loads the workbook from
-    either a URL or local file path, processes it, and generates an analysis file.
+    In local environment, copies it to the persistent output directory and returns a
+    success message; otherwise uploads it to Google Cloud Storage and returns its URL.
+    """
+    # Check if we're in local environment
+    settings = get_settings()
+    if settings.APP_ENVIRONMENT == "local":
+        # In local environment, save to a persistent directory that can be mounted in Docker
+        # Create a persistent output directory
+        persistent_output_dir = (
+            Path("/app/sandbox/output")
+            if Path("/app/sandbox").exists()
+            else Path("./output")
+        )
+        persistent_output_dir.mkdir(parents=True, exist_ok=True)
 
-    In local environment, returns a success message with the local file path.
-    In development and production environments, uploads the output file to
-    Google Cloud Storage and returns the public URL.
+        # Create a final output file path with timestamp for uniqueness
+        final_output_path = (
+            persistent_output_dir
+            / f"{unique_id}_analysis_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx"
+        )
 
-    Args:
-        instruction: The instruction for the analysis.
-        workbook_source: The URL or local file path to the workbook file.
-        is_local_file: Whether the workbook_source is a local file path.
+        # Copy the generated file to the persistent location
+        if output_file_path.exists():
+            shutil.copy2(output_file_path, final_output_path)
+            logger.info(f"Analysis file saved to: {final_output_path}")
+            return (
+                f"Successfully generated analysis file to: {final_output_path}"
+            )
+        else:
+            logger.error(f"Output file not found at: {output_file_path}")
+            raise FileNotFoundError(
+                f"Output file not generated at: {output_file_path}"
+            )
+    else:
+        # Non-local environment: upload to GCS
+        bucket_name = settings.GCS_BUCKET_NAME
+        if not bucket_name:
+            logger.error("GCS_BUCKET_NAME environment variable is not set")
+            raise ValueError(
+                "GCS_BUCKET_NAME environment variable is not set but required in non-local environment"
+            )
 
-    Returns:
-        In local environment: A success message with the local file path.
-        In non-local environments: The public URL of the uploaded analysis file in Google Cloud Storage.
+        # Generate a unique name for the file in GCS
+        destination_blob_name = f"analysis/{unique_id}_analysis.xlsx"
 
-    Raises:
-        ValueError: If GCS_BUCKET_NAME environment variable is not set in non-local environments.
-        Exception: For any errors during file processing or GCS upload.
+        # Upload the file to GCS and get the public URL
+        logger.info(f"Uploading output file to GCS bucket: {bucket_name}")
+        gcs_url = upload_to_gcs(
+            output_file_path, bucket_name, destination_blob_name
+        )
+        logger.info(f"File uploaded successfully to GCS: {gcs_url}")
+        return gcs_url
+
+
+@dataclass(frozen=True)
+class _AnalysisSession:
+    """The temporary directories and the request of one analysis run."""
+
+    temp_dir: Path
+    output_dir: Path
+    db_path: Path
+    session_output_dir: Path
+    unique_id: uuid.UUID
+    instruction: str
+    workbook_source: str
+    is_local_file: bool
+
+    @property
+    def output_file_path(self) -> Path:
+        # The output file is saved as "workbook_new.xlsx" in the session's output directory
+        return self.session_output_dir / "workbook_new.xlsx"
+
+    def load_problem(self) -> Any:
+        """Downloads or copies the workbook and loads the problem."""
+        logger.info("Loading problem from workbook")
+        return load_problem(
+            workbook_path=self.output_dir / f"{self.unique_id}_workbook.xlsx",
+            db_path=self.db_path,
+            instruction=self.instruction,
+            workbook_source=self.workbook_source,
+            is_local_file=self.is_local_file,
+            cache=get_content_cache(),
+        )
+
+
+@contextmanager
+def _analysis_session(instruction: str, workbook_source: str, is_local_file: bool) -> Iterator[_AnalysisSession]:
+    """
+    Creates the temporary directories of an analysis run and removes them afterwards.
+
+    Shared by run_analysis and arun_analysis; errors raised by the run are logged here.
     """
     source_type = "local file" if is_local_file else "URL"
     logger.info(
@@ -64,34 +137,66 @@ def run_analysis(
             )
 
             unique_id = uuid.uuid4()
-            local_workbook_path = output_dir / f"{unique_id}_workbook.xlsx"
-
             logger.info(f"Generated unique ID: {unique_id}")
 
-            # Create the sandbox instance
-            logger.info("Creating sandbox instance")
-            sandbox = Sandbox(base_dir=temp_dir)
+            # Create the session output directory
+            session_output_dir = output_dir / str(unique_id)
+            session_output_dir.mkdir(exist_ok=True)
+            logger.info(f"Created session output directory: {session_output_dir}")
 
-            # Load the problem
-            logger.info("Loading problem from workbook")
-            problem = load_problem(
-                workbook_path=local_workbook_path,
+            yield _AnalysisSession(
+                temp_dir=temp_dir,
+                output_dir=output_dir,
                 db_path=db_path,
+                session_output_dir=session_output_dir,
+                unique_id=unique_id,
                 instruction=instruction,
                 workbook_source=workbook_source,
                 is_local_file=is_local_file,
             )
+    except Exception as e:
+        logger.exception(f"Error during analysis: {str(e)}")
+        raise
 
-            # Create the session output directory
-            session_output_dir = output_dir / str(unique_id)
-            session_output_dir.mkdir(exist_ok=True)
-            logger.info(f"Created session output directory: {session_output_dir}")
 
+def run_analysis(
+    instruction: str, workbook_source: str, is_local_file: bool = False
+) -> str:
+    """
+    Runs the open post analysis on the given workbook.
+
+    All file operations are executed within a secure temporary directory to prevent
+    unauthorized file system access. The analysis process loads the workbook from
+    either a URL or local file path, processes it, and generates an analysis file.
+
+    In local environment, returns a success message with the local file path.
+    In development and production environments, uploads the output file to
+    Google Cloud Storage and returns the public URL.
+
+    Args:
+        instruction: The instruction for the analysis.
+        workbook_source: The URL or local file path to the workbook file.
+        is_local_file: Whether the workbook_source is a local file path.
+
+    Returns:
+        In local environment: A success message with the local file path.
+        In non-local environments: The public URL of the uploaded analysis file in Google Cloud Storage.
+
+    Raises:
+        ValueError: If GCS_BUCKET_NAME environment variable is not set in non-local environments.
+        Exception: For any errors during file processing or GCS upload.
+    """
+    with _analysis_session(instruction, workbook_source, is_local_file) as session:
+        problem = session.load_problem()
+
+        # Create the sandbox instance (a pre-warmed worker process if the pool is enabled)
+        logger.info("Creating sandbox instance")
+        with open_sandbox(base_dir=session.temp_dir) as sandbox:
             # Create and run the SheetAgentGraph with the new LCEL implementation
             logger.info("Creating SheetAgentGraph")
             agent_graph = SheetAgentGraph(
                 problem=problem,
-                output_dir=session_output_dir,
+                output_dir=session.session_output_dir,
                 sandbox=sandbox,
             )
 
@@ -100,59 +205,53 @@ def run_analysis(
             agent_graph.run()
             logger.info("SheetAgentGraph execution completed")
 
-            # The output file is saved as "workbook_new.xlsx" in the session's output directory
-            output_file_path = session_output_dir / "workbook_new.xlsx"
-            logger.info(f"Output file path: {output_file_path}")
-
-            # Check if we're in local environment
-            settings = get_settings()
-            if settings.APP_ENVIRONMENT == "local":
-                # In local environment, save to a persistent directory that can be mounted in Docker
-                # Create a persistent output directory
-                persistent_output_dir = (
-                    Path("/app/sandbox/output")
-                    if Path("/app/sandbox").exists()
-                    else Path("./output")
-                )
-                persistent_output_dir.mkdir(parents=True, exist_ok=True)
-
-                # Create a final output file path with timestamp for uniqueness
-                final_output_path = (
-                    persistent_output_dir
-                    / f"{unique_id}_analysis_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx"
-                )
-
-                # Copy the generated file to the persistent location
-                if output_file_path.exists():
-                    shutil.copy2(output_file_path, final_output_path)
-                    logger.info(f"Analysis file saved to: {final_output_path}")
-                    return (
-                        f"Successfully generated analysis file to: {final_output_path}"
-                    )
-                else:
-                    logger.error(f"Output file not found at: {output_file_path}")
-                    raise FileNotFoundError(
-                        f"Output file not generated at: {output_file_path}"
-                    )
-            else:
-                # Non-local environment: upload to GCS
-                bucket_name = settings.GCS_BUCKET_NAME
-                if not bucket_name:
-                    logger.error("GCS_BUCKET_NAME environment variable is not set")
-                    raise ValueError(
-                        "GCS_BUCKET_NAME environment variable is not set but required in non-local environment"
-                    )
-
-                # Generate a unique name for the file in GCS
-                destination_blob_name = f"analysis/{unique_id}_analysis.xlsx"
-
-                # Upload the file to GCS and get the public URL
-                logger.info(f"Uploading output file to GCS bucket: {bucket_name}")
-                gcs_url = upload_to_gcs(
-                    output_file_path, bucket_name, destination_blob_name
-                )
-                logger.info(f"File uploaded successfully to GCS: {gcs_url}")
-                return gcs_url
-    except Exception as e:
-        logger.exception(f"Error during analysis: {str(e)}")
+        logger.info(f"Output file path: {session.output_file_path}")
+        return _publish_output(session.output_file_path, session.unique_id)
+
+
+@asynccontextmanager
+async def _aopen_sandbox(base_dir: Path) -> AsyncIterator[Any]:
+    """open_sandbox for the event loop; acquiring and releasing a worker may block, so both run in a thread."""
+    manager = open_sandbox(base_dir=base_dir)
+    sandbox = await asyncio.to_thread(manager.__enter__)
+    try:
+        yield sandbox
+    except BaseException as e:
+        await asyncio.to_thread(manager.__exit__, type(e), e, e.__traceback__)
         raise
+    else:
+        await asyncio.to_thread(manager.__exit__, None, None, None)
+
+
+async def arun_analysis(
+    instruction: str, workbook_source: str, is_local_file: bool = False
+) -> str:
+    """
+    Async variant of run_analysis.
+
+    The graph runs with ainvoke on the calling event loop. Blocking work (the
+    download, sandbox execution and publishing the output) runs in worker threads,
+    so one process can serve many analyses concurrently while they wait for the LLM.
+
+    Args:
+        instruction: The instruction for the analysis.
+        workbook_source: The URL or local file path to the workbook file.
+        is_local_file: Whether the workbook_source is a local file path.
+
+    Returns:
+        The same as run_analysis.
+    """
+    with _analysis_session(instruction, workbook_source, is_local_file) as session:
+        problem = await asyncio.to_thread(session.load_problem)
+
+        async with _aopen_sandbox(session.temp_dir) as sandbox:
+            agent_graph = SheetAgentGraph(
+                problem=problem,
+                output_dir=session.session_output_dir,
+                sandbox=sandbox,
+            )
+            logger.info("Running SheetAgentGraph")
+            await agent_graph.arun()
+            logger.info("SheetAgentGraph execution completed")
+
+        return await asyncio.to_thread(_publish_output, session.output_file_path, session.unique_id)
@@ -0,0 +1,319 @@
+"""
+Background execution of analyses as jobs.
+
+An analysis runs for minutes, so the API only enqueues it and returns a job id.
+Jobs are executed by a fixed number of worker threads; once the queue holds
+`max_queue_depth` waiting jobs, new submissions are rejected so that callers back
+off instead of piling up work. Job metadata lives in a local SQLite database, and
+jobs that were queued or running when the process stopped are queued again on
+the next start.
+"""
+import functools
+import logging
+import queue
+import sqlite3
+import threading
+import uuid
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Callable, List, Optional
+
+from app.utils.exceptions import JobQueueFullError
+
+logger = logging.getLogger(__name__)
+
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_SUCCEEDED = "succeeded"
+JOB_FAILED = "failed"
+
+
+@dataclass(frozen=True)
+class Job:
+    """
+    A persisted analysis job.
+
+    Attributes:
+        id: The job id.
+        status: One of "queued", "running", "succeeded" and "failed".
+        instruction: The instruction for the analysis.
+        workbook_source: The URL or local file path of the workbook.
+        is_local_file: Whether the workbook_source is a local file path.
+        result: The result of run_analysis once the job succeeded.
+        error: The error message once the job failed.
+        created_at: When the job was submitted (ISO 8601, UTC).
+        started_at: When a worker picked the job up.
+        finished_at: When the job succeeded or failed.
+    """
+
+    id: str
+    status: str
+    instruction: str
+    workbook_source: str
+    is_local_file: bool
+    result: Optional[str] = None
+    error: Optional[str] = None
+    created_at: Optional[str] = None
+    started_at: Optional[str] = None
+    finished_at: Optional[str] = None
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+class JobStore:
+    """
+    SQLite persistence of jobs.
+
+    Args:
+        db_path: The path of the SQLite database file; created if missing.
+    """
+
+    _COLUMNS = (
+        "id, status, instruction, workbook_source, is_local_file, result, error, created_at, started_at, finished_at"
+    )
+
+    def __init__(self, db_path: Path) -> None:
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id TEXT PRIMARY KEY,
+                    status TEXT NOT NULL,
+                    instruction TEXT NOT NULL,
+                    workbook_source TEXT NOT NULL,
+                    is_local_file INTEGER NOT NULL,
+                    result TEXT,
+                    error TEXT,
+                    created_at TEXT NOT NULL,
+                    started_at TEXT,
+                    finished_at TEXT
+                )
+                """
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, created_at)")
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    def _execute(self, sql: str, params: tuple = ()) -> sqlite3.Cursor:
+        with self._lock, self._conn:
+            return self._conn.execute(sql, params)
+
+    @staticmethod
+    def _to_job(row: tuple) -> Job:
+        return Job(
+            id=row[0],
+            status=row[1],
+            instruction=row[2],
+            workbook_source=row[3],
+            is_local_file=bool(row[4]),
+            result=row[5],
+            error=row[6],
+            created_at=row[7],
+            started_at=row[8],
+            finished_at=row[9],
+        )
+
+    def create(self, instruction: str, workbook_source: str, is_local_file: bool) -> Job:
+        job = Job(
+            id=uuid.uuid4().hex,
+            status=JOB_QUEUED,
+            instruction=instruction,
+            workbook_source=workbook_source,
+            is_local_file=is_local_file,
+            created_at=_now(),
+        )
+        self._execute(
+            "INSERT INTO jobs (id, status, instruction, workbook_source, is_local_file, created_at) VALUES (?, ?, ?, ?, ?, ?)",
+            (job.id, job.status, job.instruction, job.workbook_source, int(job.is_local_file), job.created_at),
+        )
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        row = self._execute(f"SELECT {self._COLUMNS} FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return self._to_job(row) if row is not None else None
+
+    def mark_running(self, job_id: str) -> None:
+        self._execute("UPDATE jobs SET status = ?, started_at = ? WHERE id = ?", (JOB_RUNNING, _now(), job_id))
+
+    def mark_succeeded(self, job_id: str, result: str) -> None:
+        self._execute(
+            "UPDATE jobs SET status = ?, result = ?, finished_at = ? WHERE id = ?",
+            (JOB_SUCCEEDED, result, _now(), job_id),
+        )
+
+    def mark_failed(self, job_id: str, error: str) -> None:
+        self._execute(
+            "UPDATE jobs SET status = ?, error = ?, finished_at = ? WHERE id = ?",
+            (JOB_FAILED, error, _now(), job_id),
+        )
+
+    def requeue_unfinished(self) -> List[Job]:
+        """Marks jobs interrupted by a shutdown as queued and returns all queued jobs, oldest first."""
+        self._execute("UPDATE jobs SET status = ?, started_at = NULL WHERE status = ?", (JOB_QUEUED, JOB_RUNNING))
+        rows = self._execute(
+            f"SELECT {self._COLUMNS} FROM jobs WHERE status = ? ORDER BY created_at", (JOB_QUEUED,)
+        ).fetchall()
+        return [self._to_job(row) for row in rows]
+
+
+class JobManager:
+    """
+    Runs jobs on a bounded pool of worker threads.
+
+    Args:
+        store: The job store.
+        max_workers: Number of jobs executed concurrently.
+        max_queue_depth: Number of waiting jobs above which submissions are rejected.
+        runner: Executes one job; called with (instruction, workbook_source, is_local_file).
+    """
+
+    def __init__(
+        self,
+        store: JobStore,
+        max_workers: int,
+        max_queue_depth: int,
+        runner: Optional[Callable[..., str]] = None,
+    ) -> None:
+        if max_workers < 1:
+            raise ValueError("The job manager needs at least one worker.")
+
+        self.store = store
+        self.max_workers = max_workers
+        self.max_queue_depth = max_queue_depth
+        self._runner = runner
+        self._queue: "queue.Queue[Optional[str]]" = queue.Queue()
+        self._pending = 0
+        self._lock = threading.Lock()
+        self._threads: List[threading.Thread] = []
+        # Set by shutdown; workers then start no further job
+        self._stopping = threading.Event()
+
+    def _run(self, instruction: str, workbook_source: str, is_local_file: bool) -> str:
+        if self._runner is not None:
+            return self._runner(instruction, workbook_source, is_local_file)
+
+        from app.services.analysis_service import run_analysis
+
+        return run_analysis(instruction=instruction, workbook_source=workbook_source, is_local_file=is_local_file)
+
+    def start(self) -> None:
+        """Queues the jobs left over from a previous run and starts the workers."""
+        self._stopping.clear()
+        recovered = self.store.requeue_unfinished()
+        with self._lock:
+            self._pending += len(recovered)
+        for job in recovered:
+            self._queue.put(job.id)
+        if recovered:
+            logger.info(f"Re-queued {len(recovered)} unfinished jobs")
+
+        for idx in range(self.max_workers):
+            thread = threading.Thread(target=self._worker, name=f"job-worker-{idx}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def submit(self, instruction: str, workbook_source: str, is_local_file: bool) -> Job:
+        """
+        Persists and enqueues a job.
+
+        Raises:
+            JobQueueFullError: If `max_queue_depth` jobs are already waiting.
+        """
+        with self._lock:
+            if self._pending >= self.max_queue_depth:
+                raise JobQueueFullError(self.max_queue_depth)
+            self._pending += 1
+        try:
+            job = self.store.create(instruction, workbook_source, is_local_file)
+        except Exception:
+            with self._lock:
+                self._pending -= 1
+            raise
+        self._queue.put(job.id)
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        return self.store.get(job_id)
+
+    @property
+    def queue_depth(self) -> int:
+        """Number of jobs waiting for a worker."""
+        return self._pending
+
+    def shutdown(self, timeout: Optional[float] = None) -> None:
+        """
+        Stops the workers once they finished their current job.
+
+        Jobs still waiting stay queued in the store and run after the next start.
+        """
+        self._stopping.set()
+        # Drop the waiting jobs from the in-memory queue; the next start re-queues them from the store
+        while True:
+            try:
+                job_id = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if job_id is not None:
+                with self._lock:
+                    self._pending -= 1
+        for _ in self._threads:
+            self._queue.put(None)
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+
+    def _worker(self) -> None:
+        while True:
+            job_id = self._queue.get()
+            if job_id is None:
+                return
+            with self._lock:
+                self._pending -= 1
+            if self._stopping.is_set():
+                # Taken just before shutdown drained the queue; it stays queued in the store
+                return
+
+            job = self.store.get(job_id)
+            if job is None or job.status != JOB_QUEUED:
+                continue
+
+            self.store.mark_running(job_id)
+            logger.info(f"Running job {job_id}")
+            try:
+                result = self._run(job.instruction, job.workbook_source, job.is_local_file)
+            except Exception as e:
+                logger.exception(f"Job {job_id} failed")
+                self.store.mark_failed(job_id, str(e))
+            else:
+                self.store.mark_succeeded(job_id, result)
+                logger.info(f"Job {job_id} succeeded")
+
+
+@functools.lru_cache
+def get_job_manager() -> JobManager:
+    """
+    Returns the process-wide job manager.
+
+    Configured by JOB_WORKERS, JOB_MAX_QUEUE_DEPTH and JOB_DB_PATH; its workers are
+    started on creation.
+    """
+    from app.core.config import get_settings
+
+    settings = get_settings()
+    manager = JobManager(
+        store=JobStore(Path(settings.JOB_DB_PATH)),
+        max_workers=settings.JOB_WORKERS,
+        max_queue_depth=settings.JOB_MAX_QUEUE_DEPTH,
+    )
+    manager.start()
+    return manager
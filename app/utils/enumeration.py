@@ -21,6 +21,7 @@ class MODEL_TYPE(Enum):
     CLAUDE_OPUS = "claude-3-opus-20240229"
     CLAUDE_SONNET = "claude-3-sonnet-20240229"
     CLAUDE_HAIKU = "claude-3-haiku-20240307"
+    O4_MINI = "o4-mini-2025-04-16"
 
     def __str__(self) -> str:
         return self.value
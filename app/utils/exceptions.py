@@ -20,4 +20,24 @@ class CriticParseError(Exception):
 
 class TokenLimitError(Exception):
     def __init__(self, num_tokens:int, token_limit:int) -> None:
-        super().__init__(f"Number of tokens {num_tokens} exceeds the limit {token_limit}.")
\ No newline at end of file
+        super().__init__(f"Number of tokens {num_tokens} exceeds the limit {token_limit}.")
+
+class SandboxWorkerError(RuntimeError):
+    def __init__(self, pid, reason) -> None:
+        self.pid = pid
+        super().__init__(f"Sandbox worker {pid} is no longer available: {reason}")
+
+class DownloadError(Exception):
+    def __init__(self, url, reason) -> None:
+        self.url = url
+        super().__init__(f"Download of '{url}' failed: {reason}")
+
+class DownloadTooLargeError(DownloadError):
+    def __init__(self, url, max_bytes) -> None:
+        self.max_bytes = max_bytes
+        super().__init__(url, f"the file exceeds the maximum size of {max_bytes} bytes")
+
+class JobQueueFullError(RuntimeError):
+    def __init__(self, max_queue_depth) -> None:
+        self.max_queue_depth = max_queue_depth
+        super().__init__(f"The job queue is full ({max_queue_depth} jobs waiting).")
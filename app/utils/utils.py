@@ -128,6 +128,8 @@ def get_model_token_limit(model: MODEL_TYPE) -> Optional[int]:
         return 16385
     if model == MODEL_TYPE.GPT_4_1106:
         return 128000
+    if model == MODEL_TYPE.O4_MINI:
+        return 200000
     if model.value.startswith("claude-3"):
         return 200000
     return None
@@ -0,0 +1,64 @@
+"""
+Fixtures of the benchmark suite.
+
+The synthetic OPOS workbooks are generated once into OPOS_BENCHMARK_DIR (default
+.benchmarks/workbooks) and reused by later runs. OPOS_BENCHMARK_SIZES selects the
+row counts, e.g. "1000,10000,100000,1000000"; by default only 1k and 10k rows are
+benchmarked, since generating the 1M-row workbook takes several minutes.
+"""
+
+import os
+from pathlib import Path
+from typing import Tuple
+
+import pytest
+
+from app.core.sandbox import Sandbox
+from app.dataset.synthetic import generate_benchmark_workbooks
+from app.dataset.workbook_loader import LoadedWorkbook
+
+DEFAULT_SIZES = (1_000, 10_000)
+
+
+def _sizes() -> Tuple[int, ...]:
+    value = os.environ.get("OPOS_BENCHMARK_SIZES")
+    if not value:
+        return DEFAULT_SIZES
+    return tuple(int(size) for size in value.split(",") if size.strip())
+
+
+def _size_id(rows: int) -> str:
+    if rows >= 1_000_000 and rows % 1_000_000 == 0:
+        return f"{rows // 1_000_000}M"
+    if rows >= 1_000 and rows % 1_000 == 0:
+        return f"{rows // 1_000}k"
+    return str(rows)
+
+
+@pytest.fixture(scope="session", params=_sizes(), ids=_size_id)
+def workbook_path(request: pytest.FixtureRequest) -> Path:
+    """
+    The synthetic workbook of one benchmark size.
+    """
+    directory = Path(os.environ.get("OPOS_BENCHMARK_DIR", ".benchmarks/workbooks"))
+    return generate_benchmark_workbooks(directory, [request.param])[0]
+
+
+@pytest.fixture(scope="session")
+def loaded_workbook(workbook_path: Path) -> LoadedWorkbook:
+    """
+    The parsed and trimmed workbook, shared by the benchmarks that only read it.
+    """
+    loaded = LoadedWorkbook(workbook_path)
+    loaded.workbook
+    return loaded
+
+
+@pytest.fixture
+def sandbox(tmp_path: Path, loaded_workbook: LoadedWorkbook) -> Sandbox:
+    """
+    A sandbox with the shared workbook loaded.
+    """
+    sandbox = Sandbox(tmp_path)
+    sandbox.load_workbook(loaded_workbook)
+    return sandbox
@@ -0,0 +1,91 @@
+"""
+Benchmark of a full SheetAgentGraph run with a replayed planner.
+
+The planner answers from recorded calls (see app.core.llm_replay) without network
+access, so this measures everything around the model per synthetic workbook size:
+loading the workbook into the sandbox, the preprocessing node, the tool calls,
+validation and saving the results.
+"""
+
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+import pytest
+from langchain_core.language_models import GenericFakeChatModel
+from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
+
+from app.core.llm_replay import LLMRecorder
+from app.core.sandbox import Sandbox
+from app.dataset.dataloader import load_problem
+from app.graph import registry
+from app.graph.graph import SheetAgentGraph
+
+if TYPE_CHECKING:
+    from pytest_mock import MockerFixture
+
+# A custom instruction, so that the deterministic engine leaves the analysis to the planner
+INSTRUCTION = "Markiere alle Gutschriften im Blatt Sheet1."
+# Profile the columns, mark the sheet, then answer; the run ends with validation after the third planner call
+PLANNER_RESPONSES = [
+    AIMessage(content="", tool_calls=[{"name": "column_profile", "args": {"sheet_name": "Sheet1"}, "id": "call-1"}]),
+    AIMessage(
+        content="",
+        tool_calls=[
+            {"name": "python_executor", "args": {"code": 'workbook["Sheet1"]["Z1"] = "Geprüft"'}, "id": "call-2"}
+        ],
+    ),
+    AIMessage(content="Die Gutschriften sind markiert."),
+]
+MAX_STEPS = 5
+# Rounds of the benchmark; each round loads the workbook into a new sandbox
+ROUNDS = 3
+
+
+@pytest.fixture
+def replay_settings(tmp_path: Path, mocker: "MockerFixture"):
+    """
+    Records the planner responses and points the settings at the recording.
+    """
+    path = tmp_path / "planner.jsonl"
+    recorder = GenericFakeChatModel(messages=iter(PLANNER_RESPONSES), callbacks=[LLMRecorder(path)])
+    for _ in PLANNER_RESPONSES:
+        recorder.invoke([HumanMessage(content=INSTRUCTION)])
+    settings = mocker.Mock(
+        LLM_REPLAY_PATH=str(path),
+        LLM_REPLAY_LATENCY_MS=0.0,
+        PLANNER_HISTORY_BUDGET_RATIO=0.05,
+        PLANNER_HISTORY_KEEP_EXCHANGES=3,
+    )
+    mocker.patch("app.core.config.get_settings", return_value=settings)
+    registry.clear_registry()
+    yield settings
+    registry.clear_registry()
+
+
+def test_sheet_agent_graph_replay(benchmark, replay_settings, workbook_path: Path, tmp_path: Path) -> None:
+    """
+    Benchmarks an analysis from loading the workbook to saving the results, with the planner replayed.
+    """
+    problem = load_problem(
+        tmp_path / "workbook.xlsx",
+        tmp_path / "db",
+        INSTRUCTION,
+        workbook_source=str(workbook_path),
+        is_local_file=True,
+    )
+    output_dir = tmp_path / "output"
+
+    def setup():
+        sandbox = Sandbox(tmp_path)
+        return (SheetAgentGraph(problem, output_dir, sandbox, max_steps=MAX_STEPS),), {}
+
+    final_state = benchmark.pedantic(SheetAgentGraph.run, setup=setup, rounds=ROUNDS)
+
+    messages = final_state["messages"]
+    assert [message.name for message in messages if isinstance(message, ToolMessage)] == [
+        "column_profile",
+        "python_executor",
+    ]
+    assert "Die Gutschriften sind markiert." in [message.content for message in messages]
+    assert final_state["validation_complete"]
+    assert (output_dir / "workbook_new.xlsx").exists()
@@ -0,0 +1,140 @@
+"""
+Benchmarks of the analysis pipeline stages.
+
+This suite measures, per synthetic workbook size, the stages a request passes
+through before and after the planner: loading the problem, parsing and trimming
+the workbook into the sandbox, rendering the sheet state, the OPOS preprocessing
+node and its summary row detection, SQL queries against the SQLite mirror and
+saving the results.
+"""
+
+import shutil
+from pathlib import Path
+
+import openpyxl
+from langchain_core.messages import HumanMessage
+
+from app.core.actions import SheetSelector
+from app.core.sandbox import Sandbox
+from app.core.trim import trim_workbook
+from app.dataset.dataloader import load_problem
+from app.dataset.workbook_loader import LoadedWorkbook
+from app.graph.nodes.opos_analyzer import opos_preprocessing_node
+from app.opos import STANDARD_ANALYSIS_PROMPT, detect_cumulative_rows
+from app.utils.enumeration import EXEC_CODE
+
+# Rounds of the benchmarks that take seconds per call on the larger workbooks
+SLOW_ROUNDS = 3
+
+
+def test_load_problem(benchmark, workbook_path: Path, tmp_path: Path) -> None:
+    """
+    Benchmarks copying a local workbook into a job directory and loading the problem.
+    """
+
+    def load():
+        job_dir = tmp_path / "job"
+        shutil.rmtree(job_dir, ignore_errors=True)
+        job_dir.mkdir()
+        return load_problem(
+            job_dir / "workbook.xlsx",
+            job_dir / "db",
+            STANDARD_ANALYSIS_PROMPT,
+            workbook_source=str(workbook_path),
+            is_local_file=True,
+        )
+
+    problem = benchmark(load)
+
+    assert problem.workbook_path.exists()
+
+
+def test_sandbox_load_workbook(benchmark, workbook_path: Path, tmp_path: Path) -> None:
+    """
+    Benchmarks parsing and trimming the workbook into a sandbox.
+    """
+    sandbox = Sandbox(tmp_path)
+
+    benchmark.pedantic(lambda: sandbox.load_workbook(LoadedWorkbook(workbook_path)), rounds=SLOW_ROUNDS)
+
+    assert sandbox.get_existing_sheet_names() == ["Sheet1"]
+
+
+def test_trim_workbook(benchmark, workbook_path: Path) -> None:
+    """
+    Benchmarks trimming the phantom formatting of a freshly parsed workbook.
+    """
+
+    def setup():
+        return (openpyxl.load_workbook(workbook_path),), {}
+
+    reports = benchmark.pedantic(trim_workbook, setup=setup, rounds=SLOW_ROUNDS)
+
+    assert reports[0].rows_removed > 0 and reports[0].cols_removed > 0
+
+
+def test_get_sheet_state(benchmark, loaded_workbook: LoadedWorkbook, tmp_path: Path) -> None:
+    """
+    Benchmarks rendering the sheet state of a newly loaded workbook, before any summary is cached.
+    """
+
+    def setup():
+        sandbox = Sandbox(tmp_path)
+        sandbox.load_workbook(loaded_workbook)
+        return (sandbox,), {}
+
+    sheet_state = benchmark.pedantic(Sandbox.get_sheet_state, setup=setup, rounds=SLOW_ROUNDS)
+
+    assert "Sheet1" in sheet_state
+
+
+def test_opos_preprocessing_node(benchmark, sandbox: Sandbox) -> None:
+    """
+    Benchmarks the structure and summary row analysis of the OPOS preprocessing node.
+    """
+    state = {
+        "sandbox": sandbox,
+        "problem": None,
+        "current_sheet_state": sandbox.get_sheet_state(),
+        "messages": [HumanMessage(content=STANDARD_ANALYSIS_PROMPT)],
+    }
+
+    result = benchmark.pedantic(opos_preprocessing_node, args=(state,), rounds=SLOW_ROUNDS)
+
+    assert "opos_preprocessing_error" not in result
+
+
+def test_detect_cumulative_rows(benchmark, sandbox: Sandbox) -> None:
+    """
+    Benchmarks the summary row detection over the full sheet frame.
+    """
+    frame = sandbox.frames["Sheet1"]
+
+    result = benchmark(detect_cumulative_rows, frame)
+
+    assert len(result.rows) and result.total_rows_analyzed == len(frame)
+
+
+def test_sheet_selector_execute_query(benchmark, loaded_workbook: LoadedWorkbook, tmp_path: Path) -> None:
+    """
+    Benchmarks a query selecting the credit notes against the SQLite mirror of the workbook.
+    """
+    db_path = loaded_workbook.build_database(tmp_path / "database.db")
+    selector = SheetSelector(db_path, "markdown", add_row_number=True, lower_case=True)
+    query = """SELECT "Belegnummer", "Betrag in Hauswährung" FROM "Sheet1" WHERE "Belegart" = 'DG'"""
+
+    code, table = benchmark(selector.execute_query, query, convert=False)
+
+    assert code == EXEC_CODE.SUCCESS
+    assert table["header"] == ["row number", "Belegnummer", "Betrag in Hauswährung"] and table["rows"]
+
+
+def test_sandbox_save(benchmark, sandbox: Sandbox, tmp_path: Path) -> None:
+    """
+    Benchmarks writing the workbook, code history and outputs of a run.
+    """
+    output_dir = tmp_path / "output"
+
+    benchmark.pedantic(sandbox.save, args=(output_dir,), rounds=SLOW_ROUNDS)
+
+    assert (output_dir / "workbook_new.xlsx").exists()
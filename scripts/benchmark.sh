@@ -0,0 +1,6 @@
+#!/bin/bash
+# Runs the benchmark suite and saves the results as JSON under .benchmarks/
+# Workbook sizes: OPOS_BENCHMARK_SIZES (default 1000,10000)
+set -e
+cd "$(dirname "$0")/.."
+python -m pytest benchmarks --benchmark-autosave --benchmark-storage=file://./.benchmarks --benchmark-columns=min,mean,stddev,rounds "$@"
@@ -0,0 +1,78 @@
+"""
+Unit tests for the content cache module.
+
+This test suite verifies that the content-addressed cache stores files and objects
+per digest, evicts least recently used entries beyond its size cap and treats
+unreadable entries as misses.
+"""
+
+import hashlib
+import os
+from pathlib import Path
+
+import pytest
+
+from app.core.content_cache import ContentCache, hash_file
+
+
+def _digest(label: str) -> str:
+    return hashlib.sha256(label.encode("utf-8")).hexdigest()
+
+
+def test_objects_and_files_round_trip(tmp_path: Path) -> None:
+    """
+    Tests that cached objects and files are returned for their digest only.
+    """
+    cache = ContentCache(tmp_path / "cache", max_bytes=10 * 1024 * 1024)
+    source = tmp_path / "source.bin"
+    source.write_bytes(b"payload")
+
+    cache.put_object(_digest("a"), "result.pickle", {"rows": [1, 2, 3]})
+    cached_file = cache.put_file(_digest("a"), "data.bin", source)
+
+    assert cache.get_object(_digest("a"), "result.pickle") == {"rows": [1, 2, 3]}
+    assert cache.get_path(_digest("a"), "data.bin") == cached_file
+    assert cached_file.read_bytes() == b"payload"
+    assert cache.get_object(_digest("b"), "result.pickle") is None
+    assert hash_file(source) == hashlib.sha256(b"payload").hexdigest()
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path: Path) -> None:
+    """
+    Tests that eviction removes the least recently used digests first.
+    """
+    cache = ContentCache(tmp_path / "cache", max_bytes=3500)
+    for idx, label in enumerate(["old", "used", "new"]):
+        cache.put_object(_digest(label), "blob.pickle", b"x" * 1000)
+        entry_dir = tmp_path / "cache" / _digest(label)
+        os.utime(entry_dir, (1000 + idx, 1000 + idx))
+
+    # Reading "old" makes it the most recently used entry
+    assert cache.get_object(_digest("old"), "blob.pickle") is not None
+    cache.put_object(_digest("newest"), "blob.pickle", b"x" * 1000)
+
+    assert cache.get_path(_digest("used"), "blob.pickle") is None
+    assert cache.get_path(_digest("old"), "blob.pickle") is not None
+    assert cache.get_path(_digest("newest"), "blob.pickle") is not None
+    assert cache.size() <= 3500
+
+
+def test_unreadable_entry_is_a_miss(tmp_path: Path) -> None:
+    """
+    Tests that a corrupt pickle is dropped instead of raising.
+    """
+    cache = ContentCache(tmp_path / "cache", max_bytes=1024 * 1024)
+    cache.put_object(_digest("a"), "result.pickle", [1])
+    (tmp_path / "cache" / _digest("a") / "result.pickle").write_bytes(b"not a pickle")
+
+    assert cache.get_object(_digest("a"), "result.pickle") is None
+    assert cache.get_path(_digest("a"), "result.pickle") is None
+
+
+def test_invalid_digest_is_rejected(tmp_path: Path) -> None:
+    """
+    Tests that digests cannot be used to escape the cache directory.
+    """
+    cache = ContentCache(tmp_path / "cache", max_bytes=1024)
+    with pytest.raises(ValueError):
+        cache.get_path("../outside", "file")
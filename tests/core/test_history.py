@@ -0,0 +1,120 @@
+"""
+Unit tests for the history compaction module.
+
+This test suite verifies that the planner history keeps the task and the latest
+exchanges verbatim, digests older tool results, keeps only the latest sheet-state
+observation and drops the oldest exchanges when the token budget is exceeded.
+"""
+
+from typing import TYPE_CHECKING, List
+
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, ToolMessage
+
+from app.core.history import ApproximateEncoding, HistoryCompactor, history_token_budget, is_observation
+from app.core.prompt_manager import PromptManager
+from app.utils.enumeration import MODEL_TYPE
+
+if TYPE_CHECKING:
+    from pytest_mock import MockerFixture
+
+
+def _history(rounds: int, tool_output_chars: int = 1000) -> List[BaseMessage]:
+    """
+    Builds a history as the graph produces it: task, then call, tool result and observation per round.
+    """
+    prompt_manager = PromptManager()
+    messages: List[BaseMessage] = [HumanMessage(content="Task", id="task")]
+    for idx in range(rounds):
+        messages.append(
+            AIMessage(
+                content="",
+                tool_calls=[{"name": "python_executor", "args": {"code": f"print({idx})"}, "id": f"call{idx}"}],
+                id=f"ai{idx}",
+            )
+        )
+        messages.append(
+            ToolMessage(content=f"result {idx} " + "x" * tool_output_chars, tool_call_id=f"call{idx}", id=f"tool{idx}")
+        )
+        observation = prompt_manager.get_observation_prompt(f"state {idx}")
+        observation.id = f"obs{idx}"
+        messages.append(observation)
+    return messages
+
+
+def test_compact_keeps_recent_exchanges_and_digests_older_ones() -> None:
+    """
+    Tests that older tool results are digested while the latest exchanges stay verbatim.
+    """
+    compactor = HistoryCompactor(budget_tokens=100000, keep_exchanges=2, digest_chars=50)
+
+    compacted = compactor.compact(_history(5))
+
+    assert compacted[0].id == "task"
+    tool_messages = [message for message in compacted if isinstance(message, ToolMessage)]
+    assert [message.tool_call_id for message in tool_messages] == [f"call{idx}" for idx in range(5)]
+    assert all("more characters omitted" in message.content for message in tool_messages[:3])
+    assert [len(message.content) for message in tool_messages[3:]] == [1009, 1009]
+
+
+def test_compact_keeps_only_latest_observation() -> None:
+    """
+    Tests that a new observation replaces all observations of the history.
+    """
+    compactor = HistoryCompactor(budget_tokens=100000)
+    new_observation = PromptManager().get_observation_prompt("state new")
+
+    compacted = compactor.compact(_history(3))
+    with_new = compactor.compact(_history(3), new_observation)
+
+    observations = [message for message in compacted if is_observation(message)]
+    assert [message.id for message in observations] == ["obs2"]
+    assert compacted[-1].id == "obs2"
+    assert [message for message in with_new if is_observation(message)] == [new_observation]
+
+
+def test_compact_drops_oldest_exchanges_over_budget() -> None:
+    """
+    Tests that whole old exchanges are dropped until the history fits the budget.
+    """
+    messages = _history(10)
+    full = HistoryCompactor(budget_tokens=100000, keep_exchanges=2)
+    unbounded = full.total_tokens(full.compact(messages))
+    compactor = HistoryCompactor(budget_tokens=unbounded // 2, keep_exchanges=2)
+
+    compacted = compactor.compact(messages)
+
+    assert compactor.total_tokens(compacted) <= unbounded // 2
+    ai_ids = [message.id for message in compacted if isinstance(message, AIMessage)]
+    tool_ids = [message.tool_call_id for message in compacted if isinstance(message, ToolMessage)]
+    assert ai_ids[-2:] == ["ai8", "ai9"]
+    assert len(ai_ids) < 10
+    assert tool_ids == [f"call{message_id[2:]}" for message_id in ai_ids]
+    assert compacted[0].id == "task"
+
+
+def test_token_counts_are_cached(mocker: "MockerFixture") -> None:
+    """
+    Tests that each message is encoded only once across planner rounds.
+    """
+    encoding = ApproximateEncoding()
+    encode = mocker.spy(encoding, "encode")
+    compactor = HistoryCompactor(budget_tokens=100000, encoding=encoding)
+    messages = _history(4)
+
+    compactor.total_tokens(messages)
+    calls = encode.call_count
+    compactor.total_tokens(messages)
+
+    assert encode.call_count == calls
+
+
+def test_history_token_budget() -> None:
+    """
+    Tests that the budget is a share of the model's context window, including the planner model, with a default for unknown models.
+    """
+    assert history_token_budget(MODEL_TYPE.GPT_4.value, 0.5) == 4096
+    assert history_token_budget("unknown-model", 0.05) == 6400
+
+    from app.graph.registry import PLANNER_MODEL
+
+    assert history_token_budget(PLANNER_MODEL, 0.5) == 100000
@@ -0,0 +1,91 @@
+"""
+Unit tests for the LLM response cache module.
+
+This test suite verifies that planner responses are replayed for identical calls
+regardless of message ids, that the model description is part of the key, and
+that entries expire after the TTL and are evicted beyond the size cap.
+"""
+
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+from langchain_core.language_models import GenericFakeChatModel
+from langchain_core.load import dumps
+from langchain_core.messages import AIMessage, HumanMessage
+from langchain_core.outputs import ChatGeneration
+
+from app.core.llm_cache import LLMResponseCache, cache_key
+
+if TYPE_CHECKING:
+    from pytest_mock import MockerFixture
+
+
+def _cache(tmp_path: Path, **kwargs) -> LLMResponseCache:
+    """
+    Creates a cache in the test directory.
+    """
+    options = {"ttl_seconds": 3600, "max_bytes": 1024 * 1024, **kwargs}
+    return LLMResponseCache(tmp_path / "llm.db", **options)
+
+
+def test_identical_calls_are_replayed(tmp_path: Path) -> None:
+    """
+    Tests that a call with the same messages but new message ids is served from the cache.
+    """
+    cache = _cache(tmp_path)
+    model = GenericFakeChatModel(messages=iter([AIMessage(content="first"), AIMessage(content="second")]), cache=cache)
+
+    first = model.invoke([HumanMessage(content="Sum up column B.", id="run-1")])
+    replayed = model.invoke([HumanMessage(content="Sum up column B.", id="run-2")])
+    other = model.invoke([HumanMessage(content="Sum up column C.")])
+
+    assert first.content == replayed.content == "first"
+    assert other.content == "second"
+    assert cache.stats() == {"hits": 1, "misses": 2, "hit_rate": 0.3333, "entries": 2, "bytes": cache.stats()["bytes"]}
+
+
+def test_model_description_is_part_of_the_key() -> None:
+    """
+    Tests that a different model or tool schema leads to a different key.
+    """
+    prompt = dumps([HumanMessage(content="Sum up column B.")])
+
+    assert cache_key(prompt, "model-a---tools") != cache_key(prompt, "model-b---tools")
+    assert cache_key(prompt, "model-a---tools") == cache_key(prompt, "model-a---tools")
+
+
+def test_entries_expire_after_ttl(tmp_path: Path, mocker: "MockerFixture") -> None:
+    """
+    Tests that an entry older than the TTL is a miss.
+    """
+    cache = _cache(tmp_path, ttl_seconds=60)
+    generations = [ChatGeneration(message=AIMessage(content="cached"))]
+    clock = mocker.patch("app.core.llm_cache.time.time", return_value=1000.0)
+    cache.update("prompt", "model", generations)
+
+    clock.return_value = 1030.0
+    assert cache.lookup("prompt", "model")[0].message.content == "cached"
+    clock.return_value = 1061.0
+    assert cache.lookup("prompt", "model") is None
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path: Path, mocker: "MockerFixture") -> None:
+    """
+    Tests that the least recently used entries are evicted beyond the size cap.
+    """
+    generations = [ChatGeneration(message=AIMessage(content="x" * 500))]
+    entry_size = len(str([dumps(generation) for generation in generations]))
+    cache = _cache(tmp_path, max_bytes=int(entry_size * 2.5))
+    clock = mocker.patch("app.core.llm_cache.time.time", return_value=1000.0)
+    for idx in range(2):
+        clock.return_value += 1
+        cache.update(f"prompt {idx}", "model", generations)
+    clock.return_value += 1
+    cache.lookup("prompt 0", "model")
+
+    clock.return_value += 1
+    cache.update("prompt 2", "model", generations)
+
+    assert cache.lookup("prompt 0", "model") is not None
+    assert cache.lookup("prompt 1", "model") is None
+    assert cache.lookup("prompt 2", "model") is not None
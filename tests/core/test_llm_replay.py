@@ -0,0 +1,108 @@
+"""
+Unit tests for the LLM record/replay module.
+
+This test suite verifies that recorded planner calls, including their tool calls,
+are replayed for matching messages, that unmatched calls fall back to recording
+order unless the model is strict, and that the configured latency is simulated.
+"""
+
+import asyncio
+import time
+from pathlib import Path
+
+import pytest
+from langchain_core.language_models import GenericFakeChatModel
+from langchain_core.messages import AIMessage, HumanMessage
+from langchain_core.tools import tool
+
+from app.core.llm_replay import LLMRecorder, ReplayChatModel, load_recordings
+
+
+@tool
+def read_range(cell_range: str) -> str:
+    """Reads a cell range."""
+    return cell_range
+
+
+def _record(path: Path) -> None:
+    """
+    Records two calls of a fake model, the first answering with a tool call.
+    """
+    responses = [
+        AIMessage(content="", tool_calls=[{"name": "read_range", "args": {"cell_range": "A1:B5"}, "id": "call-1"}]),
+        AIMessage(content="Done."),
+    ]
+    model = GenericFakeChatModel(messages=iter(responses), callbacks=[LLMRecorder(path)])
+    model.invoke([HumanMessage(content="Read the header.", id="run-1")])
+    model.invoke([HumanMessage(content="Summarize.", id="run-1")])
+
+
+def test_recorded_tool_calls_are_replayed(tmp_path: Path) -> None:
+    """
+    Tests that a call with the same messages but new message ids gets the recorded tool call.
+    """
+    path = tmp_path / "planner.jsonl"
+    _record(path)
+
+    assert len(load_recordings(path)) == 2
+    model = ReplayChatModel.from_file(path).bind_tools([read_range])
+    summary = model.invoke([HumanMessage(content="Summarize.", id="run-2")])
+    header = model.invoke([HumanMessage(content="Read the header.", id="run-2")])
+
+    assert summary.content == "Done."
+    assert header.tool_calls == [
+        {"name": "read_range", "args": {"cell_range": "A1:B5"}, "id": "call-1", "type": "tool_call"}
+    ]
+
+
+def test_unmatched_calls_fall_back_to_recording_order(tmp_path: Path) -> None:
+    """
+    Tests that unmatched calls get the unreplayed responses in order and reset makes them available again.
+    """
+    path = tmp_path / "planner.jsonl"
+    _record(path)
+    model = ReplayChatModel.from_file(path)
+
+    first = model.invoke([HumanMessage(content="Today's date is 2024-01-01. Read the header.")])
+    second = model.invoke([HumanMessage(content="Today's date is 2024-01-01. Summarize.")])
+    with pytest.raises(KeyError):
+        model.invoke([HumanMessage(content="One call too many.")])
+    model.reset()
+
+    assert first.tool_calls[0]["name"] == "read_range"
+    assert second.content == "Done."
+    assert model.invoke([HumanMessage(content="Summarize.")]).content == "Done."
+
+
+def test_strict_model_rejects_unmatched_calls(tmp_path: Path) -> None:
+    """
+    Tests that a strict model raises a KeyError for a call that was not recorded.
+    """
+    path = tmp_path / "planner.jsonl"
+    _record(path)
+    model = ReplayChatModel.from_file(path, strict=True)
+
+    with pytest.raises(KeyError):
+        model.invoke([HumanMessage(content="Something else.")])
+
+
+def test_async_latency_is_concurrent(tmp_path: Path) -> None:
+    """
+    Tests that replayed async calls wait for the latency without blocking each other.
+    """
+    path = tmp_path / "planner.jsonl"
+    _record(path)
+    model = ReplayChatModel.from_file(path, latency_seconds=0.2)
+
+    async def run_both():
+        return await asyncio.gather(
+            model.ainvoke([HumanMessage(content="Read the header.")]),
+            model.ainvoke([HumanMessage(content="Summarize.")]),
+        )
+
+    start = time.perf_counter()
+    header, summary = asyncio.run(run_both())
+    elapsed = time.perf_counter() - start
+
+    assert header.tool_calls and summary.content == "Done."
+    assert 0.2 <= elapsed < 0.39
@@ -0,0 +1,129 @@
+"""
+Unit tests for the column profile module.
+
+This test suite verifies the kinds, formats, ranges and top values profiled for
+typical OPOS columns (native and German text dates and amounts), the date formats
+and number locales inferred for text, the rendering of the profiles, and that the
+sandbox caches them until a step writes to the sheet.
+"""
+
+from datetime import datetime
+from pathlib import Path
+
+import openpyxl
+import pandas as pd
+
+from app.core.profile import describe_profiles, profile_column, profile_frame
+from app.core.sandbox import Sandbox
+from app.graph.tool_node import is_read_only
+from app.graph.tools import column_profile
+
+
+def _frame() -> pd.DataFrame:
+    """
+    Creates a sheet frame with invoice numbers, mixed native and German text due dates,
+    German text amounts with an SAP trailing minus, a currency and an empty column.
+    """
+    return pd.DataFrame(
+        {
+            "Belegnummer": ["RE1", "RE2", "RE3", "RE4", None],
+            "Fälligkeit": [datetime(2025, 5, 1), "15.04.2025", "01.06.2025", datetime(2025, 3, 31), None],
+            "Betrag": ["1.234,56", "12,50", "100,00-", 42.0, "  "],
+            "Währung": ["EUR", "EUR", "EUR", "USD", None],
+            "Info": [None, None, None, None, None],
+        }
+    )
+
+
+def test_profile_frame_infers_kinds_formats_and_ranges() -> None:
+    """
+    Tests kinds, empty shares, date and number formats in text and min/max across native and text values.
+    """
+    belegnummer, faelligkeit, betrag, waehrung, info = profile_frame(_frame())
+
+    assert belegnummer.kind == "text" and belegnummer.null_ratio == 0.2 and belegnummer.distinct == 4
+    assert belegnummer.role == "invoice_number"
+
+    assert faelligkeit.kinds == (("date", 0.5), ("text", 0.5))
+    assert dict(faelligkeit.formats) == {"native date": 0.5, "DD.MM.YYYY": 0.5}
+    assert (faelligkeit.minimum, faelligkeit.maximum) == (datetime(2025, 3, 31), datetime(2025, 6, 1))
+
+    assert betrag.null_ratio == 0.2
+    assert dict(betrag.formats) == {"de": 0.75}
+    assert (betrag.minimum, betrag.maximum) == (-100.0, 1234.56)
+    assert betrag.role == "amount"
+
+    assert waehrung.top_values == (("EUR", 3), ("USD", 1))
+    assert info.kind == "empty" and info.null_ratio == 1.0
+
+
+def test_profile_column_of_numeric_dtype() -> None:
+    """
+    Tests that a numeric column is profiled from its dtype without top values for unique values.
+    """
+    profile = profile_column("A", "Betrag", pd.Series([1.5, 2.5, None, 4.0]))
+
+    assert profile.kinds == (("number", 1.0),)
+    assert (profile.minimum, profile.maximum, profile.distinct) == (1.5, 4.0, 3)
+    assert profile.top_values == ()
+
+
+def test_profile_column_of_text_dates_and_numbers() -> None:
+    """
+    Tests that text formats are inferred as in the OPOS analysis and that integer text names no locale.
+    """
+    iso = profile_column("A", "Datum", pd.Series(["2025-05-01", "2025-04-15", "offen"]))
+    english = profile_column("B", "Amount", pd.Series(["1,234.56", "12.50", 3.0]))
+    integers = profile_column("C", "Konto", pd.Series(["4711", "4712", "4713"]))
+
+    assert dict(iso.formats) == {"YYYY-MM-DD": 0.667}
+    assert (iso.minimum, iso.maximum) == (datetime(2025, 4, 15), datetime(2025, 5, 1))
+    assert dict(english.formats) == {"en": 0.667}
+    assert (english.minimum, english.maximum) == (3.0, 1234.56)
+    assert integers.formats == ()
+    assert (integers.minimum, integers.maximum) == (4711.0, 4713.0)
+
+
+def test_describe_profiles() -> None:
+    """
+    Tests the tab-separated rendering of the profiles.
+    """
+    frame = _frame()
+
+    lines = describe_profiles("Sheet1", len(frame), profile_frame(frame)).splitlines()
+
+    assert lines[0] == 'Sheet "Sheet1": 5 data rows, 5 columns'
+    assert lines[1].split("\t")[:4] == ["col", "header", "role", "kinds"]
+    assert lines[3].split("\t")[:3] == ["B", "Fälligkeit", "due_date"]
+    assert lines[3].split("\t")[6:9] == ["2025-03-31", "2025-06-01", "native date 50% DD.MM.YYYY 50%"]
+    assert lines[5].endswith("EUR x3, USD x1")
+    assert lines[6] == "E\tInfo\t\tempty\t100%\t0"
+
+
+def test_sandbox_caches_profiles_until_the_sheet_changes(tmp_path: Path) -> None:
+    """
+    Tests that profiles are reused between calls and recomputed after a step writes to the sheet.
+    """
+    workbook = openpyxl.Workbook()
+    sheet = workbook.active
+    sheet.title = "Sheet1"
+    sheet.append(["Belegnummer", "Betrag"])
+    sheet.append(["RE1", 100.0])
+    sheet.append(["RE2", 200.0])
+    path = tmp_path / "workbook.xlsx"
+    workbook.save(path)
+    sandbox = Sandbox(base_dir=tmp_path)
+    sandbox.load_workbook(path)
+
+    first = sandbox.get_column_profiles("Sheet1")
+    assert sandbox.get_column_profiles("Sheet1") is first
+    sandbox.step('workbook["Sheet1"]["B3"] = 900.0')
+    second = sandbox.get_column_profiles("Sheet1")
+
+    assert second is not first
+    assert second[1].maximum == 900.0
+
+    state = {"sandbox": sandbox, "current_sheet_state": ""}
+    assert column_profile.func("Sheet1", state).startswith('Sheet "Sheet1": 2 data rows, 2 columns')
+    assert "Error profiling columns" in column_profile.func("Other", state)
+    assert is_read_only(column_profile)
@@ -0,0 +1,101 @@
+"""
+Unit tests for the range reader module.
+
+This test suite verifies the compact encoding of a page (column letters once,
+collapsed empty cells and rows), the pagination with a cursor under a token
+budget, and the resolution of partial ranges.
+"""
+
+from datetime import datetime
+
+import openpyxl
+import pytest
+
+from app.core.range_reader import format_value, parse_range, read_range
+
+
+def _sheet(rows: int = 50):
+    """
+    Creates a sheet with a header, `rows` invoice rows, a gap and a subtotal row.
+    """
+    workbook = openpyxl.Workbook()
+    sheet = workbook.active
+    sheet.append(["Belegnummer", "Belegdatum", "Text", "Info", "Kz", "Betrag"])
+    for idx in range(rows):
+        sheet.append([f"RE{idx}", datetime(2025, 5, 1), None, None, None, 100.5])
+    sheet.append([])
+    sheet.append([])
+    sheet.append(["Debitor 1", None, None, None, None, 100.5 * rows])
+    return sheet
+
+
+def test_page_encoding_collapses_empty_cells_and_rows() -> None:
+    """
+    Tests the columnar layout, the "~N" runs, trailing empties and empty row runs.
+    """
+    sheet = _sheet(rows=2)
+    sheet["C2"] = "~literal"
+
+    page = read_range(sheet)
+
+    assert page.text.splitlines() == [
+        'Sheet "Sheet" A1:F6, rows 1-6',
+        "row\tA\tB\tC\tD\tE\tF",
+        "1\tBelegnummer\tBelegdatum\tText\tInfo\tKz\tBetrag",
+        "2\tRE0\t2025-05-01\t\\~literal\t\t\t100.5",
+        "3\tRE1\t2025-05-01\t~3\t100.5",
+        "4-5\t~",
+        "6\tDebitor 1\t~4\t201",
+        "End of range.",
+    ]
+    assert page.next_cursor is None
+
+
+def test_pages_follow_the_cursor_within_the_budget() -> None:
+    """
+    Tests that every page fits the budget, repeats the header and that the pages cover all rows once.
+    """
+    sheet = _sheet(rows=200)
+
+    seen = []
+    cursor = None
+    while True:
+        page = read_range(sheet, "A:F", cursor, max_tokens=300)
+        assert page.tokens <= 300
+        if cursor is not None:
+            assert page.text.splitlines()[2].startswith("header\tBelegnummer")
+        rows = [line.split("\t")[0] for line in page.text.splitlines()[2:-1] if line[0].isdigit()]
+        seen.extend(rows)
+        if page.next_cursor is None:
+            break
+        assert page.text.endswith(f"cursor={page.next_cursor}.")
+        cursor = page.next_cursor
+
+    assert seen[0] == "1" and seen[-2:] == ["202-203", "204"]
+    assert len(seen) == len(set(seen)) == 203
+
+
+def test_partial_ranges_are_clipped_to_the_sheet() -> None:
+    """
+    Tests column-only, row-only and oversized ranges and the errors for bad input.
+    """
+    sheet = _sheet(rows=10)
+
+    assert parse_range(sheet, "B:C") == (2, 1, 3, 14)
+    assert parse_range(sheet, "3:5") == (1, 3, 6, 5)
+    assert parse_range(sheet, "a1:$Z$999") == (1, 1, 6, 14)
+    assert read_range(sheet, "B3").text.splitlines()[3] == "3\t2025-05-01"
+    with pytest.raises(ValueError):
+        parse_range(sheet, "A1-B2")
+    with pytest.raises(ValueError):
+        read_range(sheet, "A1:B5", cursor=9)
+
+
+def test_format_value() -> None:
+    """
+    Tests the single-line rendering of cell values.
+    """
+    assert format_value(datetime(2025, 5, 1, 13, 30)) == "2025-05-01 13:30:00"
+    assert format_value(0.1 + 0.2) == "0.3"
+    assert format_value(True) == "TRUE"
+    assert format_value("a\tb\nc") == "a b c"
@@ -0,0 +1,46 @@
+"""
+Unit tests for the result codec module.
+
+This test suite verifies that objects survive the round trip through the codec,
+over a pipe as well, and that array buffers are sent out of band instead of being
+copied into the pickle stream.
+"""
+
+import multiprocessing
+
+import numpy as np
+import pandas as pd
+
+from app.core import result_codec
+
+
+def test_arrays_are_sent_out_of_band() -> None:
+    """
+    Tests that array data is carried by separate frames and restored unchanged.
+    """
+    values = np.arange(10_000, dtype=np.int64)
+    frames = result_codec.encode({"rows": values, "label": "Debitor"})
+
+    decoded = result_codec.decode(frames)
+
+    assert len(frames) == 2
+    assert len(frames[0]) < values.nbytes
+    assert np.array_equal(decoded["rows"], values)
+    assert decoded["label"] == "Debitor"
+
+
+def test_round_trip_over_a_pipe() -> None:
+    """
+    Tests sending nested results with a DataFrame and an exception over a multiprocessing pipe.
+    """
+    frame = pd.DataFrame({"Betrag": [1.5, -2.0], "Belegnummer": ["RE1", "RE2"]})
+    sender, receiver = multiprocessing.Pipe()
+
+    result_codec.send(sender, ("ok", {"frame": frame, "rows": [2, 5]}))
+    result_codec.send(sender, ("error", ValueError("broken")))
+    status, payload = result_codec.recv(receiver)
+    error_status, error = result_codec.recv(receiver)
+
+    assert status == "ok" and payload["rows"] == [2, 5]
+    pd.testing.assert_frame_equal(payload["frame"], frame)
+    assert error_status == "error" and isinstance(error, ValueError)
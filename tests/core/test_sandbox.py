@@ -0,0 +1,167 @@
+"""
+Unit tests for the sandbox module.
+
+This test suite verifies that the Sandbox executes code against a loaded workbook
+and that a failing snippet rolls the interpreter back to its previous state.
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+import openpyxl
+import pandas as pd
+import pytest
+
+from app.core.sandbox import Sandbox
+from app.utils.enumeration import EXEC_CODE
+
+if TYPE_CHECKING:
+    from pytest_mock import MockerFixture
+
+
+@pytest.fixture
+def workbook_path(tmp_path: Path) -> Path:
+    """
+    Creates a small workbook with a header row and three data rows.
+    """
+    workbook = openpyxl.Workbook()
+    sheet = workbook.active
+    sheet.title = "Sheet1"
+    sheet.append(["Belegnummer", "Betrag"])
+    for idx in range(1, 4):
+        sheet.append([f"RE{idx}", idx * 100.0])
+    path = tmp_path / "workbook.xlsx"
+    workbook.save(path)
+    return path
+
+
+@pytest.fixture
+def sandbox(tmp_path: Path, workbook_path: Path) -> Sandbox:
+    sandbox = Sandbox(base_dir=tmp_path)
+    sandbox.load_workbook(workbook_path)
+    return sandbox
+
+
+def _cell_values(sandbox: Sandbox) -> dict:
+    workbook = sandbox.interpreter.locals["workbook"]
+    return {
+        name: {key: cell.value for key, cell in workbook[name]._cells.items()}
+        for name in workbook.sheetnames
+    }
+
+
+def test_failed_step_rolls_back_workbook_and_namespace(sandbox: Sandbox) -> None:
+    """
+    Tests that a failing snippet leaves no trace in the workbook or the namespace.
+    """
+    sandbox.step('total = 1\nworkbook["Sheet1"]["B2"] = 150.0')
+    before = _cell_values(sandbox)
+
+    response = sandbox.step(
+        "total = 99\n"
+        "scratch = []\n"
+        'sheet = workbook["Sheet1"]\n'
+        'sheet["A2"] = "changed"\n'
+        "sheet.cell(50, 10).value = 1\n"
+        "sheet.append([1, 2, 3])\n"
+        "sheet.delete_rows(3)\n"
+        "sheet.insert_cols(1)\n"
+        'workbook.create_sheet("Analysis")["A1"] = "x"\n'
+        'sheet.title = "Renamed"\n'
+        "1 / 0\n"
+    )
+
+    assert response.code == EXEC_CODE.FAIL
+    assert "ZeroDivisionError" in response.msg
+    assert _cell_values(sandbox) == before
+    assert sandbox.interpreter.locals["total"] == 1
+    assert "scratch" not in sandbox.interpreter.locals
+    assert sandbox.interpreter.locals["workbook"]["Sheet1"]._current_row == 4
+
+
+def test_failed_step_is_not_recorded_in_history(sandbox: Sandbox) -> None:
+    """
+    Tests that only successful snippets are appended to the code history.
+    """
+    history_length = len(sandbox.code_history)
+
+    sandbox.step("undefined_name + 1")
+    sandbox.step("value = 2")
+
+    assert len(sandbox.code_history) == history_length + 1
+    assert sandbox.code_history[-1] == "value = 2"
+
+
+def test_rollback_falls_back_to_replay(sandbox: Sandbox, mocker: "MockerFixture") -> None:
+    """
+    Tests that the code history is replayed if the checkpoint cannot be restored.
+    """
+    sandbox.step("value = 2")
+    mocker.patch(
+        "app.core.checkpoint.SandboxCheckpoint.restore",
+        side_effect=RuntimeError("boom"),
+    )
+
+    response = sandbox.step("value = 3\n1 / 0")
+
+    assert response.code == EXEC_CODE.FAIL
+    assert sandbox.interpreter.locals["value"] == 2
+
+
+def test_concurrent_sandboxes_capture_their_own_output(tmp_path: Path) -> None:
+    """
+    Tests that sandboxes stepping in parallel threads do not see each other's output.
+    """
+    sandboxes = [Sandbox(base_dir=tmp_path / f"sandbox_{idx}") for idx in range(4)]
+
+    def run(idx: int) -> list:
+        code_snippet = f"for i in range(200):\n    print('sandbox-{idx}')\n"
+        return [sandboxes[idx].step(code_snippet).msg for _ in range(5)]
+
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        outputs = list(executor.map(run, range(4)))
+
+    for idx, messages in enumerate(outputs):
+        for msg in messages:
+            assert msg.splitlines() == [f"sandbox-{idx}"] * 200
+
+
+def test_sheet_summaries_only_recompute_touched_sheets(sandbox: Sandbox) -> None:
+    """
+    Tests that sheet summaries are cached and invalidated by writes to their sheet.
+    """
+    sandbox.step('workbook.create_sheet("Analysis")')
+    data_summary, analysis_summary = sandbox.get_sheet_summaries()
+
+    assert data_summary.headers == ("Belegnummer", "Betrag")
+    assert data_summary.n_rows == 4
+    assert analysis_summary.is_empty
+
+    sandbox.step('workbook["Analysis"]["A1"] = "Summe"')
+    new_data_summary, new_analysis_summary = sandbox.get_sheet_summaries()
+
+    assert new_data_summary is data_summary
+    assert new_analysis_summary.headers == ("Summe",)
+    assert 'Sheet "Analysis" has 1 rows' in sandbox.get_sheet_state()
+
+    sandbox.step('del workbook["Analysis"]')
+    assert sandbox.get_existing_sheet_names() == ["Sheet1"]
+
+
+def test_frames_are_typed_and_follow_writes(sandbox: Sandbox) -> None:
+    """
+    Tests that sheet frames are typed, indexed by Excel row and rebuilt after a write.
+    """
+    frame = sandbox.frames["Sheet1"]
+    assert list(frame.columns) == ["Belegnummer", "Betrag"]
+    assert list(frame.index) == [2, 3, 4]
+    assert pd.api.types.is_numeric_dtype(frame["Betrag"])
+
+    response = sandbox.step('print(frames["Sheet1"]["Betrag"].sum())')
+    assert float(response.msg) == 600.0
+    assert sandbox.frames["Sheet1"] is frame
+
+    sandbox.step('workbook["Sheet1"]["B2"] = 150.0')
+    assert sandbox.frames["Sheet1"] is not frame
+    assert sandbox.frames["Sheet1"].loc[2, "Betrag"] == 150.0
@@ -0,0 +1,153 @@
+"""
+Unit tests for the sandbox pool module.
+
+This test suite verifies that pooled sandbox workers execute code in a separate
+process, propagate errors to the caller and are recycled after serving the
+configured number of jobs, that concurrent calls on one sandbox get their own
+replies, and that read-only tools work through a pooled sandbox.
+"""
+
+import os
+from pathlib import Path
+
+import openpyxl
+import pytest
+
+from app.core.sandbox_pool import SandboxPool
+from app.utils.enumeration import EXEC_CODE
+
+
+@pytest.fixture
+def pool():
+    pool = SandboxPool(size=1, max_jobs_per_worker=2, preload=["openpyxl"])
+    pool.start()
+    yield pool
+    pool.shutdown()
+
+
+def test_remote_sandbox_runs_in_worker_process(pool: SandboxPool, tmp_path: Path) -> None:
+    """
+    Tests that a pooled sandbox executes code in another process and loads workbooks.
+    """
+    workbook = openpyxl.Workbook()
+    workbook.active.title = "Sheet1"
+    workbook.active.append(["Belegnummer", "Betrag"])
+    workbook.active.append(["RE1", 100.0])
+    workbook_path = tmp_path / "workbook.xlsx"
+    workbook.save(workbook_path)
+
+    with pool.sandbox(tmp_path) as sandbox:
+        response = sandbox.step("import os\nprint(os.getpid())")
+        sandbox.load_workbook(workbook_path)
+        sheet_names = sandbox.get_existing_sheet_names()
+
+    assert response.code == EXEC_CODE.SUCCESS
+    assert int(response.msg.strip()) != os.getpid()
+    assert sheet_names == ["Sheet1"]
+
+
+def test_remote_sandbox_propagates_exceptions(pool: SandboxPool, tmp_path: Path) -> None:
+    """
+    Tests that exceptions raised by the sandbox are re-raised in the caller.
+    """
+    with pool.sandbox(tmp_path) as sandbox:
+        with pytest.raises(ValueError):
+            sandbox.load_workbook(tmp_path / "missing.xlsx")
+
+
+def test_worker_is_recycled_after_max_jobs(pool: SandboxPool, tmp_path: Path) -> None:
+    """
+    Tests that a worker is replaced once it has served max_jobs_per_worker sandboxes.
+    """
+    pids = []
+    for _ in range(3):
+        with pool.sandbox(tmp_path) as sandbox:
+            pids.append(int(sandbox.step("import os\nprint(os.getpid())").msg.strip()))
+
+    assert pids[0] == pids[1]
+    assert pids[2] != pids[1]
+
+
+def test_remote_sandbox_returns_namespace_objects(pool: SandboxPool, tmp_path: Path) -> None:
+    """
+    Tests that variables computed in the worker arrive as real dicts and arrays.
+    """
+    with pool.sandbox(tmp_path) as sandbox:
+        sandbox.step("import numpy as np\nrows = np.arange(100_000)\nresults = {'cumulative_rows': [2, 5]}")
+        values = sandbox.get_vars("rows", "results", "missing")
+
+    assert set(values) == {"rows", "results"}
+    assert values["results"] == {"cumulative_rows": [2, 5]}
+    assert values["rows"].dtype.kind == "i" and int(values["rows"].sum()) == 4_999_950_000
+
+
+def test_column_profile_tool_with_remote_sandbox(pool: SandboxPool, tmp_path: Path) -> None:
+    """
+    Tests that the column_profile tool profiles a sheet of a pooled sandbox.
+    """
+    from app.graph.tools import column_profile
+
+    workbook = openpyxl.Workbook()
+    workbook.active.title = "Sheet1"
+    workbook.active.append(["Belegnummer", "Betrag"])
+    workbook.active.append(["RE1", 100.0])
+    workbook.active.append(["RE2", 200.0])
+    workbook_path = tmp_path / "workbook.xlsx"
+    workbook.save(workbook_path)
+
+    with pool.sandbox(tmp_path) as sandbox:
+        sandbox.load_workbook(workbook_path)
+        n_rows, profiles = sandbox.profile_sheet("Sheet1")
+        text = column_profile.func("Sheet1", {"sandbox": sandbox, "current_sheet_state": ""})
+
+    assert n_rows == 2
+    assert [profile.header for profile in profiles] == ["Belegnummer", "Betrag"]
+    assert text.startswith('Sheet "Sheet1": 2 data rows, 2 columns')
+
+
+def test_cell_range_reader_with_remote_sandbox(pool: SandboxPool, tmp_path: Path) -> None:
+    """
+    Tests that the cell_range_reader tool reads a page of a pooled sandbox's sheet.
+    """
+    from app.graph.tools import cell_range_reader
+
+    workbook = openpyxl.Workbook()
+    workbook.active.title = "Sheet1"
+    workbook.active.append(["Belegnummer", "Betrag"])
+    workbook.active.append(["RE1", 100.0])
+    workbook_path = tmp_path / "workbook.xlsx"
+    workbook.save(workbook_path)
+
+    with pool.sandbox(tmp_path) as sandbox:
+        sandbox.load_workbook(workbook_path)
+        text = cell_range_reader.func("Sheet1", {"sandbox": sandbox, "current_sheet_state": ""}, "A1:B2")
+
+    assert text == 'Sheet "Sheet1" A1:B2, rows 1-2\nrow\tA\tB\n1\tBelegnummer\tBetrag\n2\tRE1\t100\nEnd of range.'
+
+
+def test_concurrent_calls_on_one_remote_sandbox(pool: SandboxPool, tmp_path: Path) -> None:
+    """
+    Tests that concurrent calls on one pooled sandbox each receive their own reply.
+    """
+    from concurrent.futures import ThreadPoolExecutor
+
+    workbook = openpyxl.Workbook()
+    workbook.active.title = "Sheet1"
+    for row in range(1, 41):
+        workbook.active.append([f"RE{row}", float(row)])
+    workbook_path = tmp_path / "workbook.xlsx"
+    workbook.save(workbook_path)
+
+    with pool.sandbox(tmp_path) as sandbox:
+        sandbox.load_workbook(workbook_path)
+        ranges = [f"A{row}:B{row}" for row in range(1, 41)] * 4
+        executor = ThreadPoolExecutor(max_workers=8)
+        try:
+            # Interleaved messages can leave a thread waiting for a reply forever
+            pages = list(executor.map(lambda cell_range: sandbox.read_range("Sheet1", cell_range), ranges, timeout=30))
+        finally:
+            executor.shutdown(wait=False)
+
+    for cell_range, page in zip(ranges, pages):
+        row = cell_range.split(":")[1][1:]
+        assert f"\n{row}\tRE{row}\t{row}\n" in page
@@ -0,0 +1,49 @@
+"""
+Unit tests for the trim module.
+
+This test suite verifies that empty trailing rows and columns are dropped in bulk,
+that data cells are preserved and that the trim report reflects what was removed.
+"""
+
+import openpyxl
+from openpyxl.styles import Font
+
+from app.core.trim import trim_sheet, trim_workbook
+
+
+def test_trim_sheet_drops_formatted_empty_trailing_cells() -> None:
+    """
+    Tests that styled but empty rows and columns beyond the data are removed.
+    """
+    workbook = openpyxl.Workbook()
+    sheet = workbook.active
+    sheet.append(["Belegnummer", "Betrag"])
+    sheet.append(["RE1", 100.0])
+    sheet.append(["", None])
+    for row in range(4, 1000):
+        sheet.cell(row, 1).font = Font(bold=True)
+    sheet.cell(2, 8).font = Font(bold=True)
+    sheet.row_dimensions[999].height = 20
+
+    report = trim_sheet(sheet)
+
+    assert (sheet.max_row, sheet.max_column) == (2, 2)
+    assert sheet["B2"].value == 100.0
+    assert 999 not in sheet.row_dimensions
+    assert (report.rows_before, report.cols_before) == (999, 8)
+    assert (report.rows_removed, report.cols_removed) == (997, 6)
+    assert report.cells_removed == 999
+
+
+def test_trim_workbook_leaves_empty_and_tight_sheets_untouched() -> None:
+    """
+    Tests that empty sheets and sheets without trailing cells are not modified.
+    """
+    workbook = openpyxl.Workbook()
+    workbook.active.append(["Belegnummer", "Betrag"])
+    workbook.create_sheet("Empty")
+
+    reports = trim_workbook(workbook)
+
+    assert [report.cells_removed for report in reports] == [0, 0]
+    assert workbook.active.max_column == 2
@@ -0,0 +1,156 @@
+"""
+Unit tests for the downloader module.
+
+This test suite runs the WorkbookDownloader against a local HTTP server that
+serves one file with an ETag, honours range and conditional requests, and can be
+told to fail or to drop the connection midway.
+"""
+
+import hashlib
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Iterator, List
+
+import pytest
+
+from app.core.content_cache import ContentCache
+from app.dataset.downloader import WorkbookDownloader
+from app.utils.exceptions import DownloadError, DownloadTooLargeError
+
+PAYLOAD = bytes(range(256)) * 4096  # 1 MiB
+ETAG = '"v1"'
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self) -> None:
+        super().__init__(("127.0.0.1", 0), _Handler)
+        self.requests: List[dict] = []
+        self.fail_next = 0
+        self.drop_after = None
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args) -> None:
+        pass
+
+    def do_GET(self) -> None:
+        server = self.server
+        server.requests.append(dict(self.headers))
+
+        if server.fail_next:
+            server.fail_next -= 1
+            self.send_response(503)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+
+        if self.headers.get("If-None-Match") == ETAG:
+            self.send_response(304)
+            self.send_header("ETag", ETAG)
+            self.end_headers()
+            return
+
+        start = 0
+        range_header = self.headers.get("Range")
+        if range_header and self.headers.get("If-Range", ETAG) == ETAG:
+            start = int(range_header.split("=")[1].rstrip("-"))
+            self.send_response(206)
+            self.send_header("Content-Range", f"bytes {start}-{len(PAYLOAD) - 1}/{len(PAYLOAD)}")
+        else:
+            self.send_response(200)
+        body = PAYLOAD[start:]
+        self.send_header("ETag", ETAG)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+
+        if server.drop_after is not None:
+            # Send part of the body, then drop the connection
+            self.wfile.write(body[: server.drop_after])
+            self.wfile.flush()
+            server.drop_after = None
+            self.close_connection = True
+            self.connection.close()
+            return
+        self.wfile.write(body)
+
+
+@pytest.fixture
+def server() -> Iterator[_Server]:
+    server = _Server()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def _url(server: _Server) -> str:
+    return f"http://127.0.0.1:{server.server_address[1]}/workbook.xlsx"
+
+
+def test_download_saves_file_and_digest(server: _Server, tmp_path: Path) -> None:
+    """
+    Tests that a download writes the full body and reports its SHA-256.
+    """
+    downloader = WorkbookDownloader(backoff_factor=0)
+    result = downloader.download(_url(server), tmp_path / "workbook.xlsx")
+
+    assert (tmp_path / "workbook.xlsx").read_bytes() == PAYLOAD
+    assert result.size == len(PAYLOAD)
+    assert result.digest == hashlib.sha256(PAYLOAD).hexdigest()
+    assert not result.from_cache
+
+
+def test_unchanged_file_is_served_from_cache(server: _Server, tmp_path: Path) -> None:
+    """
+    Tests that a repeat download sends If-None-Match and reuses the cached body on 304.
+    """
+    downloader = WorkbookDownloader(backoff_factor=0, cache=ContentCache(tmp_path / "cache", 64 * 1024 * 1024))
+    downloader.download(_url(server), tmp_path / "first.xlsx")
+    result = downloader.download(_url(server), tmp_path / "second.xlsx")
+
+    assert server.requests[1].get("If-None-Match") == ETAG
+    assert result.from_cache
+    assert (tmp_path / "second.xlsx").read_bytes() == PAYLOAD
+
+
+def test_broken_transfer_resumes_with_range_request(server: _Server, tmp_path: Path) -> None:
+    """
+    Tests that a dropped connection is retried from the bytes already received.
+    """
+    server.drop_after = 300_000
+    downloader = WorkbookDownloader(backoff_factor=0)
+    result = downloader.download(_url(server), tmp_path / "workbook.xlsx")
+
+    assert result.attempts == 2
+    resumed_from = int(server.requests[1]["Range"].split("=")[1].rstrip("-"))
+    assert 0 < resumed_from <= 300_000
+    assert (tmp_path / "workbook.xlsx").read_bytes() == PAYLOAD
+    assert result.digest == hashlib.sha256(PAYLOAD).hexdigest()
+
+
+def test_server_errors_are_retried_then_raised(server: _Server, tmp_path: Path) -> None:
+    """
+    Tests that transient server errors are retried up to max_retries.
+    """
+    server.fail_next = 2
+    downloader = WorkbookDownloader(backoff_factor=0, max_retries=2)
+    assert downloader.download(_url(server), tmp_path / "workbook.xlsx").attempts == 3
+
+    server.fail_next = 3
+    with pytest.raises(DownloadError):
+        downloader.download(_url(server), tmp_path / "workbook.xlsx")
+
+
+def test_oversized_download_is_rejected(server: _Server, tmp_path: Path) -> None:
+    """
+    Tests that a file above max_bytes is rejected.
+    """
+    downloader = WorkbookDownloader(backoff_factor=0, max_bytes=1024)
+    with pytest.raises(DownloadTooLargeError):
+        downloader.download(_url(server), tmp_path / "workbook.xlsx")
@@ -0,0 +1,65 @@
+"""
+Unit tests for the synthetic workbook module.
+
+This test suite verifies that generated OPOS workbooks have the German headers,
+debtor subtotal rows matching their blocks, German-formatted text values and
+phantom formatting, and that the output only depends on the seed.
+"""
+
+from datetime import date
+from pathlib import Path
+
+import openpyxl
+
+from app.core.trim import trim_sheet
+from app.dataset.synthetic import HEADERS, generate_opos_workbook, german_amount, german_date
+
+
+def test_german_formatting() -> None:
+    """
+    Tests the German text formats of amounts and dates.
+    """
+    assert german_amount(-1234.5) == "-1.234,50"
+    assert german_amount(12.0) == "12,00"
+    assert german_date(date(2025, 5, 5)) == "05.05.2025"
+
+
+def test_generated_workbook_structure(tmp_path: Path) -> None:
+    """
+    Tests row count, subtotals, text values and trailing phantom formatting.
+    """
+    path = generate_opos_workbook(tmp_path / "opos.xlsx", 200, text_share=0.2, phantom_rows=50, phantom_columns=4)
+    sheet = openpyxl.load_workbook(path).active
+    rows = list(sheet.iter_rows(min_row=2, max_row=201, max_col=len(HEADERS), values_only=True))
+
+    assert tuple(cell.value for cell in sheet[1][: len(HEADERS)]) == HEADERS
+    assert (sheet.max_row, sheet.max_column) == (251, len(HEADERS) + 4)
+    assert str(rows[-1][0]).startswith("Debitor ")
+
+    block_total = 0.0
+    for row in rows:
+        if str(row[0]).startswith("Debitor "):
+            assert row[13] == round(block_total, 2)
+            block_total = 0.0
+        elif isinstance(row[13], str):
+            block_total += float(row[13].replace(".", "").replace(",", "."))
+        else:
+            block_total += row[13]
+    assert any(isinstance(row[10], str) and row[10].count(".") == 2 for row in rows)
+    assert {row[12] for row in rows} > {"EUR"}
+
+    report = trim_sheet(sheet)
+    assert (report.rows_removed, report.cols_removed) == (50, 4)
+
+
+def test_generation_is_deterministic(tmp_path: Path) -> None:
+    """
+    Tests that the same seed produces the same cell values.
+    """
+    first = generate_opos_workbook(tmp_path / "a.xlsx", 100, seed=7)
+    second = generate_opos_workbook(tmp_path / "b.xlsx", 100, seed=7)
+
+    def values(path: Path):
+        return list(openpyxl.load_workbook(path).active.iter_rows(values_only=True))
+
+    assert values(first) == values(second)
@@ -0,0 +1,109 @@
+"""
+Unit tests for the workbook loader module.
+
+This test suite verifies that a problem workbook is parsed at most once and shared
+by the sandbox, the sheet listing and the lazily built SQLite mirror, and that a
+content cache serves repeat submissions of the same bytes without parsing.
+"""
+
+import sqlite3
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+import openpyxl
+import pytest
+
+from app.core.content_cache import ContentCache
+from app.core.sandbox import Sandbox
+from app.dataset.dataloader import load_problem
+from app.dataset.workbook_loader import LoadedWorkbook
+
+if TYPE_CHECKING:
+    from pytest_mock import MockerFixture
+
+
+@pytest.fixture
+def workbook_path(tmp_path: Path) -> Path:
+    """
+    Creates a workbook with one data sheet and one empty sheet.
+    """
+    workbook = openpyxl.Workbook()
+    sheet = workbook.active
+    sheet.title = "Posten"
+    sheet.append(["Belegnummer", "Betrag"])
+    sheet.append(["RE1", 100.0])
+    sheet.append(["RE2", 250.5])
+    workbook.create_sheet("Leer")
+    path = tmp_path / "workbook.xlsx"
+    workbook.save(path)
+    return path
+
+
+def test_load_problem_does_not_parse_or_build_database(tmp_path: Path, workbook_path: Path) -> None:
+    """
+    Tests that loading a problem lists sheets without parsing and defers the SQLite mirror.
+    """
+    problem = load_problem(workbook_path=workbook_path, db_path=tmp_path / "db", instruction="")
+
+    assert problem.sheet_vars == ["Posten", "Leer"]
+    assert not problem.workbook.is_parsed
+    assert not problem.db_path.exists()
+
+
+def test_sandbox_and_database_share_one_parse(
+    tmp_path: Path, workbook_path: Path, mocker: "MockerFixture"
+) -> None:
+    """
+    Tests that the sandbox and the SQLite mirror reuse the same parsed workbook.
+    """
+    problem = load_problem(workbook_path=workbook_path, db_path=tmp_path / "db", instruction="")
+    parse = mocker.spy(openpyxl, "load_workbook")
+
+    sandbox = Sandbox(base_dir=tmp_path)
+    sandbox.load_workbook(problem.workbook)
+    db_path = problem.get_database()
+
+    assert parse.call_count == 1
+    assert sandbox.interpreter.locals["workbook"] is problem.workbook.workbook
+    with sqlite3.connect(db_path) as conn:
+        rows = conn.execute('SELECT "row number", Belegnummer, Betrag FROM Posten').fetchall()
+        tables = [name for (name,) in conn.execute("SELECT name FROM sqlite_master WHERE type='table'")]
+    assert rows == [(1, "RE1", 100.0), (2, "RE2", 250.5)]
+    assert tables == ["Posten"]
+
+
+def test_loaded_workbook_parses_lazily(workbook_path: Path) -> None:
+    """
+    Tests that the workbook is parsed on first access and cached afterwards.
+    """
+    loaded = LoadedWorkbook(workbook_path)
+    assert not loaded.is_parsed
+
+    workbook = loaded.workbook
+    assert loaded.is_parsed
+    assert loaded.workbook is workbook
+    assert loaded.sheet_names == ["Posten", "Leer"]
+
+
+def test_repeat_submission_is_served_from_cache(
+    tmp_path: Path, workbook_path: Path, mocker: "MockerFixture"
+) -> None:
+    """
+    Tests that a second load of the same bytes skips parsing and rebuilding the mirror.
+    """
+    cache = ContentCache(tmp_path / "cache", max_bytes=64 * 1024 * 1024)
+    first = LoadedWorkbook(workbook_path, cache=cache)
+    first.workbook
+    first.build_database(tmp_path / "first.db")
+
+    resubmitted = tmp_path / "resubmitted.xlsx"
+    resubmitted.write_bytes(workbook_path.read_bytes())
+    parse = mocker.spy(openpyxl, "load_workbook")
+    second = LoadedWorkbook(resubmitted, cache=cache)
+
+    assert second.workbook.sheetnames == ["Posten", "Leer"]
+    assert second.workbook["Posten"]["B3"].value == 250.5
+    assert [report.sheet_name for report in second.trim_report] == ["Posten", "Leer"]
+    second.build_database(tmp_path / "second.db")
+    assert parse.call_count == 0
+    assert (tmp_path / "second.db").read_bytes() == (tmp_path / "first.db").read_bytes()
@@ -0,0 +1,95 @@
+"""
+Unit tests for the async execution of the graph.
+
+This test suite verifies that the compiled graph awaits the planner under ainvoke,
+so that concurrent analyses interleave while they wait for the LLM.
+"""
+
+import asyncio
+import time
+from typing import TYPE_CHECKING
+
+from langchain_core.messages import AIMessage, HumanMessage
+
+from app.core.prompt_manager import PromptManager
+from app.graph.graph import build_graph
+
+if TYPE_CHECKING:
+    from pytest_mock import MockerFixture
+
+LLM_LATENCY = 0.2
+
+
+class SlowPlanner:
+    """
+    A planner chain answering after a fixed delay, in both its sync and async variant.
+    """
+
+    def __init__(self) -> None:
+        self.sync_calls = 0
+        self.async_calls = 0
+
+    def invoke(self, inputs: dict) -> AIMessage:
+        self.sync_calls += 1
+        time.sleep(LLM_LATENCY)
+        return AIMessage(content="Done")
+
+    async def ainvoke(self, inputs: dict) -> AIMessage:
+        self.async_calls += 1
+        await asyncio.sleep(LLM_LATENCY)
+        return AIMessage(content="Done")
+
+
+def _initial_state(mocker: "MockerFixture", planner: SlowPlanner) -> dict:
+    """
+    Builds a state that runs the planner once and then ends.
+    """
+    return {
+        "problem": mocker.Mock(instruction="Sum up column B."),
+        "sandbox": mocker.Mock(),
+        "planner_chain": planner,
+        "max_steps": 1,
+        "output_dir": None,
+        "prompt_manager": PromptManager(),
+        "history_compactor": None,
+        "messages": [HumanMessage(content="Sum up column B.")],
+        "step": 0,
+        "tool_executions": 0,
+        "previous_sheet_state": "Sheet plain data",
+        "current_sheet_state": "Sheet plain data",
+    }
+
+
+def test_ainvoke_interleaves_concurrent_runs(mocker: "MockerFixture") -> None:
+    """
+    Tests that concurrent ainvoke runs wait for the planner at the same time.
+    """
+    graph = build_graph([])
+    planner = SlowPlanner()
+    runs = 10
+
+    async def run_all():
+        return await asyncio.gather(*(graph.ainvoke(_initial_state(mocker, planner)) for _ in range(runs)))
+
+    start = time.perf_counter()
+    final_states = asyncio.run(run_all())
+    elapsed = time.perf_counter() - start
+
+    assert planner.async_calls == runs
+    assert planner.sync_calls == 0
+    assert all(state["messages"][-1].content == "Done" for state in final_states)
+    assert elapsed < runs * LLM_LATENCY / 2
+
+
+def test_invoke_uses_the_sync_planner(mocker: "MockerFixture") -> None:
+    """
+    Tests that the same compiled graph still runs synchronously with invoke.
+    """
+    graph = build_graph([])
+    planner = SlowPlanner()
+
+    final_state = graph.invoke(_initial_state(mocker, planner))
+
+    assert planner.sync_calls == 1
+    assert planner.async_calls == 0
+    assert final_state["step"] == 1
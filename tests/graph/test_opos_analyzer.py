@@ -0,0 +1,96 @@
+"""
+Unit tests for the OPOS analyzer nodes.
+
+This test suite verifies that the preprocessing node hands the structure and
+summary row analysis, including the inferred date formats, to the graph state as
+real dicts read from the sandbox, without a second interpreter round trip, and
+that results restored from the cache are still defined by the code history.
+"""
+
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+import openpyxl
+
+from app.core.sandbox import Sandbox
+from app.graph.nodes.opos_analyzer import opos_preprocessing_node
+
+if TYPE_CHECKING:
+    from pytest_mock import MockerFixture
+
+
+def _sandbox(tmp_path: Path) -> Sandbox:
+    """
+    Returns a sandbox with a small OPOS sheet loaded.
+    """
+    workbook = openpyxl.Workbook()
+    sheet = workbook.active
+    sheet.title = "Sheet1"
+    sheet.append(["Belegnummer", "Belegdatum", "Fälligkeit", "Betrag", "Währung"])
+    sheet.append(["RE1", "01.05.2025", "31.05.2025", "1.100,00", "EUR"])
+    sheet.append(["RE2", "02.05.2025", "01.06.2025", "20,00-", "EUR"])
+    sheet.append(["Debitor 1", None, None, 1080.0, None])
+    tmp_path.mkdir(exist_ok=True)
+    path = tmp_path / "workbook.xlsx"
+    workbook.save(path)
+    sandbox = Sandbox(base_dir=tmp_path)
+    sandbox.load_workbook(path)
+    return sandbox
+
+
+def test_preprocessing_returns_results_from_the_sandbox(tmp_path: Path, mocker: "MockerFixture") -> None:
+    """
+    Tests that the state holds the computed dicts and that the analysis runs in one step.
+    """
+    sandbox = _sandbox(tmp_path)
+    step = mocker.spy(sandbox, "step")
+    state = {
+        "sandbox": sandbox,
+        "current_sheet_state": sandbox.get_sheet_state(),
+        "messages": [],
+    }
+
+    result = opos_preprocessing_node(state)
+
+    assert "opos_preprocessing_error" not in result
+    assert step.call_count == 1
+    assert result["opos_structure_results"]["header_row"][:2] == ["Belegnummer", "Belegdatum"]
+    assert result["opos_structure_results"]["detected_columns"]["col_0"]["detected_type"] == "invoice_number"
+    assert result["opos_structure_results"]["german_terms"] == ["Belegnummer", "Belegdatum", "Währung"]
+    assert result["cumulative_detection_results"]["cumulative_rows"] == [4]
+    assert result["opos_structure_results"]["date_formats"] == {"Belegdatum": "DD.MM.YYYY", "Fälligkeit": "DD.MM.YYYY"}
+    assert result["opos_structure_results"]["detected_columns"]["col_2"]["detected_type"] == "due_date"
+    assert "1 summary rows were found" in result["opos_guidance"]
+    assert "Fälligkeit (DD.MM.YYYY)" in result["opos_guidance"]
+    assert result["opos_structure_results"]["amount_formats"] == {"Betrag": "de"}
+    assert result["opos_structure_results"]["detected_columns"]["col_3"]["detected_type"] == "amount"
+    assert "Betrag (de)" in result["opos_guidance"]
+
+
+def test_cached_results_are_replayable(tmp_path: Path, mocker: "MockerFixture") -> None:
+    """
+    Tests that a cache hit binds the results without running the analysis and records its code for replays.
+    """
+    cache = mocker.Mock()
+    cache.get_object.return_value = None
+    problem = mocker.Mock()
+    problem.workbook.cache = cache
+    computed = _sandbox(tmp_path / "computed")
+    opos_preprocessing_node(
+        {"sandbox": computed, "problem": problem, "current_sheet_state": computed.get_sheet_state(), "messages": []}
+    )
+    cache.get_object.return_value = cache.put_object.call_args.args[2]
+    cached = _sandbox(tmp_path / "cached")
+    step = mocker.spy(cached, "step")
+
+    result = opos_preprocessing_node(
+        {"sandbox": cached, "problem": problem, "current_sheet_state": cached.get_sheet_state(), "messages": []}
+    )
+    cached.rollback(mocker.Mock(restore=mocker.Mock(side_effect=RuntimeError("journal lost"))))
+
+    assert step.call_count == 1 and step.call_args.kwargs == {"dummy": True}
+    assert result["cumulative_detection_results"]["cumulative_rows"] == [4]
+    assert cached.code_history[-1] == computed.code_history[-1]
+    replayed = cached.get_vars("opos_structure_results", "cumulative_detection_results")
+    assert replayed["opos_structure_results"]["amount_formats"] == {"Betrag": "de"}
+    assert replayed["cumulative_detection_results"]["cumulative_rows"] == [4]
@@ -0,0 +1,102 @@
+"""
+Unit tests for the graph registry module.
+
+This test suite verifies that compiled graphs and planner chains are built once
+per tool set and shared, that all planner chains use one pooled HTTP client, and
+that every replayed planner chain answers from all recorded calls.
+"""
+
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+import pytest
+from langchain_core.language_models import GenericFakeChatModel
+from langchain_core.messages import AIMessage, HumanMessage
+
+from app.core import llm_replay
+from app.core.llm_cache import get_llm_response_cache
+from app.core.llm_replay import LLMRecorder
+from app.graph import registry
+from app.graph.tools import cell_range_reader, python_executor
+
+if TYPE_CHECKING:
+    from pytest_mock import MockerFixture
+
+
+@pytest.fixture(autouse=True)
+def settings(mocker: "MockerFixture"):
+    """
+    Provides settings without environment variables and resets the registry around each test.
+    """
+    settings = mocker.Mock(
+        OPENAI_API_KEY="test-key",
+        OPENAI_API_BASE="http://localhost:9/v1",
+        LLM_HTTP_MAX_CONNECTIONS=4,
+        LLM_HTTP_KEEPALIVE_SECONDS=30.0,
+        LLM_CACHE_MAX_MB=0,
+        LLM_RECORD_PATH=None,
+        LLM_REPLAY_PATH=None,
+    )
+    mocker.patch("app.core.config.get_settings", return_value=settings)
+    get_llm_response_cache.cache_clear()
+    registry.clear_registry()
+    yield settings
+    registry.clear_registry()
+    get_llm_response_cache.cache_clear()
+
+
+def test_compiled_graph_is_shared_per_tool_set() -> None:
+    """
+    Tests that the graph is compiled once per tool set.
+    """
+    graph = registry.get_compiled_graph([python_executor, cell_range_reader])
+
+    assert registry.get_compiled_graph([python_executor, cell_range_reader]) is graph
+    assert registry.get_compiled_graph([python_executor]) is not graph
+
+
+def test_planner_chains_share_the_http_client() -> None:
+    """
+    Tests that planner chains are cached per model and tool set and use the pooled client.
+    """
+    chain = registry.get_planner_chain()
+    other_model = registry.get_planner_chain(model="gpt-4.1-mini")
+
+    assert registry.get_planner_chain() is chain
+    assert other_model is not chain
+    client = registry.get_llm_http_client()
+    for planner in (chain, other_model):
+        assert planner.last.bound.http_client is client
+
+
+def test_clear_registry_closes_the_http_client() -> None:
+    """
+    Tests that clearing the registry closes the shared client and drops the compiled graphs.
+    """
+    graph = registry.get_compiled_graph()
+    client = registry.get_llm_http_client()
+
+    registry.clear_registry()
+
+    assert client.is_closed
+    assert registry.get_compiled_graph() is not graph
+
+
+def test_replayed_planner_chains_are_per_run(settings, tmp_path: Path, mocker: "MockerFixture") -> None:
+    """
+    Tests that each replayed planner chain answers from the start of the recordings, which are read once.
+    """
+    path = tmp_path / "planner.jsonl"
+    GenericFakeChatModel(messages=iter([AIMessage(content="Done.")]), callbacks=[LLMRecorder(path)]).invoke(
+        [HumanMessage(content="Analyse.")]
+    )
+    settings.LLM_REPLAY_PATH = str(path)
+    settings.LLM_REPLAY_LATENCY_MS = 0.0
+    load_recordings = mocker.spy(llm_replay, "load_recordings")
+    # The prompt differs from the recorded one, so the calls are answered in recording order
+    messages = [HumanMessage(content="Today's date is 2024-01-01. Analyse.")]
+
+    answers = [registry.get_planner_chain().invoke({"messages": messages}) for _ in range(2)]
+
+    assert [answer.content for answer in answers] == ["Done.", "Done."]
+    assert load_recordings.call_count == 1
@@ -0,0 +1,136 @@
+"""
+Unit tests for the sandbox tool node module.
+
+This test suite verifies that read-only tool calls of one planner turn run
+concurrently, that mutating calls run alone and in order, that the outputs are
+merged into one update in call order, and that the cell range reader reads the
+workbook without changing it.
+"""
+
+import asyncio
+import threading
+import time
+from pathlib import Path
+from typing import List
+
+import openpyxl
+from langchain_core.messages import AIMessage, ToolMessage
+from langchain_core.tools import InjectedToolCallId, tool
+from langgraph.types import Command
+from typing_extensions import Annotated
+
+from app.core.sandbox import Sandbox
+from app.graph.tool_node import SandboxToolNode, is_read_only, mark_read_only
+from app.graph.tools import cell_range_reader, python_executor
+
+events: List[str] = []
+events_lock = threading.Lock()
+
+
+def _log(event: str) -> None:
+    with events_lock:
+        events.append(event)
+
+
+@tool
+def slow_read(name: str) -> str:
+    """Reads something slowly."""
+    _log(f"start {name}")
+    time.sleep(0.2)
+    _log(f"end {name}")
+    return name
+
+
+@tool
+def write(name: str, tool_call_id: Annotated[str, InjectedToolCallId]) -> Command:
+    """Changes the sheet."""
+    _log(f"write {name}")
+    return Command(
+        update={
+            "current_sheet_state": name,
+            "messages": [ToolMessage(content=name, tool_call_id=tool_call_id, name="write")],
+        }
+    )
+
+
+mark_read_only(slow_read)
+
+
+def _turn(*calls) -> dict:
+    """
+    Builds the state after a planner turn with the given (tool name, argument) calls.
+    """
+    tool_calls = [
+        {"name": name, "args": {"name": arg}, "id": f"call-{idx}", "type": "tool_call"}
+        for idx, (name, arg) in enumerate(calls)
+    ]
+    return {"messages": [AIMessage(content="", tool_calls=tool_calls)], "current_sheet_state": "s0"}
+
+
+def test_read_only_calls_run_concurrently_between_ordered_writes() -> None:
+    """
+    Tests that reads overlap, that each write waits for the reads before it, and that later reads wait for it.
+    """
+    events.clear()
+    node = SandboxToolNode([slow_read, write])
+
+    start = time.perf_counter()
+    result = node.invoke(_turn(("slow_read", "a"), ("slow_read", "b"), ("write", "w1"), ("slow_read", "c")))
+    elapsed = time.perf_counter() - start
+
+    assert elapsed < 0.55
+    assert sorted(events[:2]) == ["start a", "start b"]
+    assert events.index("write w1") > max(events.index("end a"), events.index("end b"))
+    assert events.index("start c") > events.index("write w1")
+    assert [message.content for message in result["messages"]] == ["a", "b", "w1", "c"]
+
+
+def test_command_updates_are_merged_in_call_order() -> None:
+    """
+    Tests that messages follow the call order and the last write sets the sheet state.
+    """
+    events.clear()
+    node = SandboxToolNode([slow_read, write])
+
+    result = node.invoke(_turn(("write", "w1"), ("slow_read", "a"), ("write", "w2")))
+
+    assert result["current_sheet_state"] == "w2"
+    assert [message.tool_call_id for message in result["messages"]] == ["call-0", "call-1", "call-2"]
+    assert events == ["write w1", "start a", "end a", "write w2"]
+
+
+def test_async_execution_keeps_the_batches() -> None:
+    """
+    Tests that ainvoke also runs reads concurrently and writes in order.
+    """
+    events.clear()
+    node = SandboxToolNode([slow_read, write])
+
+    start = time.perf_counter()
+    result = asyncio.run(node.ainvoke(_turn(("slow_read", "a"), ("slow_read", "b"), ("write", "w1"))))
+    elapsed = time.perf_counter() - start
+
+    assert elapsed < 0.35
+    assert events[-1] == "write w1"
+    assert result["current_sheet_state"] == "w1"
+
+
+def test_cell_range_reader_reads_without_creating_cells(tmp_path: Path) -> None:
+    """
+    Tests the reader output and that reading beyond the data does not grow the sheet.
+    """
+    workbook = openpyxl.Workbook()
+    sheet = workbook.active
+    sheet.append(["Belegnummer", "Betrag"])
+    sheet.append(["RE1", 100.0])
+    sandbox = Sandbox(tmp_path)
+    sandbox.set_var("workbook", workbook)
+    state = {"sandbox": sandbox, "current_sheet_state": ""}
+
+    output = cell_range_reader.func("Sheet", state, "A1:B3")
+    missing = cell_range_reader.func("Other", state, "A1:B2")
+
+    assert output == 'Sheet "Sheet" A1:B2, rows 1-2\nrow\tA\tB\n1\tBelegnummer\tBetrag\n2\tRE1\t100\nEnd of range.'
+    assert (sheet.max_row, sheet.max_column) == (2, 2)
+    assert "Error reading cell range" in missing
+    assert is_read_only(cell_range_reader) and not is_read_only(python_executor)
@@ -0,0 +1,81 @@
+"""
+Unit tests for the OPOS amount module.
+
+This test suite verifies the inference of the number convention per column
+(German, English, ambiguous), the vectorized parsing of text amounts with currency
+tokens, trailing and bracketed signs, the cents and unparseable masks, and the
+restriction of frame-level inference to amount columns.
+"""
+
+import numpy as np
+import pandas as pd
+
+from app.opos.amounts import NumberFormat, infer_frame_number_formats, infer_number_format, parse_amounts
+
+
+def test_infer_number_format() -> None:
+    """
+    Tests that unambiguous text decides the convention and that German wins a tie.
+    """
+    german = infer_number_format(pd.Series(["1.234,56", "12,00 EUR", 42.0, None, "offen"], dtype=object))
+    english = infer_number_format(pd.Series(["1,234.56", "$12.50", "100"]))
+    ambiguous = infer_number_format(pd.Series(["1.234", "100"]))
+
+    assert (german.name, german.share, german.is_amount, german.ambiguous) == ("de", 0.75, False, False)
+    assert (english.name, english.share) == ("en", 1.0)
+    assert (ambiguous.name, ambiguous.ambiguous) == ("de", True)
+    assert infer_number_format(pd.Series([1.5, 2.5])) == NumberFormat(None, 1.0)
+    assert infer_number_format(pd.Series([True, False])).share == 0.0
+
+
+def test_parse_amounts() -> None:
+    """
+    Tests signs, currency tokens and blanks, and that non-empty cells without an amount are flagged.
+    """
+    values = pd.Series(
+        ["1.234,56", "-12,00 EUR", "1.234,56-", "(5,00)", 42, None, "  ", "n/a", "€ 1.000", "1.2.3"],
+        index=range(2, 12),
+        dtype=object,
+    )
+
+    parsed = parse_amounts(values)
+
+    expected = [1234.56, -12.0, -1234.56, -5.0, 42.0, np.nan, np.nan, np.nan, 1000.0, np.nan]
+    np.testing.assert_array_equal(parsed.amounts, expected)
+    assert parsed.cents.tolist() == [123456, -1200, -123456, -500, 4200, 0, 0, 0, 100000, 0]
+    assert parsed.cents.dtype == np.int64
+    assert parsed.unparseable.tolist() == [False] * 7 + [True, False, True]
+    assert parsed.as_series().index.tolist() == list(range(2, 12))
+
+
+def test_parse_amounts_with_given_format() -> None:
+    """
+    Tests that a given convention is used as is and that numeric columns are kept.
+    """
+    parsed = parse_amounts(pd.Series(["1,234.56", "12.5-"]), NumberFormat("en", 1.0))
+    numeric = parse_amounts(pd.Series([1.5, None, -3.0]))
+
+    assert parsed.amounts.tolist() == [1234.56, -12.5]
+    np.testing.assert_array_equal(numeric.amounts, [1.5, np.nan, -3.0])
+    assert not numeric.unparseable.any()
+    assert numeric.valid.tolist() == [True, False, True]
+
+
+def test_infer_frame_number_formats() -> None:
+    """
+    Tests that only columns whose header names an amount are inferred.
+    """
+    frame = pd.DataFrame(
+        {
+            "Belegnummer": ["4711", "4712"],
+            "Betrag": ["1.000,00", "250,50-"],
+            "Amount USD": ["1,000.00", "12.00"],
+        }
+    )
+
+    formats = infer_frame_number_formats(frame)
+
+    assert {column: number_format.name for column, number_format in formats.items()} == {
+        "Betrag": "de",
+        "Amount USD": "en",
+    }
@@ -0,0 +1,105 @@
+"""
+Unit tests for the cumulative row detector.
+
+This test suite verifies every heuristic of the detector on a sheet wider than
+26 columns, the per-heuristic scores, the plain-Python result form and the
+identify_summary_rows tool built on it.
+"""
+
+from pathlib import Path
+
+import numpy as np
+import openpyxl
+import pandas as pd
+
+from app.core.sandbox import Sandbox
+from app.graph.tools_cumulative_detector import identify_summary_rows
+from app.opos.cumulative import HEURISTICS, detect_cumulative_rows
+
+
+def _frame() -> pd.DataFrame:
+    """
+    Creates a 30-column sheet frame with postings, a debtor subtotal, an unlabelled
+    subtotal, a free-text total, a blank row and a description mentioning "Konsum".
+    """
+    rows = [
+        ["RE1", "90001", "01.05.2025", "31.05.2025", "Lieferung", 100.0],
+        ["RE2", "90002", "02.05.2025", "01.06.2025", "Konsumgüter", -20.0],
+        ["Debitor 4711", None, None, None, None, 80.0],
+        ["RE3", "90003", "03.05.2025", "02.06.2025", "Lieferung", 50.0],
+        [None, None, None, None, None, "50,00"],
+        ["RE4", "90004", "04.05.2025", "03.06.2025", "Lieferung", 10.0],
+        ["Zwischensumme Mai", "x", "y", "z", None, 140.0],
+        [None, None, None, None, None, None],
+    ]
+    frame = pd.DataFrame(
+        [row[:5] + [None] * 24 + row[5:] for row in rows],
+        columns=["Belegnummer", "Zuordnung", "Belegdatum", "Fälligkeit", "Text"]
+        + [f"Extra {idx}" for idx in range(24)]
+        + ["Betrag"],
+        index=range(2, 2 + len(rows)),
+    )
+    frame["Extra 23"] = frame["Extra 23"].astype(object)
+    frame.loc[8, "Extra 23"] = "Gesamt"
+    return frame
+
+
+def test_heuristics_flag_the_subtotals_of_the_whole_sheet() -> None:
+    """
+    Tests the flagged rows of every heuristic, including a summary word beyond column Z.
+    """
+    result = detect_cumulative_rows(_frame())
+
+    assert result.rows.dtype == np.int64
+    assert result.rows.tolist() == [4, 6, 8]
+    assert result.flagged_by("keyword").tolist() == [4]
+    assert result.flagged_by("empty_key_fields").tolist() == [4, 6]
+    assert result.flagged_by("format_change").tolist() == [4, 8]
+    assert result.flagged_by("summary_word").tolist() == [8]
+    assert result.total_rows_analyzed == 8
+
+
+def test_scores_and_plain_result() -> None:
+    """
+    Tests the score matrix and the dict kept in the graph state.
+    """
+    result = detect_cumulative_rows(_frame())
+
+    assert result.scores.shape == (3, len(HEURISTICS))
+    assert result.scores[1].tolist() == [0.0, 1.0, 0.0, 0.0]
+    assert result.scores[0, HEURISTICS.index("empty_key_fields")] == 0.8
+    assert result.to_dict() == {
+        "cumulative_rows": [4, 6, 8],
+        "total_cumulative_found": 3,
+        "total_rows_analyzed": 8,
+        "debitor_rows": [4],
+        "empty_key_fields": [4, 6],
+        "format_changes": [4, 8],
+        "summary_indicators": [8],
+    }
+    assert detect_cumulative_rows(pd.DataFrame()).rows.tolist() == []
+
+
+def test_identify_summary_rows_tool(tmp_path: Path) -> None:
+    """
+    Tests that the tool reports Excel row numbers and keeps the results in the sandbox.
+    """
+    workbook = openpyxl.Workbook()
+    sheet = workbook.active
+    sheet.title = "Sheet1"
+    sheet.append(["Belegnummer", "Belegdatum", "Betrag"])
+    sheet.append(["RE1", "01.05.2025", 100.0])
+    sheet.append(["Debitor 1", None, 100.0])
+    sheet.append(["RE2", "02.05.2025", 10.0])
+    path = tmp_path / "workbook.xlsx"
+    workbook.save(path)
+    sandbox = Sandbox(base_dir=tmp_path)
+    sandbox.load_workbook(path)
+    state = {"sandbox": sandbox, "current_sheet_state": ""}
+
+    output = identify_summary_rows.func("Sheet1", "call-1", state)
+    partial = identify_summary_rows.func("Sheet1", "call-2", state, "A1:C2")
+
+    assert "Found 1 cumulative rows in 3 data rows" in output and "Row 3" in output
+    assert "Found 0 cumulative rows in 1 data rows" in partial
+    assert sandbox.get_var("cumulative_detection_results")["cumulative_rows"] == []
@@ -0,0 +1,104 @@
+"""
+Unit tests for the OPOS date module.
+
+This test suite verifies the inference of one date format per column (German,
+ISO, Excel serials, native datetimes), the statistical day/month resolution, the
+vectorized conversion to datetime64 and the format cache keyed by header signature,
+including the re-check of columns cached as holding no dates.
+"""
+
+from datetime import datetime
+from typing import TYPE_CHECKING
+
+import pandas as pd
+
+from app.opos import dates
+from app.opos.dates import DateFormatCache, infer_date_format, infer_frame_date_formats, parse_dates
+
+if TYPE_CHECKING:
+    from pytest_mock import MockerFixture
+
+
+def test_infer_format_of_mixed_columns() -> None:
+    """
+    Tests German text mixed with native datetimes and Excel serials, and that numbers need a date header.
+    """
+    values = pd.Series(["01.05.2025", " 15.04.2025", datetime(2025, 3, 1), None, 45000, "offen"], dtype=object)
+
+    date_format = infer_date_format(values, serials=True)
+
+    assert (date_format.text_format, date_format.name, date_format.serials) == ("%d.%m.%Y", "DD.MM.YYYY", True)
+    assert date_format.share == 0.8 and date_format.is_date
+    assert infer_date_format(pd.Series([45000, 45001])).share == 0.0
+    assert infer_date_format(pd.Series([45000, 45001]), serials=True).name == "excel_serial"
+    assert infer_date_format(pd.Series(["2025-05-01", "2025-06-30"])).name == "YYYY-MM-DD"
+
+
+def test_day_and_month_order_is_resolved_statistically() -> None:
+    """
+    Tests that a component above 12 decides and that otherwise the more varied component is the day.
+    """
+    month_first = infer_date_format(pd.Series(["03/04/2025", "05/16/2025"]))
+    day_first = infer_date_format(pd.Series(["16/04/2025", "05/06/2025"]))
+    varied_first = infer_date_format(pd.Series(["03/01/2025", "07/01/2025", "11/01/2025"]))
+
+    assert (month_first.text_format, month_first.ambiguous) == ("%m/%d/%Y", False)
+    assert (day_first.text_format, day_first.ambiguous) == ("%d/%m/%Y", False)
+    assert (varied_first.name, varied_first.ambiguous) == ("DD/MM/YYYY", True)
+
+
+def test_parse_dates_converts_whole_columns() -> None:
+    """
+    Tests the conversion of mixed, serial and unparseable values to datetime64.
+    """
+    values = pd.Series(["01.05.2025", datetime(2025, 3, 1, 12, 30), 45000, None, "offen"], dtype=object, index=range(2, 7))
+
+    parsed = parse_dates(values)
+
+    assert pd.api.types.is_datetime64_any_dtype(parsed)
+    assert parsed.index.tolist() == [2, 3, 4, 5, 6]
+    assert parsed.tolist()[:3] == [pd.Timestamp(2025, 5, 1), pd.Timestamp(2025, 3, 1, 12, 30), pd.Timestamp(2023, 3, 15)]
+    assert parsed.iloc[3:].isna().all()
+    assert parse_dates(pd.Series([45000.0, 12.5])).tolist()[1] is pd.NaT
+
+
+def test_frame_formats_are_cached_by_header_signature(mocker: "MockerFixture") -> None:
+    """
+    Tests that repeat layouts skip inference, that a changed format is re-inferred and
+    that numbers only count as dates under a date header.
+    """
+    cache = DateFormatCache()
+    frame = pd.DataFrame(
+        {"Belegdatum": [45000, 45001], "Betrag": [45000.0, 1.0], "Fälligkeit": ["01.05.2025", "02.05.2025"]}
+    )
+    infer = mocker.spy(dates, "infer_date_format")
+
+    formats = infer_frame_date_formats(frame, cache)
+    repeat = infer_frame_date_formats(frame.copy(), cache)
+    iso = frame.assign(**{"Fälligkeit": ["2025-05-01", "2025-05-02"]})
+    changed = infer_frame_date_formats(iso, cache)
+
+    assert {column: date_format.name for column, date_format in formats.items()} == {
+        "Belegdatum": "excel_serial",
+        "Fälligkeit": "DD.MM.YYYY",
+    }
+    assert repeat == formats
+    assert changed["Fälligkeit"].name == "YYYY-MM-DD"
+    # Three inferences, one re-inference of the changed column and one check of the cached "Betrag" per repeat
+    assert infer.call_count == 6
+    assert cache.hits == 5
+
+
+def test_cached_non_date_columns_are_rechecked() -> None:
+    """
+    Tests that a column cached as holding no dates is re-inferred once a later upload holds dates there.
+    """
+    cache = DateFormatCache()
+    empty = pd.DataFrame({"Belegnummer": ["RE1", "RE2", "RE3"], "Fälligkeit": [None, "n/a", "offen"]})
+    dated = empty.assign(**{"Fälligkeit": ["01.02.2025", "15.03.2025", "30.04.2025"]})
+
+    assert infer_frame_date_formats(empty, cache) == {}
+    formats = infer_frame_date_formats(dated, cache)
+
+    assert formats["Fälligkeit"].text_format == "%d.%m.%Y"
+    assert cache.hits == 1
@@ -0,0 +1,192 @@
+"""
+Unit tests for the deterministic OPOS engine.
+
+This test suite verifies column role detection, the classification of cumulative,
+invoice and credit rows, the ageing, top-position and duplicate results, the
+rendered "Analysis" sheet and the fallback to the planner for unclear columns.
+"""
+
+from datetime import date, datetime
+from typing import TYPE_CHECKING
+
+import openpyxl
+import pytest
+
+from app.core.frames import SheetFrames
+from app.opos import (
+    STANDARD_ANALYSIS_PROMPT,
+    analyze_frame,
+    detect_column_roles,
+    is_standard_analysis,
+    run_opos_engine,
+)
+
+if TYPE_CHECKING:
+    from pytest_mock import MockerFixture
+
+TODAY = date(2025, 6, 30)
+
+
+@pytest.fixture
+def workbook() -> openpyxl.Workbook:
+    """
+    Creates a German open-posts sheet with two debtors, their subtotals and a grand total.
+    """
+    workbook = openpyxl.Workbook()
+    sheet = workbook.active
+    sheet.title = "OPOS"
+    sheet.append(["Zuordnung", "Belegnummer", "Belegdatum", "Nettofälligkeit", "Betrag in Hauswährung", "Währung"])
+    sheet.append(["0090001", "90001", datetime(2025, 6, 1), datetime(2025, 7, 15), 1000.0, "EUR"])
+    sheet.append(["0090002", "90002", datetime(2025, 5, 1), datetime(2025, 6, 10), 500.0, "EUR"])
+    sheet.append(["0090003", "90003", datetime(2025, 3, 1), datetime(2025, 4, 1), -200.0, "EUR"])
+    sheet.append(["Debitor 100", None, None, None, 1300.0, "EUR"])
+    sheet.append(["0090004", "90002", datetime(2025, 4, 1), datetime(2025, 5, 15), 300.0, "EUR"])
+    sheet.append(["0090005", None, datetime(2025, 6, 1), datetime(2025, 6, 1), -50.0, "EUR"])
+    sheet.append(["Debitor 200", None, None, None, 250.0, "EUR"])
+    sheet.append([None, None, None, None, 1550.0, "EUR"])
+    workbook.create_sheet("Analysis")
+    return workbook
+
+
+def test_detect_column_roles(workbook: openpyxl.Workbook) -> None:
+    """
+    Tests that the roles are found from headers and values with full confidence.
+    """
+    frames = SheetFrames(lambda: workbook)
+
+    roles = detect_column_roles(frames["OPOS"])
+
+    assert roles.get("invoice_number") == "Belegnummer"
+    assert roles.get("invoice_date") == "Belegdatum"
+    assert roles.get("due_date") == "Nettofälligkeit"
+    assert roles.get("amount") == "Betrag in Hauswährung"
+    assert roles.get("currency") == "Währung"
+    assert roles.confidence == pytest.approx(1.0)
+
+
+def test_analyze_frame(workbook: openpyxl.Workbook) -> None:
+    """
+    Tests every analysis step on the sample sheet.
+    """
+    frame = SheetFrames(lambda: workbook)["OPOS"]
+
+    analysis = analyze_frame(frame, "OPOS", detect_column_roles(frame), today=TODAY)
+
+    assert analysis.cumulative_rows == [5, 8, 9]
+    assert analysis.invoice_rows == [2, 3, 6]
+    assert analysis.credit_rows == [4, 7]
+    assert analysis.incomplete_rows == {7: ["invoice_number"]}
+    assert analysis.invoice_total == 1800.0
+    assert analysis.credit_total == -250.0
+
+    ageing = {bucket["bucket"]: bucket for bucket in analysis.invoice_ageing}
+    assert ageing["Not mature"]["amount"] == 1000.0
+    assert ageing["1-30 days"]["amount"] == 500.0
+    assert ageing["31-60 days"]["amount"] == 300.0
+    assert ageing[">60 days"]["count"] == 0
+    assert sum(bucket["share"] for bucket in analysis.invoice_ageing) == pytest.approx(100.0, abs=0.05)
+
+    assert [credit["amount"] for credit in analysis.top_credits] == [-200.0, -50.0]
+    assert analysis.top_debtors == [
+        {"debtor": "Debitor 100", "amount": 1300.0},
+        {"debtor": "Debitor 200", "amount": 250.0},
+    ]
+    assert analysis.duplicate_invoice_numbers == ["90002"]
+    assert analysis.duplicate_debtors == []
+
+
+def test_analyze_frame_with_german_text_amounts(workbook: openpyxl.Workbook) -> None:
+    """
+    Tests that text amounts are parsed with the column's convention and unparseable amounts are reported.
+    """
+    sheet = workbook["OPOS"]
+    sheet["E2"], sheet["E3"], sheet["E4"] = "1.000,00 EUR", "500,00", "200,00-"
+    sheet["E7"] = "offen"
+    frame = SheetFrames(lambda: workbook)["OPOS"]
+
+    analysis = analyze_frame(frame, "OPOS", detect_column_roles(frame), today=TODAY)
+
+    assert analysis.invoice_rows == [2, 3, 6]
+    assert analysis.credit_rows == [4]
+    assert analysis.invoice_total == 1800.0
+    assert analysis.credit_total == -200.0
+    assert analysis.unparseable_amount_rows == [7]
+    assert analysis.summary()["unparseable_amount_rows"] == 1
+
+
+def test_run_opos_engine_writes_analysis_sheet(workbook: openpyxl.Workbook) -> None:
+    """
+    Tests that the engine replaces the existing "Analysis" sheet in place.
+    """
+    result = run_opos_engine(workbook, SheetFrames(lambda: workbook), today=TODAY)
+
+    assert result["applied"] is True
+    assert result["sheet_name"] == "OPOS"
+    assert workbook.sheetnames == ["OPOS", "Analysis"]
+    sheet = workbook["Analysis"]
+    titles = [cell.value for cell in sheet[4] if cell.value]
+    assert titles[0] == "1. Cumulative rows"
+    assert len(titles) == 11
+    assert [sheet.cell(row=row, column=1).value for row in range(6, 9)] == [5, 8, 9]
+
+
+def test_run_opos_engine_low_confidence() -> None:
+    """
+    Tests that nothing is written when the columns cannot be identified.
+    """
+    workbook = openpyxl.Workbook()
+    sheet = workbook.active
+    sheet.append(["A", "B", "C"])
+    sheet.append(["x", 1, "y"])
+
+    result = run_opos_engine(workbook, SheetFrames(lambda: workbook), today=TODAY)
+
+    assert result["applied"] is False
+    assert result["confidence"] == 0.0
+    assert "Analysis" not in workbook.sheetnames
+
+
+def test_is_standard_analysis() -> None:
+    """
+    Tests that the standard prompt is recognised regardless of whitespace and date.
+    """
+    reformatted = "\n".join(line.strip() for line in STANDARD_ANALYSIS_PROMPT.splitlines())
+    other_date = reformatted.replace("Today's date is the", "Today's date is the 01th of January 2020 -")
+
+    assert is_standard_analysis(STANDARD_ANALYSIS_PROMPT)
+    assert is_standard_analysis(other_date)
+    assert not is_standard_analysis("Sum up column B.")
+
+
+def test_opos_engine_node_routes_to_end(mocker: "MockerFixture") -> None:
+    """
+    Tests that the graph node ends the run when the engine applied and falls back otherwise.
+    """
+    from langgraph.graph import END
+
+    from app.graph.nodes.opos_engine import opos_engine_node, route_after_engine
+    from app.utils.common import SandboxResponse
+    from app.utils.enumeration import EXEC_CODE
+
+    sandbox = mocker.Mock()
+    sandbox.step.return_value = SandboxResponse(EXEC_CODE.SUCCESS, "")
+    sandbox.get_var.return_value = {
+        "applied": True,
+        "sheet_name": "OPOS",
+        "invoice_rows": 3,
+        "invoice_total": 1800.0,
+        "credit_rows": 2,
+        "credit_total": -250.0,
+    }
+    sandbox.get_sheet_state.return_value = "after"
+    problem = mocker.Mock(instruction=STANDARD_ANALYSIS_PROMPT)
+    state = {"problem": problem, "sandbox": sandbox, "messages": [], "current_sheet_state": "before"}
+
+    applied = opos_engine_node(state)
+    skipped = opos_engine_node({**state, "problem": mocker.Mock(instruction="Sum up column B.")})
+
+    assert "run_opos_engine" in sandbox.step.call_args.args[0]
+    assert applied["current_sheet_state"] == "after"
+    assert route_after_engine(applied) == END
+    assert route_after_engine(skipped) == "opos_preprocessing"
+    assert sandbox.step.call_count == 1
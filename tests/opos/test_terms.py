@@ -0,0 +1,75 @@
+"""
+Unit tests for the OPOS term registry.
+
+This test suite verifies the term-class bitmasks of the compiled matcher: word
+start and substring matching, terms contained in longer terms, the matched terms,
+the matching of whole columns and frames, and that the matcher is compiled once
+per process.
+"""
+
+import numpy as np
+import pandas as pd
+
+from app.opos.terms import TermMatcher, get_term_matcher
+
+
+def test_bitmasks_of_cells_and_headers() -> None:
+    """
+    Tests word-start classes, substring classes and the bits of contained terms.
+    """
+    matcher = get_term_matcher()
+
+    assert matcher.classes_of(matcher.match_text("Debitor 4711")) == [
+        "account",
+        "header:debitor",
+        "german",
+        "role:debtor",
+        "indicator",
+        "debtor_account",
+    ]
+    assert matcher.classes_of(matcher.match_text("Kundendebitor")) == ["header:debitor", "german", "role:debtor", "indicator"]
+    assert matcher.classes_of(matcher.match_text("Gesamtsumme")) == ["summary", "header:amount", "role:amount"]
+    assert matcher.classes_of(matcher.match_text("Rechnungsdatum")) == [
+        "header:invoice_number",
+        "header:invoice_date",
+        "role:invoice_date",
+    ]
+    assert matcher.match_text("Konsumgüter") == 0
+    assert matcher.mask("account", "summary") == matcher.bit("account") | matcher.bit("summary")
+
+
+def test_longer_terms_keep_word_start_bits() -> None:
+    """
+    Tests that a substring term starting with a word-start term keeps its bits at a word start only.
+    """
+    matcher = TermMatcher({"account": ("debitor",), "role": ("debitorennummer",)}, word_start={"account"})
+
+    assert matcher.classes_of(matcher.match_text("Debitorennummer 5")) == ["account", "role"]
+    assert matcher.classes_of(matcher.match_text("Kundendebitorennummer")) == ["role"]
+    assert matcher.terms_in("Summe Debitorennummer") == ["debitorennummer"]
+
+
+def test_columns_and_frames_are_matched_per_cell() -> None:
+    """
+    Tests that non-string and missing values get no bits and frames give one mask per cell.
+    """
+    matcher = TermMatcher({"summary": ("summe", "total"), "currency": ("eur",)}, word_start={"summary"})
+    frame = pd.DataFrame(
+        {"Text": ["Summe EUR", None, "Total", "Summe EUR"], "Betrag": [1.0, 2.0, 3.0, 4.0], "Mixed": ["eur", 5, None, "x"]}
+    )
+
+    masks = matcher.match_frame(frame)
+
+    assert masks.dtype == np.int64 and masks.shape == (4, 3)
+    assert masks[:, 0].tolist() == [3, 0, 1, 3]
+    assert masks[:, 1].tolist() == [0, 0, 0, 0]
+    assert masks[:, 2].tolist() == [2, 0, 0, 0]
+    assert matcher.match(["Zwischensumme", "SUMME"]).tolist() == [0, 1]
+
+
+def test_matcher_is_compiled_once() -> None:
+    """
+    Tests that the process-wide matcher and its compiled pattern are reused.
+    """
+    assert get_term_matcher() is get_term_matcher()
+    assert get_term_matcher().pattern is get_term_matcher().pattern
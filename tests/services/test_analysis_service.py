@@ -0,0 +1,72 @@
+"""
+Unit tests for the analysis service.
+
+This test suite verifies that the synchronous and asynchronous entry points share
+one session setup: the same directories are passed to the problem loader, the
+graph and the publisher, and the temporary directory is removed afterwards.
+"""
+
+import asyncio
+from contextlib import contextmanager
+from typing import TYPE_CHECKING
+
+import pytest
+
+from app.services import analysis_service
+
+if TYPE_CHECKING:
+    from pytest_mock import MockerFixture
+
+
+@pytest.fixture
+def service(mocker: "MockerFixture"):
+    """
+    Replaces the content cache, the problem loader, the sandbox, the graph and the publisher with mocks.
+    """
+
+    @contextmanager
+    def open_sandbox(base_dir):
+        yield mocker.Mock(base_dir=base_dir)
+
+    mocker.patch.object(analysis_service, "get_content_cache", return_value=None)
+    mocker.patch.object(analysis_service, "load_problem", return_value="problem")
+    mocker.patch.object(analysis_service, "open_sandbox", side_effect=open_sandbox)
+    graph = mocker.patch.object(analysis_service, "SheetAgentGraph")
+    graph.return_value.arun = mocker.AsyncMock()
+    publish = mocker.patch.object(analysis_service, "_publish_output", side_effect=lambda path, unique_id: str(path))
+    return graph, publish
+
+
+@pytest.mark.parametrize("use_async", [False, True])
+def test_entry_points_share_the_session(service, use_async: bool) -> None:
+    """
+    Tests that both entry points load the problem, run the graph and publish from the session directories.
+    """
+    graph, publish = service
+
+    if use_async:
+        result = asyncio.run(analysis_service.arun_analysis("Analyse", "/data/opos.xlsx", is_local_file=True))
+    else:
+        result = analysis_service.run_analysis("Analyse", "/data/opos.xlsx", is_local_file=True)
+
+    problem_kwargs = analysis_service.load_problem.call_args.kwargs
+    session_output_dir = graph.call_args.kwargs["output_dir"]
+    assert problem_kwargs["workbook_source"] == "/data/opos.xlsx" and problem_kwargs["is_local_file"]
+    assert graph.call_args.kwargs["problem"] == "problem"
+    assert session_output_dir.parent == problem_kwargs["workbook_path"].parent
+    assert result == str(session_output_dir / "workbook_new.xlsx")
+    assert publish.call_count == 1
+    assert not session_output_dir.exists()
+
+
+def test_errors_are_raised_after_cleanup(service) -> None:
+    """
+    Tests that a failing run is re-raised and still removes the temporary directory.
+    """
+    graph, _ = service
+    graph.return_value.run.side_effect = RuntimeError("graph failed")
+
+    with pytest.raises(RuntimeError, match="graph failed"):
+        analysis_service.run_analysis("Analyse", "/data/opos.xlsx", is_local_file=True)
+
+    assert not graph.call_args.kwargs["output_dir"].exists()
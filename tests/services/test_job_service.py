@@ -0,0 +1,142 @@
+"""
+Unit tests for the job service and the job endpoints.
+
+This test suite verifies that jobs run on a bounded worker pool, that submissions
+are rejected once the queue is full, that shutdown starts no waiting job and that
+queued jobs survive a restart.
+"""
+
+import threading
+import time
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.api.endpoints import opos
+from app.services.job_service import JOB_FAILED, JOB_QUEUED, JOB_SUCCEEDED, JobManager, JobStore
+from app.utils.exceptions import JobQueueFullError
+
+if TYPE_CHECKING:
+    from pytest_mock import MockerFixture
+
+
+def _wait_for(manager: JobManager, job_id: str, status: str, timeout: float = 5.0) -> None:
+    deadline = time.monotonic() + timeout
+    while manager.get(job_id).status != status:
+        if time.monotonic() > deadline:
+            raise AssertionError(f"Job {job_id} did not reach status {status}")
+        time.sleep(0.01)
+
+
+def test_jobs_run_in_background(tmp_path: Path) -> None:
+    """
+    Tests that submitted jobs are executed and their result or error is persisted.
+    """
+    def runner(instruction: str, workbook_source: str, is_local_file: bool) -> str:
+        if instruction == "fail":
+            raise ValueError("broken workbook")
+        return f"result for {workbook_source}"
+
+    manager = JobManager(JobStore(tmp_path / "jobs.db"), max_workers=2, max_queue_depth=10, runner=runner)
+    manager.start()
+    ok = manager.submit("analyze", "a.xlsx", True)
+    failing = manager.submit("fail", "b.xlsx", True)
+
+    _wait_for(manager, ok.id, JOB_SUCCEEDED)
+    _wait_for(manager, failing.id, JOB_FAILED)
+    assert manager.get(ok.id).result == "result for a.xlsx"
+    assert manager.get(failing.id).error == "broken workbook"
+    manager.shutdown()
+
+
+def test_full_queue_rejects_jobs(tmp_path: Path) -> None:
+    """
+    Tests that submissions beyond the queue depth are rejected while workers are busy.
+    """
+    release = threading.Event()
+    manager = JobManager(
+        JobStore(tmp_path / "jobs.db"),
+        max_workers=1,
+        max_queue_depth=2,
+        runner=lambda *args: release.wait(5) and "done",
+    )
+    manager.start()
+    running = manager.submit("analyze", "a.xlsx", True)
+    _wait_for(manager, running.id, "running")
+    manager.submit("analyze", "b.xlsx", True)
+    manager.submit("analyze", "c.xlsx", True)
+
+    with pytest.raises(JobQueueFullError):
+        manager.submit("analyze", "d.xlsx", True)
+    release.set()
+    manager.shutdown()
+
+
+def test_queued_jobs_survive_a_restart(tmp_path: Path) -> None:
+    """
+    Tests that jobs left queued or running are executed after a restart.
+    """
+    store = JobStore(tmp_path / "jobs.db")
+    queued = store.create("analyze", "a.xlsx", True)
+    interrupted = store.create("analyze", "b.xlsx", True)
+    store.mark_running(interrupted.id)
+    store.close()
+
+    manager = JobManager(JobStore(tmp_path / "jobs.db"), max_workers=1, max_queue_depth=10, runner=lambda *args: "done")
+    manager.start()
+    _wait_for(manager, queued.id, JOB_SUCCEEDED)
+    _wait_for(manager, interrupted.id, JOB_SUCCEEDED)
+    manager.shutdown()
+
+
+def test_shutdown_leaves_waiting_jobs_queued(tmp_path: Path) -> None:
+    """
+    Tests that shutdown lets the running job finish but starts none of the waiting jobs.
+    """
+    started = threading.Event()
+    release = threading.Event()
+
+    def runner(*args) -> str:
+        started.set()
+        release.wait(5)
+        return "done"
+
+    manager = JobManager(JobStore(tmp_path / "jobs.db"), max_workers=1, max_queue_depth=10, runner=runner)
+    manager.start()
+    jobs = [manager.submit("analyze", f"{idx}.xlsx", True) for idx in range(4)]
+    assert started.wait(5)
+
+    stopper = threading.Thread(target=manager.shutdown)
+    stopper.start()
+    release.set()
+    stopper.join(5)
+
+    assert manager.get(jobs[0].id).status == JOB_SUCCEEDED
+    assert [manager.get(job.id).status for job in jobs[1:]] == [JOB_QUEUED] * 3
+    assert manager.queue_depth == 0
+
+
+def test_job_endpoints(tmp_path: Path, mocker: "MockerFixture") -> None:
+    """
+    Tests that the job endpoints answer 202, 404 and 429.
+    """
+    manager = JobManager(JobStore(tmp_path / "jobs.db"), max_workers=1, max_queue_depth=1, runner=lambda *args: "done")
+    mocker.patch.object(opos, "get_job_manager", return_value=manager)
+    workbook = tmp_path / "workbook.xlsx"
+    workbook.write_bytes(b"")
+    app = FastAPI()
+    app.include_router(opos.router, prefix="/opos")
+    client = TestClient(app)
+
+    response = client.post("/opos/jobs", json={"instruction": "analyze", "workbook_source": str(workbook)})
+    assert response.status_code == 202
+    assert response.json()["status"] == JOB_QUEUED
+
+    # The workers are not started, so the first job keeps the queue full
+    response = client.post("/opos/jobs", json={"instruction": "analyze", "workbook_source": str(workbook)})
+    assert response.status_code == 429
+
+    assert client.get("/opos/jobs/unknown").status_code == 404